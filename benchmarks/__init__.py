@@ -0,0 +1 @@
+"""Offline benchmarks of the crawler's stages against a synthetic local website."""
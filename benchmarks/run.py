@@ -0,0 +1,374 @@
+"""
+Benchmark each stage of the crawler end to end against a synthetic local website.
+
+Usage:
+    python -m benchmarks.run [--pages 500] [--latency-ms 20] [--stages robots,sitemap,...]
+                             [--output results.json] [--baseline previous.json]
+"""
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import logging
+import argparse
+import platform
+import tempfile
+import threading
+import multiprocessing
+import psutil
+from aiohttp import ClientSession, TraceConfig
+from .site import LATENCY_DISTRIBUTIONS, SiteServer, SiteSpec, page_path
+
+logger = logging.getLogger(__name__)
+
+STAGES = ('robots', 'sitemap', 'spider', 'crawl', 'save')
+
+# Seconds between two memory samples while a stage runs
+MEMORY_SAMPLE_INTERVAL = 0.05
+
+# Relative change in throughput or latency reported as a regression or improvement against a baseline
+SIGNIFICANT_CHANGE = 0.10
+
+
+def latency_stats(samples: list) -> dict:
+    """Returns the count, mean and p50/p90/p99/max of latencies in seconds, in milliseconds."""
+    if not samples:
+        return {'count': 0}
+    ordered = sorted(samples)
+
+    def percentile(q):
+        return ordered[min(int(q * len(ordered)), len(ordered) - 1)] * 1000
+
+    return {
+        'count': len(ordered),
+        'mean_ms': round(sum(ordered) / len(ordered) * 1000, 3),
+        'p50_ms': round(percentile(0.50), 3),
+        'p90_ms': round(percentile(0.90), 3),
+        'p99_ms': round(percentile(0.99), 3),
+        'max_ms': round(ordered[-1] * 1000, 3),
+    }
+
+
+class PeakMemorySampler:
+    """
+    Samples the resident memory of this process and its children in a background thread.
+
+    Children started by the stage, such as the browser, are included. Processes
+    listed in `exclude_pids`, such as the synthetic site server, are not.
+    """
+
+    def __init__(self, exclude_pids=(), interval: float = MEMORY_SAMPLE_INTERVAL):
+        self.exclude_pids = set(exclude_pids)
+        self.interval = interval
+        self.peak = 0
+        self._process = psutil.Process(os.getpid())
+        self._stop = threading.Event()
+        self._thread = None
+
+    def __enter__(self):
+        self.sample()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._stop.set()
+        self._thread.join()
+        self.sample()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.sample()
+
+    def sample(self):
+        rss = self._process.memory_info().rss
+        for child in self._process.children(recursive=True):
+            if child.pid in self.exclude_pids:
+                continue
+            try:
+                rss += child.memory_info().rss
+            except psutil.Error:
+                pass  # The child exited between listing and sampling
+        self.peak = max(self.peak, rss)
+
+    @property
+    def peak_mb(self) -> float:
+        return round(self.peak / (1024 * 1024), 1)
+
+
+def request_timer(samples: list) -> TraceConfig:
+    """Returns an aiohttp trace config appending the duration of every request to `samples`."""
+    trace = TraceConfig()
+
+    async def on_request_start(session, context, params):
+        context.start = time.perf_counter()
+
+    async def on_request_end(session, context, params):
+        samples.append(time.perf_counter() - context.start)
+
+    trace.on_request_start.append(on_request_start)
+    trace.on_request_end.append(on_request_end)
+    return trace
+
+
+def stage_result(items: int, seconds: float, latencies: list = None, **extra) -> dict:
+    result = {
+        'items': items,
+        'seconds': round(seconds, 3),
+        'items_per_sec': round(items / seconds, 1) if seconds > 0 else None,
+        'latency': latency_stats(latencies or []),
+    }
+    result.update(extra)
+    return result
+
+
+def page_urls(spec: SiteSpec, base_url: str) -> list:
+    return [f"{base_url}{page_path(page)}" for page in range(spec.pages)]
+
+
+async def bench_robots(spec: SiteSpec, base_url: str, options) -> dict:
+    """Fetches robots.txt, then times parsing it and filtering every page URL against it."""
+    from src.robots_parser import fetch_robots_txt, filter_allowed_urls, parse_robots_txt
+
+    # The synchronous fetch is what the single-site crawl uses
+    fetch_start = time.perf_counter()
+    fetched_rules = await asyncio.to_thread(fetch_robots_txt, base_url)
+    fetch_seconds = time.perf_counter() - fetch_start
+    async with ClientSession() as session:
+        async with session.get(f"{base_url}/robots.txt") as response:
+            robots_txt = await response.text()
+
+    parse_latencies = []
+    for _ in range(options.repeat):
+        start = time.perf_counter()
+        rules = parse_robots_txt(robots_txt)
+        parse_latencies.append(time.perf_counter() - start)
+
+    urls = page_urls(spec, base_url)
+    start = time.perf_counter()
+    filter_latencies = []
+    for _ in range(options.repeat):
+        filter_start = time.perf_counter()
+        allowed = filter_allowed_urls(urls, rules)
+        filter_latencies.append(time.perf_counter() - filter_start)
+    seconds = time.perf_counter() - start
+
+    return stage_result(len(urls) * options.repeat, seconds, filter_latencies,
+                        rules=len(fetched_rules.get('disallow', [])), allowed=len(allowed),
+                        fetch_ms=round(fetch_seconds * 1000, 3), parse_latency=latency_stats(parse_latencies))
+
+
+async def bench_sitemap(spec: SiteSpec, base_url: str, options) -> dict:
+    """Times collecting every page URL from the sitemap tree."""
+    from src.sitemap_parser import fetch_sitemap_urls
+
+    request_latencies = []
+    async with ClientSession(trace_configs=[request_timer(request_latencies)]) as session:
+        start = time.perf_counter()
+        urls = await fetch_sitemap_urls(f"{base_url}/sitemap.xml", session)
+        seconds = time.perf_counter() - start
+    return stage_result(len(urls), seconds, request_latencies, sitemaps=len(request_latencies))
+
+
+def _run_spider(base_url: str, max_pages: int, work_dir: str, connection):
+    os.chdir(work_dir)  # The spider writes its URL list under crawled_data/ in the working directory
+    from src.spider_runner import SpiderRunner
+
+    logging.getLogger('scrapy').setLevel(logging.WARNING)
+    start = time.perf_counter()
+    urls = SpiderRunner().run_spider(base_url + '/', max_pages=max_pages)
+    connection.send({'urls': len(urls), 'seconds': time.perf_counter() - start})
+
+
+async def bench_spider(spec: SiteSpec, base_url: str, options) -> dict:
+    """Times discovering the site's pages with the Scrapy spider.
+
+    The Twisted reactor cannot be restarted, so the spider runs in a fresh process.
+    """
+    parent, child = multiprocessing.Pipe()
+    with tempfile.TemporaryDirectory() as work_dir:
+        process = multiprocessing.get_context('spawn').Process(
+            target=_run_spider, args=(base_url, spec.pages, work_dir, child))
+        process.start()
+        await asyncio.to_thread(process.join)
+    if not parent.poll():
+        raise RuntimeError(f"Spider process exited with code {process.exitcode}")
+    result = parent.recv()
+    return stage_result(result['urls'], result['seconds'])
+
+
+async def bench_crawl(spec: SiteSpec, base_url: str, options) -> dict:
+    """Times rendering pages in the browser and saving their markdown with crawl_parallel."""
+    from src import metrics
+    from src.crawl_parallel import crawl_parallel
+
+    urls = page_urls(spec, base_url)[:options.crawl_pages]
+    metrics.REGISTRY.reset()
+    with tempfile.TemporaryDirectory() as output_dir:
+        start = time.perf_counter()
+        totals = await crawl_parallel(urls, max_concurrent=options.concurrency, output_dir=output_dir,
+                                      resource_profile=options.resource_profile)
+        seconds = time.perf_counter() - start
+    return stage_result(totals['succeeded'], seconds, failed=totals['failed'], retried=totals['retried'],
+                        render=metrics.RENDER_SECONDS.summary())
+
+
+async def bench_save(spec: SiteSpec, base_url: str, options) -> dict:
+    """Times saving pages of the site's page weight with save_markdown, then their metadata with save_metadata."""
+    from src.results_saver import save_markdown, save_metadata
+
+    rng = random.Random(spec.seed)
+    words = 'lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod tempor'.split()
+    content = ' '.join(rng.choice(words) for _ in range(spec.page_bytes // 6))
+    urls = page_urls(spec, base_url)
+
+    latencies = []
+    metadata = []
+    with tempfile.TemporaryDirectory() as output_dir:
+        start = time.perf_counter()
+        for url in urls:
+            page_start = time.perf_counter()
+            file_path = await save_markdown(url, content, output_dir)
+            latencies.append(time.perf_counter() - page_start)
+            metadata.append({'url': url, 'markdown_file': file_path})
+        metadata_start = time.perf_counter()
+        await save_metadata(metadata, output_dir, base_url)
+        metadata_seconds = time.perf_counter() - metadata_start
+        seconds = time.perf_counter() - start
+    return stage_result(len(urls), seconds, latencies, metadata_ms=round(metadata_seconds * 1000, 3))
+
+
+BENCHMARKS = {
+    'robots': bench_robots,
+    'sitemap': bench_sitemap,
+    'spider': bench_spider,
+    'crawl': bench_crawl,
+    'save': bench_save,
+}
+
+
+async def run_benchmarks(spec: SiteSpec, stages, options) -> dict:
+    """
+    Run the benchmarks of the given stages against a synthetic site.
+
+    Args:
+        spec (SiteSpec): The shape of the synthetic site.
+        stages (Iterable[str]): The names of the stages to benchmark, from STAGES.
+        options (argparse.Namespace): The stage options: 'repeat', 'crawl_pages', 'concurrency'
+            and 'resource_profile'.
+
+    Returns:
+        dict: The environment, the site spec and, per stage, its throughput, latency percentiles and
+        peak RSS, or the error that kept it from running.
+    """
+    results = {
+        'environment': {'python': platform.python_version(), 'platform': platform.platform(),
+                        'cpus': os.cpu_count()},
+        'site': spec.to_dict(),
+        'stages': {},
+    }
+    with SiteServer(spec) as server:
+        for stage in stages:
+            logger.info("Benchmarking %s", stage)
+            try:
+                with PeakMemorySampler(exclude_pids=[server.process.pid]) as memory:
+                    result = await BENCHMARKS[stage](spec, server.base_url, options)
+                result['peak_rss_mb'] = memory.peak_mb
+            except Exception as e:
+                logger.error("Benchmark of %s failed: %s", stage, e)
+                result = {'error': str(e).splitlines()[0] if str(e) else type(e).__name__}
+            results['stages'][stage] = result
+            logger.info("%s: %s", stage, result)
+    return results
+
+
+def compare(results: dict, baseline: dict) -> dict:
+    """
+    Compare benchmark results against a baseline run.
+
+    Returns:
+        dict: Per stage present in both runs, the relative change in items/sec and p50 latency,
+        and a 'verdict' of 'faster', 'slower' or 'unchanged' based on throughput.
+    """
+    comparison = {}
+    for stage, result in results['stages'].items():
+        before = baseline.get('stages', {}).get(stage)
+        if not before or 'error' in result or 'error' in before:
+            continue
+        entry = {}
+        if result.get('items_per_sec') and before.get('items_per_sec'):
+            entry['items_per_sec_change'] = round(result['items_per_sec'] / before['items_per_sec'] - 1, 3)
+        if result['latency'].get('p50_ms') and before['latency'].get('p50_ms'):
+            entry['p50_change'] = round(result['latency']['p50_ms'] / before['latency']['p50_ms'] - 1, 3)
+        if 'peak_rss_mb' in result and before.get('peak_rss_mb'):
+            entry['peak_rss_change'] = round(result['peak_rss_mb'] / before['peak_rss_mb'] - 1, 3)
+        change = entry.get('items_per_sec_change', 0.0)
+        entry['verdict'] = ('faster' if change > SIGNIFICANT_CHANGE else
+                            'slower' if change < -SIGNIFICANT_CHANGE else 'unchanged')
+        comparison[stage] = entry
+    return comparison
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the crawler against a synthetic local website.')
+    parser.add_argument('--stages', type=str, default=','.join(STAGES),
+                        help=f"Comma-separated stages to benchmark (default: {','.join(STAGES)})")
+    parser.add_argument('--pages', type=int, default=500, help='Pages on the synthetic site (default: 500)')
+    parser.add_argument('--latency-ms', type=float, default=20.0,
+                        help='Mean response delay of the site in milliseconds (default: 20)')
+    parser.add_argument('--latency-distribution', choices=LATENCY_DISTRIBUTIONS, default='exponential',
+                        help='How response delays are spread around the mean (default: exponential)')
+    parser.add_argument('--sitemap-depth', type=int, default=1,
+                        help='Levels of sitemap indexes above the page sitemaps (default: 1)')
+    parser.add_argument('--urls-per-sitemap', type=int, default=100,
+                        help='Pages listed per sitemap (default: 100)')
+    parser.add_argument('--robots-rules', type=int, default=50,
+                        help='Disallow rules in robots.txt (default: 50)')
+    parser.add_argument('--page-bytes', type=int, default=20000,
+                        help='Approximate size of each page in bytes (default: 20000)')
+    parser.add_argument('--repeat', type=int, default=20,
+                        help='Repetitions of the in-memory robots.txt benchmarks (default: 20)')
+    parser.add_argument('--crawl-pages', type=int, default=50,
+                        help='Pages rendered by the crawl benchmark (default: 50)')
+    parser.add_argument('--concurrency', type=int, default=5,
+                        help='Pages rendered at once by the crawl benchmark (default: 5)')
+    parser.add_argument('--resource-profile', type=str, default='full',
+                        help='Resource blocking profile of the crawl benchmark (default: full)')
+    parser.add_argument('--output', type=str, default=None, help='File to write the results to as JSON')
+    parser.add_argument('--baseline', type=str, default=None,
+                        help='Results of an earlier run to compare against')
+    args = parser.parse_args(argv)
+    unknown = set(args.stages.split(',')) - set(STAGES)
+    if unknown:
+        parser.error(f"unknown stages: {', '.join(sorted(unknown))}")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+    # The stages log every page; only the benchmark's own progress is of interest
+    logging.getLogger('src').setLevel(logging.WARNING)
+
+    spec = SiteSpec(pages=args.pages, latency_ms=args.latency_ms, latency_distribution=args.latency_distribution,
+                    sitemap_depth=args.sitemap_depth, urls_per_sitemap=args.urls_per_sitemap,
+                    robots_rules=args.robots_rules, page_bytes=args.page_bytes)
+    results = asyncio.run(run_benchmarks(spec, args.stages.split(','), args))
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            results['comparison'] = compare(results, json.load(f))
+
+    output = json.dumps(results, indent=4)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output + '\n')
+        logger.info("Wrote results to %s", args.output)
+    print(output)
+    return 1 if any('error' in result for result in results['stages'].values()) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
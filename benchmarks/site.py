@@ -0,0 +1,243 @@
+import math
+import random
+import asyncio
+import logging
+import multiprocessing
+from aiohttp import web
+
+logger = logging.getLogger(__name__)
+
+LATENCY_DISTRIBUTIONS = ('fixed', 'uniform', 'exponential')
+
+FILLER_WORDS = ('crawler', 'markdown', 'sitemap', 'browser', 'render', 'content', 'page', 'index', 'archive',
+                'latency', 'request', 'response', 'queue', 'worker', 'section', 'heading', 'paragraph', 'link')
+
+
+class SiteSpec:
+    """The shape of a synthetic website."""
+
+    def __init__(self, pages: int = 500, latency_ms: float = 20.0, latency_distribution: str = 'exponential',
+                 sitemap_depth: int = 1, urls_per_sitemap: int = 100, robots_rules: int = 50,
+                 page_bytes: int = 20000, links_per_page: int = 10, seed: int = 0):
+        """
+        Args:
+            pages (int): The number of content pages (default is 500).
+            latency_ms (float): The mean delay in milliseconds before each response (default is 20.0).
+            latency_distribution (str): How delays are spread around the mean: 'fixed', 'uniform'
+                between 0 and twice the mean, or 'exponential' with a long tail (default is 'exponential').
+            sitemap_depth (int): Levels of sitemap indexes above the sitemaps listing pages; 0 serves
+                all pages from a single /sitemap.xml (default is 1).
+            urls_per_sitemap (int): The number of pages listed per sitemap (default is 100).
+            robots_rules (int): The number of Disallow rules in robots.txt (default is 50).
+            page_bytes (int): The approximate size of each page's HTML (default is 20000).
+            links_per_page (int): The number of links from each page to other pages (default is 10).
+            seed (int): Seed of the random delays, so runs are comparable (default is 0).
+        """
+        if latency_distribution not in LATENCY_DISTRIBUTIONS:
+            raise ValueError(f"Unknown latency distribution: {latency_distribution}")
+        self.pages = pages
+        self.latency_ms = latency_ms
+        self.latency_distribution = latency_distribution
+        self.sitemap_depth = sitemap_depth
+        self.urls_per_sitemap = urls_per_sitemap
+        self.robots_rules = robots_rules
+        self.page_bytes = page_bytes
+        self.links_per_page = links_per_page
+        self.seed = seed
+
+    def to_dict(self) -> dict:
+        return dict(vars(self))
+
+    @property
+    def leaf_sitemaps(self) -> int:
+        """The number of sitemaps listing pages."""
+        if self.sitemap_depth == 0:
+            return 1
+        return max(math.ceil(self.pages / self.urls_per_sitemap), 1)
+
+    @property
+    def fanout(self) -> int:
+        """The number of children of each sitemap index."""
+        if self.sitemap_depth == 0:
+            return 1
+        return max(math.ceil(self.leaf_sitemaps ** (1 / self.sitemap_depth)), 2)
+
+    def sitemaps_at(self, level: int) -> int:
+        """The number of sitemaps at a level of the tree, where level 0 is /sitemap.xml."""
+        return math.ceil(self.leaf_sitemaps / self.fanout ** (self.sitemap_depth - level))
+
+
+def page_path(number: int) -> str:
+    return f"/pages/{number}"
+
+
+def sitemap_path(level: int, number: int) -> str:
+    return '/sitemap.xml' if level == 0 else f"/sitemaps/{level}-{number}.xml"
+
+
+def render_robots_txt(spec: SiteSpec, base_url: str) -> str:
+    lines = ['User-agent: *']
+    lines += [f"Disallow: /private-{i}/" for i in range(spec.robots_rules)]
+    lines += ['Allow: /pages/', f"Sitemap: {base_url}/sitemap.xml"]
+    return '\n'.join(lines) + '\n'
+
+
+def render_sitemap(spec: SiteSpec, base_url: str, level: int, number: int) -> str:
+    """Renders a sitemap index above the last level of the tree, and a list of pages at the last level."""
+    if level < spec.sitemap_depth:
+        children = range(number * spec.fanout, min((number + 1) * spec.fanout, spec.sitemaps_at(level + 1)))
+        body = ''.join(f"<sitemap><loc>{base_url}{sitemap_path(level + 1, child)}</loc></sitemap>"
+                       for child in children)
+        return ('<?xml version="1.0" encoding="UTF-8"?>'
+                f'<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">{body}</sitemapindex>')
+
+    per_sitemap = spec.pages if spec.sitemap_depth == 0 else spec.urls_per_sitemap
+    pages = range(number * per_sitemap, min((number + 1) * per_sitemap, spec.pages))
+    body = ''.join(
+        f"<url><loc>{base_url}{page_path(page)}</loc><lastmod>2024-01-{page % 28 + 1:02d}</lastmod>"
+        f"<priority>{(page % 10) / 10:.1f}</priority></url>"
+        for page in pages)
+    return ('<?xml version="1.0" encoding="UTF-8"?>'
+            f'<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">{body}</urlset>')
+
+
+def render_page(spec: SiteSpec, number: int) -> str:
+    """Renders a page of roughly `page_bytes` bytes with headings, paragraphs and links to other pages."""
+    rng = random.Random(number)
+    links = ''.join(f'<li><a href="{page_path((number + i) % spec.pages)}">Page {(number + i) % spec.pages}</a></li>'
+                    for i in range(1, spec.links_per_page + 1))
+    parts = [f"<html><head><title>Page {number}</title></head><body><h1>Page {number}</h1><ul>{links}</ul>"]
+    size = len(parts[0])
+    section = 0
+    while size < spec.page_bytes:
+        if section % 4 == 0:
+            parts.append(f"<h2>Section {section // 4 + 1}</h2>")
+        paragraph = f"<p>{' '.join(rng.choice(FILLER_WORDS) for _ in range(80))}.</p>"
+        parts.append(paragraph)
+        size += len(paragraph)
+        section += 1
+    parts.append('</body></html>')
+    return ''.join(parts)
+
+
+def render_home(spec: SiteSpec) -> str:
+    """Renders the home page, linking to every page so the spider can discover the whole site."""
+    links = ''.join(f'<li><a href="{page_path(page)}">Page {page}</a></li>' for page in range(spec.pages))
+    return f"<html><head><title>Home</title></head><body><h1>Home</h1><ul>{links}</ul></body></html>"
+
+
+def create_site_app(spec: SiteSpec) -> web.Application:
+    """
+    Build an aiohttp application serving a synthetic website.
+
+    Routes:
+        GET /: The home page, linking to every page.
+        GET /robots.txt: `robots_rules` Disallow rules and the sitemap location.
+        GET /sitemap.xml, GET /sitemaps/{level}-{number}.xml: The sitemap tree.
+        GET /pages/{number}: A content page.
+
+    Every response is delayed according to the spec's latency distribution.
+    """
+    rng = random.Random(spec.seed)
+    mean = spec.latency_ms / 1000
+
+    def delay() -> float:
+        if spec.latency_distribution == 'fixed':
+            return mean
+        if spec.latency_distribution == 'uniform':
+            return rng.uniform(0, 2 * mean)
+        return rng.expovariate(1 / mean) if mean > 0 else 0.0
+
+    def base_url(request) -> str:
+        return f"{request.scheme}://{request.host}"
+
+    @web.middleware
+    async def latency(request, handler):
+        await asyncio.sleep(delay())
+        return await handler(request)
+
+    routes = web.RouteTableDef()
+
+    @routes.get('/')
+    async def home(request):
+        return web.Response(text=render_home(spec), content_type='text/html')
+
+    @routes.get('/robots.txt')
+    async def robots_txt(request):
+        return web.Response(text=render_robots_txt(spec, base_url(request)))
+
+    @routes.get('/sitemap.xml')
+    async def root_sitemap(request):
+        return web.Response(text=render_sitemap(spec, base_url(request), 0, 0), content_type='application/xml')
+
+    @routes.get(r'/sitemaps/{level:\d+}-{number:\d+}.xml')
+    async def nested_sitemap(request):
+        level, number = int(request.match_info['level']), int(request.match_info['number'])
+        if not 0 < level <= spec.sitemap_depth or number >= spec.sitemaps_at(level):
+            raise web.HTTPNotFound()
+        return web.Response(text=render_sitemap(spec, base_url(request), level, number),
+                            content_type='application/xml')
+
+    @routes.get(r'/pages/{number:\d+}')
+    async def page(request):
+        number = int(request.match_info['number'])
+        if number >= spec.pages:
+            raise web.HTTPNotFound()
+        return web.Response(text=render_page(spec, number), content_type='text/html')
+
+    app = web.Application(middlewares=[latency])
+    app.add_routes(routes)
+    return app
+
+
+def _serve(spec_dict: dict, host: str, connection):
+    async def serve():
+        runner = web.AppRunner(create_site_app(SiteSpec(**spec_dict)), access_log=None)
+        await runner.setup()
+        site = web.TCPSite(runner, host, 0)
+        await site.start()
+        connection.send(runner.addresses[0][1])
+        await asyncio.Event().wait()
+
+    asyncio.run(serve())
+
+
+class SiteServer:
+    """
+    Serves a synthetic website from a separate process.
+
+    The server runs in its own process so that its CPU time and memory do not
+    count towards the stage being benchmarked.
+    """
+
+    def __init__(self, spec: SiteSpec, host: str = '127.0.0.1'):
+        self.spec = spec
+        self.host = host
+        self.base_url = None
+        self.process = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+    def start(self):
+        """Starts the server process and waits until it is listening."""
+        parent, child = multiprocessing.Pipe()
+        self.process = multiprocessing.get_context('spawn').Process(
+            target=_serve, args=(self.spec.to_dict(), self.host, child), daemon=True)
+        self.process.start()
+        if not parent.poll(30):
+            self.stop()
+            raise RuntimeError("Synthetic site server did not start")
+        self.base_url = f"http://{self.host}:{parent.recv()}"
+        logger.info("Serving a synthetic site of %d pages at %s", self.spec.pages, self.base_url)
+
+    def stop(self):
+        """Stops the server process."""
+        if self.process is not None:
+            self.process.terminate()
+            self.process.join()
+            self.process = None
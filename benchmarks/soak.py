@@ -0,0 +1,223 @@
+"""
+Soak test: crawl a large synthetic site and fail if resource usage keeps growing.
+
+Usage:
+    python -m benchmarks.soak [--pages 5000] [--concurrency 10] [--output soak.json]
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import logging
+import argparse
+import tempfile
+import psutil
+from .site import SiteServer, SiteSpec
+from .run import page_urls
+
+logger = logging.getLogger(__name__)
+
+# Seconds between two resource samples
+DEFAULT_SAMPLE_INTERVAL = 2.0
+
+# Share of the run, by pages crawled, left out of the slopes while caches and pools fill up
+DEFAULT_WARMUP = 0.2
+
+# Largest growth per 1000 pages crawled that still passes, per resource
+DEFAULT_MAX_SLOPES = {
+    'rss_mb': 5.0,
+    'browser_rss_mb': 20.0,
+    'open_fds': 2.0,
+    'tasks': 2.0,
+}
+
+
+def linear_slope(xs: list, ys: list) -> float:
+    """Returns the least-squares slope of ys over xs, or 0.0 if xs do not vary."""
+    n = len(xs)
+    if n < 2:
+        return 0.0
+    mean_x = sum(xs) / n
+    mean_y = sum(ys) / n
+    variance = sum((x - mean_x) ** 2 for x in xs)
+    if variance == 0:
+        return 0.0
+    return sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys)) / variance
+
+
+def check_growth(samples: list, max_slopes: dict, warmup: float = DEFAULT_WARMUP) -> dict:
+    """
+    Fit the growth of each resource per 1000 pages crawled after the warm-up.
+
+    Args:
+        samples (list): Samples as taken by `ResourceSampler`, in order.
+        max_slopes (dict): The largest growth per 1000 pages allowed for each resource.
+        warmup (float): Share of the pages crawled before samples are counted (default is 0.2).
+
+    Returns:
+        dict: Per resource, its 'slope_per_1000_pages', the 'max_slope' and whether it 'passed'.
+    """
+    total_pages = samples[-1]['pages'] if samples else 0
+    steady = [sample for sample in samples if sample['pages'] >= warmup * total_pages]
+    pages = [sample['pages'] / 1000 for sample in steady]
+    growth = {}
+    for resource, max_slope in max_slopes.items():
+        slope = linear_slope(pages, [sample[resource] for sample in steady])
+        growth[resource] = {'slope_per_1000_pages': round(slope, 3), 'max_slope': max_slope,
+                            'passed': slope <= max_slope}
+    return growth
+
+
+class ResourceSampler:
+    """
+    Samples the crawler's resource usage at a fixed interval while a crawl runs.
+
+    Each sample holds the seconds since the start, the pages finished so far,
+    the RSS of this process and of the processes it started, such as the
+    browser, its open file descriptors and its asyncio tasks.
+    """
+
+    def __init__(self, interval: float = DEFAULT_SAMPLE_INTERVAL, exclude_pids=()):
+        """
+        Args:
+            interval (float): Seconds between two samples (default is 2.0).
+            exclude_pids (Iterable[int]): Child processes not to count, such as the site server.
+        """
+        self.interval = interval
+        self.exclude_pids = set(exclude_pids)
+        self.samples = []
+        self._process = psutil.Process(os.getpid())
+        self._started_at = None
+        self._task = None
+
+    def pages_done(self) -> int:
+        from src import metrics
+
+        return sum(metrics.PAGES.value(outcome=outcome) for outcome in ('succeeded', 'failed', 'skipped'))
+
+    def sample(self) -> dict:
+        browser_rss = 0
+        for child in self._process.children(recursive=True):
+            if child.pid in self.exclude_pids:
+                continue
+            try:
+                browser_rss += child.memory_info().rss
+            except psutil.Error:
+                pass  # The child exited between listing and sampling
+        sample = {
+            'seconds': round(time.monotonic() - self._started_at, 1),
+            'pages': self.pages_done(),
+            'rss_mb': round(self._process.memory_info().rss / (1024 * 1024), 1),
+            'browser_rss_mb': round(browser_rss / (1024 * 1024), 1),
+            'open_fds': self._process.num_fds() if hasattr(self._process, 'num_fds') else self._process.num_handles(),
+            'tasks': len(asyncio.all_tasks()),
+        }
+        self.samples.append(sample)
+        return sample
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            sample = self.sample()
+            logger.info("Soak sample: %s", sample)
+
+    def start(self):
+        """Takes a first sample and starts sampling in the background."""
+        self._started_at = time.monotonic()
+        self.sample()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stops sampling and takes a last sample."""
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self.sample()
+
+
+async def run_soak(spec: SiteSpec, concurrency: int = 10, interval: float = DEFAULT_SAMPLE_INTERVAL,
+                   warmup: float = DEFAULT_WARMUP, max_slopes: dict = None,
+                   resource_profile: str = 'full') -> dict:
+    """
+    Crawl every page of a synthetic site while sampling resource usage, then check its growth.
+
+    Args:
+        spec (SiteSpec): The shape of the synthetic site; its page count is the length of the soak.
+        concurrency (int): Pages rendered at once (default is 10).
+        interval (float): Seconds between two resource samples (default is 2.0).
+        warmup (float): Share of the pages crawled before samples are counted (default is 0.2).
+        max_slopes (dict): The largest growth per 1000 pages allowed per resource (default is DEFAULT_MAX_SLOPES).
+        resource_profile (str): Resource blocking profile to render pages with (default is 'full').
+
+    Returns:
+        dict: The crawl totals, the samples, the growth per resource and whether the soak 'passed'.
+    """
+    from src import metrics
+    from src.crawl_parallel import crawl_parallel
+
+    max_slopes = max_slopes or DEFAULT_MAX_SLOPES
+    metrics.REGISTRY.reset()
+    with SiteServer(spec) as server, tempfile.TemporaryDirectory() as output_dir:
+        sampler = ResourceSampler(interval, exclude_pids=[server.process.pid])
+        sampler.start()
+        try:
+            totals = await crawl_parallel(page_urls(spec, server.base_url), max_concurrent=concurrency,
+                                          output_dir=output_dir, resource_profile=resource_profile)
+        finally:
+            await sampler.stop()
+
+    growth = check_growth(sampler.samples, max_slopes, warmup)
+    return {
+        'site': spec.to_dict(),
+        'totals': totals,
+        'growth': growth,
+        'passed': all(resource['passed'] for resource in growth.values()),
+        'samples': sampler.samples,
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Crawl a large synthetic site and check for resource leaks.')
+    parser.add_argument('--pages', type=int, default=5000, help='Pages to crawl (default: 5000)')
+    parser.add_argument('--concurrency', type=int, default=10, help='Pages rendered at once (default: 10)')
+    parser.add_argument('--latency-ms', type=float, default=5.0,
+                        help='Mean response delay of the site in milliseconds (default: 5)')
+    parser.add_argument('--page-bytes', type=int, default=20000,
+                        help='Approximate size of each page in bytes (default: 20000)')
+    parser.add_argument('--sample-interval', type=float, default=DEFAULT_SAMPLE_INTERVAL,
+                        help=f'Seconds between two resource samples (default: {DEFAULT_SAMPLE_INTERVAL})')
+    parser.add_argument('--warmup', type=float, default=DEFAULT_WARMUP,
+                        help=f'Share of the pages ignored while the crawler warms up (default: {DEFAULT_WARMUP})')
+    for resource, max_slope in DEFAULT_MAX_SLOPES.items():
+        parser.add_argument(f"--max-{resource.replace('_', '-')}-slope", type=float, default=max_slope,
+                            dest=f"max_{resource}_slope",
+                            help=f'Largest growth of {resource} per 1000 pages that passes (default: {max_slope})')
+    parser.add_argument('--resource-profile', type=str, default='full',
+                        help='Resource blocking profile to render pages with (default: full)')
+    parser.add_argument('--output', type=str, default=None, help='File to write the results to as JSON')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+    logging.getLogger('src').setLevel(logging.WARNING)
+
+    spec = SiteSpec(pages=args.pages, latency_ms=args.latency_ms, page_bytes=args.page_bytes)
+    max_slopes = {resource: getattr(args, f"max_{resource}_slope") for resource in DEFAULT_MAX_SLOPES}
+    results = asyncio.run(run_soak(spec, args.concurrency, args.sample_interval, args.warmup, max_slopes,
+                                   args.resource_profile))
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=4)
+        logger.info("Wrote results to %s", args.output)
+    print(json.dumps({key: results[key] for key in ('totals', 'growth', 'passed')}, indent=4))
+    if not results['passed']:
+        logger.error("Soak test failed: resource usage kept growing")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,11 +1,140 @@
 import os
 import sys
+import json
+import time
+import zlib
+import queue
+import atexit
 import logging
 import logging.config
+import logging.handlers
+from datetime import datetime, timezone
+
+LOG_FORMATS = ('text', 'json')
+
+# The listener writing queued records on its own thread, once logging is set up
+_listener = None
+
+
+def record_url(record: logging.LogRecord):
+    """Returns the URL a record is about: the first argument of its message that is a URL, if any."""
+    url = getattr(record, 'url', None)
+    if url is not None:
+        return url
+    args = record.args if isinstance(record.args, tuple) else ()
+    for arg in args:
+        if isinstance(arg, str) and arg.startswith(('http://', 'https://')):
+            return arg
+    return None
+
+
+class UrlLogFilter(logging.Filter):
+    """
+    Samples and rate-limits the log records about single URLs.
+
+    A crawl logs several lines per URL, so at high page rates these records
+    dominate the log. Records below WARNING whose message has a URL argument
+    are kept for a share of the URLs, decided by a hash of the URL so that all
+    lines of a URL are kept or dropped together. Of those, at most
+    `max_per_second` are kept each second, and the number suppressed is logged
+    when the second is over. Warnings, errors and records without a URL always
+    pass. The URL is stored on the record as `url`.
+    """
+
+    def __init__(self, sample_rate: float = 1.0, max_per_second: int = None):
+        """
+        Args:
+            sample_rate (float): Share of URLs whose records are kept, between 0 and 1 (default is 1.0).
+            max_per_second (int): The most records about URLs kept per second (default is None, unlimited).
+        """
+        super().__init__()
+        if not 0.0 <= sample_rate <= 1.0:
+            raise ValueError("The log sample rate must be between 0 and 1")
+        self.sample_rate = sample_rate
+        self.max_per_second = max_per_second
+        self.suppressed = 0
+        self._window = None
+        self._window_count = 0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        url = record_url(record)
+        if url is None:
+            return True
+        record.url = url
+        if record.levelno >= logging.WARNING:
+            return True
+        if self.sample_rate < 1.0 and zlib.crc32(url.encode('utf-8')) >= self.sample_rate * 2 ** 32:
+            return False
+        if self.max_per_second is None:
+            return True
+
+        window = int(time.monotonic())
+        if window != self._window:
+            suppressed, self.suppressed = self.suppressed, 0
+            self._window, self._window_count = window, 0
+            if suppressed:
+                logging.getLogger(__name__).info("Suppressed %d log records over the rate limit of %d per second",
+                                                 suppressed, self.max_per_second)
+        if self._window_count >= self.max_per_second:
+            self.suppressed += 1
+            return False
+        self._window_count += 1
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """Formats records as JSON lines with the time, level, logger, message and, if any, URL and exception."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        url = record_url(record)
+        if url is not None:
+            entry['url'] = url
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False)
+
+
+def shutdown_logging():
+    """Writes out the queued records and stops the listener thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def setup_logging(log_format: str = 'text', sample_rate: float = 1.0, max_per_second: int = None,
+                  level: str = None, log_dir: str = None):
+    """
+    Configure logging from logging.conf, with the handlers writing on a background thread.
+
+    Logging calls only put records on a queue, so file and console I/O does
+    not block the event loop; a listener thread hands them to the configured
+    handlers.
+
+    Args:
+        log_format (str): 'text' for the format of logging.conf, or 'json' for JSON lines (default is 'text').
+        sample_rate (float): Share of URLs whose INFO and DEBUG records are logged (default is 1.0).
+        max_per_second (int): The most INFO and DEBUG records about URLs logged per second (default is None).
+        level (str): Level of the root logger, overriding logging.conf (default is None).
+        log_dir (str): Directory of app.log (default is None, the logs directory of the repository).
+    """
+    global _listener
+
+    if log_format not in LOG_FORMATS:
+        raise ValueError(f"Unknown log format: {log_format}")
+    shutdown_logging()
 
-def setup_logging():
     # Define the absolute path to the logs directory
-    log_dir = os.path.join(os.path.abspath(os.path.dirname(__file__)), '..', 'logs')
+    if log_dir is None:
+        log_dir = os.path.join(os.path.abspath(os.path.dirname(__file__)), '..', 'logs')
 
     # Create the logs directory if it doesn't exist
     os.makedirs(log_dir, exist_ok=True)
@@ -17,16 +146,28 @@ def setup_logging():
     if not os.path.isfile(log_config_path):
         raise FileNotFoundError(f"{log_config_path} doesn't exist")
 
-    # Load the logging configuration
+    # Load the logging configuration; the file handler writes to app.log in log_dir
     logging.config.fileConfig(log_config_path,
             defaults={'log_dir': log_dir},
             disable_existing_loggers=False
     )
 
-    # Dynamically set the log path
-    log_file_path = os.path.join(log_dir, 'app.log')
+    root = logging.getLogger()
+    if level is not None:
+        root.setLevel(level)
+
+    handlers = list(root.handlers)
+    for handler in handlers:
+        if log_format == 'json':
+            handler.setFormatter(JsonFormatter())
+        root.removeHandler(handler)
+
+    # Records are filtered before they are queued, so dropped records cost no formatting or I/O
+    log_queue = queue.SimpleQueue()
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    queue_handler.addFilter(UrlLogFilter(sample_rate, max_per_second))
+    root.addHandler(queue_handler)
 
-    # Access the file handler and update its filename dynamically
-    for handler in logging.getLogger().handlers:
-        if isinstance(handler, logging.FileHandler):
-            handler.baseFilename = log_file_path 
\ No newline at end of file
+    _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown_logging)
@@ -0,0 +1,245 @@
+import os
+import re
+import json
+import asyncio
+import hashlib
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from typing import List
+from urllib.parse import urlparse
+from .results_saver import markdown_relative_path
+
+logger = logging.getLogger(__name__)
+
+HEADING_RE = re.compile(r'^(#{1,6})\s+(.+?)\s*#*\s*$')
+TOKEN_RE = re.compile(r"\w+|[^\w\s]", re.UNICODE)
+
+
+def count_tokens(text: str) -> int:
+    """
+    Estimate the number of tokens in a piece of text.
+
+    Counts words and individual punctuation marks, which tracks subword
+    tokenizers closely enough for sizing chunks and is deterministic across
+    machines.
+
+    Args:
+        text (str): The text to count.
+
+    Returns:
+        int: The estimated token count.
+    """
+    return len(TOKEN_RE.findall(text))
+
+
+def split_sections(markdown: str) -> List[tuple]:
+    """
+    Split markdown into sections at its headings.
+
+    Args:
+        markdown (str): The markdown to split.
+
+    Returns:
+        List[tuple]: (heading path, text) pairs, where the heading path lists the
+        enclosing headings from the outermost level down.
+    """
+    sections = []
+    headings = []  # Stack of (level, title) for the current section
+    lines = []
+    in_code_block = False
+
+    def flush():
+        text = '\n'.join(lines).strip()
+        if text:
+            sections.append(([title for _, title in headings], text))
+        lines.clear()
+
+    for line in markdown.splitlines():
+        if line.lstrip().startswith('```'):
+            in_code_block = not in_code_block
+        match = None if in_code_block else HEADING_RE.match(line)
+        if match:
+            flush()
+            level = len(match.group(1))
+            while headings and headings[-1][0] >= level:
+                headings.pop()
+            headings.append((level, match.group(2)))
+        lines.append(line)
+    flush()
+
+    return sections
+
+
+def split_word(word: str, max_tokens: int) -> List[str]:
+    """Split a word, such as a long URL, into pieces of at most max_tokens, breaking between tokens."""
+    starts = [match.start() for match in TOKEN_RE.finditer(word)]
+    bounds = [0] + starts[max_tokens::max_tokens] + [len(word)]
+    return [word[start:end] for start, end in zip(bounds, bounds[1:])]
+
+
+def split_words(paragraph: str, max_tokens: int) -> List[str]:
+    """Split a paragraph into windows of whole words whose token counts add up to at most max_tokens."""
+    windows = []
+    window = []
+    window_tokens = 0
+    for word in paragraph.split():
+        word_tokens = count_tokens(word)
+        parts = [word] if word_tokens <= max_tokens else split_word(word, max_tokens)
+        for part in parts:
+            part_tokens = word_tokens if len(parts) == 1 else count_tokens(part)
+            if window and window_tokens + part_tokens > max_tokens:
+                windows.append(' '.join(window))
+                window, window_tokens = [], 0
+            window.append(part)
+            window_tokens += part_tokens
+    if window:
+        windows.append(' '.join(window))
+    return windows
+
+
+def split_by_size(text: str, max_tokens: int) -> List[str]:
+    """Split text into pieces of at most max_tokens, breaking at paragraphs and then at words."""
+    if count_tokens(text) <= max_tokens:
+        return [text]
+
+    pieces = []
+    current = []
+    current_tokens = 0
+    for paragraph in re.split(r'\n\s*\n', text):
+        paragraph_tokens = count_tokens(paragraph)
+
+        if paragraph_tokens > max_tokens:
+            # A single oversized paragraph is split on word boundaries, by what each word costs in tokens
+            for window in split_words(paragraph, max_tokens):
+                window_tokens = count_tokens(window)
+                if current and current_tokens + window_tokens > max_tokens:
+                    pieces.append('\n\n'.join(current))
+                    current, current_tokens = [], 0
+                current.append(window)
+                current_tokens += window_tokens
+            continue
+
+        if current and current_tokens + paragraph_tokens > max_tokens:
+            pieces.append('\n\n'.join(current))
+            current, current_tokens = [], 0
+        current.append(paragraph)
+        current_tokens += paragraph_tokens
+
+    if current:
+        pieces.append('\n\n'.join(current))
+    return pieces
+
+
+def chunk_markdown(url: str, markdown: str, max_tokens: int = 512) -> List[dict]:
+    """
+    Split a page's markdown into chunks for embedding.
+
+    The markdown is split at headings first, and sections larger than
+    max_tokens are split further. Chunk IDs are derived from the URL and the
+    chunk text, so unchanged chunks keep their IDs across crawls.
+
+    Args:
+        url (str): The URL of the page.
+        markdown (str): The markdown of the page.
+        max_tokens (int): The maximum number of tokens per chunk (default is 512).
+
+    Returns:
+        List[dict]: The chunks, each with 'id', 'url', 'index', 'headings', 'text' and 'token_count'.
+    """
+    chunks = []
+    for headings, section in split_sections(markdown or ''):
+        for text in split_by_size(section, max_tokens):
+            chunk_id = hashlib.sha256(f"{url}\n{text}".encode('utf-8')).hexdigest()[:32]
+            chunks.append({
+                'id': chunk_id,
+                'url': url,
+                'index': len(chunks),
+                'headings': headings,
+                'text': text,
+                'token_count': count_tokens(text),
+            })
+    return chunks
+
+
+def chunks_file_path(url: str, output_dir: str) -> str:
+    """Returns the path of a page's chunk file, next to its markdown file."""
+    markdown_path = os.path.join(output_dir, urlparse(url).netloc, markdown_relative_path(url))
+    return markdown_path[:-len('.md')] + '.chunks.jsonl'
+
+
+def chunk_and_save(url: str, markdown: str, output_dir: str, max_tokens: int = 512) -> int:
+    """Chunks a page and writes its chunks as JSON lines, returning the number of chunks."""
+    chunks = chunk_markdown(url, markdown, max_tokens)
+    file_path = chunks_file_path(url, output_dir)
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+    with open(file_path, 'w', encoding='utf-8') as f:
+        for chunk in chunks:
+            f.write(json.dumps(chunk, ensure_ascii=False) + '\n')
+    return len(chunks)
+
+
+class MarkdownChunker:
+    """
+    Post-processing stage that chunks crawled markdown in a process pool.
+
+    Pages are submitted from the crawl loop and chunked in worker processes,
+    so tokenizing and splitting never runs on the event loop. The number of
+    pages in flight is bounded, and `submit` waits once the limit is reached.
+    """
+
+    def __init__(self, output_dir: str, max_tokens: int = 512, workers: int = None):
+        """
+        Args:
+            output_dir (str): The directory where chunk files should be saved.
+            max_tokens (int): The maximum number of tokens per chunk (default is 512).
+            workers (int): The number of worker processes (default is the number of CPUs).
+        """
+        self.output_dir = output_dir
+        self.max_tokens = max_tokens
+        self.workers = workers or os.cpu_count() or 1
+
+        self.chunk_count = 0
+        self.failed_count = 0
+
+        self._executor = None
+        self._pending = set()
+        self._slots = asyncio.Semaphore(self.workers * 4)
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def start(self):
+        """Starts the worker processes."""
+        self._executor = ProcessPoolExecutor(max_workers=self.workers)
+
+    async def submit(self, url: str, markdown: str):
+        """Queues a page to be chunked, waiting while too many pages are in flight."""
+        await self._slots.acquire()
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(self._executor, chunk_and_save, url, markdown or '',
+                                      self.output_dir, self.max_tokens)
+        self._pending.add(future)
+        future.add_done_callback(lambda done: self._on_done(url, done))
+
+    def _on_done(self, url: str, future):
+        self._pending.discard(future)
+        self._slots.release()
+        try:
+            self.chunk_count += future.result()
+        except Exception as e:
+            logger.error("Failed to chunk markdown for URL %s: %s", url, e)
+            self.failed_count += 1
+
+    async def close(self):
+        """Waits for pending pages to be chunked and stops the worker processes."""
+        if self._executor is None:
+            return
+        if self._pending:
+            await asyncio.wait(set(self._pending))
+        self._executor.shutdown(wait=True)
+        self._executor = None
+        logger.info("Chunked markdown into %d chunks, %d pages failed", self.chunk_count, self.failed_count)
@@ -0,0 +1,212 @@
+import asyncio
+import logging
+from typing import Dict, List, Optional
+from urllib.parse import urlparse
+from .metrics import PREFLIGHT_CHECKS
+
+logger = logging.getLogger(__name__)
+
+# How URLs are classified before they are rendered: not at all, by their extension, or by their extension
+# and then a HEAD request for URLs without a telling extension
+PREFLIGHT_MODES = ('off', 'extension', 'head')
+DEFAULT_PREFLIGHT = 'head'
+
+# Kinds of content; HTML and unknown content is rendered in the browser
+HTML = 'html'
+DOCUMENT = 'document'
+MEDIA = 'media'
+FEED = 'feed'
+DOWNLOAD = 'download'
+UNKNOWN = 'unknown'
+
+RENDERED_KINDS = frozenset((HTML, UNKNOWN))
+
+EXTENSION_KINDS = {
+    **dict.fromkeys(('html', 'htm', 'xhtml', 'shtml', 'php', 'asp', 'aspx', 'jsp', 'cfm'), HTML),
+    **dict.fromkeys(('pdf', 'doc', 'docx', 'xls', 'xlsx', 'ppt', 'pptx', 'odt', 'ods', 'odp', 'rtf', 'epub'),
+                    DOCUMENT),
+    **dict.fromkeys(('jpg', 'jpeg', 'png', 'gif', 'webp', 'svg', 'ico', 'bmp', 'tif', 'tiff', 'avif', 'mp3',
+                     'mp4', 'm4a', 'wav', 'ogg', 'webm', 'mov', 'avi', 'mkv', 'woff', 'woff2', 'ttf', 'otf'),
+                    MEDIA),
+    **dict.fromkeys(('xml', 'rss', 'atom', 'json'), FEED),
+    **dict.fromkeys(('zip', 'gz', 'tgz', 'bz2', 'xz', '7z', 'rar', 'tar', 'exe', 'msi', 'dmg', 'pkg', 'deb',
+                     'rpm', 'apk', 'iso', 'bin', 'csv'), DOWNLOAD),
+}
+
+# Media types by their prefix, checked in order; the rest is DOWNLOAD
+CONTENT_TYPE_KINDS = (
+    ('text/html', HTML),
+    ('application/xhtml+xml', HTML),
+    ('application/pdf', DOCUMENT),
+    ('application/msword', DOCUMENT),
+    ('application/vnd.openxmlformats-officedocument.', DOCUMENT),
+    ('application/vnd.ms-', DOCUMENT),
+    ('application/vnd.oasis.opendocument.', DOCUMENT),
+    ('application/rtf', DOCUMENT),
+    ('application/epub+zip', DOCUMENT),
+    ('image/', MEDIA),
+    ('video/', MEDIA),
+    ('audio/', MEDIA),
+    ('font/', MEDIA),
+    ('application/rss+xml', FEED),
+    ('application/atom+xml', FEED),
+    ('application/xml', FEED),
+    ('text/xml', FEED),
+    ('application/json', FEED),
+    ('text/plain', UNKNOWN),
+)
+
+# Seconds a HEAD request may take before the URL is rendered unclassified
+DEFAULT_PROBE_TIMEOUT = 10.0
+
+# HEAD requests sent at the same time, over one pooled HTTP session
+DEFAULT_PROBE_CONCURRENCY = 10
+
+# HEAD answers in a row that must say HTML before a host's URLs without an extension are assumed to be HTML
+HOST_TRUST_PROBES = 3
+
+# Status codes of servers that do not support HEAD requests
+HEAD_UNSUPPORTED_STATUS_CODES = frozenset((405, 501))
+
+
+def url_extension(url: str) -> str:
+    """Returns the lowercase extension of the last segment of the URL's path, or '' if it has none."""
+    segment = urlparse(url).path.rpartition('/')[2]
+    stem, dot, extension = segment.rpartition('.')
+    return extension.lower() if dot and stem else ''
+
+
+def kind_of_extension(url: str) -> Optional[str]:
+    """Returns the kind of content the URL's extension stands for, or None if it tells nothing."""
+    return EXTENSION_KINDS.get(url_extension(url))
+
+
+def kind_of_content_type(content_type: str) -> str:
+    """
+    Returns the kind of content of a Content-Type header.
+
+    Args:
+        content_type (str): The header value, such as 'text/html; charset=utf-8'.
+
+    Returns:
+        str: The kind of content, UNKNOWN if the header is empty.
+    """
+    media_type = (content_type or '').partition(';')[0].strip().lower()
+    if not media_type:
+        return UNKNOWN
+    for prefix, kind in CONTENT_TYPE_KINDS:
+        if media_type.startswith(prefix):
+            return kind
+    return DOWNLOAD
+
+
+class ContentTypeFilter:
+    """
+    Classifies URLs by their kind of content before they reach the browser.
+
+    Sitemaps list PDFs, images, feeds and downloads next to pages, and each of
+    them would otherwise take a browser slot for a page timeout. The
+    extension of a URL decides first, at no cost. URLs whose extension tells
+    nothing, such as '/docs/intro', get a HEAD request over one pooled HTTP
+    session, and their Content-Type decides.
+
+    Results are cached per host: once HOST_TRUST_PROBES HEAD requests in a
+    row on a host answered HTML, its URLs without an extension are taken to be
+    HTML without a request, and hosts that refuse HEAD requests are not asked
+    again. URLs that cannot be classified are UNKNOWN and rendered as before.
+    """
+
+    def __init__(self, probe: bool = True, session=None, timeout: float = DEFAULT_PROBE_TIMEOUT,
+                 max_concurrent: int = DEFAULT_PROBE_CONCURRENCY):
+        """
+        Args:
+            probe (bool): Whether to send HEAD requests for URLs whose extension tells nothing (default is True).
+            session (aiohttp.ClientSession): Optional HTTP session to send the HEAD requests over; it is left
+                open (default is None, a pooled session is opened on the first request and closed by `close`).
+            timeout (float): Seconds a HEAD request may take (default is DEFAULT_PROBE_TIMEOUT).
+            max_concurrent (int): HEAD requests sent at the same time (default is DEFAULT_PROBE_CONCURRENCY).
+        """
+        self.probe = probe
+        self.timeout = timeout
+        self.max_concurrent = max_concurrent
+        self._session = session
+        self._owns_session = session is None
+        self._slots = None  # created with the session, on the event loop
+        self._html_streak = {}  # host -> HEAD answers in a row that said HTML
+        self._no_head = set()  # hosts that refuse HEAD requests
+        self.probes = 0
+
+    @classmethod
+    def for_mode(cls, mode: str, **kwargs) -> Optional['ContentTypeFilter']:
+        """Returns the filter for one of PREFLIGHT_MODES, or None for 'off'."""
+        if mode not in PREFLIGHT_MODES:
+            raise ValueError(f"Unknown preflight mode {mode!r}; expected one of {', '.join(PREFLIGHT_MODES)}")
+        if mode == 'off':
+            return None
+        return cls(probe=mode == 'head', **kwargs)
+
+    async def classify(self, url: str) -> str:
+        """
+        Classify one URL.
+
+        Args:
+            url (str): The URL.
+
+        Returns:
+            str: HTML, DOCUMENT, MEDIA, FEED, DOWNLOAD, or UNKNOWN if neither the extension nor a HEAD
+            request tells.
+        """
+        kind = kind_of_extension(url)
+        if kind is not None:
+            PREFLIGHT_CHECKS.inc(kind=kind, source='extension')
+            return kind
+
+        host = urlparse(url).netloc
+        if not self.probe or host in self._no_head:
+            PREFLIGHT_CHECKS.inc(kind=UNKNOWN, source='extension')
+            return UNKNOWN
+        if self._html_streak.get(host, 0) >= HOST_TRUST_PROBES:
+            PREFLIGHT_CHECKS.inc(kind=HTML, source='host')
+            return HTML
+
+        kind = await self._head(url, host)
+        if url_extension(url) == '':
+            self._html_streak[host] = self._html_streak.get(host, 0) + 1 if kind == HTML else 0
+        PREFLIGHT_CHECKS.inc(kind=kind, source='head')
+        return kind
+
+    async def classify_all(self, urls: List[str]) -> Dict[str, str]:
+        """Classifies URLs concurrently, returning the kind of each URL."""
+        kinds = await asyncio.gather(*(self.classify(url) for url in urls))
+        return dict(zip(urls, kinds))
+
+    async def close(self):
+        """Closes the HTTP session, if the filter opened it."""
+        if self._owns_session and self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def _head(self, url: str, host: str) -> str:
+        # aiohttp is only imported once a HEAD request is sent, so the command line starts without it
+        import aiohttp
+
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_concurrent)
+        if self._session is None:
+            self._session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=self.max_concurrent))
+        async with self._slots:
+            self.probes += 1
+            try:
+                async with self._session.head(url, allow_redirects=True,
+                                              timeout=aiohttp.ClientTimeout(total=self.timeout)) as response:
+                    if response.status in HEAD_UNSUPPORTED_STATUS_CODES:
+                        logger.info("%s does not support HEAD requests; rendering its URLs unclassified", host)
+                        self._no_head.add(host)
+                        return UNKNOWN
+                    if response.status >= 400:
+                        # Let the browser fetch it, so the retry policy sees the failure
+                        return UNKNOWN
+                    return kind_of_content_type(response.headers.get('Content-Type'))
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                logger.debug("HEAD request for %s failed: %s", url, e)
+                return UNKNOWN
@@ -1,11 +1,18 @@
+import time
 import logging
 from crawl4ai import AsyncWebCrawler, BrowserConfig, CrawlerRunConfig
+from src.metrics import MARKDOWN_BYTES, PAGES, PAGES_IN_FLIGHT, RENDER_SECONDS, WRITE_SECONDS
+from src.retry import classify_failure
 from src.results_saver import save_markdown, save_metadata
+from src.resource_profiles import DEFAULT_RESOURCE_PROFILE, ResourceBlocker
+from src.tracing import TRACER
+from src.timeouts import DEFAULT_PAGE_TIMEOUT, arun_with_timeout
 
 
 logger = logging.getLogger(__name__)
 
-async def crawl_one(url: str, output_dir: str) -> str:
+async def crawl_one(url: str, output_dir: str, warc_writer=None, chunker=None,
+                    page_timeout: float = DEFAULT_PAGE_TIMEOUT, resource_profile: str = DEFAULT_RESOURCE_PROFILE) -> str:
     """
     Crawl the specified URL and save the markdown content to a file.
     
@@ -16,39 +23,81 @@ async def crawl_one(url: str, output_dir: str) -> str:
     Args:
         url (str): The URL to crawl.
         output_dir (str): The directory where markdown and metadata should be saved.
+        warc_writer (WarcWriter): Optional writer to archive the raw response to (default is None).
+        chunker (MarkdownChunker): Optional stage to split the markdown into chunks (default is None).
+        page_timeout (float): Wall-clock budget in seconds for the page (default is DEFAULT_PAGE_TIMEOUT).
+        resource_profile (str): Name of the resource blocking profile to render the page with (default is 'full').
 
     Returns:
-        str: The file path of the saved markdown file, or None if no content was found.
+        str: The file path of the saved markdown file, or None if the crawl failed or no content was found.
     """
     metadata = []  # To store metadata for JSON output
     logger.info("Starting to crawl URL: %s", url)
 
-    async with AsyncWebCrawler() as crawler:
-        try:
-            result = await crawler.arun(url=url)
+    # Skip downloading resources that never affect the markdown
+    resource_blocker = ResourceBlocker(resource_profile)
+    crawler = AsyncWebCrawler(config=BrowserConfig(extra_args=resource_blocker.extra_args))
+    resource_blocker.install(crawler)
 
-            # Check for markdown content in the result
-            if hasattr(result, 'markdown'):
-                markdown_content = result.markdown
+    with TRACER.start_trace('crawl_url', key=url, url=url) as trace:
+        async with crawler:
+            try:
+                PAGES_IN_FLIGHT.inc()
+                start = time.perf_counter()
+                # A render that raises counts as failed
+                outcome = 'failed'
+                try:
+                    with trace.span('render') as span:
+                        result = await arun_with_timeout(crawler, url, page_timeout)
+                        failure = classify_failure(result)
+                        outcome = 'failed' if failure is not None else 'succeeded'
+                        span['outcome'] = outcome
+                finally:
+                    PAGES_IN_FLIGHT.dec()
+                    RENDER_SECONDS.observe(time.perf_counter() - start, outcome=outcome)
+                    PAGES.inc(outcome=outcome)
 
-                # Save the markdown content
-                markdown_file_path = await save_markdown(url, markdown_content, output_dir)
-                logger.info("Saved markdown content for URL %s at %s", url, markdown_file_path)
+                # Archive the raw response so it can be re-extracted offline
+                if warc_writer is not None:
+                    with trace.span('archive'):
+                        await warc_writer.write_result(url, result)
 
-                # Store metadata
-                metadata.append({
-                    'url': url,
-                    'markdown_file': markdown_file_path
-                })
+                # Only pages that were crawled successfully are saved, not the body of an error page
+                if failure is not None:
+                    logger.error("Error crawling URL %s: %s", url, failure['reason'])
+                    trace.set_attribute('error', failure['reason'])
+                    return None
+
+                # Check for markdown content in the result
+                if hasattr(result, 'markdown'):
+                    markdown_content = result.markdown
+                    MARKDOWN_BYTES.observe(len(str(markdown_content or '').encode('utf-8')))
+
+                    # Save the markdown content
+                    with trace.span('save_markdown'), WRITE_SECONDS.time():
+                        markdown_file_path = await save_markdown(url, markdown_content, output_dir)
+                    logger.info("Saved markdown content for URL %s at %s", url, markdown_file_path)
+
+                    # Split the markdown into chunks for embedding
+                    if chunker is not None:
+                        await chunker.submit(url, markdown_content)
+
+                    # Store metadata
+                    metadata.append({
+                        'url': url,
+                        'markdown_file': markdown_file_path
+                    })
             
-                # Save metadata to JSON file
-                await save_metadata(metadata, output_dir, url)
-                logger.info("Saved metadata for URL %s", url)
-                return markdown_file_path
-            else:
-                logger.warning("No markdown content found for URL: %s", url)
-                return None
+                    # Save metadata to JSON file
+                    with trace.span('save_metadata'):
+                        await save_metadata(metadata, output_dir, url)
+                    logger.info("Saved metadata for URL %s", url)
+                    return markdown_file_path
+                else:
+                    logger.warning("No markdown content found for URL: %s", url)
+                    return None
 
-        except Exception as e:
-            logger.error("Error while crawling URL %s: %s", url, str(e))
-            return None
+            except Exception as e:
+                logger.error("Error while crawling URL %s: %s", url, str(e))
+                trace.set_attribute('error', repr(e))
+                return None
@@ -1,10 +1,27 @@
 import os
 import sys
+import copy
+import time
 import psutil
 import asyncio
 import logging
-from .results_saver import save_markdown, save_metadata
+import itertools
+from collections import deque
+from types import SimpleNamespace
+from .metrics import (MARKDOWN_BYTES, MEMORY_PEAK_BYTES, MEMORY_RSS_BYTES, PAGES, PAGES_IN_FLIGHT, RENDER_SECONDS,
+                      RETRIES)
+from .results_saver import save_metadata
+from .result_writer import ResultWriter
+from .retry import RetryPolicy, classify_failure
+from .response_cache import ResponseCache
+from .resource_profiles import DEFAULT_RESOURCE_PROFILE, ResourceBlocker
+from .content_types import RENDERED_KINDS, ContentTypeFilter
+from .frontier import StreamingFrontier
+from .politeness import PolitenessScheduler
+from .tracing import NOOP_TRACE, TRACER
+from .timeouts import DEFAULT_PAGE_TIMEOUT, HostCircuitBreaker, PageTimeoutError, arun_with_timeout, discard_session
 from typing import List
+from urllib.parse import urlparse
 from crawl4ai import AsyncWebCrawler, BrowserConfig, CrawlerRunConfig, CacheMode
 
 logger = logging.getLogger(__name__)
@@ -14,7 +31,147 @@ parent_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.append(parent_dir)
 
 
-async def crawl_parallel(urls: List[str], max_concurrent: int = 3, output_dir: str = 'crawled_data', base_url: str = None):
+# Browser session numbers, unique across crawls that share a crawler
+_session_numbers = itertools.count(1)
+
+
+def take_ready_batch(frontier: deque, max_size: int, now: float, scheduler: PolitenessScheduler = None) -> List[str]:
+    """Removes up to max_size URLs that are ready to crawl from the frontier, keeping the others in order.
+
+    With a politeness scheduler, URLs whose host may not be crawled yet are kept
+    waiting and the URLs taken are recorded as started.
+    """
+    batch = []
+    waiting = []
+    while frontier and len(batch) < max_size:
+        url, not_before = frontier.popleft()
+        if not_before <= now and (scheduler is None or scheduler.can_start(url, now)):
+            batch.append(url)
+            if scheduler is not None:
+                scheduler.started(url, now)
+        else:
+            waiting.append((url, not_before))
+    frontier.extendleft(reversed(waiting))
+    return batch
+
+
+def group_metadata_by_site(metadata: list, base_url: str = None) -> dict:
+    """Groups metadata entries by the website they belong to, keyed by a URL of that website."""
+    sites = {urlparse(base_url).netloc: (base_url, [])} if base_url else {}
+    for entry in metadata:
+        _, entries = sites.setdefault(urlparse(entry['url']).netloc, (entry['url'], []))
+        entries.append(entry)
+    return dict(sites.values())
+
+
+def create_crawler(resource_blocker: ResourceBlocker) -> AsyncWebCrawler:
+    """Creates a headless crawler that renders pages under the given resource blocking profile."""
+    # Minimal browser config
+    browser_config = BrowserConfig(
+        headless=True,
+        verbose=False,   # corrected from 'verbos=False'
+        extra_args=["--disable-gpu",
+                    "--disable-dev-shm-usage",
+                    "--no-sandbox",
+                    ] + resource_blocker.extra_args,
+    )
+    crawler = AsyncWebCrawler(config=browser_config)
+    resource_blocker.install(crawler)
+    return crawler
+
+
+async def crawl_page(crawler, url: str, timeout: float, cache: ResponseCache = None, cache_settings: dict = None,
+                     session_id: str = None, config: CrawlerRunConfig = None, trace=NOOP_TRACE):
+    """
+    Render a page, serving it from the response cache when a fresh copy exists.
+
+    Successful renders are stored in the cache, so later runs with the same
+    render settings skip the browser entirely.
+
+    With a session ID, the page is rendered in its own browser session, which
+    is killed once the page is done. Crawl4AI only closes the page, not its
+    browser context, after a crawl without a session, so over a long crawl
+    the leftover contexts would pile up in the browser.
+
+    Args:
+        crawler (AsyncWebCrawler): The crawler to use.
+        url (str): The URL to crawl.
+        timeout (float): The wall-clock budget in seconds for the page.
+        cache (ResponseCache): Optional cache of earlier renders (default is None).
+        cache_settings (dict): The render settings that are part of the cache key (default is None).
+        session_id (str): The browser session to render the page in, unique per page (default is None).
+        config (CrawlerRunConfig): The render settings (default is None, Crawl4AI's defaults).
+        trace (Trace): The trace of the URL to record the cache lookup and render in (default is not traced).
+
+    Returns:
+        CrawlResult: The result of the crawl, or an equivalent object for a cached page.
+    """
+    start = time.perf_counter()
+    if cache is not None:
+        with trace.span('cache_lookup') as span:
+            cached = await cache.get(url, cache_settings)
+            span['hit'] = cached is not None
+        if cached is not None:
+            RENDER_SECONDS.observe(time.perf_counter() - start, outcome='cached')
+            return SimpleNamespace(url=url, success=True, from_cache=True, **cached)
+
+    kwargs = {}
+    if config is not None:
+        # Crawl4AI takes the session from the run config and ignores a separate session_id argument
+        kwargs['config'] = copy.copy(config)
+        kwargs['config'].session_id = session_id
+
+    PAGES_IN_FLIGHT.inc()
+    outcome = 'error'
+    torn_down = False
+    render = trace.start_span('render', session_id=session_id)
+    try:
+        result = await arun_with_timeout(crawler, url, timeout, session_id=session_id, **kwargs)
+        failure = classify_failure(result)
+        outcome = 'failed' if failure is not None else 'succeeded'
+    except PageTimeoutError:
+        torn_down = True  # The session of a timed-out page has already been killed
+        raise
+    finally:
+        PAGES_IN_FLIGHT.dec()
+        RENDER_SECONDS.observe(time.perf_counter() - start, outcome=outcome)
+        trace.end_span(render, outcome=outcome)
+        if session_id is not None and not torn_down:
+            with trace.span('close_session'):
+                await discard_session(crawler, session_id)
+
+    if cache is not None and failure is None:
+        try:
+            await cache.put(url, {
+                'html': getattr(result, 'html', None),
+                'markdown': getattr(result, 'markdown', None),
+                'status_code': getattr(result, 'status_code', None),
+                'response_headers': getattr(result, 'response_headers', None),
+            }, cache_settings)
+        except Exception as e:
+            logger.warning(f"Failed to cache {url}: {e}")
+    return result
+
+
+async def run_in_slot(slots: asyncio.Semaphore, coro, trace=NOOP_TRACE):
+    """Runs a coroutine once one of the slots is free."""
+    with trace.span('slot_wait'):
+        await slots.acquire()
+    try:
+        return await coro
+    finally:
+        slots.release()
+
+
+async def crawl_parallel(urls: List[str], max_concurrent: int = 3, output_dir: str = 'crawled_data', base_url: str = None,
+                         warc_writer=None, chunker=None, retry_policy: RetryPolicy = None,
+                         page_timeout: float = DEFAULT_PAGE_TIMEOUT, run_deadline: float = None,
+                         circuit_breaker: HostCircuitBreaker = None,
+                         resource_profile: str = DEFAULT_RESOURCE_PROFILE, cache: ResponseCache = None,
+                         crawler: AsyncWebCrawler = None, scheduler: PolitenessScheduler = None,
+                         page_slots: asyncio.Semaphore = None, on_done=None,
+                         url_stream: StreamingFrontier = None, content_filter: ContentTypeFilter = None,
+                         content_handlers: dict = None) -> dict:
     """
     Asynchronously crawl a list of URLs in parallel.
 
@@ -26,8 +183,39 @@ async def crawl_parallel(urls: List[str], max_concurrent: int = 3, output_dir: s
         max_concurrent (int): The maximum number of concurrent crawls (default is 3).
         output_dir (str): The directory where markdown and metadata should be saved (default is 'crawled_data').
         base_url (str): The base URL for relative links (default is None).
+        warc_writer (WarcWriter): Optional writer to archive raw responses to (default is None).
+        chunker (MarkdownChunker): Optional stage to split the markdown into chunks (default is None).
+        retry_policy (RetryPolicy): Policy deciding which failed URLs are retried (default is RetryPolicy()).
+        page_timeout (float): Wall-clock budget in seconds for each page (default is DEFAULT_PAGE_TIMEOUT).
+        run_deadline (float): Seconds after which no new pages are started (default is None, no deadline).
+        circuit_breaker (HostCircuitBreaker): Breaker that stops crawling failing hosts (default is HostCircuitBreaker()).
+        resource_profile (str): Name of the resource blocking profile to render pages with (default is 'full').
+        cache (ResponseCache): Optional cache of rendered pages shared across runs (default is None).
+        crawler (AsyncWebCrawler): An already started crawler to reuse; it is left open (default is None,
+            a new crawler is started and closed).
+        scheduler (PolitenessScheduler): Optional scheduler spacing out requests per host (default is None).
+        page_slots (asyncio.Semaphore): Optional limit on pages rendered at once, shared with other crawls
+            on the same crawler (default is None).
+        on_done (callable): Optional callback called with each URL and its outcome once the URL is finished:
+            'succeeded' once its markdown is saved, 'failed' if crawling or saving it failed, or 'skipped'
+            when the run deadline or an open circuit kept it from being crawled (default is None).
+        url_stream (StreamingFrontier): Optional frontier that URL discovery is still filling; its URLs
+            are crawled after `urls` as they arrive (default is None).
+        content_filter (ContentTypeFilter): Optional classifier run on each URL before it is rendered; only
+            HTML and unclassified URLs reach the browser (default is None, every URL is rendered).
+        content_handlers (dict): Coroutine functions by kind of content, such as 'document', called with
+            a URL the content filter routed to them instead of the browser. They return a crawl result
+            with the markdown, and are bound by the page timeout. URLs of other non-HTML kinds are
+            skipped (default is None).
+
+    Returns:
+        dict: The number of pages that 'succeeded', 'failed', were 'skipped' without being crawled, such
+            as by the run deadline, an open circuit or the content filter, and were 'retried'.
     """
-    
+    retry_policy = retry_policy or RetryPolicy()
+    circuit_breaker = circuit_breaker or HostCircuitBreaker()
+    content_handlers = content_handlers or {}
+
     logger.info("=== Parallel Crawling with Browser Reuse + Memory Check ===")
 
     # Ensure the output directory exists
@@ -43,83 +231,251 @@ async def crawl_parallel(urls: List[str], max_concurrent: int = 3, output_dir: s
         current_mem = process.memory_info().rss  # in bytes
         if current_mem > peak_memory:
             peak_memory = current_mem
+        MEMORY_RSS_BYTES.set(current_mem)
+        MEMORY_PEAK_BYTES.set_max(current_mem)
         logger.debug(f"{prefix} Current Memory: {current_mem // (1024 * 1024)} MB, Peak: {peak_memory // (1024 * 1024)} MB")
         
-    # Minimal browser config
-    browser_config = BrowserConfig(
-        headless=True,
-        verbose=False,   # corrected from 'verbos=False'
-        extra_args=["--disable-gpu",
-                    "--disable-dev-shm-usage",
-                    "--no-sandbox",
-                    ],
-    )
-    crawl_config = CrawlerRunConfig(cache_mode=CacheMode.BYPASS)
+    # Skip downloading resources that never affect the markdown
+    resource_blocker = ResourceBlocker(resource_profile)
 
-    # Create the crawler instance
-    crawler = AsyncWebCrawler(config=browser_config)
-    await crawler.start()
+    crawl_config = CrawlerRunConfig(cache_mode=CacheMode.BYPASS, page_timeout=int(page_timeout * 1000))
+
+    # Settings that change the rendered output, and so are part of the cache key
+    cache_settings = {'fetcher': 'browser', 'resource_profile': resource_profile}
+
+    # Create the crawler instance, unless the caller shares one across crawls
+    owns_crawler = crawler is None
+    if owns_crawler:
+        crawler = create_crawler(resource_blocker)
+        await crawler.start()
+
+    success_count = 0
+    fail_count = 0
+    skip_count = 0
+    retry_count = 0
+
+    def page_written(url, saved):
+        # A rendered page only counts as crawled once its markdown is on disk
+        nonlocal success_count, fail_count
+        if saved:
+            success_count += 1
+        else:
+            fail_count += 1
+        outcome = 'succeeded' if saved else 'failed'
+        PAGES.inc(outcome=outcome)
+        if on_done is not None:
+            on_done(url, outcome)
+
+    # Markdown is saved by a write-behind stage so disk latency does not hold up browser slots
+    writer = ResultWriter(output_dir, on_written=page_written)
+    await writer.start()
+
+    # URLs waiting to be crawled, with the loop time before which each may not be retried
+    frontier = deque()
 
-    results_md = []  # To store markdown results
-    metadata = []  # To store metadata for JSON output
+    # Traces of the sampled URLs, from entering the frontier until their markdown is saved
+    traces = {}
+    queue_spans = {}
+
+    def enqueue(new_urls):
+        for url in new_urls:
+            frontier.append((url, 0.0))
+            trace = TRACER.start_trace('crawl_url', key=url, url=url)
+            if trace.sampled:
+                traces[url] = trace
+                queue_spans[url] = trace.start_span('queue_wait')
+
+    async def preflight(url):
+        with traces.get(url, NOOP_TRACE).span('preflight') as span:
+            span['kind'] = await content_filter.classify(url)
+            return span['kind']
+
+    enqueue(urls)
+    loop = asyncio.get_running_loop()
+    deadline_at = loop.time() + run_deadline if run_deadline is not None else None
 
     try:
-        # We'll chunk the URLs in batches of 'max_concurrent'
-        success_count = 0
-        fail_count = 0
-        for i in range(0, len(urls), max_concurrent):
-            batch = urls[i: i + max_concurrent]
+        # We'll take the URLs in batches of 'max_concurrent'
+        batch_number = 0
+        while frontier or (url_stream is not None and not url_stream.exhausted):
+            # Top up from discovery, waiting for it only when there is nothing else to crawl
+            if url_stream is not None and len(frontier) < max_concurrent and not url_stream.exhausted:
+                wait_limit = deadline_at - loop.time() if deadline_at is not None else None
+                enqueue(await url_stream.take(max_concurrent - len(frontier), wait=not frontier,
+                                              timeout=max(wait_limit, 0) if wait_limit is not None else None))
+
+            # Stop starting new pages once the run deadline has passed
+            if deadline_at is not None and loop.time() >= deadline_at:
+                logger.warning(f"Run deadline reached; skipping {len(frontier)} remaining URLs")
+                skip_count += len(frontier)
+                PAGES.inc(len(frontier), outcome='skipped')
+                for url, _ in frontier:
+                    circuit_breaker.release_trial(url)
+                    traces.pop(url, NOOP_TRACE).finish(outcome='skipped')
+                    if on_done is not None:
+                        on_done(url, 'skipped')
+                frontier.clear()
+                break
+
+            if not frontier:
+                continue
+
+            batch = take_ready_batch(frontier, max_concurrent, loop.time(), scheduler)
+            if not batch:
+                # Only URLs waiting out a retry delay or their host's politeness delay remain
+                wait = min(max(not_before, scheduler.ready_at(url) if scheduler else 0.0)
+                           for url, not_before in frontier) - loop.time()
+                if deadline_at is not None:
+                    wait = min(wait, deadline_at - loop.time())
+                await asyncio.sleep(max(wait, 0))
+                continue
+
+            for url in batch:
+                traces.get(url, NOOP_TRACE).end_span(queue_spans.pop(url, None))
+
+            # Fail fast on hosts whose circuit is open
+            for url in [url for url in batch if not circuit_breaker.allow(url)]:
+                logger.error(f"Skipping {url}: too many failures on its host")
+                batch.remove(url)
+                if scheduler is not None:
+                    scheduler.finished(url)
+                traces.pop(url, NOOP_TRACE).finish(outcome='skipped', reason='circuit open')
+                if on_done is not None:
+                    on_done(url, 'skipped')
+                PAGES.inc(outcome='skipped')
+                skip_count += 1
+            if not batch:
+                continue
+
+            # Keep non-HTML URLs from taking browser slots: route them to their handler or skip them
+            kinds = {}
+            if content_filter is not None:
+                kinds = dict(zip(batch, await asyncio.gather(*(preflight(url) for url in batch))))
+                for url in [url for url in batch
+                            if kinds[url] not in RENDERED_KINDS and kinds[url] not in content_handlers]:
+                    logger.info(f"Skipping {url}: {kinds[url]} content is not rendered")
+                    batch.remove(url)
+                    circuit_breaker.release_trial(url)
+                    if scheduler is not None:
+                        scheduler.finished(url)
+                    traces.pop(url, NOOP_TRACE).finish(outcome='skipped', reason=f"{kinds[url]} content")
+                    if on_done is not None:
+                        # Unlike a deadline or an open circuit, retrying elsewhere would not help
+                        on_done(url, 'failed')
+                    PAGES.inc(outcome='skipped')
+                    skip_count += 1
+                if not batch:
+                    continue
+
+            batch_number += 1
             tasks = []
 
-            for j, url in enumerate(batch):
-                # Unique session_id per concurrent sub-task
-                session_id = f"parallel_session_{i + j}"
-                task = crawler.arun(
-                    url=url, config=crawl_config, session_id=session_id)
+            # A page may not run past the run deadline
+            timeout = page_timeout
+            if deadline_at is not None:
+                timeout = min(timeout, max(deadline_at - loop.time(), 0))
+
+            for url in batch:
+                handler = content_handlers.get(kinds.get(url))
+                if handler is not None:
+                    # Handled outside the browser, so no browser session or page slot is needed
+                    tasks.append(asyncio.wait_for(handler(url), timeout))
+                    continue
+
+                # Each page gets its own browser session, which is killed once the page is done
+                session_id = f"parallel_session_{next(_session_numbers)}"
+                trace = traces.get(url, NOOP_TRACE)
+                task = crawl_page(
+                    crawler, url, timeout, cache=cache, cache_settings=cache_settings,
+                    session_id=session_id, config=crawl_config, trace=trace)
+                if page_slots is not None:
+                    task = run_in_slot(page_slots, task, trace)
                 tasks.append(task)
 
-                # Check memory usage prior to launching tasks
-                log_memory(prefix=f"Before batch {i//max_concurrent + 1}: ")
+            # Check memory usage prior to launching tasks
+            log_memory(prefix=f"Before batch {batch_number}: ")
 
-                # Gather results
-                results = await asyncio.gather(*tasks, return_exceptions=True)
+            # Gather results
+            results = await asyncio.gather(*tasks, return_exceptions=True)
 
-                # Check memory usage after tasks complete
-                log_memory(prefix=f"After batch {i//max_concurrent + 1}: ")
+            # Check memory usage after tasks complete
+            log_memory(prefix=f"After batch {batch_number}: ")
 
-                # Evaluate results
-                for url, result in zip(batch, results):
-                    if isinstance(result, Exception):
-                        logger.error(f"Error crawling {url}: {result}")
-                        fail_count += 1
+            # Evaluate results
+            for url, result in zip(batch, results):
+                if scheduler is not None:
+                    scheduler.finished(url)
+
+                failure = classify_failure(result)
+                # Only transient failures count against the host; a permanent one such as a 404 is an answer
+                if failure is not None and failure['retryable']:
+                    circuit_breaker.record_failure(url)
+                else:
+                    circuit_breaker.record_success(url)
+
+                if failure is not None:
+                    delay = retry_policy.next_delay(url, failure)
+                    if delay is not None:
+                        # Requeue transient failures at the back of the frontier
+                        logger.warning(f"Retrying {url} in {delay:.1f}s: {failure['reason']}")
+                        frontier.append((url, loop.time() + delay))
+                        if url in traces:
+                            queue_spans[url] = traces[url].start_span('queue_wait', retry_reason=failure['reason'])
+                        retry_count += 1
+                        RETRIES.inc()
                     else:
-                        # Assuming result returns HTML for conversion to Markdown
-                        markdown_content = result.markdown if hasattr(
-                            result, 'markdown') else ''
+                        logger.error(f"Error crawling {url}: {failure['reason']}")
+                        fail_count += 1
+                        PAGES.inc(outcome='failed')
+                        traces.pop(url, NOOP_TRACE).finish(outcome='failed', reason=failure['reason'])
+                        if on_done is not None:
+                            on_done(url, 'failed')
+                else:
+                    # Archive the raw response so it can be re-extracted offline
+                    trace = traces.pop(url, NOOP_TRACE)
+                    if warc_writer is not None:
+                        with trace.span('archive'):
+                            await warc_writer.write_result(url, result)
 
-                        # Save markdown content to a file and store the path
-                        file_path = await save_markdown(
-                            url, markdown_content, output_dir)
+                    # Assuming result returns HTML for conversion to Markdown
+                    markdown_content = result.markdown if hasattr(
+                        result, 'markdown') else ''
+                    MARKDOWN_BYTES.observe(len(str(markdown_content or '').encode('utf-8')))
 
-                        # Store metadata
-                        metadata.append({
-                            'url': url,
-                            'markdown_file': file_path
-                        })
+                    # Queue markdown content to be saved to a file; the writer finishes the trace
+                    trace.set_attribute('outcome', 'succeeded')
+                    await writer.submit(url, markdown_content, trace)
 
-                        success_count += 1
+                    # Queue markdown content to be chunked for embedding
+                    if chunker is not None:
+                        await chunker.submit(url, markdown_content)
 
-                logger.info(f"Summary:")
-                logger.info(f"  - Successfully crawled: {success_count}")
-                logger.info(f"  - Failed: {fail_count}")
+            logger.info(f"Summary:")
+            logger.info(f"  - Successfully crawled: {success_count}")
+            logger.info(f"  - Failed: {fail_count}")
+            logger.info(f"  - Skipped: {skip_count}")
+            logger.info(f"  - Retried: {retry_count}")
+            if owns_crawler:
+                logger.info(f"  - Blocked resource requests: {resource_blocker.blocked_count}")
+            if cache is not None:
+                logger.info(f"  - Cache hits: {cache.hits}, misses: {cache.misses}")
 
     finally:
-        logger.info("Closing crawler...")
-        await crawler.close()
+        for trace in traces.values():
+            trace.finish(outcome='unfinished')
+        if owns_crawler:
+            logger.info("Closing crawler...")
+            await crawler.close()
+        # Wait for pending markdown files to be written
+        await writer.close()
         # Final memory log
         log_memory(prefix="Final: ")
         logger.info("=== Parallel Crawling Complete ===")
         logger.info(f"Peak memory usage (MB): {peak_memory // (1024 * 1024)}")
-       # Save metadata to JSON file
-        metadata_file_path = await save_metadata(metadata, output_dir, base_url)
-        logger.info(f"Metadata saved to {metadata_file_path}")
+       # Save metadata to a JSON file per website
+        for site_url, entries in group_metadata_by_site(writer.metadata, base_url).items():
+            with TRACER.start_trace('save_metadata', key=site_url, site=site_url, pages=len(entries)):
+                metadata_file_path = await save_metadata(entries, output_dir, site_url)
+            logger.info(f"Metadata saved to {metadata_file_path}")
+
+    return {'succeeded': success_count, 'failed': fail_count, 'skipped': skip_count, 'retried': retry_count}
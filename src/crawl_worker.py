@@ -0,0 +1,162 @@
+import os
+import socket
+import asyncio
+import logging
+from .chunker import MarkdownChunker
+from .content_types import DEFAULT_PREFLIGHT, ContentTypeFilter
+from .crawl_parallel import crawl_parallel, create_crawler
+from .documents import DocumentExtractor
+from .lease_queue import DEFAULT_LEASE_TIMEOUT, LeaseQueue
+from .politeness import DEFAULT_HOST_DELAY, PolitenessScheduler
+from .resource_profiles import DEFAULT_RESOURCE_PROFILE, ResourceBlocker
+from .response_cache import DEFAULT_CACHE_MAX_SIZE, DEFAULT_CACHE_TTL, ResponseCache
+from .retry import RetryPolicy
+from .timeouts import DEFAULT_PAGE_TIMEOUT, HostCircuitBreaker
+from .warc import WarcWriter
+
+logger = logging.getLogger(__name__)
+
+# Seconds an idle worker waits before asking the queue for URLs again
+DEFAULT_POLL_INTERVAL = 5.0
+
+# Times a worker releases a URL it could not get to, such as one on a host whose circuit is open, before it fails it
+DEFAULT_MAX_RELEASES = 20
+
+
+def default_worker_id() -> str:
+    """Returns an ID unique to this process across machines."""
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+async def keep_leases_alive(queue: LeaseQueue, worker_id: str, urls: list, lease_timeout: float):
+    """Extends the worker's leases on the URLs until cancelled, a third of the lease timeout apart."""
+    while True:
+        await asyncio.sleep(lease_timeout / 3)
+        held = await asyncio.to_thread(queue.heartbeat, worker_id, urls, lease_timeout)
+        if held < len(urls):
+            logger.warning("Worker %s lost %d of its %d leases", worker_id, len(urls) - held, len(urls))
+
+
+async def run_worker(queue: LeaseQueue, output_dir: str, worker_id: str = None, max_concurrent: int = 10,
+                     lease_timeout: float = DEFAULT_LEASE_TIMEOUT, max_attempts: int = 3,
+                     page_timeout: float = DEFAULT_PAGE_TIMEOUT, resource_profile: str = DEFAULT_RESOURCE_PROFILE,
+                     host_delay: float = DEFAULT_HOST_DELAY, poll_interval: float = DEFAULT_POLL_INTERVAL,
+                     preflight: str = DEFAULT_PREFLIGHT, document_workers: int = None,
+                     max_releases: int = DEFAULT_MAX_RELEASES, warc_dir: str = None, chunk_tokens: int = None,
+                     cache_dir: str = None, cache_ttl: float = DEFAULT_CACHE_TTL,
+                     cache_max_size: int = DEFAULT_CACHE_MAX_SIZE) -> dict:
+    """
+    Crawl URLs leased from a shared queue until the queue is finished.
+
+    The worker leases `max_concurrent` URLs at a time and keeps the leases
+    alive with heartbeats while it crawls them. A URL is only completed in the
+    queue once its markdown has been written, so if the worker dies, its URLs
+    are leased to another worker when the leases run out. URLs the worker
+    could not get to, such as those on a host whose circuit is open, are
+    released for other workers.
+
+    Args:
+        queue (LeaseQueue): The shared queue of URLs.
+        output_dir (str): The directory where markdown and metadata should be saved.
+        worker_id (str): The ID of the worker (default is the host name and process ID).
+        max_concurrent (int): The number of URLs leased and crawled at a time (default is 10).
+        lease_timeout (float): Seconds a lease stays valid without a heartbeat (default is 120.0).
+        max_attempts (int): The maximum number of attempts per page within a lease (default is 3).
+        page_timeout (float): Wall-clock budget in seconds for each page (default is DEFAULT_PAGE_TIMEOUT).
+        resource_profile (str): Name of the resource blocking profile to render pages with (default is 'full').
+        host_delay (float): Seconds between two pages on the same host (default is 1.0).
+        poll_interval (float): Seconds to wait when all remaining URLs are leased by others (default is 5.0).
+        preflight (str): How URLs are classified before rendering, one of PREFLIGHT_MODES (default is 'head').
+        document_workers (int): Processes extracting the text of PDFs and office documents; 0 skips
+            documents (default is None, the number of CPUs).
+        max_releases (int): Times the worker releases a URL it could not get to before completing it as
+            failed, so a host whose circuit keeps opening cannot keep the queue from finishing (default is 20).
+        warc_dir (str): Directory to archive raw responses to, in WARC files named after the worker
+            (default is None, disabled).
+        chunk_tokens (int): Maximum number of tokens per chunk when the markdown is also split into
+            chunks (default is None, disabled).
+        cache_dir (str): Directory of a response cache shared across runs (default is None, disabled).
+        cache_ttl (float): Seconds a cached response stays fresh (default is DEFAULT_CACHE_TTL).
+        cache_max_size (int): Maximum size of the response cache in bytes (default is DEFAULT_CACHE_MAX_SIZE).
+
+    Returns:
+        dict: The number of URLs the worker 'succeeded', 'failed' and 'released'.
+    """
+    worker_id = worker_id or default_worker_id()
+    totals = {'succeeded': 0, 'failed': 0, 'released': 0}
+    scheduler = PolitenessScheduler(min_delay=host_delay)
+    circuit_breaker = HostCircuitBreaker()
+    # Shared across leases, so what is learned about a host's content types is kept
+    content_filter = ContentTypeFilter.for_mode(preflight)
+    # Releases do not count as leases in the queue, so the worker bounds them itself
+    releases = {}
+    documents = DocumentExtractor.for_workers(document_workers)
+    # Workers may share a WARC directory, so each writes files of its own
+    warc_writer = WarcWriter(warc_dir, prefix=f'crawl-{worker_id}') if warc_dir else None
+    chunker = MarkdownChunker(output_dir, max_tokens=chunk_tokens) if chunk_tokens else None
+    cache = ResponseCache(cache_dir, max_size=cache_max_size, ttl=cache_ttl) if cache_dir else None
+    logger.info("Worker %s started", worker_id)
+
+    crawler = create_crawler(ResourceBlocker(resource_profile))
+    try:
+        await crawler.start()
+        if chunker is not None:
+            await chunker.start()
+        while True:
+            # Queue calls may wait on other workers' writes, so they run off the event loop
+            urls = await asyncio.to_thread(queue.lease, worker_id, max_concurrent, lease_timeout)
+            if not urls:
+                if await asyncio.to_thread(queue.is_finished):
+                    break
+                # The remaining URLs are leased by other workers, whose leases may still run out
+                await asyncio.sleep(poll_interval)
+                continue
+
+            outcomes = {}
+            heartbeat = asyncio.create_task(keep_leases_alive(queue, worker_id, urls, lease_timeout))
+            try:
+                await crawl_parallel(urls, max_concurrent=max_concurrent, output_dir=output_dir,
+                                     warc_writer=warc_writer, chunker=chunker,
+                                     retry_policy=RetryPolicy(max_attempts=max_attempts), page_timeout=page_timeout,
+                                     resource_profile=resource_profile, circuit_breaker=circuit_breaker, cache=cache,
+                                     crawler=crawler, scheduler=scheduler, on_done=outcomes.__setitem__,
+                                     content_filter=content_filter,
+                                     content_handlers=documents and documents.handlers)
+            finally:
+                heartbeat.cancel()
+
+            # The markdown has been written, so the URLs can be completed
+            for url in urls:
+                outcome = outcomes.get(url, 'skipped')
+                if outcome == 'skipped':
+                    releases[url] = releases.get(url, 0) + 1
+                    if releases[url] < max_releases:
+                        await asyncio.to_thread(queue.release, worker_id, url)
+                        totals['released'] += 1
+                        continue
+                    logger.warning("Worker %s giving up on %s after releasing it %d times",
+                                   worker_id, url, releases[url])
+                    outcome = 'failed'
+                releases.pop(url, None)
+                if not await asyncio.to_thread(queue.complete, worker_id, url, outcome == 'succeeded'):
+                    logger.warning("Worker %s lost its lease on %s before completing it", worker_id, url)
+                totals[outcome] += 1
+
+            if all(outcomes.get(url, 'skipped') == 'skipped' for url in urls):
+                # Nothing could be crawled, e.g. because the hosts' circuits are open; back off
+                await asyncio.sleep(poll_interval)
+    finally:
+        await crawler.close()
+        if content_filter is not None:
+            await content_filter.close()
+        if documents is not None:
+            await documents.close()
+        if warc_writer is not None:
+            await warc_writer.close()
+        if chunker is not None:
+            await chunker.close()
+        if cache is not None:
+            logger.info("Response cache: %s", cache.stats())
+
+    logger.info("Worker %s finished: %s", worker_id, totals)
+    return totals
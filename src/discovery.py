@@ -0,0 +1,74 @@
+import asyncio
+import logging
+from aiohttp import ClientSession
+from .robots_parser import fetch_robots_txt_async, filter_allowed_urls, is_url_allowed
+from .frontier import MAX_SITEMAP_ENTRIES, entry_url, rank_urls
+from .metrics import DISCOVERED_URLS, ROBOTS_FETCHES, ROBOTS_FETCH_SECONDS, SITEMAP_DISCOVERY_SECONDS
+from .sitemap_parser import fetch_sitemap_entries, get_sitemap_entries
+from .url_check import clean_url
+from .url_rules import DEFAULT_URL_RULES
+
+logger = logging.getLogger(__name__)
+
+# Number of sites whose robots.txt and sitemaps are fetched at the same time
+DISCOVERY_CONCURRENCY = 20
+
+
+async def discover_site_urls(url, session, crawl_all, max_pages, check_robots, cache=None,
+                             include_patterns=None, exclude_patterns=None, url_rules=None):
+    """Collect the most valuable URLs of one site, using a shared HTTP session.
+
+    Without crawl_all, only the URL itself is returned, if robots.txt allows it.
+    Sitemap entries the URL rules exclude are dropped before ranking. Falls back to the seed URL itself when the site has no sitemap, since the
+    Scrapy fallback cannot run more than once per process.
+    """
+    try:
+        url = clean_url(url)
+    except ValueError as e:
+        logger.error("Skipping invalid seed URL %s: %s", url, e)
+        return []
+
+    robots_rules = {}
+    if check_robots:
+        with ROBOTS_FETCH_SECONDS.time():
+            robots_rules = await fetch_robots_txt_async(url, session)
+        ROBOTS_FETCHES.inc(result='found' if robots_rules else 'empty')
+    if not crawl_all:
+        if robots_rules and not is_url_allowed(url, robots_rules):
+            logger.warning("Skipping %s: disallowed by robots.txt", url)
+            return []
+        return [url]
+
+    sitemap_urls = robots_rules.get('sitemap', [])
+    try:
+        with SITEMAP_DISCOVERY_SECONDS.time():
+            if sitemap_urls:
+                entries = await fetch_sitemap_entries(sitemap_urls[0], session, MAX_SITEMAP_ENTRIES, cache)
+            else:
+                entries = await get_sitemap_entries(url, MAX_SITEMAP_ENTRIES, cache=cache, session=session)
+    except Exception as e:
+        logger.error("Error while fetching URLs from sitemap for %s: %s", url, e)
+        entries = []
+    DISCOVERED_URLS.inc(len(entries))
+    entries = (url_rules or DEFAULT_URL_RULES).filter(entries)
+    if not entries:
+        logger.warning("No URLs found in sitemap for %s; crawling the seed URL only.", url)
+        entries = [url]
+
+    if check_robots and robots_rules:
+        allowed = set(filter_allowed_urls([entry_url(entry) for entry in entries], robots_rules))
+        entries = [entry for entry in entries if entry_url(entry) in allowed]
+    return rank_urls(entries, max_pages, include_patterns, exclude_patterns)
+
+
+async def discover_sites(seeds, crawl_all, max_pages, check_robots, cache=None, include_patterns=None,
+                         exclude_patterns=None, url_rules=None):
+    """Collect the URLs of many sites over one shared HTTP session, returning a list of URLs per site."""
+    slots = asyncio.Semaphore(DISCOVERY_CONCURRENCY)
+    async with ClientSession() as session:
+        async def discover(seed):
+            async with slots:
+                return await discover_site_urls(seed, session, crawl_all, max_pages, check_robots, cache,
+                                                include_patterns, exclude_patterns, url_rules)
+
+        return await asyncio.gather(*(discover(seed) for seed in seeds))
@@ -0,0 +1,351 @@
+import io
+import os
+import re
+import time
+import asyncio
+import logging
+import zipfile
+import posixpath
+import xml.etree.ElementTree as ElementTree
+from concurrent.futures import ProcessPoolExecutor
+from types import SimpleNamespace
+from typing import List, Optional
+from .content_types import DOCUMENT, kind_of_extension, url_extension
+from .metrics import DOCUMENTS, EXTRACT_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# Documents larger than this are not downloaded, in bytes
+DEFAULT_MAX_DOCUMENT_BYTES = 50 * 1024 * 1024
+
+# Documents downloaded at the same time, over one pooled HTTP session
+DEFAULT_DOWNLOAD_CONCURRENCY = 10
+
+# Seconds a download may take
+DEFAULT_DOWNLOAD_TIMEOUT = 60.0
+
+# Formats that can be extracted, by media type and by extension
+DOCUMENT_FORMATS = {
+    'application/pdf': 'pdf',
+    'application/vnd.openxmlformats-officedocument.wordprocessingml.document': 'docx',
+    'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet': 'xlsx',
+    'application/vnd.openxmlformats-officedocument.presentationml.presentation': 'pptx',
+}
+DOCUMENT_EXTENSIONS = frozenset(DOCUMENT_FORMATS.values())
+
+_W = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+_S = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+_A = '{http://schemas.openxmlformats.org/drawingml/2006/main}'
+_R = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}'
+_REL = '{http://schemas.openxmlformats.org/package/2006/relationships}'
+
+
+class UnsupportedDocumentError(ValueError):
+    """Raised for documents in a format that cannot be extracted."""
+
+
+def document_format(url: str, content_type: str = None) -> Optional[str]:
+    """
+    Returns the format of a document, from its Content-Type or else its URL's extension.
+
+    Args:
+        url (str): The URL of the document.
+        content_type (str): The Content-Type header it was served with (default is None).
+
+    Returns:
+        Optional[str]: 'pdf', 'docx', 'xlsx' or 'pptx', or None if the document cannot be extracted.
+    """
+    media_type = (content_type or '').partition(';')[0].strip().lower()
+    if media_type in DOCUMENT_FORMATS:
+        return DOCUMENT_FORMATS[media_type]
+    extension = url_extension(url)
+    return extension if extension in DOCUMENT_EXTENSIONS else None
+
+
+def _table_row(cells: List[str]) -> str:
+    return '| ' + ' | '.join(cell.replace('|', '\\|').replace('\n', ' ').strip() for cell in cells) + ' |'
+
+
+def markdown_table(rows: List[List[str]]) -> str:
+    """Formats rows of cells as a markdown table, taking the first row as the header."""
+    rows = [row for row in rows if any(cell.strip() for cell in row)]
+    if not rows:
+        return ''
+    width = max(len(row) for row in rows)
+    rows = [row + [''] * (width - len(row)) for row in rows]
+    lines = [_table_row(rows[0]), '| ' + ' | '.join(['---'] * width) + ' |']
+    lines += [_table_row(row) for row in rows[1:]]
+    return '\n'.join(lines)
+
+
+def pdf_to_markdown(data: bytes) -> str:
+    """Extracts the text of a PDF, one section per page."""
+    from pypdf import PdfReader  # Only needed in the worker processes that extract PDFs
+
+    reader = PdfReader(io.BytesIO(data))
+    parts = []
+    title = reader.metadata.title if reader.metadata is not None else None
+    if title:
+        parts.append(f"# {title.strip()}")
+    for number, page in enumerate(reader.pages, 1):
+        text = (page.extract_text() or '').strip()
+        if text:
+            parts.append(f"## Page {number}\n\n{text}")
+    return '\n\n'.join(parts)
+
+
+def _paragraph_text(paragraph) -> str:
+    return ''.join(node.text or '' for node in paragraph.iter() if node.tag in (f'{_W}t', f'{_A}t'))
+
+
+def docx_to_markdown(data: bytes) -> str:
+    """Extracts the paragraphs, headings, lists and tables of a Word document."""
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        body = ElementTree.fromstring(archive.read('word/document.xml')).find(f'{_W}body')
+    parts = []
+    for block in body if body is not None else ():
+        if block.tag == f'{_W}tbl':
+            rows = [[_paragraph_text(cell) for cell in row.iter(f'{_W}tc')] for row in block.iter(f'{_W}tr')]
+            table = markdown_table(rows)
+            if table:
+                parts.append(table)
+        elif block.tag == f'{_W}p':
+            text = _paragraph_text(block).strip()
+            if not text:
+                continue
+            style = block.find(f'{_W}pPr/{_W}pStyle')
+            style = style.get(f'{_W}val', '') if style is not None else ''
+            heading = re.fullmatch(r'(?i)heading\s?([1-6])', style)
+            if style.lower() == 'title':
+                text = f"# {text}"
+            elif heading:
+                text = f"{'#' * min(int(heading.group(1)) + 1, 6)} {text}"
+            elif block.find(f'{_W}pPr/{_W}numPr') is not None:
+                text = f"- {text}"
+            parts.append(text)
+    return '\n\n'.join(parts)
+
+
+def _column_index(reference: str) -> int:
+    index = 0
+    for letter in re.match(r'[A-Z]*', reference).group():
+        index = index * 26 + ord(letter) - ord('A') + 1
+    return index - 1
+
+
+def xlsx_to_markdown(data: bytes) -> str:
+    """Extracts each sheet of an Excel workbook as a markdown table."""
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        names = set(archive.namelist())
+        shared = []
+        if 'xl/sharedStrings.xml' in names:
+            shared = [''.join(node.text or '' for node in item.iter(f'{_S}t'))
+                      for item in ElementTree.fromstring(archive.read('xl/sharedStrings.xml')).iter(f'{_S}si')]
+        targets = {}
+        if 'xl/_rels/workbook.xml.rels' in names:
+            for rel in ElementTree.fromstring(archive.read('xl/_rels/workbook.xml.rels')).iter(f'{_REL}Relationship'):
+                target = rel.get('Target', '')
+                targets[rel.get('Id')] = target.lstrip('/') if target.startswith('/') else posixpath.normpath(
+                    posixpath.join('xl', target))
+
+        parts = []
+        workbook = ElementTree.fromstring(archive.read('xl/workbook.xml'))
+        for sheet in workbook.iter(f'{_S}sheet'):
+            path = targets.get(sheet.get(f'{_R}id'))
+            if path not in names:
+                continue
+            rows = []
+            for row in ElementTree.fromstring(archive.read(path)).iter(f'{_S}row'):
+                cells = []
+                for cell in row.iter(f'{_S}c'):
+                    column = _column_index(cell.get('r', ''))
+                    if column >= 0:
+                        cells += [''] * (column - len(cells))
+                    kind = cell.get('t')
+                    if kind == 'inlineStr':
+                        value = ''.join(node.text or '' for node in cell.iter(f'{_S}t'))
+                    else:
+                        value = cell.findtext(f'{_S}v') or ''
+                        if kind == 's' and value.isdigit() and int(value) < len(shared):
+                            value = shared[int(value)]
+                    cells.append(value)
+                rows.append(cells)
+            table = markdown_table(rows)
+            if table:
+                parts.append(f"## {sheet.get('name', 'Sheet')}\n\n{table}")
+    return '\n\n'.join(parts)
+
+
+def pptx_to_markdown(data: bytes) -> str:
+    """Extracts the text of each slide of a PowerPoint presentation."""
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        slides = [name for name in archive.namelist() if re.fullmatch(r'ppt/slides/slide\d+\.xml', name)]
+        slides.sort(key=lambda name: int(re.search(r'(\d+)\.xml$', name).group(1)))
+        parts = []
+        for number, name in enumerate(slides, 1):
+            paragraphs = [_paragraph_text(paragraph).strip()
+                          for paragraph in ElementTree.fromstring(archive.read(name)).iter(f'{_A}p')]
+            text = '\n\n'.join(paragraph for paragraph in paragraphs if paragraph)
+            if text:
+                parts.append(f"## Slide {number}\n\n{text}")
+    return '\n\n'.join(parts)
+
+
+EXTRACTORS = {
+    'pdf': pdf_to_markdown,
+    'docx': docx_to_markdown,
+    'xlsx': xlsx_to_markdown,
+    'pptx': pptx_to_markdown,
+}
+
+
+def document_to_markdown(url: str, data: bytes, content_type: str = None) -> str:
+    """
+    Convert a downloaded document to markdown.
+
+    Args:
+        url (str): The URL the document was downloaded from.
+        data (bytes): The document.
+        content_type (str): The Content-Type header it was served with (default is None).
+
+    Returns:
+        str: The markdown representation of the document.
+
+    Raises:
+        UnsupportedDocumentError: If the document is not in one of the DOCUMENT_FORMATS.
+    """
+    document_type = document_format(url, content_type)
+    if document_type is None:
+        raise UnsupportedDocumentError(f"Cannot extract {content_type or 'unknown'} document {url}")
+    return EXTRACTORS[document_type](data)
+
+
+def _convert_document(url: str, data: bytes, content_type: str) -> tuple:
+    """Worker entry point: converts one document, returning (markdown, error)."""
+    try:
+        return document_to_markdown(url, data, content_type), None
+    except Exception as e:
+        return None, f"{type(e).__name__}: {e}"
+
+
+class DocumentExtractor:
+    """
+    Crawls PDFs and office documents without the browser.
+
+    A document is downloaded over one pooled HTTP session and converted to
+    markdown in a process pool, so parsing large files neither ties up a
+    browser slot nor blocks the event loop. Called with a URL, it returns a
+    result shaped like a crawl result, so `crawl_parallel` saves, chunks and
+    records it like a rendered page. Use it as the 'document' handler of
+    `crawl_parallel`.
+    """
+
+    def __init__(self, workers: int = None, max_bytes: int = DEFAULT_MAX_DOCUMENT_BYTES, session=None,
+                 timeout: float = DEFAULT_DOWNLOAD_TIMEOUT, max_concurrent: int = DEFAULT_DOWNLOAD_CONCURRENCY):
+        """
+        Args:
+            workers (int): The number of worker processes (default is the number of CPUs).
+            max_bytes (int): The largest document downloaded, in bytes (default is DEFAULT_MAX_DOCUMENT_BYTES).
+            session (aiohttp.ClientSession): Optional HTTP session to download over; it is left open
+                (default is None, a pooled session is opened on the first download and closed by `close`).
+            timeout (float): Seconds a download may take (default is DEFAULT_DOWNLOAD_TIMEOUT).
+            max_concurrent (int): Documents downloaded at the same time (default is DEFAULT_DOWNLOAD_CONCURRENCY).
+        """
+        self.workers = workers or os.cpu_count() or 1
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+        self.max_concurrent = max_concurrent
+        self._session = session
+        self._owns_session = session is None
+        self._slots = None  # created with the session, on the event loop
+        self._executor = None  # started on the first document, so runs without documents start no processes
+
+    @classmethod
+    def for_workers(cls, workers: Optional[int], **kwargs) -> Optional['DocumentExtractor']:
+        """Returns an extractor with that many worker processes, or None for 0, which skips documents."""
+        if workers is not None and workers < 0:
+            raise ValueError(f"workers must be zero or more, got {workers}")
+        if workers == 0:
+            return None
+        return cls(workers=workers, **kwargs)
+
+    @property
+    def handlers(self) -> dict:
+        """The `content_handlers` of `crawl_parallel` that send documents to this extractor."""
+        return {DOCUMENT: self}
+
+    async def __call__(self, url: str) -> SimpleNamespace:
+        """
+        Download a document and convert it to markdown.
+
+        Args:
+            url (str): The URL of the document.
+
+        Returns:
+            SimpleNamespace: A crawl result with the 'markdown', 'status_code' and 'response_headers', with
+            'success' False for an HTTP error.
+
+        Raises:
+            UnsupportedDocumentError: If the document is not in one of the DOCUMENT_FORMATS or too large.
+                Formats are checked by the extension before the request and by the Content-Type before
+                the body is downloaded.
+        """
+        try:
+            if kind_of_extension(url) == DOCUMENT and document_format(url) is None:
+                raise UnsupportedDocumentError(f"Cannot extract {url_extension(url)} document {url}")
+            status_code, headers, data = await self._download(url)
+        except UnsupportedDocumentError:
+            DOCUMENTS.inc(result='refused')
+            raise
+        if status_code >= 400:
+            DOCUMENTS.inc(result='failed')
+            return SimpleNamespace(url=url, success=False, status_code=status_code, response_headers=headers,
+                                   markdown=None, html=None, error_message=f"HTTP {status_code}")
+
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        start = time.perf_counter()
+        markdown_content, error = await asyncio.get_running_loop().run_in_executor(
+            self._executor, _convert_document, url, data, headers.get('Content-Type'))
+        EXTRACT_SECONDS.observe(time.perf_counter() - start)
+        if error is not None:
+            DOCUMENTS.inc(result='failed')
+            raise UnsupportedDocumentError(f"Failed to extract {url}: {error}")
+
+        DOCUMENTS.inc(result='extracted')
+        logger.info("Extracted %d characters of markdown from document %s", len(markdown_content), url)
+        return SimpleNamespace(url=url, success=True, status_code=status_code, response_headers=headers,
+                               markdown=markdown_content, html=None)
+
+    async def close(self):
+        """Closes the HTTP session, if the extractor opened it, and stops the worker processes."""
+        if self._owns_session and self._session is not None:
+            await self._session.close()
+            self._session = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    async def _download(self, url: str) -> tuple:
+        import aiohttp
+
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_concurrent)
+        if self._session is None:
+            self._session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=self.max_concurrent))
+        async with self._slots:
+            async with self._session.get(url, timeout=aiohttp.ClientTimeout(total=self.timeout)) as response:
+                headers = dict(response.headers)
+                if response.status >= 400:
+                    return response.status, headers, b''
+                content_type = response.headers.get('Content-Type')
+                if document_format(url, content_type) is None:
+                    raise UnsupportedDocumentError(f"Cannot extract {content_type or 'unknown'} document {url}")
+                if response.content_length is not None and response.content_length > self.max_bytes:
+                    raise UnsupportedDocumentError(f"{url} is larger than {self.max_bytes} bytes")
+                data = bytearray()
+                async for chunk in response.content.iter_chunked(64 * 1024):
+                    data += chunk
+                    if len(data) > self.max_bytes:
+                        raise UnsupportedDocumentError(f"{url} is larger than {self.max_bytes} bytes")
+                return response.status, headers, bytes(data)
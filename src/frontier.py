@@ -0,0 +1,254 @@
+import re
+import heapq
+import asyncio
+import itertools
+import logging
+from datetime import datetime, timezone
+from typing import Iterable, List, Optional
+from urllib.parse import urlparse
+from .url_store import UrlStore
+
+logger = logging.getLogger(__name__)
+
+# Most sitemap entries considered when picking the most valuable pages, the limit of a single sitemap file
+MAX_SITEMAP_ENTRIES = 50000
+
+# Sitemap priority assumed for URLs that do not state one, as in the sitemap protocol
+DEFAULT_SITEMAP_PRIORITY = 0.5
+
+# Age in days at which a page's recency counts half as much as a page modified today
+RECENCY_HALF_LIFE_DAYS = 30.0
+
+# Weights of the score components
+RECENCY_WEIGHT = 0.5
+DEPTH_WEIGHT = 0.5
+
+# Added to the score of URLs matching an include pattern, which puts them ahead of all others
+INCLUDE_BOOST = 10.0
+
+
+def parse_lastmod(value: str) -> Optional[datetime]:
+    """Parses a sitemap <lastmod> value in W3C datetime format, returning None if it is invalid."""
+    if not value:
+        return None
+    value = value.strip()
+    if value.endswith('Z'):
+        value = value[:-1] + '+00:00'
+    try:
+        lastmod = datetime.fromisoformat(value)
+    except ValueError:
+        return None
+    return lastmod if lastmod.tzinfo else lastmod.replace(tzinfo=timezone.utc)
+
+
+def url_depth(url: str) -> int:
+    """Returns the number of path segments of a URL."""
+    return len([segment for segment in urlparse(url).path.split('/') if segment])
+
+
+def score_url(url: str, priority: float = None, lastmod: str = None, now: datetime = None) -> float:
+    """
+    Score how valuable a page is to crawl.
+
+    The score adds up the sitemap priority, how recently the page was
+    modified, and how shallow its path is. Pages without a known lastmod get
+    half the recency score of a page modified today.
+
+    Args:
+        url (str): The URL of the page.
+        priority (float): The page's sitemap <priority> between 0 and 1 (default is 0.5).
+        lastmod (str): The page's sitemap <lastmod> (default is None, unknown).
+        now (datetime): The current time (default is now).
+
+    Returns:
+        float: The score; higher is more valuable.
+    """
+    if priority is None:
+        priority = DEFAULT_SITEMAP_PRIORITY
+    priority = min(max(priority, 0.0), 1.0)
+
+    modified = parse_lastmod(lastmod)
+    if modified is None:
+        recency = 0.5
+    else:
+        age_days = max(((now or datetime.now(timezone.utc)) - modified).total_seconds() / 86400, 0.0)
+        recency = 0.5 ** (age_days / RECENCY_HALF_LIFE_DAYS)
+
+    depth = 1.0 / (1 + url_depth(url))
+    return priority + RECENCY_WEIGHT * recency + DEPTH_WEIGHT * depth
+
+
+class PriorityFrontier:
+    """
+    Heap of URLs to crawl, highest score first.
+
+    URLs matching an exclude pattern are never queued, and URLs matching an
+    include pattern go ahead of all others. URLs can be pushed at any time,
+    also while the frontier is being consumed; pushing a queued URL again only
+    raises its score, and URLs that were already popped are not queued again.
+    """
+
+    def __init__(self, include_patterns: Iterable[str] = None, exclude_patterns: Iterable[str] = None,
+                 now: datetime = None):
+        """
+        Args:
+            include_patterns (Iterable[str]): Regular expressions of URLs to crawl first (default is None).
+            exclude_patterns (Iterable[str]): Regular expressions of URLs never to crawl (default is None).
+            now (datetime): The time lastmod recency is measured against (default is now).
+        """
+        self.include = [re.compile(pattern) for pattern in include_patterns or ()]
+        self.exclude = [re.compile(pattern) for pattern in exclude_patterns or ()]
+        self.now = now or datetime.now(timezone.utc)
+        self._heap = []  # (-score, insertion number, url)
+        # The queued URLs are kept as str: they need a score each and are removed when popped, which the
+        # append-only UrlStore does not support, and their number is capped by MAX_SITEMAP_ENTRIES per site
+        self._queued = {}  # url -> score of its live heap entry
+        self._popped = UrlStore()  # Grows to every URL crawled, so it is kept compact
+        self._counter = itertools.count()
+
+    def __len__(self) -> int:
+        return len(self._queued)
+
+    def score(self, url: str, priority: float = None, lastmod: str = None) -> Optional[float]:
+        """Returns the score of a URL, or None if it is excluded."""
+        if any(pattern.search(url) for pattern in self.exclude):
+            return None
+        score = score_url(url, priority, lastmod, self.now)
+        if any(pattern.search(url) for pattern in self.include):
+            score += INCLUDE_BOOST
+        return score
+
+    def push(self, url: str, priority: float = None, lastmod: str = None) -> bool:
+        """Queues a URL, returning whether it was queued or its score raised."""
+        if url in self._popped:
+            return False
+        score = self.score(url, priority, lastmod)
+        if score is None or score <= self._queued.get(url, float('-inf')):
+            return False
+        # A previous, lower-scored entry for the URL stays in the heap and is skipped when popped
+        self._queued[url] = score
+        heapq.heappush(self._heap, (-score, next(self._counter), url))
+        return True
+
+    def pop(self) -> str:
+        """Removes and returns the highest-scored URL.
+
+        Raises:
+            IndexError: If the frontier is empty.
+        """
+        while self._heap:
+            negative_score, _, url = heapq.heappop(self._heap)
+            if self._queued.get(url) == -negative_score:
+                del self._queued[url]
+                self._popped.add(url)
+                return url
+        raise IndexError("pop from an empty frontier")
+
+    def take(self, count: int) -> List[str]:
+        """Removes and returns up to `count` URLs, highest score first."""
+        urls = []
+        while self._queued and len(urls) < count:
+            urls.append(self.pop())
+        return urls
+
+
+class StreamingFrontier:
+    """
+    A priority frontier that URL discovery fills while the crawl consumes it.
+
+    Discovery pushes the entries of each sitemap as soon as it is parsed and
+    closes the frontier once it is done. The crawl takes the most valuable
+    URLs found so far whenever a browser slot is free, up to max_pages in
+    total, so the first pages render while the rest of the sitemap tree is
+    still being fetched.
+    """
+
+    def __init__(self, max_pages: int, include_patterns: Iterable[str] = None,
+                 exclude_patterns: Iterable[str] = None):
+        """
+        Args:
+            max_pages (int): The number of URLs handed out in total.
+            include_patterns (Iterable[str]): Regular expressions of URLs to crawl first (default is None).
+            exclude_patterns (Iterable[str]): Regular expressions of URLs never to crawl (default is None).
+        """
+        self.frontier = PriorityFrontier(include_patterns, exclude_patterns)
+        self.max_pages = max_pages
+        self.pushed = 0
+        self.taken = 0
+        self.closed = False
+        self._changed = asyncio.Event()
+
+    def push_entries(self, entries: Iterable) -> int:
+        """Queues sitemap entries or plain URLs, returning how many were queued."""
+        queued = 0
+        for entry in entries:
+            if isinstance(entry, str):
+                queued += self.frontier.push(entry)
+            else:
+                queued += self.frontier.push(entry['url'], entry.get('priority'), entry.get('lastmod'))
+        self.pushed += queued
+        if queued:
+            self._changed.set()
+        return queued
+
+    def close(self):
+        """Marks discovery as done, so the crawl stops waiting for more URLs."""
+        self.closed = True
+        self._changed.set()
+
+    @property
+    def exhausted(self) -> bool:
+        """Whether no more URLs will be handed out."""
+        return self.taken >= self.max_pages or (self.closed and not len(self.frontier))
+
+    async def take(self, count: int, wait: bool = True, timeout: float = None) -> List[str]:
+        """
+        Remove the most valuable URLs found so far.
+
+        Args:
+            count (int): The most URLs to take.
+            wait (bool): Whether to wait for discovery when no URL is queued yet (default is True).
+            timeout (float): The most seconds to wait (default is None, no limit).
+
+        Returns:
+            List[str]: Up to `count` URLs, highest score first; empty if none arrived in time or the
+            frontier is exhausted.
+        """
+        if wait and not len(self.frontier) and not self.exhausted:
+            self._changed.clear()
+            try:
+                await asyncio.wait_for(self._changed.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        urls = self.frontier.take(min(count, self.max_pages - self.taken))
+        self.taken += len(urls)
+        return urls
+
+
+def entry_url(entry) -> str:
+    """Returns the URL of a sitemap entry or a plain URL."""
+    return entry if isinstance(entry, str) else entry['url']
+
+
+def rank_urls(entries: Iterable, max_pages: int, include_patterns: Iterable[str] = None,
+              exclude_patterns: Iterable[str] = None) -> List[str]:
+    """
+    Pick the max_pages most valuable URLs.
+
+    Args:
+        entries (Iterable): Sitemap entries as returned by `fetch_sitemap_entries`, or plain URLs.
+        max_pages (int): The number of URLs to pick.
+        include_patterns (Iterable[str]): Regular expressions of URLs to crawl first (default is None).
+        exclude_patterns (Iterable[str]): Regular expressions of URLs never to crawl (default is None).
+
+    Returns:
+        List[str]: The URLs, highest score first.
+    """
+    frontier = PriorityFrontier(include_patterns, exclude_patterns)
+    for entry in entries:
+        if isinstance(entry, str):
+            frontier.push(entry)
+        else:
+            frontier.push(entry['url'], entry.get('priority'), entry.get('lastmod'))
+    logger.info("Ranked %d URLs; keeping the top %d", len(frontier), min(max_pages, len(frontier)))
+    return frontier.take(max_pages)
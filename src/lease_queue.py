@@ -0,0 +1,259 @@
+import os
+import time
+import sqlite3
+import logging
+import threading
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import Iterable, List
+
+logger = logging.getLogger(__name__)
+
+# Default number of seconds a lease stays valid without a heartbeat
+DEFAULT_LEASE_TIMEOUT = 120.0
+
+# Default number of times a URL is leased before it is given up on
+DEFAULT_MAX_LEASES = 5
+
+URL_STATES = ('pending', 'leased', 'done', 'failed')
+
+
+class LeaseQueue(ABC):
+    """
+    A crawl frontier shared by several workers.
+
+    Workers lease URLs for a visibility timeout. While a URL is leased, no
+    other worker gets it. The worker extends its leases with heartbeats and
+    finally completes or releases each URL. A lease that runs out, because
+    its worker died or hung, makes the URL available again. A URL whose lease
+    ran out `max_leases` times, which happens when it keeps crashing or hanging
+    its workers, is marked as failed.
+
+    Subclasses implement the storage: SQLiteLeaseQueue for workers on one
+    machine, InMemoryLeaseQueue for tests. Another backend, such as Redis,
+    implements the abstract methods. The methods block, so workers call them
+    on a thread, and backends must be safe to call from several threads.
+    """
+
+    @abstractmethod
+    def add(self, urls: Iterable[str]) -> int:
+        """Adds URLs that are not in the queue yet, returning how many were added."""
+
+    @abstractmethod
+    def lease(self, worker_id: str, count: int, timeout: float = DEFAULT_LEASE_TIMEOUT) -> List[str]:
+        """Leases up to `count` available URLs to a worker for `timeout` seconds."""
+
+    @abstractmethod
+    def heartbeat(self, worker_id: str, urls: Iterable[str], timeout: float = DEFAULT_LEASE_TIMEOUT) -> int:
+        """Extends a worker's leases on the given URLs, returning how many are still held by the worker."""
+
+    @abstractmethod
+    def complete(self, worker_id: str, url: str, succeeded: bool = True) -> bool:
+        """Marks a URL leased by the worker as done or failed. Returns False if the worker lost the lease."""
+
+    @abstractmethod
+    def release(self, worker_id: str, url: str) -> bool:
+        """Makes a URL leased by the worker available again without counting the lease.
+
+        Returns False if the worker lost the lease.
+        """
+
+    @abstractmethod
+    def counts(self) -> dict:
+        """Returns the number of URLs in each state."""
+
+    def is_finished(self) -> bool:
+        """Returns whether every URL is done or failed."""
+        counts = self.counts()
+        return counts['pending'] == 0 and counts['leased'] == 0
+
+
+class InMemoryLeaseQueue(LeaseQueue):
+    """Lease queue held in memory, for a single process and for tests."""
+
+    def __init__(self, max_leases: int = DEFAULT_MAX_LEASES, clock=time.time):
+        """
+        Args:
+            max_leases (int): Times a URL is leased before it is marked as failed (default is 5).
+            clock (callable): Function returning the current time in seconds (default is time.time).
+        """
+        self.max_leases = max_leases
+        self.clock = clock
+        self._urls = {}  # url -> {'state', 'worker_id', 'expires_at', 'leases'}
+        self._lock = threading.Lock()  # Workers call the queue from threads
+
+    def _reclaim(self, now: float):
+        for url, entry in self._urls.items():
+            if entry['state'] == 'leased' and entry['expires_at'] <= now:
+                logger.warning("Lease on %s held by %s expired", url, entry['worker_id'])
+                entry.update(state='pending' if entry['leases'] < self.max_leases else 'failed', worker_id=None)
+
+    def _held_by(self, worker_id: str, url: str) -> bool:
+        entry = self._urls.get(url)
+        return (entry is not None and entry['state'] == 'leased' and entry['worker_id'] == worker_id
+                and entry['expires_at'] > self.clock())
+
+    def add(self, urls: Iterable[str]) -> int:
+        with self._lock:
+            added = 0
+            for url in urls:
+                if url not in self._urls:
+                    self._urls[url] = {'state': 'pending', 'worker_id': None, 'expires_at': 0.0, 'leases': 0}
+                    added += 1
+            return added
+
+    def lease(self, worker_id: str, count: int, timeout: float = DEFAULT_LEASE_TIMEOUT) -> List[str]:
+        with self._lock:
+            now = self.clock()
+            self._reclaim(now)
+            leased = []
+            for url, entry in self._urls.items():
+                if len(leased) >= count:
+                    break
+                if entry['state'] == 'pending':
+                    entry.update(state='leased', worker_id=worker_id, expires_at=now + timeout,
+                                 leases=entry['leases'] + 1)
+                    leased.append(url)
+            return leased
+
+    def heartbeat(self, worker_id: str, urls: Iterable[str], timeout: float = DEFAULT_LEASE_TIMEOUT) -> int:
+        with self._lock:
+            held = [url for url in urls if self._held_by(worker_id, url)]
+            for url in held:
+                self._urls[url]['expires_at'] = self.clock() + timeout
+            return len(held)
+
+    def complete(self, worker_id: str, url: str, succeeded: bool = True) -> bool:
+        with self._lock:
+            if not self._held_by(worker_id, url):
+                return False
+            self._urls[url].update(state='done' if succeeded else 'failed', worker_id=None)
+            return True
+
+    def release(self, worker_id: str, url: str) -> bool:
+        with self._lock:
+            if not self._held_by(worker_id, url):
+                return False
+            entry = self._urls[url]
+            entry.update(state='pending', worker_id=None, leases=entry['leases'] - 1)
+            return True
+
+    def counts(self) -> dict:
+        with self._lock:
+            self._reclaim(self.clock())
+            counts = dict.fromkeys(URL_STATES, 0)
+            for entry in self._urls.values():
+                counts[entry['state']] += 1
+            return counts
+
+
+class SQLiteLeaseQueue(LeaseQueue):
+    """
+    Lease queue stored in a SQLite database.
+
+    Every operation runs in its own write transaction, so any number of worker
+    processes on the same machine can share the database file. The database
+    uses write-ahead logging, which does not work on network filesystems.
+    """
+
+    def __init__(self, db_path: str, max_leases: int = DEFAULT_MAX_LEASES, clock=time.time):
+        """
+        Args:
+            db_path (str): The path of the SQLite database file.
+            max_leases (int): Times a URL is leased before it is marked as failed (default is 5).
+            clock (callable): Function returning the current time in seconds (default is time.time).
+        """
+        if os.path.dirname(db_path):
+            os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self.max_leases = max_leases
+        self.clock = clock
+        # Transactions are managed explicitly, and writers wait for each other instead of failing. Workers
+        # call the queue from threads, one at a time through the lock
+        self._db = sqlite3.connect(db_path, timeout=30.0, isolation_level=None, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('''
+            CREATE TABLE IF NOT EXISTS frontier (
+                url TEXT PRIMARY KEY,
+                state TEXT NOT NULL DEFAULT 'pending',
+                worker_id TEXT,
+                expires_at REAL NOT NULL DEFAULT 0,
+                leases INTEGER NOT NULL DEFAULT 0
+            )
+        ''')
+        self._db.execute('CREATE INDEX IF NOT EXISTS frontier_state ON frontier (state, expires_at)')
+
+    @contextmanager
+    def _transaction(self):
+        """Runs a block in an immediate write transaction, rolling it back on errors."""
+        with self._lock:
+            self._db.execute('BEGIN IMMEDIATE')
+            try:
+                yield
+            except BaseException:
+                self._db.execute('ROLLBACK')
+                raise
+            self._db.execute('COMMIT')
+
+    def _reclaim(self, now: float):
+        expired = self._db.execute("SELECT url, worker_id FROM frontier WHERE state = 'leased' AND expires_at <= ?",
+                                   (now,)).fetchall()
+        for url, worker_id in expired:
+            logger.warning("Lease on %s held by %s expired", url, worker_id)
+        self._db.execute('''
+            UPDATE frontier SET state = CASE WHEN leases < ? THEN 'pending' ELSE 'failed' END, worker_id = NULL
+            WHERE state = 'leased' AND expires_at <= ?
+        ''', (self.max_leases, now))
+
+    def add(self, urls: Iterable[str]) -> int:
+        with self._transaction():
+            cursor = self._db.executemany('INSERT OR IGNORE INTO frontier (url) VALUES (?)', ((url,) for url in urls))
+            return cursor.rowcount
+
+    def lease(self, worker_id: str, count: int, timeout: float = DEFAULT_LEASE_TIMEOUT) -> List[str]:
+        now = self.clock()
+        with self._transaction():
+            self._reclaim(now)
+            urls = [row[0] for row in self._db.execute(
+                "SELECT url FROM frontier WHERE state = 'pending' ORDER BY rowid LIMIT ?", (count,))]
+            self._db.executemany('''
+                UPDATE frontier SET state = 'leased', worker_id = ?, expires_at = ?, leases = leases + 1 WHERE url = ?
+            ''', ((worker_id, now + timeout, url) for url in urls))
+        return urls
+
+    def heartbeat(self, worker_id: str, urls: Iterable[str], timeout: float = DEFAULT_LEASE_TIMEOUT) -> int:
+        now = self.clock()
+        held = 0
+        with self._transaction():
+            for url in urls:
+                held += self._db.execute('''
+                    UPDATE frontier SET expires_at = ?
+                    WHERE url = ? AND state = 'leased' AND worker_id = ? AND expires_at > ?
+                ''', (now + timeout, url, worker_id, now)).rowcount
+        return held
+
+    def _finish(self, worker_id: str, url: str, state: str, lease_delta: int = 0) -> bool:
+        with self._transaction():
+            return self._db.execute('''
+                UPDATE frontier SET state = ?, worker_id = NULL, leases = leases + ?
+                WHERE url = ? AND state = 'leased' AND worker_id = ? AND expires_at > ?
+            ''', (state, lease_delta, url, worker_id, self.clock())).rowcount == 1
+
+    def complete(self, worker_id: str, url: str, succeeded: bool = True) -> bool:
+        return self._finish(worker_id, url, 'done' if succeeded else 'failed')
+
+    def release(self, worker_id: str, url: str) -> bool:
+        return self._finish(worker_id, url, 'pending', lease_delta=-1)
+
+    def counts(self) -> dict:
+        with self._transaction():
+            self._reclaim(self.clock())
+            counts = dict.fromkeys(URL_STATES, 0)
+            counts.update(self._db.execute('SELECT state, COUNT(*) FROM frontier GROUP BY state').fetchall())
+        return counts
+
+    def close(self):
+        """Closes the database."""
+        with self._lock:
+            self._db.close()
+
@@ -1,18 +1,61 @@
 import argparse
 import asyncio
+import importlib
 import logging
 import os
-from config.logging_config import setup_logging
-from .spider_runner import SpiderRunner
-from .crawl_one import crawl_one
-from .crawl_parallel import crawl_parallel
-from .robots_parser import fetch_robots_txt, filter_allowed_urls, is_url_allowed
-from .sitemap_parser import fetch_sitemap_urls, get_sitemap_urls
-from .url_check import check_url
+import time
+from itertools import chain, zip_longest
+from config.logging_config import LOG_FORMATS, setup_logging
+from .chunker import MarkdownChunker
+from .content_types import DEFAULT_PREFLIGHT, PREFLIGHT_MODES, ContentTypeFilter
+from .documents import DocumentExtractor
+from .frontier import MAX_SITEMAP_ENTRIES, StreamingFrontier, entry_url
+from .lease_queue import DEFAULT_LEASE_TIMEOUT, SQLiteLeaseQueue
+from .metrics import (DISCOVERED_URLS, REGISTRY, export_periodically, ROBOTS_FETCHES, ROBOTS_FETCH_SECONDS, SITEMAP_DISCOVERY_SECONDS,
+                      URL_VALIDATION_SECONDS, URL_VALIDATIONS)
+from .profiling import DEFAULT_STALL_THRESHOLD, PROFILE_MODES, LoopLagMonitor, RunProfiler
+from .politeness import DEFAULT_HOST_DELAY, PolitenessScheduler
+from .response_cache import DEFAULT_CACHE_MAX_SIZE, DEFAULT_CACHE_TTL, ResponseCache
+from .resource_profiles import DEFAULT_RESOURCE_PROFILE, RESOURCE_PROFILES, ResourceBlocker
+from .retry import RetryPolicy
+from .timeouts import DEFAULT_PAGE_TIMEOUT
+from .tracing import DEFAULT_MAX_TRACES, NOOP_TRACE, TRACE_FORMATS, TRACER
+from .url_rules import DEFAULT_EXCLUDED_EXTENSIONS, DEFAULT_URL_RULES, UrlRules
+from .warc import WarcWriter
 
 
-# Call setup_logging to configure logging
-setup_logging()
+def lazy_import(module_name, attribute):
+    """
+    Return a stand-in for a function or class that imports its module on first use.
+
+    Crawl4AI, Playwright, Scrapy, aiohttp and requests take about a second to
+    import, so they are only loaded once a code path calls into them. The
+    stand-in is a module attribute like the real object, so it can be patched
+    in tests.
+    """
+    def load(*args, **kwargs):
+        target = getattr(importlib.import_module(module_name, __package__), attribute)
+        return target(*args, **kwargs)
+
+    load.__name__ = load.__qualname__ = attribute
+    return load
+
+
+SpiderRunner = lazy_import('.spider_runner', 'SpiderRunner')
+crawl_one = lazy_import('.crawl_one', 'crawl_one')
+crawl_parallel = lazy_import('.crawl_parallel', 'crawl_parallel')
+create_crawler = lazy_import('.crawl_parallel', 'create_crawler')
+run_worker = lazy_import('.crawl_worker', 'run_worker')
+discover_sites = lazy_import('.discovery', 'discover_sites')
+replay_warc = lazy_import('.reextract', 'replay_warc')
+CrawlService = lazy_import('.service', 'CrawlService')
+run_service = lazy_import('.service', 'run_service')
+fetch_robots_txt = lazy_import('.robots_parser', 'fetch_robots_txt')
+filter_allowed_urls = lazy_import('.robots_parser', 'filter_allowed_urls')
+is_url_allowed = lazy_import('.robots_parser', 'is_url_allowed')
+iter_sitemap_entries = lazy_import('.sitemap_parser', 'iter_sitemap_entries')
+default_sitemap_url = lazy_import('.sitemap_parser', 'default_sitemap_url')
+check_url = lazy_import('.url_check', 'check_url')
 
 logger = logging.getLogger(__name__)
 
@@ -26,85 +69,273 @@ os.makedirs(output_dir, exist_ok=True)
 
 
 
-async def run_crawler(url, crawl_all=False, max_pages=50, check_robots=True):
+async def run_crawler(url, crawl_all=False, max_pages=50, check_robots=True, warc_dir=None, chunk_tokens=None,
+                      max_attempts=3, page_timeout=DEFAULT_PAGE_TIMEOUT, run_deadline=None,
+                      resource_profile=DEFAULT_RESOURCE_PROFILE, cache_dir=None, cache_ttl=DEFAULT_CACHE_TTL,
+                      cache_max_size=DEFAULT_CACHE_MAX_SIZE, include_patterns=None, exclude_patterns=None,
+                      url_rules=None, preflight=DEFAULT_PREFLIGHT, document_workers=None):
 
     logger.info("Application started!")
-    
+
+    # Each crawled page gets a trace of its own; this one covers the run's stages up to the crawl
+    trace = TRACER.start_trace('run_crawler', key=url, url=url)
+
     # Validate the incoming URL
-    validation_result = check_url(url)
+    # The check blocks on requests, so it runs off the event loop
+    with trace.span('check_url'), URL_VALIDATION_SECONDS.time():
+        validation_result = await asyncio.to_thread(check_url, url)
+    URL_VALIDATIONS.inc(result='valid' if validation_result['valid'] else 'invalid')
     if not validation_result['valid']:
         logger.error(f"Invalid URL: {validation_result['message']}")
+        trace.finish(valid=False)
         return
 
     # Use the sanitized URL
     url = validation_result['url']
     logger.info("Sanitized URL: %s", url)
 
-    robots_rules = {}
-    sitemap_url = None
-    # Fetch robots.txt and check crawling rules
-    if check_robots:
-        try:
-            robots_rules = await fetch_robots_txt(url)
-            logger.info("Fetched robots.txt")
-
-            sitemap_urls = robots_rules.get('sitemap', [])
-            sitemap_url = sitemap_urls[0] if sitemap_urls else None
-            if sitemap_url:
-                logger.info("Sitemap URL found: %s", sitemap_url)
-            else:
-                logger.warning("No sitemap URLs found in robots.txt.")        
-        except Exception as e:
-            logger.error("Failed to fetch robots.txt: %s", e)
+    # Archive raw responses alongside the markdown when requested
+    warc_writer = WarcWriter(warc_dir) if warc_dir else None
+
+    # Reuse responses from earlier runs when a cache directory is configured
+    cache = ResponseCache(cache_dir, max_size=cache_max_size, ttl=cache_ttl) if cache_dir else None
 
-    urls_to_crawl = []
+    # Split the markdown into chunks for embedding when requested
+    chunker = MarkdownChunker(output_dir, max_tokens=chunk_tokens) if chunk_tokens else None
 
-    # Conditional crawling logic
+    # Launch the browser while robots.txt and the sitemaps are fetched, so it is ready for the first URL
+    crawler = None
+    browser_start = None
     if crawl_all:
-        urls = await fetch_urls_for_crawling(url, sitemap_url, robots_rules, max_pages, check_robots)
-        urls_to_crawl = urls if urls is not None else []  # Ensure it's an empty list if None
-        if not urls_to_crawl:
-            logger.warning("No URLs found to crawl.")
-            logger.info("Crawling single URL: %s", url)
-            await crawl_single_url(url, robots_rules)
-            return
-        await crawl_urls(urls_to_crawl, url)  # Crawl the URLs if any
-    else:
-        await crawl_single_url(url, robots_rules if check_robots else None)
+        crawler = create_crawler(ResourceBlocker(resource_profile))
+        browser_start = asyncio.create_task(start_browser(crawler, trace))
+    discovery = None
 
+    # Classify discovered URLs before rendering, so downloads and media do not take browser slots
+    content_filter = ContentTypeFilter.for_mode(preflight) if crawl_all else None
 
+    # Extract PDFs and office documents in worker processes instead of skipping them
+    documents = DocumentExtractor.for_workers(document_workers) if crawl_all else None
 
-async def fetch_urls_for_crawling(url, sitemap_url, robots_rules, max_pages, check_robots):
-    """Fetch URLs either from the sitemap or using the SpiderRunner."""
     try:
-        if sitemap_url:
-            urls = await fetch_sitemap_urls(sitemap_url, max_pages=max_pages)
-            logger.info("Fetched URLs from sitemap: %d URLs found", len(urls))
+        if chunker is not None:
+            await chunker.start()
+
+        robots_rules = {}
+        sitemap_url = None
+        # Fetch robots.txt and check crawling rules
+        if check_robots:
+            try:
+                # The fetch blocks on requests, so it runs off the event loop
+                with trace.span('fetch_robots'), ROBOTS_FETCH_SECONDS.time():
+                    robots_rules = await asyncio.to_thread(fetch_robots_txt, url)
+                ROBOTS_FETCHES.inc(result='found' if robots_rules else 'empty')
+                logger.info("Fetched robots.txt")
+
+                sitemap_urls = robots_rules.get('sitemap', [])
+                sitemap_url = sitemap_urls[0] if sitemap_urls else None
+                if sitemap_url:
+                    logger.info("Sitemap URL found: %s", sitemap_url)
+                else:
+                    logger.warning("No sitemap URLs found in robots.txt.")
+            except Exception as e:
+                ROBOTS_FETCHES.inc(result='error')
+                logger.error("Failed to fetch robots.txt: %s", e)
+
+        # Conditional crawling logic
+        if crawl_all:
+            # URLs stream from the sitemaps through the URL rules and robots.txt filter into the crawl as they are found
+            url_stream = StreamingFrontier(max_pages, include_patterns, exclude_patterns)
+            discovery = asyncio.create_task(stream_urls_for_crawling(
+                url, sitemap_url, robots_rules, max_pages, check_robots, url_stream, cache, trace, url_rules))
+            await browser_start
+            await crawl_urls([], url, warc_writer, chunker, RetryPolicy(max_attempts=max_attempts), page_timeout,
+                             run_deadline, resource_profile, cache, crawler=crawler, url_stream=url_stream,
+                             content_filter=content_filter, content_handlers=documents and documents.handlers)
+            await discovery
+            if not url_stream.pushed:
+                logger.warning("No URLs found to crawl.")
+                logger.info("Crawling single URL: %s", url)
+                await crawl_single_url(url, robots_rules, warc_writer, chunker, page_timeout, resource_profile)
         else:
-            urls = await get_sitemap_urls(url, max_pages)
-            logger.info("Fetched URLs from sitemap.xml: %d URLs found", len(urls))
+            await crawl_single_url(url, robots_rules if check_robots else None, warc_writer, chunker, page_timeout,
+                                   resource_profile)
+    finally:
+        if discovery is not None and not discovery.done():
+            discovery.cancel()
+            await asyncio.gather(discovery, return_exceptions=True)
+        if crawler is not None:
+            # The browser may still be starting if an earlier stage failed
+            await asyncio.gather(browser_start, return_exceptions=True)
+            await crawler.close()
+        if content_filter is not None:
+            await content_filter.close()
+        if documents is not None:
+            await documents.close()
+        if warc_writer is not None:
+            await warc_writer.close()
+        if chunker is not None:
+            await chunker.close()
+        if cache is not None:
+            logger.info("Response cache: %s", cache.stats())
+        trace.finish()
+
+
+async def start_browser(crawler, trace=NOOP_TRACE):
+    """Starts the crawler's browser, recording the launch in the run's trace."""
+    span = trace.start_span('start_browser')
+    try:
+        await crawler.start()
+    finally:
+        trace.end_span(span)
+
+
+def read_seeds(seeds_file):
+    """Read the site URLs from a seed file, one per line, skipping blank lines, comments and duplicates."""
+    seeds = []
+    with open(seeds_file, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith('#') and line not in seeds:
+                seeds.append(line)
+    return seeds
+
+
+async def run_batch(seeds_file, crawl_all=False, max_pages=50, check_robots=True, warc_dir=None, chunk_tokens=None,
+                    max_attempts=3, page_timeout=DEFAULT_PAGE_TIMEOUT, run_deadline=None,
+                    resource_profile=DEFAULT_RESOURCE_PROFILE, cache_dir=None, cache_ttl=DEFAULT_CACHE_TTL,
+                    cache_max_size=DEFAULT_CACHE_MAX_SIZE, host_delay=DEFAULT_HOST_DELAY, include_patterns=None,
+                    exclude_patterns=None, url_rules=None, preflight=DEFAULT_PREFLIGHT, document_workers=None):
+    """Crawl every site listed in a seed file in one process.
+
+    All sites share a single HTTP session for robots.txt and sitemaps and a
+    single browser for rendering. Their URLs are interleaved in one frontier
+    and spaced out per host by a politeness scheduler, so a slow or large site
+    does not hold up the others.
+    """
+    seeds = read_seeds(seeds_file)
+    logger.info("Batch crawl of %d sites from %s", len(seeds), seeds_file)
+
+    # Archive raw responses alongside the markdown when requested
+    warc_writer = WarcWriter(warc_dir) if warc_dir else None
+
+    # Reuse responses from earlier runs when a cache directory is configured
+    cache = ResponseCache(cache_dir, max_size=cache_max_size, ttl=cache_ttl) if cache_dir else None
+
+    # Split the markdown into chunks for embedding when requested
+    chunker = MarkdownChunker(output_dir, max_tokens=chunk_tokens) if chunk_tokens else None
+
+    content_filter = ContentTypeFilter.for_mode(preflight)
+    documents = DocumentExtractor.for_workers(document_workers)
+    crawler = create_crawler(ResourceBlocker(resource_profile))
+    try:
+        if chunker is not None:
+            await chunker.start()
+        await crawler.start()
+        site_urls = await discover_sites(seeds, crawl_all, max_pages, check_robots, cache, include_patterns,
+                                         exclude_patterns, url_rules)
+
+        # Round-robin across sites so every site gets started early
+        urls = [url for url in chain.from_iterable(zip_longest(*site_urls)) if url is not None]
+        logger.info("Starting to crawl %d URLs from %d sites...", len(urls), len(seeds))
+
+        await crawl_parallel(urls, max_concurrent=10, output_dir=output_dir, warc_writer=warc_writer,
+                             chunker=chunker, retry_policy=RetryPolicy(max_attempts=max_attempts),
+                             page_timeout=page_timeout, run_deadline=run_deadline,
+                             resource_profile=resource_profile, cache=cache, crawler=crawler,
+                             scheduler=PolitenessScheduler(min_delay=host_delay), content_filter=content_filter,
+                             content_handlers=documents and documents.handlers)
+    finally:
+        await crawler.close()
+        if content_filter is not None:
+            await content_filter.close()
+        if documents is not None:
+            await documents.close()
+        if warc_writer is not None:
+            await warc_writer.close()
+        if chunker is not None:
+            await chunker.close()
+        if cache is not None:
+            logger.info("Response cache: %s", cache.stats())
+
 
-        if not urls:
-            logger.warning("No URLs found in sitemap; fetching with scraper.")
-            runner = SpiderRunner()
-            urls = runner.run_spider(url, max_pages=max_pages)
-            logger.info("Fetched URLs with scraper: %d URLs found", len(urls))
+async def enqueue_sites(seeds, queue_path, crawl_all=False, max_pages=50, check_robots=True, include_patterns=None,
+                        exclude_patterns=None, url_rules=None):
+    """Discover the URLs of the sites and add them to a shared crawl queue for workers started with --worker."""
+    site_urls = await discover_sites(seeds, crawl_all, max_pages, check_robots, include_patterns=include_patterns,
+                                     exclude_patterns=exclude_patterns, url_rules=url_rules)
+    queue = SQLiteLeaseQueue(queue_path)
+    try:
+        added = queue.add(url for urls in site_urls for url in urls)
+        logger.info("Added %d URLs from %d sites to the queue at %s: %s", added, len(seeds), queue_path,
+                    queue.counts())
+    finally:
+        queue.close()
+    return added
+
+
+async def stream_urls_for_crawling(url, sitemap_url, robots_rules, max_pages, check_robots, url_stream, cache=None,
+                                   trace=NOOP_TRACE, url_rules=None):
+    """
+    Push the URLs of a site into a streaming frontier as each sitemap is parsed.
+
+    URLs excluded by the URL rules or disallowed by robots.txt are dropped
+    before they reach the frontier.
+    Without sitemap entries, falls back to the SpiderRunner, which blocks
+    until the spider is done, so it runs on a thread and the crawl carries on.
+    The frontier is closed once discovery is done, also when it fails.
 
+    Args:
+        url (str): The URL of the website.
+        sitemap_url (str): The sitemap named in robots.txt, or None for the site's sitemap.xml.
+        robots_rules (dict): The robots.txt rules of the site.
+        max_pages (int): The page budget, passed on to the SpiderRunner.
+        check_robots (bool): Whether to filter the URLs by the robots.txt rules.
+        url_stream (StreamingFrontier): The frontier the crawl takes its URLs from.
+        cache (ResponseCache): Optional cache of earlier responses (default is None).
+        trace (Trace): The trace of the run to record discovery in (default is not traced).
+        url_rules (UrlRules): The rules of the URLs worth crawling (default is DEFAULT_URL_RULES).
+    """
+    url_rules = url_rules or DEFAULT_URL_RULES
+    span = trace.start_span('discover_urls')
+    found = 0
+
+    def push(entries):
+        DISCOVERED_URLS.inc(len(entries))
+        entries = url_rules.filter(entries)
         if check_robots and robots_rules:
-            logger.info("Filtering URLs based on robots.txt rules.")
-            return filter_allowed_urls(urls, robots_rules)[:max_pages]
-        else:
-            logger.info("No robots.txt rules found; using all URLs.")
-            return list(urls)[:max_pages]
+            allowed = set(filter_allowed_urls([entry_url(entry) for entry in entries], robots_rules))
+            entries = [entry for entry in entries if entry_url(entry) in allowed]
+        url_stream.push_entries(entries)
+
+    try:
+        with SITEMAP_DISCOVERY_SECONDS.time():
+            async for entries in iter_sitemap_entries(sitemap_url or default_sitemap_url(url),
+                                                      max_entries=MAX_SITEMAP_ENTRIES, cache=cache):
+                found += len(entries)
+                push(entries)
+
+            if not found:
+                logger.warning("No URLs found in sitemap; fetching with scraper.")
+                runner = SpiderRunner()
+                entries = await asyncio.to_thread(runner.run_spider, url, max_pages=max_pages, url_rules=url_rules)
+                found = len(entries)
+                push(entries)
+        logger.info("Discovered %d URLs, %d queued for crawling", found, url_stream.pushed)
     except Exception as e:
         logger.error("Error while fetching URLs from sitemap: %s", e)
-        return []
+    finally:
+        url_stream.close()
+        trace.end_span(span, urls=found)
+
 
-async def crawl_single_url(url, robots_rules):
+async def crawl_single_url(url, robots_rules, warc_writer=None, chunker=None, page_timeout=DEFAULT_PAGE_TIMEOUT,
+                           resource_profile=DEFAULT_RESOURCE_PROFILE):
     """Crawl a single URL with respect to robots.txt rules."""
     if not robots_rules or is_url_allowed(url, robots_rules):
         try:
-            await crawl_one(url, output_dir)
+            await crawl_one(url, output_dir, warc_writer=warc_writer, chunker=chunker, page_timeout=page_timeout,
+                            resource_profile=resource_profile)
             logger.info("Successfully crawled URL: %s", url)
         except Exception as e:
             logger.error("An error occurred while crawling the URL: %s", e)
@@ -112,12 +343,20 @@ async def crawl_single_url(url, robots_rules):
     return []
 
 
-async def crawl_urls(urls_to_crawl, base_url):
-    """Crawl multiple URLs in parallel."""
-    logger.info("Starting to crawl %d URLs...", len(urls_to_crawl))
+async def crawl_urls(urls_to_crawl, base_url, warc_writer=None, chunker=None, retry_policy=None,
+                     page_timeout=DEFAULT_PAGE_TIMEOUT, run_deadline=None, resource_profile=DEFAULT_RESOURCE_PROFILE,
+                     cache=None, crawler=None, url_stream=None, content_filter=None, content_handlers=None):
+    """Crawl multiple URLs in parallel, then the URLs of a streaming frontier as discovery finds them."""
+    logger.info("Starting to crawl %d URLs%s...", len(urls_to_crawl),
+                " and the URLs being discovered" if url_stream is not None else "")
     try:
-        await crawl_parallel(urls_to_crawl, max_concurrent=10, output_dir=output_dir, base_url=base_url)
-        logger.info("Crawling completed for %d URLs.", len(urls_to_crawl))
+        totals = await crawl_parallel(urls_to_crawl, max_concurrent=10, output_dir=output_dir, base_url=base_url,
+                                      warc_writer=warc_writer, chunker=chunker, retry_policy=retry_policy,
+                                      page_timeout=page_timeout, run_deadline=run_deadline,
+                                      resource_profile=resource_profile, cache=cache, crawler=crawler,
+                                      url_stream=url_stream, content_filter=content_filter,
+                                      content_handlers=content_handlers)
+        logger.info("Crawling completed: %s", totals)
     except Exception as e:
         logger.error("An error occurred during crawling: %s", e)
 
@@ -125,18 +364,223 @@ async def main():
 
     # Set up argument parsing
     parser = argparse.ArgumentParser(description='Crawl URLs from a sitemap.')
-    parser.add_argument('url', type=str, help='The base URL to crawl')
+    parser.add_argument('url', type=str, nargs='?', help='The base URL to crawl')
     parser.add_argument('--crawl-all', action='store_true',
                         help='Whether to crawl all pages (default: false)')
     parser.add_argument('--max-pages', type=int, default=50,
                         help='Maximum number of pages to crawl (default: 50)')
     parser.add_argument('--check-robots', action='store_true', help='Whether to check the robots.txt rules (default: true)')
+    parser.add_argument('--include', action='append', default=None, metavar='PATTERN',
+                        help='Regular expression of URLs to crawl first; may be repeated')
+    parser.add_argument('--exclude', action='append', default=None, metavar='PATTERN',
+                        help='Regular expression of URLs never to crawl; may be repeated')
+    parser.add_argument('--exclude-glob', action='append', default=None, metavar='GLOB',
+                        help="Glob of URLs never to crawl or follow, such as '*/tag/*'; may be repeated")
+    parser.add_argument('--exclude-ext', type=str, default=','.join(sorted(DEFAULT_EXCLUDED_EXTENSIONS)),
+                        metavar='EXTENSIONS',
+                        help='Comma-separated file extensions never to crawl or follow; empty for none '
+                             '(default: images and legacy office documents)')
+    parser.add_argument('--allow-query-param', action='append', default=None, metavar='NAME',
+                        help="Query parameter URLs may have, or '*' for any; may be repeated "
+                             "(default: URLs with a query are skipped)")
+    parser.add_argument('--max-depth', type=int, default=None,
+                        help='Most path segments of a URL to crawl or follow (default: no limit)')
+    parser.add_argument('--preflight', choices=PREFLIGHT_MODES, default=DEFAULT_PREFLIGHT,
+                        help='How URLs are classified before rendering, so non-HTML URLs skip the browser: not at '
+                             'all, by extension, or by extension and then a HEAD request (default: head)')
+    parser.add_argument('--document-workers', type=int, default=None,
+                        help='Processes extracting the text of PDFs and office documents; 0 skips documents '
+                             '(default: number of CPUs)')
+    parser.add_argument('--max-attempts', type=int, default=3,
+                        help='Maximum number of attempts per page for transient failures (default: 3)')
+    parser.add_argument('--page-timeout', type=float, default=DEFAULT_PAGE_TIMEOUT,
+                        help=f'Wall-clock budget in seconds for each page (default: {DEFAULT_PAGE_TIMEOUT:.0f})')
+    parser.add_argument('--run-deadline', type=float, default=None,
+                        help='Seconds after which no new pages are started (default: no deadline)')
+    parser.add_argument('--resource-profile', choices=sorted(RESOURCE_PROFILES), default=DEFAULT_RESOURCE_PROFILE,
+                        help=f'Resources the browser may download while rendering (default: {DEFAULT_RESOURCE_PROFILE})')
+    parser.add_argument('--cache-dir', type=str, default=None,
+                        help='Directory of a response cache shared across runs (default: disabled)')
+    parser.add_argument('--cache-ttl', type=float, default=DEFAULT_CACHE_TTL,
+                        help=f'Seconds a cached response stays fresh (default: {DEFAULT_CACHE_TTL})')
+    parser.add_argument('--cache-max-size', type=int, default=DEFAULT_CACHE_MAX_SIZE // (1024 * 1024),
+                        help=f'Maximum size of the response cache in MB (default: {DEFAULT_CACHE_MAX_SIZE // (1024 * 1024)})')
+    parser.add_argument('--seeds', type=str, default=None,
+                        help='File with one site URL per line to crawl in a single process instead of <url>')
+    parser.add_argument('--host-delay', type=float, default=DEFAULT_HOST_DELAY,
+                        help=f'Seconds between two pages on the same host with --seeds (default: {DEFAULT_HOST_DELAY})')
+    parser.add_argument('--serve', action='store_true',
+                        help='Run as a service accepting crawl jobs over a local HTTP/JSON API')
+    parser.add_argument('--host', type=str, default='127.0.0.1',
+                        help='Address the service listens on with --serve (default: 127.0.0.1)')
+    parser.add_argument('--port', type=int, default=8080,
+                        help='Port the service listens on with --serve (default: 8080)')
+    parser.add_argument('--db', type=str, default=os.path.join(output_dir, 'jobs.db'),
+                        help='SQLite database holding the service jobs (default: crawled_data/jobs.db)')
+    parser.add_argument('--queue', type=str, default=None,
+                        help='SQLite database of a crawl queue shared by workers, used with --enqueue and --worker')
+    parser.add_argument('--enqueue', action='store_true',
+                        help='Add the URLs of <url> or the --seeds sites to the --queue instead of crawling them')
+    parser.add_argument('--worker', action='store_true',
+                        help='Crawl URLs leased from the --queue until it is finished')
+    parser.add_argument('--lease-timeout', type=float, default=DEFAULT_LEASE_TIMEOUT,
+                        help=f'Seconds a worker may hold URLs without a heartbeat (default: {DEFAULT_LEASE_TIMEOUT:.0f})')
+    parser.add_argument('--warc-dir', type=str, default=None,
+                        help='Directory to archive raw responses to as WARC files (default: disabled)')
+    parser.add_argument('--from-warc', type=str, default=None,
+                        help='Regenerate markdown from a WARC file or directory instead of crawling')
+    parser.add_argument('--chunks', action='store_true',
+                        help='Also write each page as JSONL chunks for embedding (default: false)')
+    parser.add_argument('--chunk-tokens', type=int, default=512,
+                        help='Maximum number of tokens per chunk when --chunks is set (default: 512)')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Number of processes used by --from-warc (default: number of CPUs)')
+    parser.add_argument('--metrics-file', type=str, default=None,
+                        help='File to write Prometheus metrics to during and after the run (default: disabled)')
+    parser.add_argument('--metrics-summary', type=str, default=None,
+                        help='File to write a JSON summary of the run metrics to (default: disabled)')
+    parser.add_argument('--trace-file', type=str, default=None,
+                        help='File to write per-URL traces of the pipeline stages to (default: disabled)')
+    parser.add_argument('--trace-format', choices=TRACE_FORMATS, default='chrome',
+                        help='Format of the --trace-file: Chrome trace events or OTLP JSON (default: chrome)')
+    parser.add_argument('--trace-sample-rate', type=float, default=1.0,
+                        help='Share of URLs traced with --trace-file, between 0 and 1 (default: 1.0)')
+    parser.add_argument('--profile', type=str, default=None,
+                        help='File to write a profile of the run to; also turns on --loop-monitor (default: disabled)')
+    parser.add_argument('--profile-mode', choices=PROFILE_MODES, default='cprofile',
+                        help='cprofile for exact call counts, or sampling for low-overhead collapsed stacks '
+                             '(default: cprofile)')
+    parser.add_argument('--loop-monitor', action='store_true',
+                        help='Measure event loop lag and log the stack of code that blocks the loop')
+    parser.add_argument('--stall-threshold', type=float, default=DEFAULT_STALL_THRESHOLD,
+                        help=f'Seconds the event loop may be blocked before it is reported '
+                             f'(default: {DEFAULT_STALL_THRESHOLD})')
+    parser.add_argument('--log-format', choices=LOG_FORMATS, default='text',
+                        help='Format of the log lines: text or JSON lines (default: text)')
+    parser.add_argument('--log-level', choices=('DEBUG', 'INFO', 'WARNING', 'ERROR'), default=None,
+                        help='Lowest level logged (default: the level of config/logging.conf, DEBUG)')
+    parser.add_argument('--log-sample-rate', type=float, default=1.0,
+                        help='Share of URLs whose INFO and DEBUG lines are logged, between 0 and 1 (default: 1.0)')
+    parser.add_argument('--log-rate-limit', type=int, default=None,
+                        help='Most INFO and DEBUG lines about URLs logged per second (default: unlimited)')
 
 
     args = parser.parse_args()
+
+    if not 0.0 <= args.log_sample_rate <= 1.0:
+        parser.error('--log-sample-rate must be between 0 and 1')
+    if args.log_rate_limit is not None and args.log_rate_limit <= 0:
+        parser.error('--log-rate-limit must be above 0')
+
+    # Configure logging only once there is work to do, so --help and usage errors stay fast
+    setup_logging(args.log_format, args.log_sample_rate, args.log_rate_limit, args.log_level)
     logger.info("Received arguments: %s", args)
 
-    await run_crawler(args.url, args.crawl_all, args.max_pages, args.check_robots)
+    if args.trace_file:
+        if not 0.0 < args.trace_sample_rate <= 1.0:
+            parser.error('--trace-sample-rate must be above 0 and at most 1')
+        TRACER.configure(args.trace_sample_rate, DEFAULT_MAX_TRACES)
+    if args.stall_threshold <= 0:
+        parser.error('--stall-threshold must be above 0')
+    if args.max_depth is not None and args.max_depth < 0:
+        parser.error('--max-depth must be 0 or more')
+    if args.document_workers is not None and args.document_workers < 0:
+        parser.error('--document-workers must be 0 or more')
+
+    profiler = RunProfiler(args.profile, args.profile_mode) if args.profile else None
+    monitor = LoopLagMonitor(threshold=args.stall_threshold) if args.profile or args.loop_monitor else None
+    if profiler is not None:
+        profiler.start()
+    if monitor is not None:
+        monitor.start()
+
+    # Export the metrics while the run is going, for long worker and service runs, and once it is over
+    started_at = time.time()
+    exporter = asyncio.create_task(export_periodically(REGISTRY, args.metrics_file)) if args.metrics_file else None
+    try:
+        await run_mode(args, parser)
+    finally:
+        if monitor is not None:
+            await monitor.stop()
+        if profiler is not None:
+            profiler.stop()
+        if exporter is not None:
+            exporter.cancel()
+            REGISTRY.write_prometheus(args.metrics_file)
+        if args.metrics_summary:
+            REGISTRY.write_summary(args.metrics_summary, {'started_at': started_at,
+                                                          'duration_seconds': round(time.time() - started_at, 3)})
+        if args.trace_file:
+            TRACER.write(args.trace_file, args.trace_format)
+
+
+def build_url_rules(args):
+    """Compiles the URL rules set on the command line."""
+    extensions = [extension.strip() for extension in args.exclude_ext.split(',') if extension.strip()]
+    return UrlRules(exclude_globs=args.exclude_glob, exclude_patterns=args.exclude, excluded_extensions=extensions,
+                    allowed_query_params=args.allow_query_param, max_depth=args.max_depth)
+
+
+async def run_mode(args, parser):
+    """
+    Runs the mode selected on the command line.
+
+    The --exclude patterns are part of the URL rules, so they are not passed
+    on as exclude patterns of the frontier as well, which would match every
+    URL against them a second time.
+    """
+    if args.from_warc:
+        await replay_warc(args.from_warc, output_dir, workers=args.workers)
+        return
+    if (args.enqueue or args.worker) and not args.queue:
+        parser.error('--enqueue and --worker require --queue')
+    if args.worker:
+        queue = SQLiteLeaseQueue(args.queue)
+        try:
+            await run_worker(queue, output_dir, lease_timeout=args.lease_timeout, max_attempts=args.max_attempts,
+                             page_timeout=args.page_timeout, resource_profile=args.resource_profile,
+                             host_delay=args.host_delay, preflight=args.preflight,
+                             document_workers=args.document_workers, warc_dir=args.warc_dir,
+                             chunk_tokens=args.chunk_tokens if args.chunks else None, cache_dir=args.cache_dir,
+                             cache_ttl=args.cache_ttl, cache_max_size=args.cache_max_size * 1024 * 1024)
+        finally:
+            queue.close()
+        return
+    if args.enqueue:
+        seeds = read_seeds(args.seeds) if args.seeds else [args.url] if args.url else []
+        if not seeds:
+            parser.error('--enqueue requires <url> or --seeds')
+        await enqueue_sites(seeds, args.queue, args.crawl_all, args.max_pages, args.check_robots,
+                            include_patterns=args.include, exclude_patterns=None, url_rules=build_url_rules(args))
+        return
+    if args.serve:
+        # Each job saves to a directory of its own, which one WARC archive or chunk stage cannot follow
+        if args.warc_dir or args.chunks:
+            parser.error('--warc-dir and --chunks cannot be used with --serve')
+        service = CrawlService(output_dir, args.db, max_attempts=args.max_attempts, page_timeout=args.page_timeout,
+                               resource_profile=args.resource_profile, host_delay=args.host_delay,
+                               url_rules=build_url_rules(args), preflight=args.preflight,
+                               document_workers=args.document_workers, cache_dir=args.cache_dir,
+                               cache_ttl=args.cache_ttl, cache_max_size=args.cache_max_size * 1024 * 1024)
+        await run_service(service, args.host, args.port)
+        return
+    if args.seeds:
+        await run_batch(args.seeds, args.crawl_all, args.max_pages, args.check_robots, args.warc_dir,
+                        args.chunk_tokens if args.chunks else None, args.max_attempts,
+                        args.page_timeout, args.run_deadline, args.resource_profile,
+                        args.cache_dir, args.cache_ttl, args.cache_max_size * 1024 * 1024, args.host_delay,
+                        include_patterns=args.include, exclude_patterns=None, url_rules=build_url_rules(args),
+                        preflight=args.preflight, document_workers=args.document_workers)
+        return
+    if not args.url:
+        parser.error('the following arguments are required: url')
+
+    await run_crawler(args.url, args.crawl_all, args.max_pages, args.check_robots, args.warc_dir,
+                      args.chunk_tokens if args.chunks else None, args.max_attempts,
+                      args.page_timeout, args.run_deadline, args.resource_profile,
+                      args.cache_dir, args.cache_ttl, args.cache_max_size * 1024 * 1024,
+                      include_patterns=args.include, exclude_patterns=None, url_rules=build_url_rules(args),
+                      preflight=args.preflight, document_workers=args.document_workers)
 
 if __name__ == "__main__":
     asyncio.run(main())
@@ -0,0 +1,347 @@
+import os
+import json
+import asyncio
+import math
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Iterable
+
+logger = logging.getLogger(__name__)
+
+# Content type of the Prometheus text exposition format
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Seconds between two writes of the metrics file during a run
+DEFAULT_EXPORT_INTERVAL = 15.0
+
+# Histogram buckets in seconds, from a fast cache hit to a page running into its timeout
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+# Histogram buckets in bytes for page sizes
+SIZE_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+# Histogram buckets in seconds for event loop lag, where a millisecond is normal and a second is a stall
+LOOP_LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return '+Inf'
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(labels: dict) -> str:
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + '}'
+
+
+class _Metric:
+    """Base of the metric types: a named family of values, one per combination of label values."""
+
+    type_name = None
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}  # tuple of label values -> value
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> tuple:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _labels(self, key: tuple) -> dict:
+        return dict(zip(self.labelnames, key))
+
+    def reset(self):
+        """Drops all recorded values."""
+        with self._lock:
+            self._values.clear()
+
+    def samples(self):
+        """Yields (suffix, labels, value) for each sample in the Prometheus exposition."""
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            yield '', self._labels(key), value
+
+    def summary(self):
+        """Returns the values for the JSON run summary, keyed by label values when there are labels."""
+        with self._lock:
+            items = sorted(self._values.items())
+        if not self.labelnames:
+            return items[0][1] if items else 0
+        return {','.join(key): value for key, value in items}
+
+
+class Counter(_Metric):
+    """A value that only goes up, such as the number of pages crawled."""
+
+    type_name = 'counter'
+
+    def inc(self, amount: float = 1, **labels):
+        """Adds to the counter."""
+        if amount < 0:
+            raise ValueError("Counters can only increase")
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        """Returns the current value."""
+        return self._values.get(self._key(labels), 0)
+
+
+class Gauge(_Metric):
+    """A value that goes up and down, such as the number of pages being rendered."""
+
+    type_name = 'gauge'
+
+    def set(self, value: float, **labels):
+        """Sets the gauge."""
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount: float = 1, **labels):
+        """Raises the gauge."""
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        """Lowers the gauge."""
+        self.inc(-amount, **labels)
+
+    def set_max(self, value: float, **labels):
+        """Raises the gauge to the value if it is higher, for tracking peaks."""
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = max(self._values.get(key, value), value)
+
+    def value(self, **labels) -> float:
+        """Returns the current value."""
+        return self._values.get(self._key(labels), 0)
+
+
+class Histogram(_Metric):
+    """The distribution of observed values, such as render latencies, in cumulative buckets."""
+
+    type_name = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                 buckets: Iterable[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value: float, **labels):
+        """Records an observation."""
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = {'counts': [0] * len(self.buckets), 'sum': 0.0, 'count': 0,
+                                             'max': value}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state['counts'][i] += 1
+                    break
+            state['sum'] += value
+            state['count'] += 1
+            state['max'] = max(state['max'], value)
+
+    @contextmanager
+    def time(self, **labels):
+        """Observes the number of seconds the block takes."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def count(self, **labels) -> int:
+        """Returns the number of observations."""
+        state = self._values.get(self._key(labels))
+        return state['count'] if state else 0
+
+    def samples(self):
+        with self._lock:
+            items = sorted((key, dict(state, counts=list(state['counts']))) for key, state in self._values.items())
+        for key, state in items:
+            labels = self._labels(key)
+            cumulative = 0
+            for bound, count in zip(self.buckets, state['counts']):
+                cumulative += count
+                yield '_bucket', dict(labels, le=_format_value(bound)), cumulative
+            yield '_sum', labels, state['sum']
+            yield '_count', labels, state['count']
+
+    def _quantile(self, state: dict, q: float) -> float:
+        """Estimates a quantile as the upper bound of the bucket it falls in, capped at the maximum."""
+        rank = q * state['count']
+        cumulative = 0
+        for bound, count in zip(self.buckets, state['counts']):
+            cumulative += count
+            if cumulative >= rank:
+                return min(bound, state['max'])
+        return state['max']
+
+    def summary(self):
+        with self._lock:
+            items = sorted((key, dict(state)) for key, state in self._values.items())
+        stats = {
+            ','.join(key): {
+                'count': state['count'],
+                'sum': round(state['sum'], 6),
+                'mean': round(state['sum'] / state['count'], 6),
+                'p50': self._quantile(state, 0.5),
+                'p95': self._quantile(state, 0.95),
+                'max': state['max'],
+            }
+            for key, state in items
+        }
+        if not self.labelnames:
+            return stats.get('', {'count': 0})
+        return stats
+
+
+class MetricsRegistry:
+    """A set of metrics that are exported together."""
+
+    def __init__(self):
+        self._metrics = {}
+
+    def _register(self, metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Counter:
+        """Creates and registers a counter."""
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Gauge:
+        """Creates and registers a gauge."""
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                  buckets: Iterable[float] = LATENCY_BUCKETS) -> Histogram:
+        """Creates and registers a histogram."""
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def reset(self):
+        """Drops the values of all metrics."""
+        for metric in self._metrics.values():
+            metric.reset()
+
+    def render_prometheus(self) -> str:
+        """Renders all metrics in the Prometheus text exposition format."""
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type_name}")
+            for suffix, labels, value in metric.samples():
+                lines.append(f"{metric.name}{suffix}{_format_labels(labels)} {_format_value(value)}")
+        return '\n'.join(lines) + '\n'
+
+    def summary(self) -> dict:
+        """Returns all metrics as a JSON-serializable dictionary."""
+        return {name: metric.summary() for name, metric in self._metrics.items()}
+
+    def write_prometheus(self, path: str):
+        """Writes the metrics to a file in the Prometheus text format, e.g. for node_exporter's textfile collector.
+
+        The file is replaced atomically, so a scraper never reads a partial file.
+        """
+        _write_atomically(path, self.render_prometheus())
+        logger.debug("Wrote metrics to %s", path)
+
+    def write_summary(self, path: str, run: dict = None):
+        """Writes the metrics to a JSON run summary.
+
+        Args:
+            path (str): The path of the JSON file.
+            run (dict): Details of the run stored next to the metrics, such as its duration (default is None).
+        """
+        _write_atomically(path, json.dumps({'run': run or {}, 'metrics': self.summary()}, indent=4) + '\n')
+        logger.info("Wrote run summary to %s", path)
+
+
+async def export_periodically(registry: MetricsRegistry, path: str, interval: float = DEFAULT_EXPORT_INTERVAL):
+    """Rewrites the Prometheus metrics file every `interval` seconds until cancelled."""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            registry.write_prometheus(path)
+        except OSError as e:
+            logger.error("Failed to write metrics to %s: %s", path, e)
+
+
+def _write_atomically(path: str, content: str):
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = f"{path}.tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        f.write(content)
+    os.replace(temp_path, path)
+
+
+# The metrics of the crawler, shared by all stages of a run
+REGISTRY = MetricsRegistry()
+
+URL_VALIDATIONS = REGISTRY.counter(
+    'crawler_url_validations_total', 'Start URLs validated, by result.', ['result'])
+URL_VALIDATION_SECONDS = REGISTRY.histogram(
+    'crawler_url_validation_seconds', 'Time spent validating start URLs.')
+ROBOTS_FETCHES = REGISTRY.counter(
+    'crawler_robots_fetches_total', 'robots.txt fetches, by result.', ['result'])
+ROBOTS_FETCH_SECONDS = REGISTRY.histogram(
+    'crawler_robots_fetch_seconds', 'Time spent fetching robots.txt.')
+SITEMAP_DISCOVERY_SECONDS = REGISTRY.histogram(
+    'crawler_sitemap_discovery_seconds', 'Time spent collecting the URLs of a site.')
+DISCOVERED_URLS = REGISTRY.counter(
+    'crawler_discovered_urls_total', 'URLs collected from sitemaps or the spider, before ranking.')
+FILTERED_URLS = REGISTRY.counter(
+    'crawler_filtered_urls_total', 'Discovered URLs dropped by the URL rules.')
+PREFLIGHT_CHECKS = REGISTRY.counter(
+    'crawler_preflight_checks_total', 'URLs classified before rendering, by kind of content and what told it.',
+    ['kind', 'source'])
+DOCUMENTS = REGISTRY.counter(
+    'crawler_documents_total', 'PDFs and office documents downloaded and extracted, by result.', ['result'])
+EXTRACT_SECONDS = REGISTRY.histogram(
+    'crawler_document_extract_seconds', 'Time to extract the text of a document in the process pool.')
+RENDER_SECONDS = REGISTRY.histogram(
+    'crawler_render_seconds', 'Time to fetch and render a page, by outcome.', ['outcome'])
+PAGES = REGISTRY.counter(
+    'crawler_pages_total', 'Pages finished, by outcome.', ['outcome'])
+RETRIES = REGISTRY.counter(
+    'crawler_retries_total', 'Pages requeued after a transient failure.')
+PAGES_IN_FLIGHT = REGISTRY.gauge(
+    'crawler_pages_in_flight', 'Pages being fetched and rendered right now.')
+MARKDOWN_BYTES = REGISTRY.histogram(
+    'crawler_markdown_bytes', 'Size of the markdown generated per page.', buckets=SIZE_BUCKETS)
+WRITE_SECONDS = REGISTRY.histogram(
+    'crawler_write_seconds', 'Time to write a batch of markdown files.')
+PAGES_WRITTEN = REGISTRY.counter(
+    'crawler_pages_written_total', 'Markdown files written, by result.', ['result'])
+MEMORY_RSS_BYTES = REGISTRY.gauge(
+    'crawler_memory_rss_bytes', 'Resident memory of the crawler process.')
+MEMORY_PEAK_BYTES = REGISTRY.gauge(
+    'crawler_memory_peak_bytes', 'Peak resident memory of the crawler process.')
+JOBS = REGISTRY.gauge(
+    'crawler_jobs', 'Jobs of the crawl service, by status.', ['status'])
+LOOP_LAG_SECONDS = REGISTRY.histogram(
+    'crawler_event_loop_lag_seconds', 'Delay of the event loop in running a scheduled callback.',
+    buckets=LOOP_LAG_BUCKETS)
+LOOP_STALLS = REGISTRY.counter(
+    'crawler_event_loop_stalls_total', 'Times the event loop was blocked longer than the stall threshold.')
@@ -0,0 +1,58 @@
+import logging
+from urllib.parse import urlparse
+
+logger = logging.getLogger(__name__)
+
+# Default minimum number of seconds between starting two pages on the same host
+DEFAULT_HOST_DELAY = 1.0
+
+# Default maximum number of pages crawled at the same time on one host
+DEFAULT_MAX_PER_HOST = 2
+
+
+class PolitenessScheduler:
+    """
+    Spaces out requests to each host.
+
+    A page on a host may only start once `min_delay` seconds have passed since
+    the previous page on that host started, and while fewer than `max_per_host`
+    pages on it are running. URLs of other hosts are free to go in between, so a
+    frontier holding many sites interleaves them instead of hammering one site
+    at a time.
+    """
+
+    def __init__(self, min_delay: float = DEFAULT_HOST_DELAY, max_per_host: int = DEFAULT_MAX_PER_HOST):
+        """
+        Args:
+            min_delay (float): Seconds between starting two pages on the same host (default is 1.0).
+            max_per_host (int): Maximum number of running pages per host (default is 2).
+        """
+        self.min_delay = min_delay
+        self.max_per_host = max_per_host
+        self._last_start = {}  # host -> loop time the last page on it started
+        self._running = {}  # host -> number of running pages
+
+    def ready_at(self, url: str) -> float:
+        """Returns the earliest time a page on the URL's host may start, ignoring running pages."""
+        last_start = self._last_start.get(urlparse(url).netloc)
+        return last_start + self.min_delay if last_start is not None else 0.0
+
+    def can_start(self, url: str, now: float) -> bool:
+        """Returns whether a page on the URL's host may start now."""
+        host = urlparse(url).netloc
+        return self._running.get(host, 0) < self.max_per_host and self.ready_at(url) <= now
+
+    def started(self, url: str, now: float):
+        """Records that a page on the URL's host started."""
+        host = urlparse(url).netloc
+        self._last_start[host] = now
+        self._running[host] = self._running.get(host, 0) + 1
+
+    def finished(self, url: str):
+        """Records that a page on the URL's host finished."""
+        host = urlparse(url).netloc
+        running = self._running.get(host, 0) - 1
+        if running > 0:
+            self._running[host] = running
+        else:
+            self._running.pop(host, None)
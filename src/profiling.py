@@ -0,0 +1,207 @@
+import io
+import sys
+import time
+import pstats
+import asyncio
+import cProfile
+import logging
+import threading
+import traceback
+from collections import Counter
+from .metrics import LOOP_LAG_SECONDS, LOOP_STALLS
+
+logger = logging.getLogger(__name__)
+
+PROFILE_MODES = ('cprofile', 'sampling')
+
+# Seconds between two heartbeats of the event loop lag monitor
+DEFAULT_LAG_INTERVAL = 0.1
+
+# Seconds the event loop may be blocked before the blocking code is reported
+DEFAULT_STALL_THRESHOLD = 0.25
+
+# Stalls whose stacks are kept for the report; later stalls are only counted
+MAX_RECORDED_STALLS = 100
+
+# Seconds between two stack samples of the sampling profiler
+DEFAULT_SAMPLE_INTERVAL = 0.005
+
+# Functions listed in the profile summary written to the log
+PROFILE_SUMMARY_LINES = 25
+
+
+class LoopLagMonitor:
+    """
+    Measures how late the event loop runs its callbacks and reports code that blocks it.
+
+    A heartbeat task sleeps for `interval` seconds and records by how much it
+    overslept in the loop lag histogram. A watchdog thread checks the
+    heartbeat, and when the loop has not run it for `threshold` seconds, logs
+    the stack of the loop thread, which shows the blocking call while it is
+    still running.
+    """
+
+    def __init__(self, interval: float = DEFAULT_LAG_INTERVAL, threshold: float = DEFAULT_STALL_THRESHOLD):
+        """
+        Args:
+            interval (float): Seconds between two heartbeats (default is 0.1).
+            threshold (float): Seconds of blocking reported as a stall (default is 0.25).
+        """
+        self.interval = interval
+        self.threshold = threshold
+        self.stalls = []  # {'blocked_for', 'stack'} of the first MAX_RECORDED_STALLS stalls
+        self.stall_count = 0
+        self.max_lag = 0.0
+        self._last_beat = None
+        self._loop_thread_id = None
+        self._task = None
+        self._watchdog = None
+        self._stop = threading.Event()
+
+    async def _heartbeat(self):
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            lag = max(now - expected, 0.0)
+            LOOP_LAG_SECONDS.observe(lag)
+            self.max_lag = max(self.max_lag, lag)
+            self._last_beat = now
+
+    def _watch(self):
+        reported_beat = None
+        while not self._stop.wait(self.threshold / 2):
+            last_beat = self._last_beat
+            blocked_for = time.monotonic() - last_beat - self.interval
+            if blocked_for < self.threshold or last_beat == reported_beat:
+                continue
+            # Report each stall once, while the blocking code is still on the stack
+            reported_beat = last_beat
+            frame = sys._current_frames().get(self._loop_thread_id)
+            stack = ''.join(traceback.format_stack(frame)) if frame is not None else ''
+            self.stall_count += 1
+            LOOP_STALLS.inc()
+            if len(self.stalls) < MAX_RECORDED_STALLS:
+                self.stalls.append({'blocked_for': round(blocked_for, 3), 'stack': stack})
+            logger.warning("Event loop blocked for %.2fs; the loop thread is at:\n%s", blocked_for, stack)
+
+    def start(self):
+        """Starts monitoring the running event loop."""
+        self._loop_thread_id = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._stop.clear()
+        self._task = asyncio.create_task(self._heartbeat())
+        self._watchdog = threading.Thread(target=self._watch, name='loop-lag-watchdog', daemon=True)
+        self._watchdog.start()
+
+    async def stop(self) -> dict:
+        """Stops monitoring and logs a report of the loop lag.
+
+        Returns:
+            dict: The loop lag percentiles, the longest lag and the number of stalls.
+        """
+        self._stop.set()
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._watchdog.join()
+        report = self.report()
+        logger.info("Event loop lag: %s", report)
+        return report
+
+    def report(self) -> dict:
+        summary = LOOP_LAG_SECONDS.summary()
+        return {
+            'heartbeats': summary.get('count', 0),
+            'p50_lag': summary.get('p50'),
+            'p95_lag': summary.get('p95'),
+            'max_lag': round(self.max_lag, 3),
+            'stalls': self.stall_count,
+        }
+
+
+class SamplingProfiler:
+    """
+    Samples the stack of a thread at a fixed interval from a background thread.
+
+    Unlike cProfile, the sampled code runs at full speed, so the profile shows
+    where a run spends its time without distorting it. The stacks are written
+    in the collapsed format read by flamegraph.pl and speedscope.
+    """
+
+    def __init__(self, interval: float = DEFAULT_SAMPLE_INTERVAL):
+        self.interval = interval
+        self.stacks = Counter()
+        self._thread_id = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._thread_id)
+            if frame is None:
+                continue
+            names = []
+            while frame is not None:
+                names.append(f"{frame.f_code.co_name} ({frame.f_code.co_filename}:{frame.f_code.co_firstlineno})")
+                frame = frame.f_back
+            self.stacks[';'.join(reversed(names))] += 1
+
+    def enable(self):
+        """Starts sampling the calling thread."""
+        self._thread_id = threading.get_ident()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='sampling-profiler', daemon=True)
+        self._thread.start()
+
+    def disable(self):
+        """Stops sampling."""
+        self._stop.set()
+        self._thread.join()
+
+    def top_functions(self, count: int = PROFILE_SUMMARY_LINES) -> list:
+        """Returns the functions most often at the top of the stack, with their share of the samples."""
+        total = sum(self.stacks.values()) or 1
+        leaves = Counter()
+        for stack, samples in self.stacks.items():
+            leaves[stack.rsplit(';', 1)[-1]] += samples
+        return [(name, round(samples / total, 3)) for name, samples in leaves.most_common(count)]
+
+    def dump_stats(self, path: str):
+        """Writes the sampled stacks in the collapsed stack format."""
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, samples in self.stacks.most_common():
+                f.write(f"{stack} {samples}\n")
+
+
+class RunProfiler:
+    """Profiles a run with cProfile or the sampling profiler and writes the profile to a file."""
+
+    def __init__(self, path: str, mode: str = 'cprofile'):
+        """
+        Args:
+            path (str): The file to write the profile to: pstats for 'cprofile', collapsed stacks for 'sampling'.
+            mode (str): 'cprofile' to trace every call, or 'sampling' to sample stacks (default is 'cprofile').
+        """
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"Unknown profile mode: {mode}")
+        self.path = path
+        self.mode = mode
+        self.profiler = cProfile.Profile() if mode == 'cprofile' else SamplingProfiler()
+
+    def start(self):
+        """Starts profiling the calling thread, which runs the event loop."""
+        self.profiler.enable()
+
+    def stop(self):
+        """Stops profiling, writes the profile and logs the functions that took the most time."""
+        self.profiler.disable()
+        self.profiler.dump_stats(self.path)
+        logger.info("Wrote %s profile to %s", self.mode, self.path)
+        logger.info("Profile summary:\n%s", self.summary())
+
+    def summary(self) -> str:
+        if self.mode == 'sampling':
+            return '\n'.join(f"{share:6.1%}  {name}" for name, share in self.profiler.top_functions())
+        stream = io.StringIO()
+        pstats.Stats(self.profiler, stream=stream).sort_stats('cumulative').print_stats(PROFILE_SUMMARY_LINES)
+        return stream.getvalue()
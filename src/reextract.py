@@ -0,0 +1,111 @@
+import os
+import time
+import asyncio
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from typing import List
+from urllib.parse import urlparse
+from crawl4ai.content_scraping_strategy import WebScrapingStrategy
+from crawl4ai.markdown_generation_strategy import DefaultMarkdownGenerator
+from .results_saver import save_markdown, save_metadata
+from .warc import find_warc_files, iter_warc_responses
+
+logger = logging.getLogger(__name__)
+
+
+def html_to_markdown(url: str, html: str) -> str:
+    """
+    Convert raw HTML to markdown without a browser.
+
+    Runs the same scraping and markdown generation steps that `AsyncWebCrawler`
+    applies to a rendered page, so replayed pages match live crawls.
+
+    Args:
+        url (str): The URL the HTML was fetched from, used to resolve links.
+        html (str): The raw HTML of the page.
+
+    Returns:
+        str: The markdown representation of the page.
+    """
+    scraped = WebScrapingStrategy().scrap(url, html)
+    markdown_result = DefaultMarkdownGenerator().generate_markdown(
+        cleaned_html=scraped.get('cleaned_html', ''), base_url=url)
+    return markdown_result.raw_markdown
+
+
+def _convert_page(url: str, html: str) -> tuple:
+    """Worker entry point: converts one page, returning (url, markdown, error)."""
+    try:
+        return url, html_to_markdown(url, html), None
+    except Exception as e:
+        return url, None, str(e)
+
+
+async def replay_warc(path: str, output_dir: str, workers: int = None) -> List[str]:
+    """
+    Regenerate markdown for every response stored in WARC files.
+
+    Pages are converted in a process pool across all cores while the event loop
+    reads records and writes results. At most a few pages per worker are in
+    flight at once, so memory stays flat regardless of corpus size.
+
+    Args:
+        path (str): A WARC file or a directory containing WARC files.
+        output_dir (str): The directory where markdown and metadata should be saved.
+        workers (int): The number of worker processes (default is the number of CPUs).
+
+    Returns:
+        List[str]: The file paths of the saved markdown files.
+    """
+    warc_files = find_warc_files(path)
+    workers = workers or os.cpu_count() or 1
+    max_in_flight = workers * 4
+    logger.info("Replaying %d WARC file(s) from %s with %d worker(s)", len(warc_files), path, workers)
+
+    metadata = {}  # Metadata entries grouped by website
+    saved_files = []
+    fail_count = 0
+
+    async def save_converted(done):
+        nonlocal fail_count
+        for future in done:
+            url, markdown_content, error = future.result()
+            try:
+                if error is not None:
+                    raise ValueError(error)
+                file_path = await save_markdown(url, markdown_content, output_dir)
+            except Exception as e:
+                logger.error("Error re-extracting %s: %s", url, e)
+                fail_count += 1
+                continue
+
+            saved_files.append(file_path)
+            metadata.setdefault(urlparse(url).netloc, []).append({
+                'url': url,
+                'markdown_file': file_path
+            })
+
+    start_time = time.perf_counter()
+    loop = asyncio.get_running_loop()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = set()
+        for response in iter_warc_responses(warc_files):
+            pending.add(loop.run_in_executor(executor, _convert_page, response['url'], response['html']))
+
+            # Apply backpressure so the reader cannot run ahead of the workers
+            if len(pending) >= max_in_flight:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                await save_converted(done)
+
+        if pending:
+            done, _ = await asyncio.wait(pending)
+            await save_converted(done)
+
+    for entries in metadata.values():
+        await save_metadata(entries, output_dir, entries[0]['url'])
+
+    elapsed = time.perf_counter() - start_time
+    pages_per_sec = len(saved_files) / elapsed if elapsed > 0 else 0.0
+    logger.info("Replay complete: %d pages re-extracted, %d failed in %.2fs (%.1f pages/sec)",
+                len(saved_files), fail_count, elapsed, pages_per_sec)
+    return saved_files
@@ -0,0 +1,102 @@
+import logging
+from urllib.parse import urlparse
+
+logger = logging.getLogger(__name__)
+
+# Hosts serving analytics, advertising and tag-manager scripts that never affect page content
+TRACKER_DOMAINS = frozenset({
+    'google-analytics.com', 'googletagmanager.com', 'googletagservices.com', 'googlesyndication.com',
+    'doubleclick.net', 'googleadservices.com', 'adservice.google.com', 'analytics.google.com',
+    'facebook.net', 'connect.facebook.net', 'hotjar.com', 'segment.com', 'segment.io', 'mixpanel.com',
+    'amplitude.com', 'fullstory.com', 'newrelic.com', 'nr-data.net', 'optimizely.com', 'quantserve.com',
+    'scorecardresearch.com', 'taboola.com', 'outbrain.com', 'criteo.com', 'criteo.net', 'adnxs.com',
+    'amazon-adsystem.com', 'bat.bing.com', 'clarity.ms', 'matomo.cloud', 'plausible.io', 'mc.yandex.ru',
+})
+
+# Named profiles of what to block while rendering pages. Resource types are Playwright's
+# request.resource_type values; extra_args are passed on to the browser.
+RESOURCE_PROFILES = {
+    'full': {
+        'resource_types': frozenset(),
+        'block_trackers': False,
+        'extra_args': [],
+    },
+    'no-media': {
+        'resource_types': frozenset({'image', 'media', 'font'}),
+        'block_trackers': True,
+        'extra_args': ['--blink-settings=imagesEnabled=false', '--autoplay-policy=user-gesture-required'],
+    },
+    'text-only': {
+        'resource_types': frozenset({'image', 'media', 'font', 'stylesheet', 'texttrack', 'manifest',
+                                     'eventsource', 'websocket'}),
+        'block_trackers': True,
+        'extra_args': ['--blink-settings=imagesEnabled=false', '--autoplay-policy=user-gesture-required',
+                       '--disable-remote-fonts'],
+    },
+}
+
+DEFAULT_RESOURCE_PROFILE = 'full'
+
+
+def is_tracker(url: str) -> bool:
+    """Checks whether the URL's host, or any parent domain of it, is a known tracker."""
+    labels = urlparse(url).netloc.split(':')[0].lower().split('.')
+    return any('.'.join(labels[i:]) in TRACKER_DOMAINS for i in range(len(labels) - 1))
+
+
+class ResourceBlocker:
+    """
+    Aborts browser requests that a resource profile does not need.
+
+    Installed as the crawler's `on_page_context_created` hook, it routes every
+    request of a new page through `should_block`. Blocked requests are aborted
+    before any bytes are downloaded.
+    """
+
+    def __init__(self, profile_name: str = DEFAULT_RESOURCE_PROFILE):
+        """
+        Args:
+            profile_name (str): The name of a profile in RESOURCE_PROFILES (default is 'full').
+
+        Raises:
+            ValueError: If the profile does not exist.
+        """
+        if profile_name not in RESOURCE_PROFILES:
+            raise ValueError(f"Unknown resource profile: {profile_name}")
+        self.profile_name = profile_name
+        self.profile = RESOURCE_PROFILES[profile_name]
+        self.blocked_count = 0
+
+    @property
+    def extra_args(self) -> list:
+        """Browser arguments for the profile."""
+        return list(self.profile['extra_args'])
+
+    def should_block(self, resource_type: str, url: str) -> bool:
+        """Returns whether a request should be aborted under this profile."""
+        if resource_type == 'document':
+            return False  # Never block the pages being crawled
+        if resource_type in self.profile['resource_types']:
+            return True
+        return self.profile['block_trackers'] and is_tracker(url)
+
+    async def handle_route(self, route):
+        """Aborts or continues an intercepted request."""
+        request = route.request
+        if self.should_block(request.resource_type, request.url):
+            self.blocked_count += 1
+            await route.abort()
+        else:
+            await route.continue_()
+
+    async def on_page_context_created(self, page, context=None, **kwargs):
+        """Crawler hook that starts intercepting the requests of a new page."""
+        await page.route('**/*', self.handle_route)
+        return page
+
+    def install(self, crawler):
+        """Installs the blocker on an `AsyncWebCrawler`. The 'full' profile installs nothing."""
+        if not self.profile['resource_types'] and not self.profile['block_trackers']:
+            return
+        crawler.crawler_strategy.set_hook('on_page_context_created', self.on_page_context_created)
+        logger.info("Blocking resources with the '%s' profile", self.profile_name)
@@ -0,0 +1,170 @@
+import os
+import json
+import time
+import hashlib
+import logging
+import aiofiles
+from typing import Optional
+from urllib.parse import urlparse, urlunparse, parse_qsl, urlencode
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_TTL = 24 * 60 * 60  # One day
+DEFAULT_CACHE_MAX_SIZE = 1024 * 1024 * 1024  # 1 GB
+
+_DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+
+def canonicalize_url(url: str) -> str:
+    """Normalizes a URL so equivalent spellings share a cache entry.
+
+    Lowercases the scheme and host, drops default ports and fragments, and sorts
+    the query parameters.
+    """
+    parsed_url = urlparse(url)
+    scheme = parsed_url.scheme.lower()
+    netloc = (parsed_url.hostname or '').lower()
+    if parsed_url.port and parsed_url.port != _DEFAULT_PORTS.get(scheme):
+        netloc += f":{parsed_url.port}"
+    query = urlencode(sorted(parse_qsl(parsed_url.query, keep_blank_values=True)))
+    return urlunparse((scheme, netloc, parsed_url.path or '/', parsed_url.params, query, ''))
+
+
+class ResponseCache:
+    """
+    On-disk cache of fetched responses shared across runs.
+
+    Entries are keyed by the canonical URL together with the settings used to
+    fetch or render it, so a page rendered with a different resource profile
+    is a different entry. Entries expire after `ttl` seconds. Once the cache
+    grows past `max_size` bytes, the least recently used entries are evicted.
+    """
+
+    def __init__(self, cache_dir: str, max_size: int = DEFAULT_CACHE_MAX_SIZE, ttl: float = DEFAULT_CACHE_TTL):
+        """
+        Args:
+            cache_dir (str): The directory holding the cache entries.
+            max_size (int): The maximum total size of the cache in bytes (default is 1 GB).
+            ttl (float): The number of seconds an entry stays fresh (default is one day).
+        """
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+        self.ttl = ttl
+
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+
+        self._index = None  # key -> [size in bytes, last access time]
+        self._total_size = 0
+
+    @staticmethod
+    def make_key(url: str, settings: dict = None) -> str:
+        """Returns the cache key for a URL fetched with the given settings."""
+        material = canonicalize_url(url) + '\n' + json.dumps(settings or {}, sort_keys=True)
+        return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
+
+    def _load_index(self):
+        """Builds the in-memory LRU index from the files on disk, once per process."""
+        if self._index is not None:
+            return
+        self._index = {}
+        self._total_size = 0
+        if os.path.isdir(self.cache_dir):
+            for shard in os.scandir(self.cache_dir):
+                if not shard.is_dir():
+                    continue
+                for entry in os.scandir(shard.path):
+                    if entry.name.endswith('.json'):
+                        stat = entry.stat()
+                        self._index[entry.name[:-len('.json')]] = [stat.st_size, stat.st_mtime]
+                        self._total_size += stat.st_size
+        logger.debug("Loaded response cache index with %d entries (%d bytes)", len(self._index), self._total_size)
+
+    def _remove(self, key: str):
+        size, _ = self._index.pop(key, (0, 0))
+        self._total_size -= size
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def _evict(self):
+        """Removes least recently used entries until the cache is back under 90% of its size limit."""
+        if self._total_size <= self.max_size:
+            return
+        target = self.max_size * 0.9
+        for key, _ in sorted(self._index.items(), key=lambda item: item[1][1]):
+            if self._total_size <= target:
+                break
+            self._remove(key)
+            self.evictions += 1
+
+    async def get(self, url: str, settings: dict = None) -> Optional[dict]:
+        """Returns the fresh cached entry for a URL, or None on a miss.
+
+        Args:
+            url (str): The URL that was fetched.
+            settings (dict): The settings the URL was fetched or rendered with.
+
+        Returns:
+            Optional[dict]: The stored entry, or None if there is no fresh entry.
+        """
+        self._load_index()
+        key = self.make_key(url, settings)
+        if key not in self._index:
+            self.misses += 1
+            return None
+
+        try:
+            async with aiofiles.open(self._path(key), 'r', encoding='utf-8') as f:
+                entry = json.loads(await f.read())
+        except (OSError, ValueError) as e:
+            logger.warning("Dropping unreadable cache entry for %s: %s", url, e)
+            self._remove(key)
+            self.misses += 1
+            return None
+
+        if time.time() - entry.get('stored_at', 0) > self.ttl:
+            self._remove(key)
+            self.misses += 1
+            return None
+
+        # Record the access so the entry counts as recently used, also for later runs
+        now = time.time()
+        self._index[key][1] = now
+        os.utime(self._path(key), (now, now))
+        self.hits += 1
+        return entry['data']
+
+    async def put(self, url: str, data: dict, settings: dict = None):
+        """Stores an entry for a URL.
+
+        Args:
+            url (str): The URL that was fetched.
+            data (dict): JSON-serializable data to store.
+            settings (dict): The settings the URL was fetched or rendered with.
+        """
+        self._load_index()
+        key = self.make_key(url, settings)
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        payload = json.dumps({'url': url, 'stored_at': time.time(), 'data': data}, ensure_ascii=False)
+        async with aiofiles.open(path, 'w', encoding='utf-8') as f:
+            await f.write(payload)
+
+        size = os.path.getsize(path)
+        previous_size, _ = self._index.get(key, (0, 0))
+        self._index[key] = [size, time.time()]
+        self._total_size += size - previous_size
+        self.stores += 1
+        self._evict()
+
+    def stats(self) -> dict:
+        """Returns the hit, miss, store and eviction counters."""
+        return {'hits': self.hits, 'misses': self.misses, 'stores': self.stores, 'evictions': self.evictions}
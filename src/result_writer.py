@@ -0,0 +1,131 @@
+import time
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from .metrics import PAGES_WRITTEN, WRITE_SECONDS
+from .results_saver import save_markdown_batch
+from .tracing import NOOP_TRACE
+
+logger = logging.getLogger(__name__)
+
+
+class ResultWriter:
+    """
+    Write-behind stage that saves crawled markdown off the crawl loop.
+
+    Pages are queued with `submit` and written in batches by a small pool of
+    writer tasks, each of which hands its batch to a worker thread. The queue is
+    bounded, so when the disk falls behind, `submit` waits instead of letting
+    pending pages pile up in memory.
+    """
+
+    def __init__(self, output_dir: str, num_writers: int = 2, queue_size: int = 100, batch_size: int = 16,
+                 on_written=None):
+        """
+        Args:
+            output_dir (str): The directory where markdown should be saved.
+            num_writers (int): The number of concurrent writer tasks and threads (default is 2).
+            queue_size (int): The number of pages that may wait to be written (default is 100).
+            batch_size (int): The maximum number of pages written per batch (default is 16).
+            on_written (callable): Optional callback called with each URL and whether it was saved, once
+                its write is over (default is None).
+        """
+        self.output_dir = output_dir
+        self.num_writers = num_writers
+        self.batch_size = batch_size
+
+        self.metadata = []  # Metadata entries for pages that were saved
+        self.saved_count = 0
+        self.failed_count = 0
+        self.on_written = on_written
+
+        self._queue = asyncio.Queue(maxsize=queue_size)
+        self._executor = None
+        self._tasks = []
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def start(self):
+        """Starts the writer tasks."""
+        self._executor = ThreadPoolExecutor(max_workers=self.num_writers, thread_name_prefix='result-writer')
+        self._tasks = [asyncio.create_task(self._run()) for _ in range(self.num_writers)]
+
+    async def submit(self, url: str, content: str, trace=NOOP_TRACE):
+        """Queues a page to be saved, waiting while the queue is full.
+
+        The page's trace, if it is traced, is finished once the page is saved.
+        """
+        await self._queue.put((url, content, trace, trace.start_span('write_queue')))
+
+    async def _run(self):
+        while True:
+            batch = [await self._queue.get()]
+            # Take whatever else is already waiting, up to the batch size
+            while len(batch) < self.batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+
+            # Every page taken must be marked done, or close() would wait for it forever
+            written = set()
+            try:
+                await self._write_batch(batch, written)
+            except Exception as e:
+                logger.error("Result writer failed on a batch of %d pages: %s", len(batch), e)
+                for url, _, _, _ in batch:
+                    if url not in written:
+                        self._written(url, None, written)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _written(self, url: str, file_path: str, written: set):
+        """Records the outcome of a page's write and reports it."""
+        written.add(url)
+        if file_path is None:
+            self.failed_count += 1
+            PAGES_WRITTEN.inc(result='failed')
+        else:
+            self.saved_count += 1
+            PAGES_WRITTEN.inc(result='saved')
+            self.metadata.append({
+                'url': url,
+                'markdown_file': file_path
+            })
+        if self.on_written is not None:
+            self.on_written(url, file_path is not None)
+
+    async def _write_batch(self, batch, written: set):
+        for _, _, trace, queued in batch:
+            trace.end_span(queued)
+        spans = [(trace, trace.start_span('save_markdown', batch_size=len(batch))) for _, _, trace, _ in batch]
+
+        start = time.perf_counter()
+        try:
+            file_paths = await asyncio.get_running_loop().run_in_executor(
+                self._executor, save_markdown_batch, [(url, content) for url, content, _, _ in batch],
+                self.output_dir)
+        except Exception as e:
+            logger.error("Failed to save batch of %d pages: %s", len(batch), e)
+            file_paths = [None] * len(batch)
+        WRITE_SECONDS.observe(time.perf_counter() - start)
+
+        for (url, _, trace, _), (_, span), file_path in zip(batch, spans, file_paths):
+            trace.end_span(span)
+            trace.finish(saved=file_path is not None)
+            self._written(url, file_path, written)
+
+    async def close(self):
+        """Waits for all queued pages to be written and stops the writer tasks."""
+        if not self._tasks:
+            return
+        await self._queue.join()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._executor.shutdown(wait=True)
+        logger.info("Result writer saved %d pages, %d failed", self.saved_count, self.failed_count)
@@ -1,12 +1,54 @@
 import os
 import json
+import asyncio
 import logging
 import re
+import hashlib
+import threading
 import aiofiles
 from urllib.parse import urlparse
 
 logger = logging.getLogger(__name__)
 
+MANIFEST_FILENAME = 'manifest.jsonl'
+
+# Maximum length of the human-readable part of a markdown filename
+MAX_SLUG_LENGTH = 80
+
+# Most directories remembered as created; the cache is emptied when it is full
+MAX_CACHED_DIRS = 100_000
+
+# Directories already created by this process, so repeated saves skip the makedirs call. A directory removed
+# since, e.g. by a cleanup of the output directory, is created again when a write into it fails
+_created_dirs = set()
+
+# Serializes the manifest appends of the writer threads, so their lines never interleave
+_manifest_lock = threading.Lock()
+
+
+def makedirs_cached(path: str):
+    """Creates a directory and its parents unless this process has already done so."""
+    if path not in _created_dirs:
+        os.makedirs(path, exist_ok=True)
+        if len(_created_dirs) >= MAX_CACHED_DIRS:
+            _created_dirs.clear()
+        _created_dirs.add(path)
+
+
+def _write_markdown(file_path: str, url: str, content: str):
+    """Writes a markdown file, creating its directory again if it was removed after it was cached."""
+    makedirs_cached(os.path.dirname(file_path))
+    try:
+        f = open(file_path, 'w', encoding='utf-8')
+    except FileNotFoundError:
+        _created_dirs.clear()
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        f = open(file_path, 'w', encoding='utf-8')
+    with f:
+        f.write(f"## {url}\n\n")  # Adding the URL as a header
+        f.write(content)
+
+
 async def ensure_directory_exists(base_output_dir: str, url: str) -> str:
     """Ensures the directory exists for the given URL and returns the full directory path."""
     # Extract domain name from the URL
@@ -15,35 +57,124 @@ async def ensure_directory_exists(base_output_dir: str, url: str) -> str:
     # Create a specific directory for this website
     website_dir = os.path.join(base_output_dir, domain)
     
-    # Create the directory if it doesn't exist
+    # Create the directory if it doesn't exist; not cached, so a removed directory is created again
     os.makedirs(website_dir, exist_ok=True)
     
     return website_dir
 
 
+def markdown_relative_path(url: str) -> str:
+    """Returns the collision-free path of a URL's markdown file, relative to its website directory.
+
+    Files are fanned out over two levels of subdirectories taken from a hash of
+    the full URL, so no single directory grows too large. The filename keeps a
+    readable slug of the URL path and ends with the hash, so distinct URLs such
+    as `/a_b` and `/a/b` never map to the same file.
+    """
+    digest = hashlib.sha256(url.encode('utf-8')).hexdigest()
+
+    parsed_url = urlparse(url)
+    slug = parsed_url.path.strip('/')
+    if parsed_url.query:
+        slug += '_' + parsed_url.query
+
+    # Replace any characters that might not be safe for filenames
+    slug = re.sub(r'[^A-Za-z0-9._-]+', '_', slug).strip('._')[:MAX_SLUG_LENGTH] or 'index'
+
+    return os.path.join(digest[:2], digest[2:4], f"{slug}-{digest[:16]}.md")
+
+
+def _manifest_line(website_dir: str, url: str, file_path: str) -> str:
+    entry = {'url': url, 'markdown_file': os.path.relpath(file_path, website_dir)}
+    return json.dumps(entry, ensure_ascii=False) + '\n'
+
+
+def _append_manifest_lines(website_dir: str, lines: list):
+    with _manifest_lock, open(os.path.join(website_dir, MANIFEST_FILENAME), 'a', encoding='utf-8') as f:
+        f.write(''.join(lines))
+
+
+async def append_manifest(website_dir: str, url: str, file_path: str):
+    """Appends a URL to markdown file mapping to the website's manifest."""
+    await asyncio.to_thread(_append_manifest_lines, website_dir, [_manifest_line(website_dir, url, file_path)])
+
+
+def load_manifest(website_dir: str) -> dict:
+    """Loads a website's manifest as a dictionary mapping URLs to markdown file paths.
+
+    The manifest is an append-only log: a URL saved again, by a re-crawl or a
+    retried save, gets another line, and its last line wins.
+    """
+    manifest = {}
+    manifest_path = os.path.join(website_dir, MANIFEST_FILENAME)
+    if not os.path.exists(manifest_path):
+        return manifest
+
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                entry = json.loads(line)
+                manifest[entry['url']] = os.path.join(website_dir, entry['markdown_file'])
+    return manifest
+
+
 async def save_markdown(url: str, content: str, output_dir: str) -> str:
     """Asynchronously saves the Markdown content to a file and returns the file path."""
     # Ensure the appropriate directory exists for the website
     website_dir = await ensure_directory_exists(output_dir, url)
 
-    # Generating the filename from the URL
-    safe_filename = f"{url.replace('http://', '').replace('https://', '').replace('/', '_')}.md"
-
-    # Replace any characters that might not be safe for filenames
-    safe_filename = re.sub(r'[<>:"/\\|?*]', '_', safe_filename)
-    
-    file_path = os.path.join(website_dir, safe_filename)
-
+    file_path = os.path.join(website_dir, markdown_relative_path(url))
 
     # Write Markdown content to the file
-    async with aiofiles.open(file_path, 'w', encoding='utf-8') as f:
-        await f.write(f"## {url}\n\n")  # Adding the URL as a header
-        await f.write(content)
+    await asyncio.to_thread(_write_markdown, file_path, url, content)
+
+    # Record where the URL was saved
+    await append_manifest(website_dir, url, file_path)
 
     logger.info("Saved markdown content for URL %s at %s", url, file_path)
     return file_path
 
 
+def save_markdown_batch(pages: list, output_dir: str) -> list:
+    """Synchronously saves a batch of (url, content) pages and returns their file paths.
+
+    Meant to run in a worker thread. Manifest entries are appended once per website
+    for the whole batch, under a lock shared by the writer threads, and a page that
+    fails to save gets None as its path. A manifest that cannot be appended to is
+    logged, and its pages keep their paths, since their files were saved.
+    """
+    file_paths = []
+    manifest_lines = {}  # Manifest lines grouped by website directory
+
+    for url, content in pages:
+        website_dir = os.path.join(output_dir, urlparse(url).netloc)
+        file_path = os.path.join(website_dir, markdown_relative_path(url))
+        try:
+            _write_markdown(file_path, url, content)
+        except Exception as e:
+            logger.error("Failed to save markdown content for URL %s: %s", url, e)
+            file_paths.append(None)
+            continue
+
+        manifest_lines.setdefault(website_dir, []).append(_manifest_line(website_dir, url, file_path))
+        file_paths.append(file_path)
+
+    # The markdown files are saved by now, so a manifest that cannot be appended to fails no page
+    for website_dir, lines in manifest_lines.items():
+        try:
+            try:
+                _append_manifest_lines(website_dir, lines)
+            except FileNotFoundError:
+                # The website directory was removed after the files were written; retry once
+                os.makedirs(website_dir, exist_ok=True)
+                _append_manifest_lines(website_dir, lines)
+        except Exception as e:
+            logger.error("Failed to add %d saved pages to the manifest of %s: %s", len(lines), website_dir, e)
+
+    logger.debug("Saved batch of %d markdown files", len(pages))
+    return file_paths
+
+
 async def save_metadata(new_metadata: list, output_dir: str, url: str) -> str:
     """Asynchronously saves metadata to a JSON file, appending new entries if the file exists, and returns the file path."""
     # Ensure the directory for the specific website exists
@@ -0,0 +1,148 @@
+import random
+import asyncio
+import logging
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Optional
+from urllib.parse import urlparse
+
+logger = logging.getLogger(__name__)
+
+# HTTP status codes that indicate a temporary condition on the server side
+RETRYABLE_STATUS_CODES = {408, 425, 429, 500, 502, 503, 504}
+
+# Fragments of browser and network error messages that indicate a transient failure
+RETRYABLE_ERROR_MARKERS = (
+    'timeout', 'timed out', 'net::err_connection', 'net::err_network_changed',
+    'net::err_internet_disconnected', 'net::err_name_not_resolved', 'net::err_empty_response',
+    'connection reset', 'connection refused', 'temporarily unavailable',
+)
+
+
+def parse_retry_after(value: str) -> Optional[float]:
+    """Parses a Retry-After header given either in seconds or as an HTTP date.
+
+    Args:
+        value (str): The value of the Retry-After header.
+
+    Returns:
+        Optional[float]: The number of seconds to wait, or None if the value cannot be parsed.
+    """
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+def _header(headers: dict, name: str) -> Optional[str]:
+    for key, value in (headers or {}).items():
+        if key.lower() == name:
+            return value
+    return None
+
+
+def _is_retryable_error(error) -> bool:
+    if isinstance(error, (asyncio.TimeoutError, TimeoutError, ConnectionError)):
+        return True
+    message = str(error).lower()
+    return any(marker in message for marker in RETRYABLE_ERROR_MARKERS)
+
+
+def classify_failure(result) -> Optional[dict]:
+    """Classifies the outcome of a crawl as success, retryable failure or permanent failure.
+
+    Args:
+        result: A crawl result, or the exception raised while crawling.
+
+    Returns:
+        Optional[dict]: None if the crawl succeeded, otherwise a dictionary with
+        'retryable' (bool), 'reason' (str) and 'retry_after' (float or None).
+    """
+    if isinstance(result, BaseException):
+        return {'retryable': _is_retryable_error(result), 'reason': str(result) or type(result).__name__,
+                'retry_after': None}
+
+    status_code = getattr(result, 'status_code', None)
+    if isinstance(status_code, int) and status_code >= 400:
+        retry_after = None
+        if status_code in RETRYABLE_STATUS_CODES:
+            retry_after = parse_retry_after(_header(getattr(result, 'response_headers', None), 'retry-after'))
+        return {'retryable': status_code in RETRYABLE_STATUS_CODES, 'reason': f"HTTP {status_code}",
+                'retry_after': retry_after}
+
+    if getattr(result, 'success', True) is False:
+        error_message = getattr(result, 'error_message', None) or 'Crawl failed'
+        return {'retryable': _is_retryable_error(error_message), 'reason': error_message, 'retry_after': None}
+
+    return None
+
+
+class RetryPolicy:
+    """Decides whether and when failed URLs are retried.
+
+    Delays grow exponentially with the number of attempts and use full jitter,
+    so retries against a struggling host are spread out rather than synchronized.
+    A Retry-After sent by the server is always waited out.
+    """
+
+    def __init__(self, max_attempts: int = 3, max_retries_per_host: int = 100,
+                 base_delay: float = 1.0, max_delay: float = 60.0, max_retry_after: float = 300.0):
+        """
+        Args:
+            max_attempts (int): The maximum number of attempts per URL, including the first (default is 3).
+            max_retries_per_host (int): The maximum number of retries per host for the whole run (default is 100).
+            base_delay (float): The delay cap in seconds before the first retry (default is 1.0).
+            max_delay (float): The maximum backoff delay in seconds (default is 60.0).
+            max_retry_after (float): Retry-After values above this many seconds are treated as permanent (default is 300.0).
+        """
+        self.max_attempts = max_attempts
+        self.max_retries_per_host = max_retries_per_host
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_retry_after = max_retry_after
+
+        self.attempts = {}  # Number of failed attempts per URL
+        self.host_retries = {}  # Number of retries scheduled per host
+
+    def backoff(self, attempt: int) -> float:
+        """Returns a jittered exponential delay for the given attempt number."""
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** (attempt - 1))))
+
+    def next_delay(self, url: str, failure: dict) -> Optional[float]:
+        """Records a failed attempt and returns how long to wait before retrying.
+
+        Args:
+            url (str): The URL that failed.
+            failure (dict): The failure as returned by `classify_failure`.
+
+        Returns:
+            Optional[float]: The delay in seconds, or None if the URL should not be retried.
+        """
+        attempt = self.attempts.get(url, 0) + 1
+        self.attempts[url] = attempt
+        host = urlparse(url).netloc
+
+        if not failure['retryable']:
+            return None
+        if attempt >= self.max_attempts:
+            logger.warning("Giving up on %s after %d attempts: %s", url, attempt, failure['reason'])
+            return None
+        if self.host_retries.get(host, 0) >= self.max_retries_per_host:
+            logger.warning("Retry budget exhausted for host %s; not retrying %s", host, url)
+            return None
+
+        retry_after = failure.get('retry_after')
+        if retry_after is not None and retry_after > self.max_retry_after:
+            logger.warning("Retry-After of %.0fs for %s exceeds the limit; not retrying", retry_after, url)
+            return None
+
+        self.host_retries[host] = self.host_retries.get(host, 0) + 1
+        return max(self.backoff(attempt), retry_after or 0.0)
@@ -31,6 +31,30 @@ def fetch_robots_txt(url: str) -> dict:
         return {}
 
 
+async def fetch_robots_txt_async(url: str, session) -> dict:
+    """Fetches the robots.txt file for the given base URL over a shared aiohttp session.
+
+    Args:
+        url (str): The base URL to fetch the robots.txt file from.
+        session (aiohttp.ClientSession): The HTTP session to use.
+
+    Returns:
+        dict: Parsed robots.txt rules, or an empty dict if an error occurs.
+    """
+    parsed_url = urlparse(url)
+    robots_url = urljoin(f"{parsed_url.scheme}://{parsed_url.netloc}/", 'robots.txt')
+
+    try:
+        async with session.get(robots_url, timeout=10) as response:
+            response.raise_for_status()
+            robots_txt = await response.text()
+        logger.info("Successfully fetched robots.txt from %s", robots_url)
+        return parse_robots_txt(robots_txt)
+    except Exception as e:
+        logger.error(f"Error fetching robots.txt for {url}: {e}")
+        return {}
+
+
 def parse_robots_txt(robots_txt: str) -> dict:
     """Parses the content of robots.txt and extracts allow/disallow rules.
 
@@ -0,0 +1,390 @@
+import os
+import json
+import time
+import uuid
+import asyncio
+import sqlite3
+import logging
+from typing import List, Optional
+from aiohttp import ClientSession, web
+from .content_types import DEFAULT_PREFLIGHT, ContentTypeFilter
+from .crawl_parallel import crawl_parallel, create_crawler
+from .discovery import discover_site_urls
+from .documents import DocumentExtractor
+from .metrics import JOBS, PROMETHEUS_CONTENT_TYPE, REGISTRY
+from .politeness import DEFAULT_HOST_DELAY, PolitenessScheduler
+from .resource_profiles import DEFAULT_RESOURCE_PROFILE, ResourceBlocker
+from .response_cache import DEFAULT_CACHE_MAX_SIZE, DEFAULT_CACHE_TTL, ResponseCache
+from .results_saver import load_manifest
+from .retry import RetryPolicy
+from .timeouts import DEFAULT_PAGE_TIMEOUT
+
+logger = logging.getLogger(__name__)
+
+JOB_STATUSES = ('queued', 'running', 'succeeded', 'failed', 'cancelled')
+FINISHED_STATUSES = ('succeeded', 'failed', 'cancelled')
+
+# Pages a single job may render at once unless it asks for fewer, and the most it may ask for
+DEFAULT_JOB_CONCURRENCY = 3
+MAX_JOB_CONCURRENCY = 10
+
+
+class JobStore:
+    """
+    Persists crawl jobs in a local SQLite database.
+
+    Jobs are stored with their options, status and crawl statistics, so the
+    service can pick up queued and interrupted jobs after a restart.
+    """
+
+    def __init__(self, db_path: str):
+        """
+        Args:
+            db_path (str): The path of the SQLite database file.
+        """
+        if os.path.dirname(db_path):
+            os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self._db = sqlite3.connect(db_path)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute('''
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                url TEXT NOT NULL,
+                options TEXT NOT NULL,
+                status TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL,
+                error TEXT,
+                stats TEXT
+            )
+        ''')
+        self._db.commit()
+
+    @staticmethod
+    def _to_dict(row) -> dict:
+        job = dict(row)
+        job['options'] = json.loads(job['options'])
+        job['stats'] = json.loads(job['stats']) if job['stats'] else None
+        return job
+
+    def create(self, url: str, options: dict) -> dict:
+        """Stores a new queued job and returns it."""
+        now = time.time()
+        job_id = uuid.uuid4().hex
+        self._db.execute('INSERT INTO jobs (id, url, options, status, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?)',
+                         (job_id, url, json.dumps(options), 'queued', now, now))
+        self._db.commit()
+        return self.get(job_id)
+
+    def get(self, job_id: str) -> Optional[dict]:
+        """Returns a job, or None if it does not exist."""
+        row = self._db.execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        return self._to_dict(row) if row else None
+
+    def list(self, status: str = None) -> List[dict]:
+        """Returns all jobs, or the jobs with the given status, oldest first."""
+        if status is None:
+            rows = self._db.execute('SELECT * FROM jobs ORDER BY created_at')
+        else:
+            rows = self._db.execute('SELECT * FROM jobs WHERE status = ? ORDER BY created_at', (status,))
+        return [self._to_dict(row) for row in rows]
+
+    def update(self, job_id: str, status: str, error: str = None, stats: dict = None):
+        """Records a job's new status, together with its error or statistics."""
+        self._db.execute('UPDATE jobs SET status = ?, error = ?, stats = ?, updated_at = ? WHERE id = ?',
+                         (status, error, json.dumps(stats) if stats is not None else None, time.time(), job_id))
+        self._db.commit()
+
+    def requeue_interrupted(self) -> int:
+        """Puts jobs that were running when the service stopped back in the queue, returning how many."""
+        cursor = self._db.execute("UPDATE jobs SET status = 'queued', updated_at = ? WHERE status = 'running'",
+                                  (time.time(),))
+        self._db.commit()
+        return cursor.rowcount
+
+    def close(self):
+        """Closes the database."""
+        self._db.close()
+
+
+def parse_job_options(body: dict) -> dict:
+    """
+    Validate the options of a submitted job and fill in defaults.
+
+    Args:
+        body (dict): The JSON body of the request.
+
+    Returns:
+        dict: The job options.
+
+    Raises:
+        ValueError: If an option is missing or invalid.
+    """
+    if not isinstance(body, dict) or not isinstance(body.get('url'), str) or not body['url']:
+        raise ValueError("'url' is required")
+
+    options = {
+        'crawl_all': body.get('crawl_all', False),
+        'max_pages': body.get('max_pages', 50),
+        'check_robots': body.get('check_robots', True),
+        'max_concurrent': body.get('max_concurrent', DEFAULT_JOB_CONCURRENCY),
+    }
+    for name in ('crawl_all', 'check_robots'):
+        if not isinstance(options[name], bool):
+            raise ValueError(f"'{name}' must be a boolean")
+    # bool is a subclass of int, so true and false would otherwise pass as 1 and 0
+    for name in ('max_pages', 'max_concurrent'):
+        if isinstance(options[name], bool):
+            raise ValueError(f"'{name}' must be an integer")
+    if not isinstance(options['max_pages'], int) or options['max_pages'] < 1:
+        raise ValueError("'max_pages' must be a positive integer")
+    if not isinstance(options['max_concurrent'], int) or not 1 <= options['max_concurrent'] <= MAX_JOB_CONCURRENCY:
+        raise ValueError(f"'max_concurrent' must be between 1 and {MAX_JOB_CONCURRENCY}")
+    return options
+
+
+class CrawlService:
+    """
+    Runs crawl jobs in a long-lived process.
+
+    A single browser, HTTP session, politeness scheduler, content type filter,
+    document extractor and response cache are shared by all jobs, as are the
+    URL rules. Up to `max_running_jobs` jobs run at the same time, each
+    rendering at most its own `max_concurrent` pages, and all of them together
+    at most `max_pages_in_flight` pages. Each job writes its results to its own
+    directory under `output_dir/jobs`.
+    """
+
+    def __init__(self, output_dir: str, db_path: str, max_running_jobs: int = 4, max_pages_in_flight: int = 10,
+                 max_attempts: int = 3, page_timeout: float = DEFAULT_PAGE_TIMEOUT,
+                 resource_profile: str = DEFAULT_RESOURCE_PROFILE, host_delay: float = DEFAULT_HOST_DELAY,
+                 url_rules=None, preflight: str = DEFAULT_PREFLIGHT, document_workers: int = None,
+                 cache_dir: str = None, cache_ttl: float = DEFAULT_CACHE_TTL,
+                 cache_max_size: int = DEFAULT_CACHE_MAX_SIZE):
+        """
+        Args:
+            output_dir (str): The directory where job results should be saved.
+            db_path (str): The path of the SQLite database holding the jobs.
+            max_running_jobs (int): The maximum number of jobs running at once (default is 4).
+            max_pages_in_flight (int): The maximum number of pages rendered at once across all jobs (default is 10).
+            max_attempts (int): The maximum number of attempts per page (default is 3).
+            page_timeout (float): Wall-clock budget in seconds for each page (default is DEFAULT_PAGE_TIMEOUT).
+            resource_profile (str): Name of the resource blocking profile of the shared browser (default is 'full').
+            host_delay (float): Seconds between two pages on the same host (default is 1.0).
+            url_rules (UrlRules): The rules of the URLs worth crawling (default is DEFAULT_URL_RULES).
+            preflight (str): How URLs are classified before rendering, one of PREFLIGHT_MODES (default is 'head').
+            document_workers (int): Processes extracting the text of PDFs and office documents; 0 skips
+                documents (default is None, the number of CPUs).
+            cache_dir (str): Directory of a response cache shared across jobs and runs (default is None, disabled).
+            cache_ttl (float): Seconds a cached response stays fresh (default is DEFAULT_CACHE_TTL).
+            cache_max_size (int): Maximum size of the response cache in bytes (default is DEFAULT_CACHE_MAX_SIZE).
+        """
+        self.output_dir = output_dir
+        self.store = JobStore(db_path)
+        self.max_attempts = max_attempts
+        self.page_timeout = page_timeout
+        self.resource_profile = resource_profile
+        self.url_rules = url_rules
+        self.preflight = preflight
+        self.document_workers = document_workers
+        self.cache_dir = cache_dir
+        self.cache_ttl = cache_ttl
+        self.cache_max_size = cache_max_size
+
+        self._job_slots = asyncio.Semaphore(max_running_jobs)
+        self._page_slots = asyncio.Semaphore(max_pages_in_flight)
+        self._scheduler = PolitenessScheduler(min_delay=host_delay)
+        self._crawler = None
+        self._session = None
+        self._content_filter = None
+        self._documents = None
+        self._cache = None
+        self._tasks = {}  # job_id -> asyncio.Task
+        self._cancelled = set()  # IDs of jobs cancelled through the API
+
+    def job_output_dir(self, job_id: str) -> str:
+        """Returns the directory a job saves its results to."""
+        return os.path.join(self.output_dir, 'jobs', job_id)
+
+    async def start(self):
+        """Starts the shared browser, HTTP session and extractors, and resumes queued and interrupted jobs."""
+        self._crawler = create_crawler(ResourceBlocker(self.resource_profile))
+        await self._crawler.start()
+        self._session = ClientSession()
+        self._content_filter = ContentTypeFilter.for_mode(self.preflight)
+        self._documents = DocumentExtractor.for_workers(self.document_workers)
+        if self.cache_dir:
+            self._cache = ResponseCache(self.cache_dir, max_size=self.cache_max_size, ttl=self.cache_ttl)
+
+        requeued = self.store.requeue_interrupted()
+        if requeued:
+            logger.info("Requeued %d jobs interrupted by the last shutdown", requeued)
+        for job in self.store.list('queued'):
+            self._schedule(job['id'])
+
+    async def close(self):
+        """Stops running jobs, leaving them queued for the next start, and releases the shared resources."""
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if self._session is not None:
+            await self._session.close()
+        if self._crawler is not None:
+            await self._crawler.close()
+        if self._content_filter is not None:
+            await self._content_filter.close()
+        if self._documents is not None:
+            await self._documents.close()
+        if self._cache is not None:
+            logger.info("Response cache: %s", self._cache.stats())
+        self.store.close()
+
+    def submit(self, url: str, options: dict) -> dict:
+        """Queues a new job and returns it."""
+        job = self.store.create(url, options)
+        logger.info("Queued job %s for %s", job['id'], url)
+        self._schedule(job['id'])
+        return job
+
+    def cancel(self, job_id: str) -> Optional[dict]:
+        """Cancels a queued or running job, returning it, or None if it does not exist."""
+        job = self.store.get(job_id)
+        if job is None or job['status'] in FINISHED_STATUSES:
+            return job
+        self._cancelled.add(job_id)
+        if job['status'] == 'queued':
+            self.store.update(job_id, 'cancelled')
+        task = self._tasks.get(job_id)
+        if task is not None:
+            task.cancel()
+        return self.store.get(job_id)
+
+    def results(self, job_id: str) -> List[dict]:
+        """Returns the URLs a job has saved so far, with their markdown files."""
+        jobs_dir = self.job_output_dir(job_id)
+        results = []
+        if os.path.isdir(jobs_dir):
+            for site in sorted(os.listdir(jobs_dir)):
+                for url, markdown_file in load_manifest(os.path.join(jobs_dir, site)).items():
+                    results.append({'url': url, 'markdown_file': markdown_file})
+        return results
+
+    def _schedule(self, job_id: str):
+        self._tasks[job_id] = asyncio.create_task(self._run_job(job_id))
+
+    async def _run_job(self, job_id: str):
+        try:
+            async with self._job_slots:
+                job = self.store.get(job_id)
+                if job is None or job['status'] != 'queued':
+                    return
+                self.store.update(job_id, 'running')
+                logger.info("Running job %s for %s", job_id, job['url'])
+                options = job['options']
+                try:
+                    urls = await discover_site_urls(job['url'], self._session, options['crawl_all'],
+                                                    options['max_pages'], options['check_robots'], self._cache,
+                                                    url_rules=self.url_rules)
+                    if not urls:
+                        # The URL is invalid, or robots.txt or the URL rules leave nothing to crawl
+                        raise ValueError(f"No crawlable URLs found for {job['url']}")
+                    stats = await crawl_parallel(
+                        urls, max_concurrent=options['max_concurrent'], output_dir=self.job_output_dir(job_id),
+                        retry_policy=RetryPolicy(max_attempts=self.max_attempts), page_timeout=self.page_timeout,
+                        resource_profile=self.resource_profile, cache=self._cache, crawler=self._crawler,
+                        scheduler=self._scheduler, page_slots=self._page_slots, content_filter=self._content_filter,
+                        content_handlers=self._documents and self._documents.handlers)
+                except asyncio.CancelledError:
+                    # A job stopped by a shutdown runs again after the next start
+                    self.store.update(job_id, 'cancelled' if job_id in self._cancelled else 'queued')
+                    raise
+                except Exception as e:
+                    logger.error("Job %s failed: %s", job_id, e)
+                    self.store.update(job_id, 'failed', error=str(e))
+                else:
+                    logger.info("Job %s finished: %s", job_id, stats)
+                    self.store.update(job_id, 'succeeded', stats=stats)
+        finally:
+            self._tasks.pop(job_id, None)
+            self._cancelled.discard(job_id)
+
+
+def create_app(service: CrawlService) -> web.Application:
+    """
+    Build the HTTP/JSON API of a crawl service.
+
+    Routes:
+        POST /jobs: Submit a job; the body holds 'url' and optional 'crawl_all', 'max_pages',
+            'check_robots' and 'max_concurrent'.
+        GET /jobs: List jobs, optionally filtered with ?status=.
+        GET /jobs/{job_id}: Get a job's status.
+        POST /jobs/{job_id}/cancel: Cancel a queued or running job.
+        GET /jobs/{job_id}/results: List the pages a job has saved.
+        GET /metrics: The crawler metrics in the Prometheus text format, or as JSON with ?format=json.
+    """
+    routes = web.RouteTableDef()
+
+    def get_job_or_404(request) -> dict:
+        job = service.store.get(request.match_info['job_id'])
+        if job is None:
+            raise web.HTTPNotFound(text=json.dumps({'error': 'Job not found'}), content_type='application/json')
+        return job
+
+    @routes.post('/jobs')
+    async def submit_job(request):
+        try:
+            body = await request.json()
+            options = parse_job_options(body)
+        except ValueError as e:
+            return web.json_response({'error': str(e)}, status=400)
+        return web.json_response(service.submit(body['url'], options), status=201)
+
+    @routes.get('/jobs')
+    async def list_jobs(request):
+        status = request.query.get('status')
+        if status is not None and status not in JOB_STATUSES:
+            return web.json_response({'error': f"Unknown status: {status}"}, status=400)
+        return web.json_response({'jobs': service.store.list(status)})
+
+    @routes.get('/jobs/{job_id}')
+    async def get_job(request):
+        return web.json_response(get_job_or_404(request))
+
+    @routes.post('/jobs/{job_id}/cancel')
+    async def cancel_job(request):
+        job = get_job_or_404(request)
+        if job['status'] in FINISHED_STATUSES:
+            return web.json_response({'error': f"Job already {job['status']}"}, status=409)
+        return web.json_response(service.cancel(job['id']))
+
+    @routes.get('/jobs/{job_id}/results')
+    async def get_results(request):
+        job = get_job_or_404(request)
+        return web.json_response({'job_id': job['id'], 'results': service.results(job['id'])})
+
+    @routes.get('/metrics')
+    async def get_metrics(request):
+        for status in JOB_STATUSES:
+            JOBS.set(len(service.store.list(status)), status=status)
+        if request.query.get('format') == 'json':
+            return web.json_response(REGISTRY.summary())
+        return web.Response(text=REGISTRY.render_prometheus(), headers={'Content-Type': PROMETHEUS_CONTENT_TYPE})
+
+    app = web.Application()
+    app.add_routes(routes)
+    return app
+
+
+async def run_service(service: CrawlService, host: str = '127.0.0.1', port: int = 8080):
+    """Starts a crawl service and serves its API until the process is stopped."""
+    await service.start()
+    runner = web.AppRunner(create_app(service))
+    await runner.setup()
+    try:
+        await web.TCPSite(runner, host, port).start()
+        logger.info("Crawl service listening on http://%s:%d", host, port)
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
+        await service.close()
@@ -9,60 +9,115 @@ from src.url_check import is_valid_format
 # Setup logging
 logger = logging.getLogger(__name__)
 
-async def fetch_sitemap_urls(sitemap_url: str, session: ClientSession = None, max_pages: int = None) -> list:
+async def fetch_text(url: str, session: ClientSession, cache=None) -> str:
     """
-    Fetches URLs from a sitemap, including nested sitemaps.
+    Fetches the body of a URL as text, going through the response cache if one is given.
 
     Args:
-        sitemap_url (str): The URL of the sitemap or sitemap index.
+        url (str): The URL to fetch.
+        session (ClientSession): The HTTP session to use.
+        cache (ResponseCache): Optional cache of earlier responses (default is None).
 
     Returns:
-        list: A list of URLs found in the sitemap, or an empty list if an error occurs.
+        str: The response body.
+    """
+    if cache is not None:
+        cached = await cache.get(url, {'fetcher': 'aiohttp'})
+        if cached is not None:
+            logger.debug(f"Using cached response for {url}")
+            return cached['body']
+
+    async with session.get(url, timeout=10) as response:  # 10-second timeout
+        response.raise_for_status()  # Raise an error for bad responses
+        content = await response.text()
+
+    if cache is not None:
+        await cache.put(url, {'body': content}, {'fetcher': 'aiohttp'})
+    return content
+
+
+def _parse_priority(tag) -> float:
+    """Returns the value of a <priority> tag, or None if it is missing or invalid."""
+    try:
+        return float(tag.text) if tag is not None else None
+    except ValueError:
+        return None
+
+
+def parse_sitemap(content: str, sitemap_url: str, max_entries: int = None) -> tuple:
+    """
+    Parses a sitemap or sitemap index.
+
+    Args:
+        content (str): The XML of the sitemap.
+        sitemap_url (str): The URL of the sitemap, for logging.
+        max_entries (int): The maximum number of entries to extract (default is None, no limit).
+
+    Returns:
+        tuple: The URLs of the nested sitemaps of a sitemap index, and the entries of a sitemap,
+        as returned by `fetch_sitemap_entries`.
+    """
+    nested_sitemap_urls = []
+    entries = []
+    soup = BeautifulSoup(content, 'xml')
+
+    # Check if this is a sitemap index (contains links to other sitemaps)
+    sitemap_tags = soup.find_all('sitemap')
+    if sitemap_tags:
+        logger.info(f"Found nested sitemaps in: {sitemap_url}")
+        nested_sitemap_urls = [sitemap.find('loc').text for sitemap in sitemap_tags]
+    else:
+        logger.info(f"Extracting URLs from: {sitemap_url}")
+        # Extract URLs from the current sitemap
+        for url_tag in soup.find_all('url'):
+            if max_entries is not None and len(entries) >= max_entries:
+                logger.info(f"Reached max limit of {max_entries} URLs. Stopping further extraction.")
+                break
+
+            loc = url_tag.find('loc')
+            if loc:
+                lastmod = url_tag.find('lastmod')
+                entries.append({
+                    'url': loc.text.strip(),
+                    'priority': _parse_priority(url_tag.find('priority')),
+                    'lastmod': lastmod.text.strip() if lastmod is not None else None,
+                })
+    return nested_sitemap_urls, entries
+
+
+async def iter_sitemap_entries(sitemap_url: str, session: ClientSession = None, max_entries: int = None,
+                               cache=None):
+    """
+    Yields the entries of a sitemap as each sitemap file is parsed, including nested sitemaps.
+
+    Consumers can start on the pages of the first sitemap while the rest of a
+    sitemap index is still being fetched.
+
+    Args:
+        sitemap_url (str): The URL of the sitemap or sitemap index.
+        session (ClientSession): Optional HTTP session to reuse (default is None, a new session is opened).
+        max_entries (int): The maximum number of entries to yield (default is None, no limit).
+        cache (ResponseCache): Optional cache of earlier responses (default is None).
+
+    Yields:
+        list: The entries of one sitemap file, as returned by `fetch_sitemap_entries`. A sitemap that
+        fails to load is logged and skipped.
     """
     if session is None:
         async with ClientSession() as session:
-            return await fetch_sitemap_urls(sitemap_url, session, max_pages)
-
+            async for entries in iter_sitemap_entries(sitemap_url, session, max_entries, cache):
+                yield entries
+        return
 
     logger.info(f"Fetching sitemap: {sitemap_url}")
-    urls = []
+    nested_sitemap_urls = []
+    entries = []
 
     try:
-        async with session.get(sitemap_url, timeout=10) as response:  # 10-second timeout
-            response.raise_for_status()  # Raise an error for bad responses
-            content = await response.text()
-
-            # Parse the sitemap
-            soup = BeautifulSoup(content, 'xml')
-
-            # Check if this is a sitemap index (contains links to other sitemaps)
-            sitemap_tags = soup.find_all('sitemap')
-            if sitemap_tags:
-                logger.info(f"Found nested sitemaps in: {sitemap_url}")
-                nested_sitemap_urls = [sitemap.find('loc').text for sitemap in sitemap_tags]
-                
-                for nested_sitemap_url in nested_sitemap_urls:
-                    if max_pages is not None and len(urls) >= max_pages:
-                        logger.info(f"Reached max limit of {max_pages} URLs. Stopping further extraction.")
-                        break
-                    
-                    nested_urls = await fetch_sitemap_urls(nested_sitemap_url, session, max_pages)
-                    urls.extend(nested_urls)
-
-            else:
-                logger.info(f"Extracting URLs from: {sitemap_url}")
-                # Extract URLs from the current sitemap
-                url_tags = soup.find_all('url')
-                for url_tag in url_tags:
-                    if max_pages is not None and len(urls) >= max_pages:
-                        logger.info(f"Reached max limit of {max_pages} URLs. Stopping further extraction.")
-                        break
-
-                    loc = url_tag.find('loc')
-                    if loc:
-                        urls.append(loc.text)                    
-                    # urls.extend(url.find('loc').text for url in url_tags if url.find('loc'))
-                
+        content = await fetch_text(sitemap_url, session, cache)
+
+        # Parsing a large sitemap takes a while, so it runs off the event loop
+        nested_sitemap_urls, entries = await asyncio.to_thread(parse_sitemap, content, sitemap_url, max_entries)
     except asyncio.TimeoutError:
         logger.error(f"Timeout while fetching sitemap: {sitemap_url}")
     except aiohttp.ClientError as e:
@@ -70,30 +125,94 @@ async def fetch_sitemap_urls(sitemap_url: str, session: ClientSession = None, ma
     except Exception as e:
         logger.error(f"Unexpected error while fetching sitemap {sitemap_url}: {e}")
 
+    if entries:
+        yield entries
+
+    found = 0
+    for nested_sitemap_url in nested_sitemap_urls:
+        if max_entries is not None and found >= max_entries:
+            logger.info(f"Reached max limit of {max_entries} URLs. Stopping further extraction.")
+            break
 
-    return urls
+        remaining = max_entries - found if max_entries is not None else None
+        async for nested_entries in iter_sitemap_entries(nested_sitemap_url, session, remaining, cache):
+            found += len(nested_entries)
+            yield nested_entries
 
-async def get_sitemap_urls(url: str, max_pages: int = None) -> list:
+
+async def fetch_sitemap_entries(sitemap_url: str, session: ClientSession = None, max_entries: int = None,
+                                cache=None) -> list:
     """
-    Constructs the sitemap URL and fetches all URLs from it, including nested sitemaps.
+    Fetches the entries of a sitemap, including nested sitemaps.
+
+    Args:
+        sitemap_url (str): The URL of the sitemap or sitemap index.
+        session (ClientSession): Optional HTTP session to reuse (default is None, a new session is opened).
+        max_entries (int): The maximum number of entries to collect (default is None, no limit).
+        cache (ResponseCache): Optional cache of earlier responses (default is None).
+
+    Returns:
+        list: Dictionaries with the 'url' and, when the sitemap gives them, the 'priority' (float)
+        and 'lastmod' (str) of each page, or an empty list if an error occurs.
+    """
+    entries = []
+    async for batch in iter_sitemap_entries(sitemap_url, session, max_entries, cache):
+        entries.extend(batch)
+    return entries
+
+
+async def fetch_sitemap_urls(sitemap_url: str, session: ClientSession = None, max_pages: int = None, cache=None) -> list:
+    """
+    Fetches URLs from a sitemap, including nested sitemaps.
+
+    Args:
+        sitemap_url (str): The URL of the sitemap or sitemap index.
+        cache (ResponseCache): Optional cache of earlier responses (default is None).
+
+    Returns:
+        list: A list of URLs found in the sitemap, or an empty list if an error occurs.
+    """
+    entries = await fetch_sitemap_entries(sitemap_url, session, max_pages, cache)
+    return [entry['url'] for entry in entries]
+
+def default_sitemap_url(url: str) -> str:
+    """Returns the conventional sitemap.xml location on a website's home page."""
+    parsed_url = urlparse(url)
+    return f"{parsed_url.scheme}://{parsed_url.netloc}/sitemap.xml"
+
+
+async def get_sitemap_entries(url: str, max_entries: int = None, cache=None, session: ClientSession = None) -> list:
+    """
+    Fetches the entries of a website's sitemap.xml, including nested sitemaps.
 
     Args:
         url (str): The URL of the website.
+        max_entries (int): The maximum number of entries to collect (default is None, no limit).
+        cache (ResponseCache): Optional cache of earlier responses (default is None).
+        session (ClientSession): Optional HTTP session to reuse (default is None, a new session is opened).
 
     Returns:
-        list: A list of all URLs found in the sitemap.
+        list: The sitemap entries, as returned by `fetch_sitemap_entries`.
     """
     if not is_valid_format(url):
         logger.error(f"Invalid URL: {url}")
         return []
-    # Parse the URL into components
-    parsed_url = urlparse(url)
+    return await fetch_sitemap_entries(default_sitemap_url(url), session, max_entries, cache)
 
-    # Construct the base URL (homepage)
-    # Ensure it's always the home page
-    base_url = f"{parsed_url.scheme}://{parsed_url.netloc}/"
 
-    sitemap_url = base_url + 'sitemap.xml'
+async def get_sitemap_urls(url: str, max_pages: int = None, cache=None, session: ClientSession = None) -> list:
+    """
+    Constructs the sitemap URL and fetches all URLs from it, including nested sitemaps.
 
-    async with ClientSession() as session:
-        return await fetch_sitemap_urls(sitemap_url, session, max_pages)
+    Args:
+        url (str): The URL of the website.
+        cache (ResponseCache): Optional cache of earlier responses (default is None).
+        session (ClientSession): Optional HTTP session to reuse (default is None, a new session is opened).
+
+    Returns:
+        list: A list of all URLs found in the sitemap.
+    """
+    if not is_valid_format(url):
+        logger.error(f"Invalid URL: {url}")
+        return []
+    return await fetch_sitemap_urls(default_sitemap_url(url), session, max_pages, cache)
@@ -2,11 +2,13 @@ import scrapy
 import json
 import os
 from urllib.parse import urlparse
+from .url_store import UrlStore
+from .url_rules import DEFAULT_URL_RULES
 
 class SitemapSpider(scrapy.Spider):
     name = "sitemap"
 
-    def __init__(self, start_url=None, output_file='sitemap.json', max_pages=50, *args, **kwargs):
+    def __init__(self, start_url=None, output_file='sitemap.json', max_pages=50, url_rules=None, *args, **kwargs):
         super(SitemapSpider, self).__init__(*args, **kwargs)
         if start_url:
             self.start_urls = [start_url]
@@ -24,10 +26,11 @@ class SitemapSpider(scrapy.Spider):
 
         self.output_file = os.path.join(self.output_dir, output_file)  # Full path for the output file
         
-        self.urls = set()  # Initialize a set to hold unique URLs
+        self.urls = UrlStore()  # Compact set of the unique URLs found
 
         self.max_pages = max_pages  # Maximum number of pages to crawl
         self.crawled_pages = 0  # Counter to track crawled pages
+        self.url_rules = url_rules or DEFAULT_URL_RULES  # Which links are worth following
         
 
     def parse(self, response):
@@ -39,29 +42,23 @@ class SitemapSpider(scrapy.Spider):
 
         domain = urlparse(response.url).netloc
         
-        # Extract all links from the page
-        for href in response.css('a::attr(href)').getall():
-            absolute_url = response.urljoin(href)
-            link_domain = urlparse(absolute_url).netloc
-            
-            # Check if the URL is internal, does not point to files or images,
-            # and does not contain query parameters
-            if (link_domain == domain and
-                    not absolute_url.endswith(('.jpg', '.jpeg', '.png', '.gif', 
-                                               '.pdf', '.doc', '.docx', '.xls', '.xlsx')) and
-                    not '?' in absolute_url):  # Exclude URLs with query parameters
-                
-                # Only store unique URLs
-                if absolute_url not in self.urls:
-                    self.urls.add(absolute_url)
-                    self.crawled_pages += 1
+        # Extract all internal links from the page
+        links = [response.urljoin(href) for href in response.css('a::attr(href)').getall()]
+        links = [link for link in links if urlparse(link).netloc == domain]
 
-                    # Yield the URL to be collected by the main script
-                    yield {'url': absolute_url}
+        # Drop the links the URL rules exclude, such as files, images and query strings, in one batch
+        for absolute_url in self.url_rules.filter(links, followed_links=True):
+            # Only store unique URLs
+            if absolute_url not in self.urls:
+                self.urls.add(absolute_url)
+                self.crawled_pages += 1
 
-                    # Stop crawling if the limit is reached after increment
-                    if self.crawled_pages >= self.max_pages:
-                        break
+                # Yield the URL to be collected by the main script
+                yield {'url': absolute_url}
+
+                # Stop crawling if the limit is reached after increment
+                if self.crawled_pages >= self.max_pages:
+                    break
 
         # At the end of parsing, write URLs to the output file
         if response.url == self.start_urls[0]:  # Check if it's the first response to avoid duplicates
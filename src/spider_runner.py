@@ -9,18 +9,21 @@ logger = logging.getLogger(__name__)
 
 class SpiderRunner:
     def __init__(self):
-        self.urls = []
+        self.urls = []  # The URLs found, in the order the spider found them; the spider yields each once
 
-    def run_spider(self, start_url, output_file='sitemap.json', max_pages=50):
-        """Starts the sitemap spider to crawl URLs."""
+    def run_spider(self, start_url, output_file='sitemap.json', max_pages=50, url_rules=None):
+        """Starts the sitemap spider to crawl URLs, following the links that pass the URL rules."""
         process = CrawlerProcess(get_project_settings())
         
         # Connect to the item scraped signal
         dispatcher.connect(self.collect_urls, signal=scrapy.signals.item_scraped)
         
         # Start the crawler
-        process.crawl(SitemapSpider, start_url=start_url, output_file=output_file, max_pages=max_pages)
-        process.start()  # The script will block here until the crawling is finished
+        process.crawl(SitemapSpider, start_url=start_url, output_file=output_file, max_pages=max_pages,
+                      url_rules=url_rules)
+        # Blocks until the crawling is finished; signal handlers can only be installed on the main thread,
+        # and the crawl runs the spider on a worker thread
+        process.start(install_signal_handlers=False)
         return self.urls
 
     def collect_urls(self, item, response, **kwargs):
@@ -0,0 +1,116 @@
+import time
+import asyncio
+import logging
+from urllib.parse import urlparse
+
+logger = logging.getLogger(__name__)
+
+# Default wall-clock budget in seconds for rendering a single page
+DEFAULT_PAGE_TIMEOUT = 60.0
+
+# How long to wait for a hung browser page to close before giving up on it
+SESSION_TEARDOWN_TIMEOUT = 10.0
+
+
+class PageTimeoutError(asyncio.TimeoutError):
+    """Raised when a page does not finish within its wall-clock budget."""
+
+
+async def discard_session(crawler, session_id: str):
+    """Closes the browser page of a session so the next crawl gets a fresh one."""
+    try:
+        await asyncio.wait_for(crawler.crawler_strategy.kill_session(session_id), timeout=SESSION_TEARDOWN_TIMEOUT)
+    except Exception as e:
+        logger.warning("Failed to tear down browser session %s: %s", session_id, e)
+
+
+async def arun_with_timeout(crawler, url: str, timeout: float, session_id: str = None, **kwargs):
+    """
+    Crawl a URL, cancelling the crawl if it exceeds its wall-clock budget.
+
+    When the budget runs out, the crawl is cancelled and its browser page is
+    torn down, so a page that never finishes loading cannot hold a browser
+    slot.
+
+    Args:
+        crawler (AsyncWebCrawler): The crawler to use.
+        url (str): The URL to crawl.
+        timeout (float): The budget in seconds, or None for no limit.
+        session_id (str): The browser session of the crawl (default is None).
+        **kwargs: Additional arguments passed to `crawler.arun`.
+
+    Returns:
+        CrawlResult: The result of the crawl.
+
+    Raises:
+        PageTimeoutError: If the crawl did not finish within the budget.
+    """
+    if session_id is not None:
+        kwargs['session_id'] = session_id
+    try:
+        return await asyncio.wait_for(crawler.arun(url=url, **kwargs), timeout=timeout)
+    except asyncio.TimeoutError:
+        logger.warning("Crawling %s exceeded its %.1fs budget; cancelling it", url, timeout)
+        if session_id is not None:
+            await discard_session(crawler, session_id)
+        raise PageTimeoutError(f"Page timed out after {timeout:.1f}s")
+
+
+class HostCircuitBreaker:
+    """
+    Stops crawling hosts that keep failing.
+
+    After `failure_threshold` consecutive transient failures the circuit for
+    a host opens and its URLs are rejected immediately. Once `reset_timeout`
+    seconds have passed, a single trial URL is let through. The circuit closes
+    again if the host answers the trial, even with a permanent error such as a
+    404, and reopens if the trial fails transiently. A trial URL that is not
+    crawled after all must be given back with `release_trial`, or the host
+    would never get another one.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 60.0, clock=time.monotonic):
+        """
+        Args:
+            failure_threshold (int): Consecutive failures that open the circuit for a host (default is 5).
+            reset_timeout (float): Seconds before an open circuit lets a trial URL through (default is 60.0).
+            clock (callable): Function returning the current time in seconds (default is time.monotonic).
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self._hosts = {}  # host -> {'failures': int, 'opened_at': float or None, 'trial': bool}
+
+    def _state(self, url: str) -> dict:
+        host = urlparse(url).netloc
+        return self._hosts.setdefault(host, {'failures': 0, 'opened_at': None, 'trial': False})
+
+    def allow(self, url: str) -> bool:
+        """Returns whether the URL may be crawled now."""
+        state = self._state(url)
+        if state['opened_at'] is None:
+            return True
+        if not state['trial'] and self.clock() - state['opened_at'] >= self.reset_timeout:
+            state['trial'] = True
+            return True
+        return False
+
+    def release_trial(self, url: str):
+        """Lets another URL of the host be the trial, when the admitted trial URL was not crawled."""
+        self._state(url)['trial'] = False
+
+    def record_success(self, url: str):
+        """Closes the circuit for the URL's host."""
+        state = self._state(url)
+        if state['opened_at'] is not None:
+            logger.info("Circuit closed for host %s", urlparse(url).netloc)
+        state.update(failures=0, opened_at=None, trial=False)
+
+    def record_failure(self, url: str):
+        """Counts a transient failure for the URL's host, opening its circuit if needed."""
+        state = self._state(url)
+        state['failures'] += 1
+        if state['trial'] or (state['opened_at'] is None and state['failures'] >= self.failure_threshold):
+            logger.warning("Circuit opened for host %s after %d consecutive failures",
+                           urlparse(url).netloc, state['failures'])
+            state.update(opened_at=self.clock(), trial=False)
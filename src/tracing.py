@@ -0,0 +1,263 @@
+import os
+import json
+import time
+import zlib
+import logging
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+TRACE_FORMATS = ('chrome', 'otlp')
+
+# Traces kept in memory for export; later traces are dropped so a long run cannot exhaust memory
+DEFAULT_MAX_TRACES = 10000
+
+SERVICE_NAME = 'web-crawler'
+
+
+def _otlp_value(value) -> dict:
+    if isinstance(value, bool):
+        return {'boolValue': value}
+    if isinstance(value, int):
+        return {'intValue': str(value)}
+    if isinstance(value, float):
+        return {'doubleValue': value}
+    return {'stringValue': str(value)}
+
+
+class Trace:
+    """
+    The spans of one unit of work, such as the life of a URL in the crawl.
+
+    The trace has a root span from its start until `finish`. Spans opened
+    with `span` while another span is open become its children.
+    """
+
+    sampled = True
+
+    def __init__(self, tracer, name: str, attributes: dict):
+        self.tracer = tracer
+        self.trace_id = os.urandom(16).hex()
+        self.root = self._new_span(name, None, attributes)
+        self.spans = [self.root]
+        self._open = [self.root]
+
+    @staticmethod
+    def _new_span(name: str, parent, attributes: dict) -> dict:
+        return {'name': name, 'span_id': os.urandom(8).hex(), 'parent_id': parent['span_id'] if parent else None,
+                'start': time.time_ns(), 'end': None, 'attributes': dict(attributes)}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc is not None:
+            self.set_attribute('error', repr(exc))
+        self.finish()
+
+    def start_span(self, name: str, **attributes) -> dict:
+        """Opens a span that is ended with `end_span`, for stages that do not fit in a block, like queueing."""
+        span = self._new_span(name, self._open[-1], attributes)
+        self.spans.append(span)
+        return span
+
+    def end_span(self, span: dict, **attributes):
+        """Ends a span opened with `start_span`."""
+        if span is not None and span['end'] is None:
+            span['attributes'].update(attributes)
+            span['end'] = time.time_ns()
+
+    @contextmanager
+    def span(self, name: str, **attributes):
+        """Records the block as a span, yielding its attributes so the block can add to them."""
+        span = self.start_span(name, **attributes)
+        self._open.append(span)
+        try:
+            yield span['attributes']
+        except BaseException as e:
+            span['attributes']['error'] = repr(e)
+            raise
+        finally:
+            self._open.remove(span)
+            self.end_span(span)
+
+    def set_attribute(self, key: str, value):
+        """Sets an attribute of the root span."""
+        self.root['attributes'][key] = value
+
+    def finish(self, **attributes):
+        """Ends the root span and any span left open, and hands the trace to the tracer for export."""
+        if self.root['end'] is not None:
+            return
+        self.root['attributes'].update(attributes)
+        for span in self.spans:
+            self.end_span(span)
+        self.tracer.record(self)
+
+
+class _NoopTrace:
+    """Stands in for a trace that was not sampled; every method does nothing."""
+
+    sampled = False
+    trace_id = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        pass
+
+    def start_span(self, name: str, **attributes):
+        return None
+
+    def end_span(self, span, **attributes):
+        pass
+
+    @contextmanager
+    def span(self, name: str, **attributes):
+        yield {}
+
+    def set_attribute(self, key: str, value):
+        pass
+
+    def finish(self, **attributes):
+        pass
+
+
+NOOP_TRACE = _NoopTrace()
+
+
+class Tracer:
+    """
+    Records sampled traces and exports them as Chrome trace events or OTLP JSON.
+
+    Sampling is decided per key, such as the URL, by hashing it, so all
+    attempts at a URL, and all processes crawling it, make the same decision.
+    Traces that are not sampled are a shared no-op object, so tracing costs
+    next to nothing for them.
+    """
+
+    def __init__(self, sample_rate: float = 0.0, max_traces: int = DEFAULT_MAX_TRACES):
+        """
+        Args:
+            sample_rate (float): Share of traces to record, between 0 (off) and 1 (default is 0.0).
+            max_traces (int): The most traces kept for export (default is 10000).
+        """
+        self.configure(sample_rate, max_traces)
+        self.traces = []
+        self.dropped = 0
+
+    def configure(self, sample_rate: float, max_traces: int = DEFAULT_MAX_TRACES):
+        """Sets the share of traces to record and the most traces kept."""
+        if not 0.0 <= sample_rate <= 1.0:
+            raise ValueError("The sample rate must be between 0 and 1")
+        self.sample_rate = sample_rate
+        self.max_traces = max_traces
+
+    def reset(self):
+        """Drops all recorded traces."""
+        self.traces = []
+        self.dropped = 0
+
+    def should_sample(self, key: str = None) -> bool:
+        """Returns whether the trace of a key is recorded."""
+        if self.sample_rate <= 0.0:
+            return False
+        if self.sample_rate >= 1.0:
+            return True
+        if key is None:
+            return int.from_bytes(os.urandom(4), 'big') < self.sample_rate * 2 ** 32
+        return zlib.crc32(key.encode('utf-8')) < self.sample_rate * 2 ** 32
+
+    def start_trace(self, name: str, key: str = None, **attributes):
+        """
+        Start the trace of a unit of work.
+
+        Args:
+            name (str): The name of the root span.
+            key (str): What the sampling decision is based on, such as the URL (default is None, random).
+            **attributes: Attributes of the root span.
+
+        Returns:
+            Trace: The trace, or a no-op stand-in if it is not sampled.
+        """
+        if not self.should_sample(key):
+            return NOOP_TRACE
+        return Trace(self, name, attributes)
+
+    def record(self, trace: Trace):
+        """Keeps a finished trace for export."""
+        if len(self.traces) >= self.max_traces:
+            if not self.dropped:
+                logger.warning("Trace buffer full at %d traces; dropping further traces", self.max_traces)
+            self.dropped += 1
+            return
+        self.traces.append(trace)
+
+    def to_chrome_trace(self) -> dict:
+        """Returns the traces in the Chrome trace event format, one row per trace."""
+        pid = os.getpid()
+        origin = min((trace.root['start'] for trace in self.traces), default=0)
+        events = []
+        for row, trace in enumerate(self.traces, start=1):
+            label = trace.root['attributes'].get('url') or trace.root['name']
+            events.append({'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': row, 'args': {'name': label}})
+            for span in trace.spans:
+                events.append({
+                    'name': span['name'],
+                    'cat': trace.root['name'],
+                    'ph': 'X',
+                    'ts': (span['start'] - origin) / 1000,
+                    'dur': (span['end'] - span['start']) / 1000,
+                    'pid': pid,
+                    'tid': row,
+                    'args': span['attributes'],
+                })
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def to_otlp(self) -> dict:
+        """Returns the traces as an OTLP/JSON export request, as accepted by OpenTelemetry collectors."""
+        spans = []
+        for trace in self.traces:
+            for span in trace.spans:
+                otlp_span = {
+                    'traceId': trace.trace_id,
+                    'spanId': span['span_id'],
+                    'name': span['name'],
+                    'kind': 1,  # SPAN_KIND_INTERNAL
+                    'startTimeUnixNano': str(span['start']),
+                    'endTimeUnixNano': str(span['end']),
+                    'attributes': [{'key': key, 'value': _otlp_value(value)}
+                                   for key, value in span['attributes'].items()],
+                }
+                if span['parent_id'] is not None:
+                    otlp_span['parentSpanId'] = span['parent_id']
+                if 'error' in span['attributes']:
+                    otlp_span['status'] = {'code': 2, 'message': str(span['attributes']['error'])}
+                spans.append(otlp_span)
+        return {'resourceSpans': [{
+            'resource': {'attributes': [{'key': 'service.name', 'value': {'stringValue': SERVICE_NAME}}]},
+            'scopeSpans': [{'scope': {'name': __name__}, 'spans': spans}],
+        }]}
+
+    def write(self, path: str, trace_format: str = 'chrome'):
+        """
+        Write the recorded traces to a file.
+
+        Args:
+            path (str): The path of the JSON file.
+            trace_format (str): 'chrome' for the trace event format read by chrome://tracing and Perfetto,
+                or 'otlp' for OTLP/JSON (default is 'chrome').
+        """
+        if trace_format not in TRACE_FORMATS:
+            raise ValueError(f"Unknown trace format: {trace_format}")
+        content = self.to_chrome_trace() if trace_format == 'chrome' else self.to_otlp()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(content, f)
+        logger.info("Wrote %d traces to %s (%d dropped)", len(self.traces), path, self.dropped)
+
+
+# The tracer of the crawler; tracing is off until it is configured with a sample rate
+TRACER = Tracer()
@@ -2,12 +2,7 @@ import re
 import logging
 import requests
 from urllib.parse import urlparse, urlunparse
-from config.logging_config import setup_logging
 
-# Call setup_logging to configure logging
-setup_logging()
-
-# Now you can use the logger in this file
 logger = logging.getLogger(__name__) 
 
 def is_valid_format(url: str) -> bool:
@@ -35,7 +30,7 @@ def is_valid_format(url: str) -> bool:
         re.IGNORECASE)
 
     if re.match(regex, url):
-        logger.info("URL is valid: %s", url)
+        logger.debug("URL is valid: %s", url)
         return True
     else:
         logger.warning("Invalid URL format: %s", url)
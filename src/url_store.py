@@ -0,0 +1,215 @@
+import sys
+import heapq
+import bisect
+import logging
+from array import array
+from typing import Iterable, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+# Keys per front-coded block; the first key of each block is kept as bytes so lookups can binary search in C
+BLOCK_SIZE = 16
+
+# Keys buffered in a plain set before they are merged into the compact buffer
+MIN_PENDING = 4096
+
+# The pending set may grow to this share of the compact keys before a merge, so merges stay amortized O(1)
+PENDING_RATIO = 0.25
+
+# Bytes of the host number at the start of each key; big-endian so keys sort by host, then path
+HOST_ID_BYTES = 4
+
+
+def split_origin(url: str):
+    """Splits a URL into its origin ('https://example.com') and the rest ('/docs?page=2')."""
+    scheme_end = url.find('://')
+    if scheme_end < 0:
+        return '', url
+    end = len(url)
+    for separator in '/?#':
+        index = url.find(separator, scheme_end + 3)
+        if 0 <= index < end:
+            end = index
+    return url[:end], url[end:]
+
+
+def _write_varint(buffer: bytearray, value: int):
+    while value >= 0x80:
+        buffer.append((value & 0x7F) | 0x80)
+        value >>= 7
+    buffer.append(value)
+
+
+def _read_varint(buffer: bytearray, position: int):
+    value = shift = 0
+    while True:
+        byte = buffer[position]
+        position += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, position
+        shift += 7
+
+
+def _shared_prefix(a: bytes, b: bytes) -> int:
+    """Returns the length of the common prefix of two byte strings, comparing slices in C."""
+    low, high = 0, min(len(a), len(b))
+    while low < high:
+        middle = (low + high + 1) // 2
+        if a[:middle] == b[:middle]:
+            low = middle
+        else:
+            high = middle - 1
+    return low
+
+
+class UrlStore:
+    """
+    A compact set of URLs for frontiers of millions of pages.
+
+    A Python set of str costs well over 100 bytes per URL. Here, each origin
+    (scheme and host) is stored once and replaced by a 4-byte number, and the
+    keys are kept sorted in a bytearray with front coding: each key only
+    stores the bytes it does not share with the key before it. URLs of one
+    site share long path prefixes, so a million URLs take tens of MB.
+
+    Membership tests binary search the first keys of the blocks and scan one
+    block; iteration decodes the keys one by one, so neither builds all the
+    strings. New URLs are buffered in a small set and merged into the buffer
+    in batches. URLs iterate sorted by origin, in the order the origins were
+    first added, then by path.
+    """
+
+    def __init__(self, urls: Iterable[str] = ()):
+        """
+        Args:
+            urls (Iterable[str]): URLs to add (default is none).
+        """
+        self._origins = []  # origin number -> origin
+        self._origin_ids = {}  # origin -> origin number
+        self._first_keys = []  # first key of each block
+        self._data = bytearray()
+        self._blocks = array('Q')  # offset in _data of the second key of each block
+        self._count = 0
+        self._pending = set()  # keys not merged into _data yet
+        self.update(urls)
+
+    def __len__(self) -> int:
+        return self._count + len(self._pending)
+
+    def __bool__(self) -> bool:
+        return len(self) > 0
+
+    def __contains__(self, url) -> bool:
+        if not isinstance(url, str):
+            return False
+        key = self._key(url, create=False)
+        if key is None:
+            return False
+        return key in self._pending or self._contains_compact(key)
+
+    def __iter__(self) -> Iterator[str]:
+        for key in heapq.merge(self._iter_compact(), sorted(self._pending)):
+            yield self._url(key)
+
+    def __repr__(self) -> str:
+        return f"<UrlStore of {len(self)} URLs in {self.nbytes} bytes>"
+
+    def add(self, url: str) -> bool:
+        """Adds a URL, returning whether it was new."""
+        key = self._key(url, create=True)
+        if key in self._pending or self._contains_compact(key):
+            return False
+        self._pending.add(key)
+        if len(self._pending) >= max(MIN_PENDING, self._count * PENDING_RATIO):
+            self.compact()
+        return True
+
+    def update(self, urls: Iterable[str]) -> int:
+        """Adds URLs in one merge, returning how many were new."""
+        before = len(self)
+        keys = {self._key(url, create=True) for url in urls}
+        self._pending |= keys
+        self.compact()
+        return len(self) - before
+
+    def compact(self):
+        """Merges the buffered URLs into the front-coded buffer."""
+        if not self._pending:
+            return
+        first_keys = []
+        data = bytearray()
+        blocks = array('Q')
+        count = 0
+        previous = None
+        for key in heapq.merge(self._iter_compact(), sorted(self._pending)):
+            if key == previous:
+                continue  # Buffered by update() while already in the buffer
+            if count % BLOCK_SIZE == 0:
+                first_keys.append(key)
+                blocks.append(len(data))
+            else:
+                shared = _shared_prefix(previous, key)
+                _write_varint(data, shared)
+                _write_varint(data, len(key) - shared)
+                data += key[shared:]
+            previous = key
+            count += 1
+        self._first_keys, self._data, self._blocks, self._count = first_keys, data, blocks, count
+        self._pending = set()
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate memory used by the store, in bytes."""
+        pending = sys.getsizeof(self._pending) + sum(sys.getsizeof(key) for key in self._pending)
+        origins = sum(sys.getsizeof(origin) for origin in self._origins) * 2 + sys.getsizeof(self._origin_ids)
+        first_keys = sys.getsizeof(self._first_keys) + sum(sys.getsizeof(key) for key in self._first_keys)
+        return sys.getsizeof(self._data) + sys.getsizeof(self._blocks) + first_keys + pending + origins
+
+    def _key(self, url: str, create: bool) -> Optional[bytes]:
+        origin, rest = split_origin(url)
+        origin_id = self._origin_ids.get(origin)
+        if origin_id is None:
+            if not create:
+                return None
+            origin_id = self._origin_ids[origin] = len(self._origins)
+            self._origins.append(origin)
+        return origin_id.to_bytes(HOST_ID_BYTES, 'big') + rest.encode('utf-8', 'surrogatepass')
+
+    def _url(self, key: bytes) -> str:
+        origin = self._origins[int.from_bytes(key[:HOST_ID_BYTES], 'big')]
+        return origin + key[HOST_ID_BYTES:].decode('utf-8', 'surrogatepass')
+
+    def _contains_compact(self, key: bytes) -> bool:
+        block = bisect.bisect_right(self._first_keys, key) - 1
+        if block < 0:
+            return False
+        for candidate in self._iter_block(block):
+            if candidate >= key:
+                return candidate == key
+        return False
+
+    def _iter_block(self, block: int) -> Iterator[bytes]:
+        data = self._data
+        position = self._blocks[block]
+        current = self._first_keys[block]
+        yield current
+        for _ in range(min(BLOCK_SIZE, self._count - block * BLOCK_SIZE) - 1):
+            # Most lengths fit in one byte, so only longer ones go through _read_varint
+            shared = data[position]
+            if shared < 0x80:
+                position += 1
+            else:
+                shared, position = _read_varint(data, position)
+            length = data[position]
+            if length < 0x80:
+                position += 1
+            else:
+                length, position = _read_varint(data, position)
+            current = current[:shared] + data[position:position + length]
+            position += length
+            yield current
+
+    def _iter_compact(self) -> Iterator[bytes]:
+        for block in range(len(self._blocks)):
+            yield from self._iter_block(block)
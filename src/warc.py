@@ -0,0 +1,249 @@
+import os
+import gzip
+import glob
+import uuid
+import base64
+import asyncio
+import hashlib
+import logging
+import aiofiles
+from datetime import datetime, timezone
+from http import HTTPStatus
+from typing import Iterator, List
+from urllib.parse import urlparse
+
+logger = logging.getLogger(__name__)
+
+WARC_VERSION = 'WARC/1.1'
+
+# Headers describing the original transfer encoding no longer apply once the
+# crawler has decoded the body, so they are dropped before the record is written.
+_HOP_HEADERS = {'content-encoding', 'content-length', 'transfer-encoding', 'connection'}
+
+
+def _warc_date() -> str:
+    return datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+def _record_id() -> str:
+    return f"<urn:uuid:{uuid.uuid4()}>"
+
+
+def _block_digest(block: bytes) -> str:
+    return 'sha1:' + base64.b32encode(hashlib.sha1(block).digest()).decode('ascii')
+
+
+def build_record(warc_type: str, url: str, block: bytes, content_type: str, extra_headers: dict = None) -> bytes:
+    """Builds a single gzip-compressed WARC record.
+
+    Each record is compressed as its own gzip member so files can be
+    concatenated, truncated at record boundaries and read back sequentially.
+
+    Args:
+        warc_type (str): The WARC-Type of the record (e.g. 'response', 'request').
+        url (str): The target URI of the record.
+        block (bytes): The record content block.
+        content_type (str): The Content-Type of the content block.
+        extra_headers (dict): Additional WARC headers to include.
+
+    Returns:
+        bytes: The compressed record.
+    """
+    headers = {
+        'WARC-Type': warc_type,
+        'WARC-Record-ID': _record_id(),
+        'WARC-Date': _warc_date(),
+    }
+    if url:
+        headers['WARC-Target-URI'] = url
+    headers.update(extra_headers or {})
+    headers['WARC-Block-Digest'] = _block_digest(block)
+    headers['Content-Type'] = content_type
+    headers['Content-Length'] = str(len(block))
+
+    head = WARC_VERSION + '\r\n' + ''.join(f"{name}: {value}\r\n" for name, value in headers.items()) + '\r\n'
+    return gzip.compress(head.encode('utf-8') + block + b'\r\n\r\n')
+
+
+def build_http_response(status_code: int, headers: dict, body: bytes) -> bytes:
+    """Serializes a status line, headers and body into an HTTP/1.1 response block."""
+    try:
+        reason = HTTPStatus(status_code).phrase
+    except ValueError:
+        reason = ''
+    lines = [f"HTTP/1.1 {status_code} {reason}".rstrip()]
+    has_content_type = False
+    for name, value in (headers or {}).items():
+        if name.lower() in _HOP_HEADERS:
+            continue
+        if name.lower() == 'content-type':
+            has_content_type = True
+        lines.append(f"{name}: {value}")
+    if not has_content_type:
+        lines.append('Content-Type: text/html; charset=utf-8')
+    lines.append(f"Content-Length: {len(body)}")
+    return ('\r\n'.join(lines) + '\r\n\r\n').encode('utf-8') + body
+
+
+def build_http_request(url: str) -> bytes:
+    """Serializes the GET request that fetched the given URL."""
+    parsed_url = urlparse(url)
+    target = parsed_url.path or '/'
+    if parsed_url.query:
+        target += '?' + parsed_url.query
+    return f"GET {target} HTTP/1.1\r\nHost: {parsed_url.netloc}\r\n\r\n".encode('utf-8')
+
+
+class WarcWriter:
+    """Streams fetched pages into rolling, per-record gzip WARC files."""
+
+    def __init__(self, output_dir: str, prefix: str = 'crawl', max_file_size: int = 1024 * 1024 * 1024):
+        self.output_dir = output_dir
+        self.prefix = prefix
+        self.max_file_size = max_file_size
+
+        self.file_path = None
+        self.files_written = []
+        self.records_written = 0
+
+        self._file = None
+        self._file_size = 0
+        self._serial = 0
+        self._lock = asyncio.Lock()
+
+    async def _open_next_file(self):
+        os.makedirs(self.output_dir, exist_ok=True)
+        timestamp = datetime.now(timezone.utc).strftime('%Y%m%d%H%M%S')
+        self._serial += 1
+        self.file_path = os.path.join(self.output_dir, f"{self.prefix}-{timestamp}-{self._serial:05d}.warc.gz")
+        self._file = await aiofiles.open(self.file_path, 'ab')
+        self._file_size = 0
+        self.files_written.append(self.file_path)
+        logger.info("Writing WARC records to %s", self.file_path)
+
+        info = b"software: crawler\r\nformat: WARC File Format 1.1\r\n"
+        record = build_record('warcinfo', None, info, 'application/warc-fields',
+                              {'WARC-Filename': os.path.basename(self.file_path)})
+        await self._file.write(record)
+        self._file_size += len(record)
+
+    async def _write(self, records: List[bytes]):
+        async with self._lock:
+            if self._file is None:
+                await self._open_next_file()
+            for record in records:
+                await self._file.write(record)
+                self._file_size += len(record)
+            self.records_written += len(records)
+
+            # Roll over once the current file has grown past the limit
+            if self._file_size >= self.max_file_size:
+                await self._close_file()
+
+    async def _close_file(self):
+        if self._file is not None:
+            await self._file.close()
+            self._file = None
+
+    async def write_response(self, url: str, html: str, status_code: int = 200, headers: dict = None):
+        """Writes a request/response record pair for a fetched page.
+
+        Args:
+            url (str): The URL of the page.
+            html (str): The HTML returned for the page.
+            status_code (int): The HTTP status code of the response.
+            headers (dict): The HTTP response headers.
+        """
+        body = (html or '').encode('utf-8')
+        response_id = _record_id()
+        response = build_record('response', url, build_http_response(status_code or 200, headers, body),
+                                'application/http; msgtype=response', {'WARC-Record-ID': response_id})
+        # Link the request record to the response it produced
+        request = build_record('request', url, build_http_request(url), 'application/http; msgtype=request',
+                               {'WARC-Concurrent-To': response_id})
+        await self._write([response, request])
+        logger.debug("Wrote WARC records for URL %s", url)
+
+    async def write_result(self, url: str, result):
+        """Writes the raw HTML of a crawl result, if it has any."""
+        html = getattr(result, 'html', None)
+        if not html:
+            return
+        await self.write_response(url, html,
+                                  getattr(result, 'status_code', None) or 200,
+                                  getattr(result, 'response_headers', None) or {})
+
+    async def close(self):
+        """Closes the current WARC file."""
+        async with self._lock:
+            await self._close_file()
+        logger.info("Wrote %d WARC records to %d file(s)", self.records_written, len(self.files_written))
+
+
+def find_warc_files(path: str) -> List[str]:
+    """Returns the WARC files at the given path, which may be a file or a directory."""
+    if os.path.isdir(path):
+        return sorted(glob.glob(os.path.join(path, '**', '*.warc.gz'), recursive=True))
+    return [path]
+
+
+def iter_warc_records(path: str) -> Iterator[dict]:
+    """Reads the records of a gzip-compressed WARC file.
+
+    Args:
+        path (str): The path of the WARC file.
+
+    Yields:
+        dict: The record's 'type', 'url', WARC 'headers' and raw 'content'.
+    """
+    with gzip.open(path, 'rb') as f:
+        while True:
+            line = f.readline()
+            if not line:
+                return
+            if not line.strip():
+                continue  # Padding between records
+            if not line.startswith(b'WARC/'):
+                raise ValueError(f"Malformed WARC record in {path}: {line[:40]!r}")
+
+            headers = {}
+            for header_line in iter(f.readline, b'\r\n'):
+                if not header_line:
+                    raise ValueError(f"Truncated WARC record in {path}")
+                name, _, value = header_line.decode('utf-8').partition(':')
+                headers[name.strip()] = value.strip()
+
+            content = f.read(int(headers.get('Content-Length', 0)))
+            yield {
+                'type': headers.get('WARC-Type'),
+                'url': headers.get('WARC-Target-URI'),
+                'headers': headers,
+                'content': content,
+            }
+
+
+def parse_http_response(block: bytes) -> dict:
+    """Splits an HTTP response block into its status code, headers and body."""
+    head, _, body = block.partition(b'\r\n\r\n')
+    lines = head.decode('iso-8859-1').split('\r\n')
+    status_code = int(lines[0].split(' ')[1])
+    headers = {}
+    for line in lines[1:]:
+        name, _, value = line.partition(':')
+        headers[name.strip()] = value.strip()
+    return {'status_code': status_code, 'headers': headers, 'body': body}
+
+
+def iter_warc_responses(paths: List[str]) -> Iterator[dict]:
+    """Yields the URL, status code, headers and HTML of every response record in the given WARC files."""
+    for path in paths:
+        for record in iter_warc_records(path):
+            if record['type'] != 'response':
+                continue
+            response = parse_http_response(record['content'])
+            yield {
+                'url': record['url'],
+                'status_code': response['status_code'],
+                'headers': response['headers'],
+                'html': response['body'].decode('utf-8', errors='replace'),
+            }
@@ -0,0 +1,118 @@
+import asyncio
+import unittest
+from aiohttp import ClientSession
+from aiohttp.test_utils import TestServer
+from benchmarks.run import compare, latency_stats
+from benchmarks.site import SiteSpec, create_site_app, render_page
+from benchmarks.soak import ResourceSampler, check_growth, linear_slope
+from src.robots_parser import filter_allowed_urls, parse_robots_txt
+from src.sitemap_parser import fetch_sitemap_urls
+
+
+async def fetch_site(spec: SiteSpec):
+    """Serves a synthetic site and returns its robots.txt and the URLs listed in its sitemaps."""
+    async with TestServer(create_site_app(spec)) as server:
+        base_url = str(server.make_url('')).rstrip('/')
+        urls = await fetch_sitemap_urls(f"{base_url}/sitemap.xml")
+        async with ClientSession() as session:
+            async with session.get(f"{base_url}/robots.txt") as response:
+                robots_txt = await response.text()
+        return base_url, robots_txt, urls
+
+
+class TestSyntheticSite(unittest.TestCase):
+
+    def test_sitemap_tree_lists_every_page(self):
+        for depth in (0, 1, 2):
+            spec = SiteSpec(pages=250, latency_ms=0, sitemap_depth=depth, urls_per_sitemap=20, robots_rules=7)
+
+            base_url, robots_txt, urls = asyncio.run(fetch_site(spec))
+
+            self.assertEqual(sorted(urls), sorted(f"{base_url}/pages/{i}" for i in range(250)), depth)
+            rules = parse_robots_txt(robots_txt)
+            self.assertEqual(len(rules['disallow']), 7)
+            self.assertEqual(filter_allowed_urls(urls, rules), urls)
+
+    def test_page_weight(self):
+        spec = SiteSpec(page_bytes=5000, links_per_page=3)
+
+        page = render_page(spec, 7)
+
+        self.assertGreaterEqual(len(page), 5000)
+        self.assertLess(len(page), 6000)
+        self.assertEqual(page.count('<a href='), 3)
+        self.assertEqual(page, render_page(spec, 7))
+
+    def test_unknown_latency_distribution(self):
+        with self.assertRaises(ValueError):
+            SiteSpec(latency_distribution='normal')
+
+
+class TestBenchmarkResults(unittest.TestCase):
+
+    def test_latency_stats(self):
+        stats = latency_stats([i / 1000 for i in range(1, 101)])
+
+        self.assertEqual(stats['count'], 100)
+        self.assertEqual(stats['p50_ms'], 51.0)
+        self.assertEqual(stats['p99_ms'], 100.0)
+        self.assertEqual(stats['max_ms'], 100.0)
+        self.assertEqual(latency_stats([]), {'count': 0})
+
+    def test_compare_against_baseline(self):
+        baseline = {'stages': {
+            'save': {'items_per_sec': 100.0, 'latency': {'p50_ms': 10.0}, 'peak_rss_mb': 100.0},
+            'sitemap': {'items_per_sec': 100.0, 'latency': {'p50_ms': 10.0}},
+            'crawl': {'error': 'no browser'},
+        }}
+        results = {'stages': {
+            'save': {'items_per_sec': 150.0, 'latency': {'p50_ms': 5.0}, 'peak_rss_mb': 110.0},
+            'sitemap': {'items_per_sec': 95.0, 'latency': {'p50_ms': 10.0}},
+            'crawl': {'items_per_sec': 5.0, 'latency': {}},
+        }}
+
+        comparison = compare(results, baseline)
+
+        self.assertEqual(comparison['save'], {'items_per_sec_change': 0.5, 'p50_change': -0.5,
+                                              'peak_rss_change': 0.1, 'verdict': 'faster'})
+        self.assertEqual(comparison['sitemap']['verdict'], 'unchanged')
+        self.assertNotIn('crawl', comparison)
+
+
+class TestSoak(unittest.TestCase):
+
+    def test_linear_slope(self):
+        self.assertAlmostEqual(linear_slope([0, 1, 2, 3], [10, 12, 14, 16]), 2.0)
+        self.assertEqual(linear_slope([1, 1], [5, 9]), 0.0)
+        self.assertEqual(linear_slope([1], [5]), 0.0)
+
+    def test_check_growth_ignores_warmup(self):
+        # Memory jumps while warming up, then stays flat; file descriptors leak 3 per 1000 pages
+        samples = [{'pages': pages, 'rss_mb': 100 if pages < 1000 else 300, 'open_fds': 20 + pages * 3 // 1000}
+                   for pages in range(0, 10001, 500)]
+
+        growth = check_growth(samples, {'rss_mb': 5.0, 'open_fds': 2.0}, warmup=0.2)
+
+        self.assertEqual(growth['rss_mb']['slope_per_1000_pages'], 0.0)
+        self.assertTrue(growth['rss_mb']['passed'])
+        self.assertAlmostEqual(growth['open_fds']['slope_per_1000_pages'], 3.0, places=1)
+        self.assertFalse(growth['open_fds']['passed'])
+
+    def test_resource_sampler(self):
+        async def scenario():
+            sampler = ResourceSampler(interval=0.01)
+            sampler.start()
+            await asyncio.sleep(0.05)
+            await sampler.stop()
+            return sampler.samples
+
+        samples = asyncio.run(scenario())
+
+        self.assertGreaterEqual(len(samples), 3)
+        self.assertEqual(set(samples[0]), {'seconds', 'pages', 'rss_mb', 'browser_rss_mb', 'open_fds', 'tasks'})
+        self.assertGreater(samples[-1]['rss_mb'], 0)
+        self.assertGreater(samples[-1]['open_fds'], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,92 @@
+import os
+import json
+import asyncio
+import tempfile
+import unittest
+import logging
+from src.chunker import MarkdownChunker, chunk_markdown, chunks_file_path, count_tokens, split_sections
+
+# Setup logging for tests
+logging.basicConfig(level=logging.DEBUG)
+
+SAMPLE_MARKDOWN = """Intro paragraph.
+
+# Guide
+
+Guide overview.
+
+## Install
+
+Run the installer.
+
+```bash
+# not a heading
+pip install crawler
+```
+
+## Usage
+
+Use it.
+"""
+
+class TestChunker(unittest.TestCase):
+
+    def test_count_tokens(self):
+        self.assertEqual(count_tokens("Hello, world!"), 4)
+        self.assertEqual(count_tokens(""), 0)
+
+    def test_split_sections(self):
+        sections = split_sections(SAMPLE_MARKDOWN)
+
+        self.assertEqual([headings for headings, _ in sections],
+                         [[], ['Guide'], ['Guide', 'Install'], ['Guide', 'Usage']])
+        self.assertIn("# not a heading", sections[2][1])
+
+    def test_chunk_markdown_splits_large_sections(self):
+        paragraphs = "\n\n".join(" ".join(["word"] * 30) for _ in range(10))
+        chunks = chunk_markdown("https://example.com/", f"# Title\n\n{paragraphs}", max_tokens=100)
+
+        self.assertGreater(len(chunks), 1)
+        self.assertEqual([chunk['index'] for chunk in chunks], list(range(len(chunks))))
+        for chunk in chunks:
+            self.assertLessEqual(chunk['token_count'], 100)
+            self.assertEqual(chunk['headings'], ['Title'])
+
+    def test_chunks_stay_under_the_cap_when_words_cost_many_tokens(self):
+        links = " ".join(f"https://example.com/docs/page-{n}?ref=nav#top" for n in range(100))
+        long_word = "-".join(["x"] * 300)
+        chunks = chunk_markdown("https://example.com/", f"# Links\n\n{links} {long_word}", max_tokens=100)
+
+        for chunk in chunks:
+            self.assertLessEqual(chunk['token_count'], 100)
+        # No text is lost when a word is split
+        self.assertEqual(sum(chunk['token_count'] for chunk in chunks), count_tokens(f"# Links {links} {long_word}"))
+
+    def test_chunk_ids_are_stable(self):
+        first = chunk_markdown("https://example.com/", SAMPLE_MARKDOWN)
+        edited = chunk_markdown("https://example.com/", SAMPLE_MARKDOWN.replace("Use it.", "Use it well."))
+
+        self.assertEqual([chunk['id'] for chunk in first][:3], [chunk['id'] for chunk in edited][:3])
+        self.assertNotEqual(first[3]['id'], edited[3]['id'])
+        self.assertNotEqual(first[0]['id'], chunk_markdown("https://example.com/other", SAMPLE_MARKDOWN)[0]['id'])
+
+    def test_markdown_chunker_writes_jsonl(self):
+        with tempfile.TemporaryDirectory() as output_dir:
+            async def run():
+                async with MarkdownChunker(output_dir, workers=2) as chunker:
+                    await chunker.submit("https://example.com/guide", SAMPLE_MARKDOWN)
+                    await chunker.submit("https://example.com/empty", None)
+                return chunker
+
+            chunker = asyncio.run(run())
+
+            self.assertEqual(chunker.chunk_count, 4)
+            self.assertEqual(chunker.failed_count, 0)
+            with open(chunks_file_path("https://example.com/guide", output_dir), encoding='utf-8') as f:
+                chunks = [json.loads(line) for line in f]
+            self.assertEqual(len(chunks), 4)
+            self.assertEqual(chunks[0]['url'], "https://example.com/guide")
+            self.assertTrue(os.path.exists(chunks_file_path("https://example.com/empty", output_dir)))
+
+if __name__ == "__main__":
+    unittest.main()
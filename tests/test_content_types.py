@@ -0,0 +1,100 @@
+import asyncio
+import unittest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from src import content_types
+from src.content_types import (ContentTypeFilter, kind_of_content_type, kind_of_extension, url_extension)
+
+
+def make_app(head_requests, content_types=None, allow_head=True):
+    async def handle(request):
+        head_requests.append(request.path)
+        if not allow_head:
+            return web.Response(status=405)
+        return web.Response(content_type=(content_types or {}).get(request.path, 'text/html'))
+
+    app = web.Application()
+    app.router.add_route('HEAD', '/{path:.*}', handle)
+    return app
+
+
+class TestClassification(unittest.TestCase):
+
+    def test_url_extension(self):
+        self.assertEqual(url_extension("https://a.com/files/Report.PDF?download=1"), 'pdf')
+        self.assertEqual(url_extension("https://a.com/docs/intro"), '')
+        self.assertEqual(url_extension("https://a.com/v1.2/intro"), '')
+        self.assertEqual(url_extension("https://a.com/.well-known"), '')
+
+    def test_kind_of_extension(self):
+        self.assertEqual(kind_of_extension("https://a.com/index.html"), 'html')
+        self.assertEqual(kind_of_extension("https://a.com/report.pdf"), 'document')
+        self.assertEqual(kind_of_extension("https://a.com/logo.svg"), 'media')
+        self.assertEqual(kind_of_extension("https://a.com/feed.xml"), 'feed')
+        self.assertEqual(kind_of_extension("https://a.com/setup.zip"), 'download')
+        self.assertIsNone(kind_of_extension("https://a.com/docs/intro"))
+
+    def test_kind_of_content_type(self):
+        self.assertEqual(kind_of_content_type("text/html; charset=utf-8"), 'html')
+        self.assertEqual(kind_of_content_type("application/pdf"), 'document')
+        self.assertEqual(kind_of_content_type(
+            "application/vnd.openxmlformats-officedocument.wordprocessingml.document"), 'document')
+        self.assertEqual(kind_of_content_type("image/webp"), 'media')
+        self.assertEqual(kind_of_content_type("application/rss+xml"), 'feed')
+        self.assertEqual(kind_of_content_type("application/octet-stream"), 'download')
+        self.assertEqual(kind_of_content_type(None), 'unknown')
+
+    def test_for_mode(self):
+        self.assertIsNone(ContentTypeFilter.for_mode('off'))
+        self.assertFalse(ContentTypeFilter.for_mode('extension').probe)
+        self.assertTrue(ContentTypeFilter.for_mode('head').probe)
+        with self.assertRaises(ValueError):
+            ContentTypeFilter.for_mode('get')
+
+
+class TestContentTypeFilter(unittest.TestCase):
+
+    def classify(self, app, paths, extension_urls=()):
+        async def run():
+            async with TestServer(app) as server:
+                content_filter = ContentTypeFilter()
+                try:
+                    kinds = [await content_filter.classify(str(server.make_url(path))) for path in paths]
+                    kinds += [await content_filter.classify(url) for url in extension_urls]
+                    return kinds, content_filter.probes
+                finally:
+                    await content_filter.close()
+
+        return asyncio.run(run())
+
+    def test_head_request_decides_urls_without_extension(self):
+        head_requests = []
+        app = make_app(head_requests, {'/download': 'application/pdf', '/photo': 'image/jpeg'})
+
+        kinds, _ = self.classify(app, ['/download', '/photo', '/docs'], ["https://a.com/report.pdf"])
+
+        self.assertEqual(kinds, ['document', 'media', 'html', 'document'])
+        # The URL with an extension needed no request
+        self.assertEqual(head_requests, ['/download', '/photo', '/docs'])
+
+    def test_host_trusted_after_consistent_html_answers(self):
+        head_requests = []
+        paths = [f'/page{i}' for i in range(content_types.HOST_TRUST_PROBES + 5)]
+
+        kinds, probes = self.classify(make_app(head_requests), paths)
+
+        self.assertEqual(set(kinds), {'html'})
+        self.assertEqual(probes, content_types.HOST_TRUST_PROBES)
+        self.assertEqual(len(head_requests), content_types.HOST_TRUST_PROBES)
+
+    def test_hosts_refusing_head_are_not_asked_again(self):
+        head_requests = []
+
+        kinds, probes = self.classify(make_app(head_requests, allow_head=False), ['/a', '/b', '/c'])
+
+        self.assertEqual(kinds, ['unknown'] * 3)
+        self.assertEqual(probes, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,13 +1,16 @@
 import os
 import sys
+import asyncio
+import tempfile
 import unittest
-from unittest.mock import AsyncMock, patch
+from unittest.mock import AsyncMock, MagicMock, patch
 import logging
 
 # Add the src directory to the path for imports
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
 
 from crawl_one import crawl_one
+from src import metrics
 
 # Setup logging for tests (optional)
 logging.basicConfig(level=logging.DEBUG)
@@ -58,6 +61,34 @@ class TestCrawlOne(unittest.TestCase):
         # Optionally, you can check if the logger recorded the error
         # For checking log messages, you could tap on logging.captureWarnings() and validate the output
 
+    @patch('crawl_one.save_markdown', new_callable=AsyncMock)
+    @patch('crawl_one.AsyncWebCrawler')
+    def test_failed_pages_are_counted_but_not_saved(self, mock_crawler_class, mock_save_markdown):
+        metrics.REGISTRY.reset()
+        mock_crawler_class.return_value.arun = AsyncMock(return_value=MagicMock(
+            success=False, status_code=404, markdown="# Not Found", response_headers={}))
+
+        with tempfile.TemporaryDirectory() as output_dir:
+            result = asyncio.run(crawl_one("https://example.com/missing", output_dir))
+
+        self.assertIsNone(result)
+        mock_save_markdown.assert_not_called()
+        self.assertEqual(metrics.PAGES.value(outcome='failed'), 1)
+        self.assertEqual(metrics.RENDER_SECONDS.count(outcome='failed'), 1)
+
+    @patch('crawl_one.AsyncWebCrawler')
+    def test_errors_are_counted(self, mock_crawler_class):
+        metrics.REGISTRY.reset()
+        mock_crawler_class.return_value.arun = AsyncMock(side_effect=RuntimeError("Browser closed"))
+
+        with tempfile.TemporaryDirectory() as output_dir:
+            result = asyncio.run(crawl_one("https://example.com", output_dir))
+
+        self.assertIsNone(result)
+        self.assertEqual(metrics.PAGES.value(outcome='failed'), 1)
+        self.assertEqual(metrics.RENDER_SECONDS.count(outcome='failed'), 1)
+        self.assertEqual(metrics.PAGES_IN_FLIGHT.value(), 0)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -1,10 +1,19 @@
 import os
 import sys
+import json
+import asyncio
+import tempfile
 import unittest
-from unittest.mock import AsyncMock, patch
+from unittest.mock import AsyncMock, MagicMock, patch
 import logging
 
+from src.content_types import ContentTypeFilter
 from src.crawl_parallel import crawl_parallel  # Replace with the actual import path
+from src.frontier import StreamingFrontier
+from src.politeness import PolitenessScheduler
+from src.retry import RetryPolicy
+from src.response_cache import ResponseCache
+from src.timeouts import HostCircuitBreaker
 
 # Setup logging for tests (optional)
 logging.basicConfig(level=logging.DEBUG)
@@ -47,6 +56,252 @@ class TestCrawlParallel(unittest.TestCase):
 
         # Log error should be verified (you may implement verification depending on logging setup)
 
+    @patch('src.crawl_parallel.AsyncWebCrawler')
+    def test_crawl_parallel_saves_results(self, mock_crawler_class):
+        # Fail the second URL and succeed for the others
+        async def arun(url, **kwargs):
+            if url.endswith('page2'):
+                raise Exception("Crawl error")
+            return MagicMock(markdown=f"# {url}", html="<html></html>")
+
+        mock_crawler_instance = mock_crawler_class.return_value
+        mock_crawler_instance.start = AsyncMock()
+        mock_crawler_instance.close = AsyncMock()
+        mock_crawler_instance.arun = AsyncMock(side_effect=arun)
+
+        urls = [f"https://example.com/page{i}" for i in range(1, 6)]
+        with tempfile.TemporaryDirectory() as output_dir:
+            asyncio.run(crawl_parallel(urls, max_concurrent=2, output_dir=output_dir, base_url="https://example.com"))
+
+            self.assertEqual(mock_crawler_instance.arun.call_count, 5)
+            mock_crawler_instance.close.assert_called_once()
+
+            with open(os.path.join(output_dir, 'example.com', 'crawl_metadata.json'), encoding='utf-8') as f:
+                metadata = json.load(f)
+            self.assertEqual(sorted(entry['url'] for entry in metadata),
+                             [url for url in urls if not url.endswith('page2')])
+
+    @patch('src.crawl_parallel.AsyncWebCrawler')
+    def test_crawl_parallel_retries_transient_failures(self, mock_crawler_class):
+        attempts = {}
+
+        # The first attempt at each URL is throttled, the second succeeds
+        async def arun(url, **kwargs):
+            attempts[url] = attempts.get(url, 0) + 1
+            if attempts[url] == 1:
+                return MagicMock(success=False, status_code=503, response_headers={}, markdown=None)
+            return MagicMock(success=True, status_code=200, markdown=f"# {url}", html="<html></html>")
+
+        mock_crawler_instance = mock_crawler_class.return_value
+        mock_crawler_instance.start = AsyncMock()
+        mock_crawler_instance.close = AsyncMock()
+        mock_crawler_instance.arun = AsyncMock(side_effect=arun)
+
+        urls = ["https://example.com/page1", "https://example.com/page2", "https://example.com/page3"]
+        with tempfile.TemporaryDirectory() as output_dir:
+            asyncio.run(crawl_parallel(urls, max_concurrent=2, output_dir=output_dir, base_url="https://example.com",
+                                       retry_policy=RetryPolicy(base_delay=0.01)))
+
+            self.assertEqual(attempts, {url: 2 for url in urls})
+            with open(os.path.join(output_dir, 'example.com', 'crawl_metadata.json'), encoding='utf-8') as f:
+                self.assertEqual(sorted(entry['url'] for entry in json.load(f)), urls)
+
+    @patch('src.crawl_parallel.AsyncWebCrawler')
+    def test_crawl_parallel_times_out_hung_pages(self, mock_crawler_class):
+        # The first page never finishes loading
+        async def arun(url, **kwargs):
+            if url.endswith('page1'):
+                await asyncio.sleep(60)
+            return MagicMock(success=True, status_code=200, markdown=f"# {url}", html="<html></html>")
+
+        mock_crawler_instance = mock_crawler_class.return_value
+        mock_crawler_instance.start = AsyncMock()
+        mock_crawler_instance.close = AsyncMock()
+        mock_crawler_instance.crawler_strategy.kill_session = AsyncMock()
+        mock_crawler_instance.arun = AsyncMock(side_effect=arun)
+
+        urls = ["https://example.com/page1", "https://example.com/page2"]
+        with tempfile.TemporaryDirectory() as output_dir:
+            asyncio.run(asyncio.wait_for(
+                crawl_parallel(urls, max_concurrent=2, output_dir=output_dir, base_url="https://example.com",
+                               page_timeout=0.05, retry_policy=RetryPolicy(max_attempts=1)),
+                timeout=5))
+
+            # Both pages' sessions were torn down, the hung one exactly once
+            killed = [call.args[0] for call in mock_crawler_instance.crawler_strategy.kill_session.call_args_list]
+            self.assertEqual(len(killed), 2)
+            self.assertEqual(len(set(killed)), 2)
+            with open(os.path.join(output_dir, 'example.com', 'crawl_metadata.json'), encoding='utf-8') as f:
+                self.assertEqual([entry['url'] for entry in json.load(f)], ["https://example.com/page2"])
+
+    @patch('src.crawl_parallel.AsyncWebCrawler')
+    def test_crawl_parallel_uses_response_cache(self, mock_crawler_class):
+        mock_crawler_instance = mock_crawler_class.return_value
+        mock_crawler_instance.start = AsyncMock()
+        mock_crawler_instance.close = AsyncMock()
+        mock_crawler_instance.arun = AsyncMock(side_effect=lambda url, **kwargs: MagicMock(
+            success=True, status_code=200, markdown=f"# {url}", html="<html></html>", response_headers={}))
+
+        urls = ["https://example.com/page1", "https://example.com/page2"]
+        with tempfile.TemporaryDirectory() as temp_dir:
+            output_dir = os.path.join(temp_dir, 'out')
+            cache_dir = os.path.join(temp_dir, 'cache')
+
+            asyncio.run(crawl_parallel(urls, output_dir=output_dir, base_url="https://example.com",
+                                       cache=ResponseCache(cache_dir)))
+            self.assertEqual(mock_crawler_instance.arun.call_count, 2)
+
+            # A second run is served entirely from the cache
+            cache = ResponseCache(cache_dir)
+            asyncio.run(crawl_parallel(urls, output_dir=output_dir, base_url="https://example.com", cache=cache))
+            self.assertEqual(mock_crawler_instance.arun.call_count, 2)
+            self.assertEqual(cache.hits, 2)
+
+            with open(os.path.join(output_dir, 'example.com', 'crawl_metadata.json'), encoding='utf-8') as f:
+                self.assertEqual(sorted(entry['url'] for entry in json.load(f)), urls)
+
+    def test_crawl_parallel_reuses_shared_crawler(self):
+        crawler = MagicMock()
+        crawler.close = AsyncMock()
+        crawler.arun = AsyncMock(side_effect=lambda url, **kwargs: MagicMock(
+            success=True, status_code=200, markdown=f"# {url}", html="<html></html>", response_headers={}))
+
+        urls = ["https://a.example.com/1", "https://b.example.com/1", "https://a.example.com/2"]
+        with tempfile.TemporaryDirectory() as output_dir:
+            asyncio.run(crawl_parallel(urls, output_dir=output_dir, crawler=crawler,
+                                       scheduler=PolitenessScheduler(min_delay=0.01)))
+
+            # The caller's crawler is used and left open
+            self.assertEqual(crawler.arun.call_count, 3)
+            crawler.close.assert_not_called()
+
+            # Metadata is saved per website
+            for site, expected in (('a.example.com', 2), ('b.example.com', 1)):
+                with open(os.path.join(output_dir, site, 'crawl_metadata.json'), encoding='utf-8') as f:
+                    self.assertEqual(len(json.load(f)), expected)
+
+    def test_crawl_parallel_fails_pages_whose_markdown_is_not_saved(self):
+        crawler = MagicMock()
+        crawler.arun = AsyncMock(side_effect=lambda url, **kwargs: MagicMock(
+            success=True, status_code=200, markdown=f"# {url}", html="<html></html>", response_headers={}))
+        outcomes = {}
+
+        urls = ["https://example.com/1", "https://example.com/2"]
+        with tempfile.TemporaryDirectory() as output_dir, \
+                patch('src.result_writer.save_markdown_batch', return_value=[None, None]):
+            totals = asyncio.run(crawl_parallel(urls, max_concurrent=2, output_dir=output_dir, crawler=crawler,
+                                                on_done=outcomes.__setitem__))
+
+        # Rendered, but not saved, so the pages are not reported as crawled
+        self.assertEqual(outcomes, dict.fromkeys(urls, 'failed'))
+        self.assertEqual(totals['succeeded'], 0)
+        self.assertEqual(totals['failed'], 2)
+
+    def test_crawl_parallel_closes_each_page_session(self):
+        crawler = MagicMock()
+        crawler.close = AsyncMock()
+        crawler.crawler_strategy.kill_session = AsyncMock()
+        crawler.arun = AsyncMock(side_effect=lambda url, **kwargs: MagicMock(
+            success=True, status_code=200, markdown=f"# {url}", html="<html></html>", response_headers={}))
+
+        urls = ["https://example.com/1", "https://example.com/2"]
+        with tempfile.TemporaryDirectory() as output_dir:
+            asyncio.run(crawl_parallel(urls, output_dir=output_dir, crawler=crawler))
+
+        # Every page ran in its own session, set on the run config, and the session was killed afterwards
+        sessions = [call.kwargs['config'].session_id for call in crawler.arun.call_args_list]
+        self.assertEqual(len(set(sessions)), 2)
+        killed = [call.args[0] for call in crawler.crawler_strategy.kill_session.call_args_list]
+        self.assertEqual(sorted(killed), sorted(sessions))
+
+    def test_crawl_parallel_crawls_urls_as_they_are_discovered(self):
+        crawler = MagicMock()
+        crawler.close = AsyncMock()
+        crawled = []
+
+        async def arun(url, **kwargs):
+            crawled.append(url)
+            return MagicMock(success=True, status_code=200, markdown=f"# {url}", html="<html></html>",
+                             response_headers={})
+
+        crawler.arun = AsyncMock(side_effect=arun)
+
+        async def run(output_dir):
+            stream = StreamingFrontier(max_pages=3)
+
+            async def discover():
+                stream.push_entries(["https://example.com/1"])
+                # The first page is crawled before discovery is done
+                while not crawled:
+                    await asyncio.sleep(0.01)
+                stream.push_entries(["https://example.com/2", "https://example.com/3", "https://example.com/4"])
+                stream.close()
+
+            discovery = asyncio.create_task(discover())
+            totals = await crawl_parallel([], max_concurrent=2, output_dir=output_dir, crawler=crawler,
+                                          url_stream=stream)
+            await discovery
+            return totals
+
+        with tempfile.TemporaryDirectory() as output_dir:
+            totals = asyncio.run(run(output_dir))
+
+        self.assertEqual(crawled[0], "https://example.com/1")
+        # Only max_pages URLs are crawled
+        self.assertEqual(len(crawled), 3)
+        self.assertEqual(totals['succeeded'], 3)
+
+    def test_crawl_parallel_routes_non_html_urls_around_the_browser(self):
+        crawler = MagicMock()
+        crawler.close = AsyncMock()
+        crawler.arun = AsyncMock(side_effect=lambda url, **kwargs: MagicMock(
+            success=True, status_code=200, markdown=f"# {url}", html="<html></html>", response_headers={}))
+        handled = []
+
+        async def extract_document(url):
+            handled.append(url)
+            return MagicMock(success=True, status_code=200, markdown=f"# Document {url}", html=None)
+
+        urls = ["https://example.com/page.html", "https://example.com/logo.png", "https://example.com/report.pdf",
+                "https://example.com/docs"]
+        outcomes = {}
+        with tempfile.TemporaryDirectory() as output_dir:
+            totals = asyncio.run(crawl_parallel(
+                urls, max_concurrent=4, output_dir=output_dir, crawler=crawler, on_done=outcomes.__setitem__,
+                content_filter=ContentTypeFilter(probe=False), content_handlers={'document': extract_document}))
+
+            with open(os.path.join(output_dir, 'example.com', 'crawl_metadata.json'), encoding='utf-8') as f:
+                saved = sorted(entry['url'] for entry in json.load(f))
+
+        # Only HTML and unclassified URLs reach the browser; documents go to their handler and images are skipped
+        rendered = sorted(call.kwargs['url'] for call in crawler.arun.call_args_list)
+        self.assertEqual(rendered, ["https://example.com/docs", "https://example.com/page.html"])
+        self.assertEqual(handled, ["https://example.com/report.pdf"])
+        self.assertEqual(outcomes["https://example.com/logo.png"], 'failed')
+        self.assertEqual(totals, {'succeeded': 3, 'failed': 0, 'skipped': 1, 'retried': 0})
+        self.assertEqual(saved, sorted(rendered + handled))
+
+    def test_crawl_parallel_circuit_closes_when_trial_returns_404(self):
+        now = [0.0]
+        breaker = HostCircuitBreaker(failure_threshold=1, reset_timeout=30.0, clock=lambda: now[0])
+        breaker.record_failure("https://example.com/down")
+        now[0] = 31.0
+
+        crawler = MagicMock()
+        crawler.arun = AsyncMock(side_effect=lambda url, **kwargs: MagicMock(
+            success=not url.endswith('/gone'), status_code=404 if url.endswith('/gone') else 200,
+            markdown=f"# {url}", html="<html></html>", response_headers={}))
+
+        urls = ["https://example.com/gone", "https://example.com/a", "https://example.com/b"]
+        with tempfile.TemporaryDirectory() as output_dir:
+            totals = asyncio.run(crawl_parallel(urls, max_concurrent=1, output_dir=output_dir, crawler=crawler,
+                                                circuit_breaker=breaker))
+
+        # The host answered the trial, so its other URLs are crawled instead of being skipped for the run
+        self.assertEqual(totals['succeeded'], 2)
+        self.assertEqual(crawler.arun.call_count, 3)
+        self.assertTrue(breaker.allow("https://example.com/c"))
+
 # To run the tests
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,117 @@
+import os
+import asyncio
+import tempfile
+import unittest
+import logging
+from unittest.mock import AsyncMock, MagicMock, patch
+from src.crawl_worker import run_worker
+from src.lease_queue import InMemoryLeaseQueue
+
+# Setup logging for tests
+logging.basicConfig(level=logging.DEBUG)
+
+
+def mock_crawler(crawled):
+    crawler = MagicMock()
+    crawler.start = AsyncMock()
+    crawler.close = AsyncMock()
+
+    async def arun(url, **kwargs):
+        crawled.append(url)
+        await asyncio.sleep(0.01)
+        return MagicMock(success=True, status_code=200, markdown=f"# {url}", html="<html></html>",
+                         response_headers={})
+
+    crawler.arun = AsyncMock(side_effect=arun)
+    return crawler
+
+
+class TestCrawlWorker(unittest.TestCase):
+
+    def test_workers_share_the_frontier_without_duplicates(self):
+        queue = InMemoryLeaseQueue()
+        urls = [f"https://site{i % 3}.example.com/{i}" for i in range(12)]
+        queue.add(urls)
+        crawled = []
+
+        async def run():
+            with patch('src.crawl_worker.create_crawler', side_effect=lambda blocker: mock_crawler(crawled)):
+                return await asyncio.gather(*(
+                    run_worker(queue, output_dir, worker_id=f'worker-{n}', max_concurrent=2, host_delay=0.0,
+                               poll_interval=0.01, preflight='off')
+                    for n in range(3)))
+
+        with tempfile.TemporaryDirectory() as output_dir:
+            totals = asyncio.run(run())
+
+        self.assertEqual(sorted(crawled), sorted(urls))
+        self.assertEqual(sum(total['succeeded'] for total in totals), len(urls))
+        self.assertEqual(queue.counts()['done'], len(urls))
+
+    def test_dead_workers_urls_are_reclaimed(self):
+        queue = InMemoryLeaseQueue()
+        queue.add(["https://example.com/1", "https://example.com/2"])
+        # A worker that leased a URL and died
+        queue.lease('dead-worker', 1, timeout=0.05)
+        crawled = []
+
+        async def run():
+            with patch('src.crawl_worker.create_crawler', return_value=mock_crawler(crawled)):
+                return await run_worker(queue, output_dir, worker_id='worker-1', host_delay=0.0, poll_interval=0.02,
+                                        preflight='off')
+
+        with tempfile.TemporaryDirectory() as output_dir:
+            totals = asyncio.run(run())
+
+        self.assertEqual(sorted(crawled), ["https://example.com/1", "https://example.com/2"])
+        self.assertEqual(totals, {'succeeded': 2, 'failed': 0, 'released': 0})
+
+    def test_worker_drains_a_host_with_an_open_circuit(self):
+        queue = InMemoryLeaseQueue()
+        down = [f"https://down.example.com/{i}" for i in range(8)]
+        queue.add(down + ["https://up.example.com/1"])
+        crawler = mock_crawler([])
+        crawler.arun = AsyncMock(side_effect=lambda url, **kwargs: MagicMock(
+            success=url.startswith("https://up."), status_code=200 if url.startswith("https://up.") else 503,
+            markdown=f"# {url}", html="<html></html>", response_headers={}))
+
+        async def run():
+            with patch('src.crawl_worker.create_crawler', return_value=crawler):
+                # The circuit opens after five failures and stays open, so the other down URLs keep being skipped
+                return await asyncio.wait_for(run_worker(
+                    queue, output_dir, worker_id='worker-1', max_concurrent=2, max_attempts=1, host_delay=0.0,
+                    poll_interval=0.01, preflight='off', max_releases=3), timeout=10)
+
+        with tempfile.TemporaryDirectory() as output_dir:
+            totals = asyncio.run(run())
+
+        self.assertTrue(queue.is_finished())
+        self.assertEqual(queue.counts()['failed'], len(down))
+        self.assertEqual(totals['succeeded'], 1)
+        self.assertEqual(totals['failed'], len(down))
+        self.assertGreater(totals['released'], 0)
+
+    def test_worker_archives_and_caches_its_pages(self):
+        queue = InMemoryLeaseQueue()
+        queue.add(["https://example.com/1"])
+
+        async def run():
+            with patch('src.crawl_worker.create_crawler', return_value=mock_crawler([])):
+                return await run_worker(queue, output_dir, worker_id='worker-1', host_delay=0.0, poll_interval=0.01,
+                                        preflight='off', warc_dir=os.path.join(output_dir, 'warc'),
+                                        cache_dir=os.path.join(output_dir, 'cache'))
+
+        with tempfile.TemporaryDirectory() as output_dir:
+            totals = asyncio.run(run())
+            warc_files = os.listdir(os.path.join(output_dir, 'warc'))
+            cached = os.listdir(os.path.join(output_dir, 'cache'))
+
+        self.assertEqual(totals['succeeded'], 1)
+        # Each worker writes WARC files of its own
+        self.assertEqual(len(warc_files), 1)
+        self.assertTrue(warc_files[0].startswith('crawl-worker-1-'))
+        self.assertTrue(cached)
+
+
+if __name__ == "__main__":
+    unittest.main()
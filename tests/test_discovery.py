@@ -0,0 +1,27 @@
+import asyncio
+import unittest
+from unittest.mock import AsyncMock, patch
+from src.discovery import discover_site_urls
+
+
+class TestDiscoverSiteUrls(unittest.TestCase):
+
+    @patch('src.discovery.fetch_robots_txt_async', new_callable=AsyncMock)
+    def test_single_url_is_checked_against_robots_txt(self, mock_fetch_robots):
+        mock_fetch_robots.return_value = {'disallow': ['/private'], 'allow': [], 'sitemap': []}
+
+        async def run():
+            return (await discover_site_urls("https://example.com/private/a", None, False, 10, True),
+                    await discover_site_urls("https://example.com/docs", None, False, 10, True),
+                    await discover_site_urls("https://example.com/private/a", None, False, 10, False))
+
+        disallowed, allowed, unchecked = asyncio.run(run())
+
+        self.assertEqual(disallowed, [])
+        self.assertEqual(allowed, ["https://example.com/docs"])
+        self.assertEqual(unchecked, ["https://example.com/private/a"])
+        self.assertEqual(mock_fetch_robots.await_count, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
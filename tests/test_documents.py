@@ -0,0 +1,166 @@
+import io
+import asyncio
+import zipfile
+import unittest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from src.documents import (DocumentExtractor, UnsupportedDocumentError, document_format, document_to_markdown,
+                           docx_to_markdown, pptx_to_markdown, xlsx_to_markdown)
+
+W = 'xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main"'
+S = 'xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"'
+A = 'xmlns:a="http://schemas.openxmlformats.org/drawingml/2006/main"'
+R = 'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships"'
+DOCX_TYPE = 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'
+
+
+def make_zip(files):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as archive:
+        for name, content in files.items():
+            archive.writestr(name, content)
+    return buffer.getvalue()
+
+
+def paragraph(text, style=None, listed=False):
+    properties = f'<w:pStyle w:val="{style}"/>' if style else ''
+    properties += '<w:numPr><w:numId w:val="1"/></w:numPr>' if listed else ''
+    return f'<w:p><w:pPr>{properties}</w:pPr><w:r><w:t>{text}</w:t></w:r></w:p>'
+
+
+def make_docx():
+    cells = ''.join(f'<w:tr><w:tc>{paragraph(a)}</w:tc><w:tc>{paragraph(b)}</w:tc></w:tr>'
+                    for a, b in (('Plan', 'Price'), ('Basic', '5 | 10')))
+    body = (paragraph('Annual Report', 'Title') + paragraph('Summary', 'Heading1') + paragraph('Revenue grew.')
+            + paragraph('First point', listed=True) + f'<w:tbl>{cells}</w:tbl>')
+    return make_zip({'word/document.xml': f'<w:document {W}><w:body>{body}</w:body></w:document>'})
+
+
+def make_xlsx():
+    return make_zip({
+        'xl/workbook.xml': f'<workbook {S} {R}><sheets><sheet name="Prices" sheetId="1" r:id="rId1"/></sheets></workbook>',
+        'xl/_rels/workbook.xml.rels': '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+                                      '<Relationship Id="rId1" Target="worksheets/sheet1.xml"/></Relationships>',
+        'xl/sharedStrings.xml': f'<sst {S}><si><t>Plan</t></si><si><t>Price</t></si><si><t>Basic</t></si></sst>',
+        'xl/worksheets/sheet1.xml': f'<worksheet {S}><sheetData>'
+                                    '<row r="1"><c r="A1" t="s"><v>0</v></c><c r="B1" t="s"><v>1</v></c></row>'
+                                    '<row r="2"><c r="A2" t="s"><v>2</v></c><c r="C2"><v>5</v></c></row>'
+                                    '</sheetData></worksheet>',
+    })
+
+
+def make_pptx():
+    def slide(*texts):
+        paragraphs = ''.join(f'<a:p><a:r><a:t>{text}</a:t></a:r></a:p>' for text in texts)
+        return f'<p:sld xmlns:p="http://schemas.openxmlformats.org/presentationml/2006/main" {A}>{paragraphs}</p:sld>'
+
+    return make_zip({'ppt/slides/slide10.xml': slide('Questions?'), 'ppt/slides/slide2.xml': slide('Agenda', 'Intro')})
+
+
+class TestDocumentConversion(unittest.TestCase):
+
+    def test_document_format(self):
+        self.assertEqual(document_format("https://a.com/files/Report.PDF?v=2"), 'pdf')
+        self.assertEqual(document_format("https://a.com/download?id=7", f"{DOCX_TYPE}; charset=binary"), 'docx')
+        self.assertIsNone(document_format("https://a.com/notes.doc"))
+        self.assertIsNone(document_format("https://a.com/download", 'application/octet-stream'))
+
+    def test_docx_to_markdown(self):
+        markdown = docx_to_markdown(make_docx())
+
+        self.assertEqual(markdown, "# Annual Report\n\n## Summary\n\nRevenue grew.\n\n- First point\n\n"
+                                   "| Plan | Price |\n| --- | --- |\n| Basic | 5 \\| 10 |")
+
+    def test_xlsx_to_markdown(self):
+        markdown = xlsx_to_markdown(make_xlsx())
+
+        # Cells missing from a row are kept as empty columns
+        self.assertEqual(markdown, "## Prices\n\n| Plan | Price |  |\n| --- | --- | --- |\n| Basic |  | 5 |")
+
+    def test_pptx_to_markdown_orders_slides_by_number(self):
+        markdown = pptx_to_markdown(make_pptx())
+
+        self.assertEqual(markdown, "## Slide 1\n\nAgenda\n\nIntro\n\n## Slide 2\n\nQuestions?")
+
+    def test_unsupported_documents_are_refused(self):
+        with self.assertRaises(UnsupportedDocumentError):
+            document_to_markdown("https://a.com/notes.doc", b'\xd0\xcf\x11\xe0', 'application/msword')
+
+    def test_pdf_to_markdown(self):
+        try:
+            from pypdf import PdfWriter
+        except ImportError:
+            self.skipTest("pypdf is not installed")
+        writer = PdfWriter()
+        writer.add_blank_page(width=200, height=200)
+        writer.add_metadata({'/Title': 'Blank'})
+        buffer = io.BytesIO()
+        writer.write(buffer)
+
+        self.assertEqual(document_to_markdown("https://a.com/blank.pdf", buffer.getvalue()), "# Blank")
+
+
+class TestDocumentExtractor(unittest.TestCase):
+
+    def extract(self, paths, requested=None, **kwargs):
+        async def handle(request):
+            if requested is not None:
+                requested.append(request.path)
+            if request.path == '/missing.docx':
+                return web.Response(status=404)
+            if request.path == '/download':
+                return web.Response(body=b'\xd0\xcf\x11\xe0' * 1024, content_type='application/msword')
+            body = b'PK' * 1024 if request.path == '/big.docx' else make_docx()
+            return web.Response(body=body, content_type=DOCX_TYPE)
+
+        app = web.Application()
+        app.router.add_get('/{path:.*}', handle)
+
+        async def run():
+            async with TestServer(app) as server:
+                extractor = DocumentExtractor(workers=1, **kwargs)
+                try:
+                    return await asyncio.gather(*(extractor(str(server.make_url(path))) for path in paths),
+                                                return_exceptions=True)
+                finally:
+                    await extractor.close()
+
+        return asyncio.run(run())
+
+    def test_documents_are_downloaded_and_extracted_in_the_pool(self):
+        result, missing = self.extract(['/files/report.docx', '/missing.docx'])
+
+        self.assertTrue(result.success)
+        self.assertEqual(result.status_code, 200)
+        self.assertIsNone(result.html)
+        self.assertTrue(result.markdown.startswith("# Annual Report"))
+        self.assertFalse(missing.success)
+        self.assertEqual(missing.status_code, 404)
+
+    def test_oversized_documents_are_not_downloaded(self):
+        (error,) = self.extract(['/big.docx'], max_bytes=1024)
+
+        self.assertIsInstance(error, UnsupportedDocumentError)
+        self.assertIn('larger than', str(error))
+
+    def test_unsupported_formats_are_refused_before_downloading(self):
+        requested = []
+
+        by_extension, by_content_type = self.extract(['/files/notes.odt', '/download'], requested)
+
+        # The extension alone refuses the OpenDocument file, without a request
+        self.assertIsInstance(by_extension, UnsupportedDocumentError)
+        self.assertEqual(requested, ['/download'])
+        self.assertIsInstance(by_content_type, UnsupportedDocumentError)
+        self.assertIn('application/msword', str(by_content_type))
+
+    def test_for_workers(self):
+        self.assertIsNone(DocumentExtractor.for_workers(0))
+        self.assertEqual(DocumentExtractor.for_workers(3).workers, 3)
+        self.assertEqual(set(DocumentExtractor.for_workers(None).handlers), {'document'})
+        with self.assertRaises(ValueError):
+            DocumentExtractor.for_workers(-1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,123 @@
+import asyncio
+import unittest
+from datetime import datetime, timezone
+from src.frontier import PriorityFrontier, StreamingFrontier, parse_lastmod, rank_urls, score_url, url_depth
+
+NOW = datetime(2024, 6, 1, tzinfo=timezone.utc)
+
+
+class TestScoring(unittest.TestCase):
+
+    def test_parse_lastmod(self):
+        self.assertEqual(parse_lastmod("2024-05-01"), datetime(2024, 5, 1, tzinfo=timezone.utc))
+        self.assertEqual(parse_lastmod("2024-05-01T10:00:00Z"), datetime(2024, 5, 1, 10, tzinfo=timezone.utc))
+        self.assertIsNone(parse_lastmod("last week"))
+        self.assertIsNone(parse_lastmod(None))
+
+    def test_url_depth(self):
+        self.assertEqual(url_depth("https://example.com/"), 0)
+        self.assertEqual(url_depth("https://example.com/blog/2019/post/"), 3)
+
+    def test_score_prefers_priority_recency_and_shallow_pages(self):
+        base = score_url("https://example.com/a/b", 0.5, "2024-05-01", NOW)
+
+        self.assertGreater(score_url("https://example.com/a/b", 0.9, "2024-05-01", NOW), base)
+        self.assertGreater(score_url("https://example.com/a/b", 0.5, "2024-05-31", NOW), base)
+        self.assertGreater(score_url("https://example.com/a", 0.5, "2024-05-01", NOW), base)
+
+
+class TestPriorityFrontier(unittest.TestCase):
+
+    def test_pops_highest_score_first(self):
+        frontier = PriorityFrontier(now=NOW)
+        frontier.push("https://example.com/archive/2019/post", 0.2, "2019-01-01")
+        frontier.push("https://example.com/pricing", 0.9, "2024-05-30")
+        frontier.push("https://example.com/blog/news", 0.5)
+
+        self.assertEqual(frontier.take(3), ["https://example.com/pricing", "https://example.com/blog/news",
+                                            "https://example.com/archive/2019/post"])
+        with self.assertRaises(IndexError):
+            frontier.pop()
+
+    def test_patterns(self):
+        frontier = PriorityFrontier(include_patterns=[r'/docs/'], exclude_patterns=[r'/tag/'], now=NOW)
+
+        self.assertFalse(frontier.push("https://example.com/tag/python", 1.0))
+        frontier.push("https://example.com/", 1.0, "2024-06-01")
+        frontier.push("https://example.com/docs/deep/page", 0.0, "2010-01-01")
+
+        self.assertEqual(frontier.pop(), "https://example.com/docs/deep/page")
+
+    def test_dynamic_insertion(self):
+        frontier = PriorityFrontier(now=NOW)
+        frontier.push("https://example.com/a/b/c", 0.1)
+        frontier.push("https://example.com/a", 0.5)
+        self.assertEqual(frontier.pop(), "https://example.com/a")
+
+        # URLs found while crawling go ahead of lower-scored queued ones
+        self.assertTrue(frontier.push("https://example.com/new", 0.7))
+        # Pushing a queued URL with a higher score moves it up, and popped URLs are not queued again
+        self.assertTrue(frontier.push("https://example.com/a/b/c", 1.0))
+        self.assertFalse(frontier.push("https://example.com/a", 1.0))
+
+        self.assertEqual(len(frontier), 2)
+        self.assertEqual(frontier.take(5), ["https://example.com/a/b/c", "https://example.com/new"])
+
+    def test_rank_urls(self):
+        entries = [{'url': f"https://example.com/archive/{n}", 'priority': 0.1} for n in range(100)]
+        entries.append({'url': "https://example.com/important", 'priority': 1.0})
+        entries.append("https://example.com/")
+
+        self.assertEqual(rank_urls(entries, 2), ["https://example.com/important", "https://example.com/"])
+
+
+class TestStreamingFrontier(unittest.TestCase):
+
+    def test_take_waits_for_discovery(self):
+        async def run():
+            stream = StreamingFrontier(max_pages=3)
+
+            async def discover():
+                await asyncio.sleep(0.01)
+                stream.push_entries([{'url': "https://example.com/a/b", 'priority': 0.1},
+                                     {'url': "https://example.com/", 'priority': 0.9}])
+                await asyncio.sleep(0.01)
+                stream.push_entries(["https://example.com/c", "https://example.com/d"])
+                stream.close()
+
+            discovery = asyncio.create_task(discover())
+            first = await stream.take(10)
+            await discovery
+            rest = await stream.take(10)
+            return stream, first, rest
+
+        stream, first, rest = asyncio.run(run())
+
+        # The best URLs found so far come first, and no more than max_pages are handed out
+        self.assertEqual(first, ["https://example.com/", "https://example.com/a/b"])
+        self.assertEqual(len(rest), 1)
+        self.assertEqual(stream.pushed, 4)
+        self.assertTrue(stream.exhausted)
+
+    def test_take_returns_when_closed_or_timed_out(self):
+        async def run():
+            stream = StreamingFrontier(max_pages=10)
+            timed_out = await stream.take(5, timeout=0.01)
+            self.assertFalse(stream.exhausted)
+            asyncio.get_running_loop().call_later(0.01, stream.close)
+            return timed_out, await stream.take(5), stream.exhausted
+
+        self.assertEqual(asyncio.run(run()), ([], [], True))
+
+    def test_take_without_waiting(self):
+        async def run():
+            stream = StreamingFrontier(max_pages=10, exclude_patterns=[r'/private/'])
+            self.assertEqual(await stream.take(5, wait=False), [])
+            self.assertEqual(stream.push_entries(["https://example.com/private/a", "https://example.com/b"]), 1)
+            return await stream.take(5, wait=False)
+
+        self.assertEqual(asyncio.run(run()), ["https://example.com/b"])
+
+
+if __name__ == "__main__":
+    unittest.main()
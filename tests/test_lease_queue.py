@@ -0,0 +1,143 @@
+import os
+import asyncio
+import tempfile
+import unittest
+from src.lease_queue import InMemoryLeaseQueue, LeaseQueue, SQLiteLeaseQueue
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class LeaseQueueTests:
+    """Tests every lease queue backend must pass."""
+
+    def make_queue(self, clock, max_leases=5):
+        raise NotImplementedError
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.queue = self.make_queue(self.clock)
+        self.queue.add(["https://example.com/1", "https://example.com/2", "https://example.com/3"])
+
+    def test_queue_is_used_from_worker_threads(self):
+        async def run():
+            return await asyncio.gather(*(asyncio.to_thread(self.queue.lease, f'worker-{n}', 1, 60)
+                                          for n in range(3)))
+
+        leased = asyncio.run(run())
+
+        self.assertEqual(sorted(url for urls in leased for url in urls),
+                         ["https://example.com/1", "https://example.com/2", "https://example.com/3"])
+
+    def test_add_skips_known_urls(self):
+        self.assertEqual(self.queue.add(["https://example.com/1", "https://example.com/4"]), 1)
+        self.assertEqual(self.queue.counts()['pending'], 4)
+
+    def test_leases_are_exclusive(self):
+        first = self.queue.lease('worker-1', 2, timeout=60)
+        second = self.queue.lease('worker-2', 2, timeout=60)
+
+        self.assertEqual(first, ["https://example.com/1", "https://example.com/2"])
+        self.assertEqual(second, ["https://example.com/3"])
+        self.assertFalse(self.queue.complete('worker-2', "https://example.com/1"))
+
+    def test_expired_leases_are_reclaimed(self):
+        self.queue.lease('dead-worker', 3, timeout=60)
+        self.clock.now += 61
+
+        self.assertEqual(len(self.queue.lease('worker-2', 3, timeout=60)), 3)
+        self.assertFalse(self.queue.complete('dead-worker', "https://example.com/1"))
+
+    def test_heartbeat_extends_leases(self):
+        self.queue.lease('worker-1', 1, timeout=60)
+        self.clock.now += 50
+        self.assertEqual(self.queue.heartbeat('worker-1', ["https://example.com/1"], timeout=60), 1)
+        self.clock.now += 50
+
+        self.assertEqual(self.queue.lease('worker-2', 3, timeout=60), ["https://example.com/2", "https://example.com/3"])
+        self.assertTrue(self.queue.complete('worker-1', "https://example.com/1"))
+
+    def test_complete_and_release(self):
+        self.queue.lease('worker-1', 3, timeout=60)
+        self.assertTrue(self.queue.complete('worker-1', "https://example.com/1"))
+        self.assertTrue(self.queue.complete('worker-1', "https://example.com/2", succeeded=False))
+        self.assertTrue(self.queue.release('worker-1', "https://example.com/3"))
+
+        self.assertEqual(self.queue.counts(), {'pending': 1, 'leased': 0, 'done': 1, 'failed': 1})
+        self.assertFalse(self.queue.is_finished())
+        self.assertEqual(self.queue.lease('worker-2', 3, timeout=60), ["https://example.com/3"])
+
+    def test_urls_that_keep_expiring_fail(self):
+        queue = self.make_queue(self.clock, max_leases=2)
+        queue.add(["https://example.com/poison"])
+        for _ in range(2):
+            self.assertEqual(queue.lease('worker', 1, timeout=60), ["https://example.com/poison"])
+            self.clock.now += 61
+
+        self.assertEqual(queue.lease('worker', 1, timeout=60), [])
+        self.assertTrue(queue.is_finished())
+        self.assertEqual(queue.counts()['failed'], 1)
+
+    def test_released_urls_do_not_count_towards_failure(self):
+        queue = self.make_queue(self.clock, max_leases=1)
+        queue.add(["https://example.com/busy"])
+        for _ in range(3):
+            queue.lease('worker', 1, timeout=60)
+            queue.release('worker', "https://example.com/busy")
+
+        self.assertEqual(queue.counts()['pending'], 1)
+
+
+class TestInMemoryLeaseQueue(LeaseQueueTests, unittest.TestCase):
+
+    def make_queue(self, clock, max_leases=5):
+        return InMemoryLeaseQueue(max_leases=max_leases, clock=clock)
+
+
+class TestSQLiteLeaseQueue(LeaseQueueTests, unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.queues = []
+        super().setUp()
+
+    def tearDown(self):
+        for queue in self.queues:
+            queue.close()
+        self.temp_dir.cleanup()
+
+    def make_queue(self, clock, max_leases=5):
+        queue = SQLiteLeaseQueue(os.path.join(self.temp_dir.name, f'queue-{len(self.queues)}.db'),
+                                 max_leases=max_leases, clock=clock)
+        self.queues.append(queue)
+        return queue
+
+    def test_queue_is_shared_between_connections(self):
+        path = os.path.join(self.temp_dir.name, 'shared.db')
+        coordinator = SQLiteLeaseQueue(path, clock=self.clock)
+        worker = SQLiteLeaseQueue(path, clock=self.clock)
+        self.queues.extend([coordinator, worker])
+
+        coordinator.add(["https://example.com/1"])
+        self.assertEqual(worker.lease('worker-1', 5, timeout=60), ["https://example.com/1"])
+        self.assertEqual(coordinator.counts()['leased'], 1)
+
+
+class TestLeaseQueueInterface(unittest.TestCase):
+
+    def test_incomplete_backends_cannot_be_created(self):
+        class PartialQueue(LeaseQueue):
+            def add(self, urls):
+                return 0
+
+        with self.assertRaises(TypeError):
+            PartialQueue()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,118 @@
+import os
+import sys
+import json
+import logging
+import logging.handlers
+import tempfile
+import threading
+import unittest
+from config import logging_config
+from config.logging_config import JsonFormatter, UrlLogFilter, setup_logging, shutdown_logging
+
+
+def make_record(msg, *args, level=logging.INFO):
+    return logging.LogRecord('src.crawl_one', level, __file__, 1, msg, args, None)
+
+
+class TestUrlLogFilter(unittest.TestCase):
+
+    def test_sampling_keeps_all_lines_of_a_url(self):
+        log_filter = UrlLogFilter(sample_rate=0.25)
+        urls = [f"https://a.com/{i}" for i in range(2000)]
+        kept = [url for url in urls if log_filter.filter(make_record("Starting to crawl URL: %s", url))]
+
+        self.assertTrue(350 < len(kept) < 650)
+        # Every later line about a kept URL is kept too
+        self.assertTrue(all(log_filter.filter(make_record("Saved markdown content for URL %s at %s", url, '/tmp/a'))
+                            for url in kept))
+
+    def test_warnings_and_records_without_url_pass(self):
+        log_filter = UrlLogFilter(sample_rate=0.0)
+
+        self.assertFalse(log_filter.filter(make_record("Starting to crawl URL: %s", "https://a.com/")))
+        self.assertTrue(log_filter.filter(make_record("Invalid URL: %s", "https://a.com/", level=logging.WARNING)))
+        self.assertTrue(log_filter.filter(make_record("Closing crawler...")))
+
+    def test_rate_limit(self):
+        log_filter = UrlLogFilter(max_per_second=5)
+        kept = sum(log_filter.filter(make_record("Starting to crawl URL: %s", f"https://a.com/{i}"))
+                   for i in range(20))
+
+        # The test may straddle a second boundary, which opens a new budget
+        self.assertIn(kept, (5, 10))
+        self.assertEqual(log_filter.suppressed, 20 - kept)
+
+    def test_invalid_sample_rate(self):
+        with self.assertRaises(ValueError):
+            UrlLogFilter(sample_rate=2.0)
+
+
+class TestJsonFormatter(unittest.TestCase):
+
+    def test_formats_json_line(self):
+        record = make_record("Saved markdown content for URL %s at %s", "https://a.com/", '/tmp/a.md')
+        entry = json.loads(JsonFormatter().format(record))
+
+        self.assertEqual(entry['level'], 'INFO')
+        self.assertEqual(entry['logger'], 'src.crawl_one')
+        self.assertEqual(entry['message'], "Saved markdown content for URL https://a.com/ at /tmp/a.md")
+        self.assertEqual(entry['url'], "https://a.com/")
+        self.assertNotIn('exception', entry)
+
+    def test_includes_exception(self):
+        try:
+            raise RuntimeError("boom")
+        except RuntimeError:
+            record = logging.LogRecord('src', logging.ERROR, __file__, 1, "Failed", (), sys.exc_info())
+        entry = json.loads(JsonFormatter().format(record))
+
+        self.assertIn('RuntimeError: boom', entry['exception'])
+
+
+class TestSetupLogging(unittest.TestCase):
+
+    def setUp(self):
+        self.root = logging.getLogger()
+        self.saved_handlers = list(self.root.handlers)
+        self.saved_level = self.root.level
+        # Write app.log to a temporary directory rather than the repository's logs
+        self.log_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        if logging_config._listener is not None:
+            handlers = logging_config._listener.handlers
+            shutdown_logging()
+            for handler in handlers:
+                handler.close()
+        self.log_dir.cleanup()
+        for handler in list(self.root.handlers):
+            self.root.removeHandler(handler)
+        for handler in self.saved_handlers:
+            self.root.addHandler(handler)
+        self.root.setLevel(self.saved_level)
+
+    def test_handlers_write_on_listener_thread(self):
+        setup_logging(log_format='json', level='INFO', log_dir=self.log_dir.name)
+        self.assertEqual(self.root.level, logging.INFO)
+        self.assertEqual(len(self.root.handlers), 1)
+        self.assertIsInstance(self.root.handlers[0], logging.handlers.QueueHandler)
+
+        threads = []
+        capture = logging.Handler()
+        capture.emit = lambda record: threads.append(threading.current_thread())
+        logging_config._listener.handlers += (capture,)
+
+        logging.getLogger('src.test').info("Starting to crawl URL: %s", "https://a.com/")
+        handlers = logging_config._listener.handlers
+        shutdown_logging()
+        for handler in handlers:
+            handler.close()
+
+        self.assertEqual(len(threads), 1)
+        self.assertIsNot(threads[0], threading.current_thread())
+        with open(os.path.join(self.log_dir.name, 'app.log'), encoding='utf-8') as f:
+            self.assertEqual(json.loads(f.readline())['url'], "https://a.com/")
+
+
+if __name__ == '__main__':
+    unittest.main()
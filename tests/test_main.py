@@ -1,7 +1,13 @@
+import os
 import unittest
-from unittest.mock import patch, MagicMock
+import tempfile
+from unittest.mock import patch, MagicMock, AsyncMock
 import asyncio
-from src.main import main, fetch_urls_for_crawling, crawl_single_url, crawl_urls
+import threading
+from src.frontier import StreamingFrontier
+from src.main import (main, crawl_single_url, crawl_urls, read_seeds, run_batch, run_crawler,
+                      stream_urls_for_crawling)
+from src.url_rules import UrlRules
 
 class TestCrawler(unittest.TestCase):
 
@@ -71,25 +77,148 @@ class TestCrawler(unittest.TestCase):
 
         mock_crawl_one.assert_not_called()  # Ensure crawl_one was never called since the URL is disallowed
 
-    @patch('src.main.fetch_sitemap_urls')
-    @patch('src.main.get_sitemap_urls')
-    async def test_fetch_urls_for_crawling_with_sitemap(self, mock_get_sitemap_urls, mock_fetch_sitemap_urls):
-        mock_fetch_sitemap_urls.return_value = ['https://example.com/page1', 'https://example.com/page2']        
-        urls = await fetch_urls_for_crawling('https://example.com', 'https://example.com/sitemap.xml', None, 5, True)
-
-        self.assertEqual(len(urls), 2)  # Check that we retrieved the correct number of URLs
-        mock_fetch_sitemap_urls.assert_called_once_with('https://example.com/sitemap.xml', max_pages=5)
-
-    @patch('src.main.fetch_sitemap_urls')
-    @patch('src.main.get_sitemap_urls')
-    async def test_fetch_urls_for_crawling_without_sitemap(self, mock_get_sitemap_urls, mock_fetch_sitemap_urls):
-        mock_fetch_sitemap_urls.return_value = []  # Simulate no URLs found
-        mock_get_sitemap_urls.return_value = ['https://example.com/page1', 'https://example.com/page2']
+class TestPipelinedCrawl(unittest.TestCase):
 
-        urls = await fetch_urls_for_crawling('https://example.com', None, None, 5, True)
-
-        self.assertEqual(len(urls), 2)  # Check that we retrieved the correct number of URLs
-        mock_get_sitemap_urls.assert_called_once_with('https://example.com', max_pages=5)
+    @patch('src.main.crawl_parallel')
+    @patch('src.main.create_crawler')
+    @patch('src.main.iter_sitemap_entries')
+    @patch('src.main.fetch_robots_txt')
+    @patch('src.main.check_url')
+    def test_run_crawler_crawls_while_discovering(self, mock_check_url, mock_fetch_robots_txt,
+                                                  mock_iter_sitemap_entries, mock_create_crawler,
+                                                  mock_crawl_parallel):
+        events = []
+        mock_check_url.return_value = {'valid': True, 'url': 'https://example.com'}
+        mock_fetch_robots_txt.return_value = {'sitemap': ['https://example.com/sitemap.xml'],
+                                              'disallow': ['/private'], 'allow': []}
+
+        async def sitemap_entries(sitemap_url, max_entries=None, cache=None):
+            events.append('sitemap 1')
+            yield [{'url': 'https://example.com/a'}, {'url': 'https://example.com/private/b'},
+                   {'url': 'https://example.com/drafts/d'}]
+            await asyncio.sleep(0.05)
+            events.append('sitemap 2')
+            yield [{'url': 'https://example.com/c'}, {'url': 'https://example.com/c.png'}]
+
+        mock_iter_sitemap_entries.side_effect = sitemap_entries
+
+        crawler = mock_create_crawler.return_value
+        crawler.start = AsyncMock(side_effect=lambda: events.append('browser started'))
+        crawler.close = AsyncMock()
+
+        async def crawl(urls, url_stream=None, **kwargs):
+            while not url_stream.exhausted:
+                for url in await url_stream.take(10):
+                    events.append(f'crawl {url}')
+            return {'succeeded': url_stream.taken, 'failed': 0, 'skipped': 0, 'retried': 0}
+
+        mock_crawl_parallel.side_effect = crawl
+
+        asyncio.run(run_crawler('https://example.com', crawl_all=True, max_pages=10,
+                                url_rules=UrlRules(exclude_globs=['*/drafts/*'])))
+
+        # The browser starts while discovery runs, and the first page is crawled before the last sitemap is read
+        self.assertLess(events.index('browser started'), events.index('sitemap 2'))
+        self.assertLess(events.index('crawl https://example.com/a'), events.index('sitemap 2'))
+        self.assertIn('crawl https://example.com/c', events)
+        self.assertNotIn('crawl https://example.com/private/b', events)
+        # Discovered URLs go through the URL rules before they reach the frontier
+        self.assertNotIn('crawl https://example.com/drafts/d', events)
+        self.assertNotIn('crawl https://example.com/c.png', events)
+        self.assertIs(mock_crawl_parallel.call_args.kwargs['crawler'], crawler)
+        crawler.close.assert_awaited_once()
+
+    @patch('src.main.SpiderRunner')
+    @patch('src.main.iter_sitemap_entries')
+    def test_spider_fallback_runs_off_the_event_loop(self, mock_iter_sitemap_entries, mock_spider_runner):
+        async def no_entries(sitemap_url, max_entries=None, cache=None):
+            return
+            yield
+
+        mock_iter_sitemap_entries.side_effect = no_entries
+        spider_threads = []
+
+        def run_spider(url, max_pages=50, url_rules=None):
+            spider_threads.append(threading.current_thread())
+            return ['https://example.com/a', 'https://example.com/b.png']
+
+        mock_spider_runner.return_value.run_spider.side_effect = run_spider
+        url_stream = StreamingFrontier(10)
+
+        async def run():
+            await stream_urls_for_crawling('https://example.com', None, {}, 10, False, url_stream)
+            return await url_stream.take(10)
+
+        self.assertEqual(asyncio.run(run()), ['https://example.com/a'])
+        self.assertIsNot(spider_threads[0], threading.main_thread())
+        self.assertTrue(url_stream.exhausted)
+
+class TestBatchMode(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.seeds_file = os.path.join(self.temp_dir.name, 'seeds.txt')
+        with open(self.seeds_file, 'w', encoding='utf-8') as f:
+            f.write("# nightly sites\nhttps://a.com\n\nhttps://b.com\nhttps://a.com\n")
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_read_seeds(self):
+        self.assertEqual(read_seeds(self.seeds_file), ['https://a.com', 'https://b.com'])
+
+    @patch('src.main.crawl_parallel', new_callable=AsyncMock)
+    @patch('src.main.create_crawler')
+    @patch('src.discovery.fetch_robots_txt_async', new_callable=AsyncMock)
+    @patch('src.discovery.get_sitemap_entries', new_callable=AsyncMock)
+    def test_run_batch_shares_one_crawler(self, mock_get_sitemap_entries, mock_fetch_robots, mock_create_crawler,
+                                          mock_crawl_parallel):
+        mock_fetch_robots.return_value = {}
+        mock_get_sitemap_entries.side_effect = lambda url, max_entries, cache=None, session=None: [
+            {'url': f"{url}/{n}", 'priority': 1.0 - n / 10} for n in (1, 2, 3)] if 'a.com' in url else [
+            {'url': f"{url}/1"}]
+        crawler = mock_create_crawler.return_value
+        crawler.start = AsyncMock()
+        crawler.close = AsyncMock()
+
+        asyncio.run(run_batch(self.seeds_file, crawl_all=True, max_pages=10))
+
+        mock_create_crawler.assert_called_once()
+        crawler.close.assert_awaited_once()
+        mock_crawl_parallel.assert_awaited_once()
+        urls = mock_crawl_parallel.call_args.args[0]
+        self.assertEqual(urls, ['https://a.com/1', 'https://b.com/1', 'https://a.com/2', 'https://a.com/3'])
+        self.assertIs(mock_crawl_parallel.call_args.kwargs['crawler'], crawler)
+        # Both sites were discovered over the same HTTP session
+        sessions = {call.kwargs['session'] for call in mock_get_sitemap_entries.call_args_list}
+        self.assertEqual(len(sessions), 1)
+
+    @patch('src.main.MarkdownChunker')
+    @patch('src.main.create_crawler')
+    def test_run_batch_closes_the_chunker_when_the_browser_fails(self, mock_create_crawler, mock_chunker_class):
+        chunker = mock_chunker_class.return_value
+        chunker.start = AsyncMock()
+        chunker.close = AsyncMock()
+        crawler = mock_create_crawler.return_value
+        crawler.start = AsyncMock(side_effect=RuntimeError("Browser failed to launch"))
+        crawler.close = AsyncMock()
+
+        with self.assertRaises(RuntimeError):
+            asyncio.run(run_batch(self.seeds_file, chunk_tokens=256, preflight='off', document_workers=0))
+
+        chunker.start.assert_awaited_once()
+        chunker.close.assert_awaited_once()
+
+    @patch('src.main.run_crawler', new_callable=AsyncMock)
+    def test_exclude_patterns_are_applied_by_the_url_rules_only(self, mock_run_crawler):
+        with patch('sys.argv', ['main', 'https://example.com', '--crawl-all', '--exclude', '/drafts/']), \
+                patch('src.main.setup_logging'):
+            asyncio.run(main())
+
+        kwargs = mock_run_crawler.call_args.kwargs
+        # The frontier gets no exclude patterns; the URL rules have them
+        self.assertIsNone(kwargs['exclude_patterns'])
+        self.assertFalse(kwargs['url_rules'].allows("https://example.com/drafts/1"))
 
 if __name__ == '__main__':
-    asyncio.run(unittest.main())
\ No newline at end of file
+    asyncio.run(unittest.main())
@@ -0,0 +1,91 @@
+import os
+import json
+import asyncio
+import tempfile
+import unittest
+from unittest.mock import AsyncMock, MagicMock
+from src import metrics
+from src.crawl_parallel import crawl_page
+from src.metrics import MetricsRegistry
+
+
+class TestMetrics(unittest.TestCase):
+
+    def setUp(self):
+        self.registry = MetricsRegistry()
+
+    def test_counter_and_gauge(self):
+        pages = self.registry.counter('pages_total', 'Pages.', ['outcome'])
+        in_flight = self.registry.gauge('in_flight', 'In flight.')
+
+        pages.inc(outcome='succeeded')
+        pages.inc(2, outcome='failed')
+        in_flight.inc()
+        in_flight.inc()
+        in_flight.dec()
+
+        self.assertEqual(pages.value(outcome='failed'), 2)
+        self.assertEqual(in_flight.value(), 1)
+        with self.assertRaises(ValueError):
+            pages.inc(-1, outcome='failed')
+        with self.assertRaises(ValueError):
+            pages.inc(status='failed')
+
+    def test_histogram_buckets_and_summary(self):
+        latency = self.registry.histogram('latency_seconds', 'Latency.', buckets=(0.1, 1.0))
+
+        for value in (0.05, 0.5, 0.7, 3.0):
+            latency.observe(value)
+
+        summary = latency.summary()
+        self.assertEqual(summary['count'], 4)
+        self.assertAlmostEqual(summary['sum'], 4.25)
+        self.assertEqual(summary['p50'], 1.0)
+        self.assertEqual(summary['p95'], 3.0)
+        self.assertEqual(summary['max'], 3.0)
+
+    def test_render_prometheus(self):
+        pages = self.registry.counter('pages_total', 'Pages.', ['outcome'])
+        latency = self.registry.histogram('latency_seconds', 'Latency.', buckets=(0.1, 1.0))
+        pages.inc(outcome='say "hi"')
+        latency.observe(0.5)
+
+        text = self.registry.render_prometheus()
+
+        self.assertIn('# TYPE pages_total counter', text)
+        self.assertIn('pages_total{outcome="say \\"hi\\""} 1', text)
+        self.assertIn('latency_seconds_bucket{le="0.1"} 0', text)
+        self.assertIn('latency_seconds_bucket{le="1"} 1', text)
+        self.assertIn('latency_seconds_bucket{le="+Inf"} 1', text)
+        self.assertIn('latency_seconds_sum 0.5', text)
+        self.assertIn('latency_seconds_count 1', text)
+
+    def test_write_files(self):
+        self.registry.counter('pages_total', 'Pages.').inc(3)
+        with tempfile.TemporaryDirectory() as temp_dir:
+            prometheus_path = os.path.join(temp_dir, 'metrics.prom')
+            summary_path = os.path.join(temp_dir, 'summary.json')
+
+            self.registry.write_prometheus(prometheus_path)
+            self.registry.write_summary(summary_path, {'duration_seconds': 1.5})
+
+            with open(prometheus_path) as f:
+                self.assertIn('pages_total 3', f.read())
+            with open(summary_path) as f:
+                summary = json.load(f)
+            self.assertEqual(summary, {'run': {'duration_seconds': 1.5}, 'metrics': {'pages_total': 3}})
+            self.assertEqual(sorted(os.listdir(temp_dir)), ['metrics.prom', 'summary.json'])
+
+    def test_crawl_page_records_render_latency(self):
+        metrics.REGISTRY.reset()
+        crawler = MagicMock()
+        crawler.arun = AsyncMock(return_value=MagicMock(success=True, status_code=200, markdown="# Page"))
+
+        asyncio.run(crawl_page(crawler, "https://example.com", 10.0))
+
+        self.assertEqual(metrics.RENDER_SECONDS.count(outcome='succeeded'), 1)
+        self.assertEqual(metrics.PAGES_IN_FLIGHT.value(), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
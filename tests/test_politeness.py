@@ -0,0 +1,42 @@
+import unittest
+from collections import deque
+from src.crawl_parallel import take_ready_batch
+from src.politeness import PolitenessScheduler
+
+
+class TestPolitenessScheduler(unittest.TestCase):
+
+    def test_spaces_out_pages_on_the_same_host(self):
+        scheduler = PolitenessScheduler(min_delay=2.0)
+
+        self.assertTrue(scheduler.can_start("https://a.com/1", 10.0))
+        scheduler.started("https://a.com/1", 10.0)
+        scheduler.finished("https://a.com/1")
+
+        self.assertFalse(scheduler.can_start("https://a.com/2", 11.0))
+        self.assertTrue(scheduler.can_start("https://b.com/1", 11.0))
+        self.assertEqual(scheduler.ready_at("https://a.com/2"), 12.0)
+        self.assertTrue(scheduler.can_start("https://a.com/2", 12.0))
+
+    def test_limits_running_pages_per_host(self):
+        scheduler = PolitenessScheduler(min_delay=0.0, max_per_host=1)
+
+        scheduler.started("https://a.com/1", 0.0)
+        self.assertFalse(scheduler.can_start("https://a.com/2", 5.0))
+
+        scheduler.finished("https://a.com/1")
+        self.assertTrue(scheduler.can_start("https://a.com/2", 5.0))
+
+    def test_take_ready_batch_interleaves_hosts(self):
+        scheduler = PolitenessScheduler(min_delay=1.0)
+        frontier = deque((url, 0.0) for url in
+                         ["https://a.com/1", "https://a.com/2", "https://b.com/1", "https://b.com/2"])
+
+        batch = take_ready_batch(frontier, 4, 0.0, scheduler)
+
+        self.assertEqual(batch, ["https://a.com/1", "https://b.com/1"])
+        self.assertEqual([url for url, _ in frontier], ["https://a.com/2", "https://b.com/2"])
+
+
+if __name__ == "__main__":
+    unittest.main()
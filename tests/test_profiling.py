@@ -0,0 +1,87 @@
+import os
+import time
+import pstats
+import asyncio
+import tempfile
+import unittest
+from src import metrics
+from src.profiling import LoopLagMonitor, RunProfiler
+
+
+def block_the_loop(seconds):
+    time.sleep(seconds)
+
+
+class TestLoopLagMonitor(unittest.TestCase):
+
+    def setUp(self):
+        metrics.REGISTRY.reset()
+
+    def test_reports_blocking_call_with_its_stack(self):
+        async def run():
+            monitor = LoopLagMonitor(interval=0.02, threshold=0.1)
+            monitor.start()
+            await asyncio.sleep(0.1)
+            block_the_loop(0.4)
+            await asyncio.sleep(0.05)
+            return monitor, await monitor.stop()
+
+        with self.assertLogs('src.profiling', level='WARNING'):
+            monitor, report = asyncio.run(run())
+
+        self.assertEqual(report['stalls'], 1)
+        self.assertEqual(metrics.LOOP_STALLS.value(), 1)
+        self.assertIn('block_the_loop', monitor.stalls[0]['stack'])
+        self.assertGreaterEqual(monitor.stalls[0]['blocked_for'], 0.1)
+        self.assertGreaterEqual(report['max_lag'], 0.3)
+        self.assertEqual(metrics.LOOP_LAG_SECONDS.count(), report['heartbeats'])
+
+    def test_idle_loop_has_no_stalls(self):
+        async def run():
+            monitor = LoopLagMonitor(interval=0.01, threshold=0.2)
+            monitor.start()
+            await asyncio.sleep(0.1)
+            return await monitor.stop()
+
+        report = asyncio.run(run())
+
+        self.assertEqual(report['stalls'], 0)
+        self.assertGreater(report['heartbeats'], 0)
+
+
+class TestRunProfiler(unittest.TestCase):
+
+    def test_cprofile_writes_pstats(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'run.prof')
+            profiler = RunProfiler(path)
+            profiler.start()
+            block_the_loop(0.01)
+            profiler.stop()
+
+            stats = pstats.Stats(path)
+            self.assertTrue(any(name == 'block_the_loop' for _, _, name in stats.stats))
+            self.assertIn('block_the_loop', profiler.summary())
+
+    def test_sampling_writes_collapsed_stacks(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'run.folded')
+            profiler = RunProfiler(path, mode='sampling')
+            profiler.start()
+            block_the_loop(0.2)
+            profiler.stop()
+
+            with open(path, encoding='utf-8') as f:
+                lines = f.read().splitlines()
+            self.assertTrue(lines)
+            stack, samples = lines[0].rsplit(' ', 1)
+            self.assertIn('block_the_loop', stack)
+            self.assertGreater(int(samples), 0)
+
+    def test_unknown_mode(self):
+        with self.assertRaises(ValueError):
+            RunProfiler('run.prof', mode='perf')
+
+
+if __name__ == '__main__':
+    unittest.main()
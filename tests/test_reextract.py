@@ -0,0 +1,68 @@
+import os
+import json
+import asyncio
+import tempfile
+import unittest
+import logging
+from unittest.mock import patch
+from src.reextract import html_to_markdown, replay_warc
+from src.warc import WarcWriter
+
+# Setup logging for tests
+logging.basicConfig(level=logging.DEBUG)
+
+SAMPLE_HTML = """
+<html>
+    <body>
+        <h1>Sample Title</h1>
+        <p>This paragraph has enough words in it to be kept by the scraper.</p>
+    </body>
+</html>
+"""
+
+class TestReextract(unittest.TestCase):
+
+    def test_html_to_markdown(self):
+        markdown = html_to_markdown("https://example.com/page1", SAMPLE_HTML)
+
+        self.assertIn("# Sample Title", markdown)
+        self.assertIn("enough words", markdown)
+
+    def test_replay_warc(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            warc_dir = os.path.join(temp_dir, 'warc')
+            output_dir = os.path.join(temp_dir, 'out')
+
+            async def run():
+                writer = WarcWriter(warc_dir)
+                await writer.write_response("https://example.com/page1", SAMPLE_HTML)
+                await writer.write_response("https://example.com/page2", SAMPLE_HTML)
+                await writer.close()
+                return await replay_warc(warc_dir, output_dir, workers=2)
+
+            saved_files = asyncio.run(run())
+
+            self.assertEqual(len(saved_files), 2)
+            with open(saved_files[0], encoding='utf-8') as f:
+                self.assertIn("# Sample Title", f.read())
+
+            with open(os.path.join(output_dir, 'example.com', 'crawl_metadata.json'), encoding='utf-8') as f:
+                metadata = json.load(f)
+            self.assertEqual({entry['url'] for entry in metadata},
+                             {"https://example.com/page1", "https://example.com/page2"})
+
+    def test_replay_warc_reports_failures(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            async def run():
+                writer = WarcWriter(temp_dir)
+                await writer.write_response("https://example.com/page1", SAMPLE_HTML)
+                await writer.close()
+                return await replay_warc(temp_dir, os.path.join(temp_dir, 'out'), workers=1)
+
+            with patch('src.reextract.save_markdown', side_effect=OSError("disk full")):
+                saved_files = asyncio.run(run())
+
+            self.assertEqual(saved_files, [])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,69 @@
+import asyncio
+import unittest
+import logging
+from unittest.mock import AsyncMock, MagicMock
+from src.resource_profiles import ResourceBlocker, is_tracker
+
+# Setup logging for tests
+logging.basicConfig(level=logging.DEBUG)
+
+class TestResourceProfiles(unittest.TestCase):
+
+    def test_is_tracker(self):
+        self.assertTrue(is_tracker("https://www.google-analytics.com/analytics.js"))
+        self.assertTrue(is_tracker("https://securepubads.g.doubleclick.net:443/tag/js/gpt.js"))
+        self.assertFalse(is_tracker("https://example.com/app.js"))
+        self.assertFalse(is_tracker("https://www.bing.com/search"))
+
+    def test_profiles(self):
+        full = ResourceBlocker('full')
+        no_media = ResourceBlocker('no-media')
+        text_only = ResourceBlocker('text-only')
+
+        self.assertFalse(full.should_block('image', "https://example.com/a.png"))
+        self.assertFalse(full.should_block('script', "https://www.googletagmanager.com/gtm.js"))
+
+        self.assertTrue(no_media.should_block('image', "https://example.com/a.png"))
+        self.assertTrue(no_media.should_block('font', "https://example.com/a.woff2"))
+        self.assertTrue(no_media.should_block('script', "https://www.googletagmanager.com/gtm.js"))
+        self.assertFalse(no_media.should_block('stylesheet', "https://example.com/site.css"))
+        self.assertFalse(no_media.should_block('script', "https://example.com/app.js"))
+
+        self.assertTrue(text_only.should_block('stylesheet', "https://example.com/site.css"))
+        self.assertFalse(text_only.should_block('xhr', "https://example.com/api/content"))
+
+    def test_documents_are_never_blocked(self):
+        self.assertFalse(ResourceBlocker('text-only').should_block('document', "https://www.google-analytics.com/"))
+
+    def test_unknown_profile(self):
+        with self.assertRaises(ValueError):
+            ResourceBlocker('everything')
+
+    def test_handle_route(self):
+        blocker = ResourceBlocker('no-media')
+        image_route = MagicMock(abort=AsyncMock(), continue_=AsyncMock())
+        image_route.request.resource_type = 'image'
+        image_route.request.url = "https://example.com/a.png"
+        page_route = MagicMock(abort=AsyncMock(), continue_=AsyncMock())
+        page_route.request.resource_type = 'document'
+        page_route.request.url = "https://example.com/"
+
+        asyncio.run(blocker.handle_route(image_route))
+        asyncio.run(blocker.handle_route(page_route))
+
+        image_route.abort.assert_called_once()
+        page_route.continue_.assert_called_once()
+        self.assertEqual(blocker.blocked_count, 1)
+
+    def test_install(self):
+        crawler = MagicMock()
+        ResourceBlocker('full').install(crawler)
+        crawler.crawler_strategy.set_hook.assert_not_called()
+
+        blocker = ResourceBlocker('text-only')
+        blocker.install(crawler)
+        crawler.crawler_strategy.set_hook.assert_called_once_with('on_page_context_created',
+                                                                  blocker.on_page_context_created)
+
+if __name__ == "__main__":
+    unittest.main()
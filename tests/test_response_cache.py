@@ -0,0 +1,87 @@
+import os
+import asyncio
+import tempfile
+import unittest
+import logging
+from unittest.mock import patch
+from src.response_cache import ResponseCache, canonicalize_url
+
+# Setup logging for tests
+logging.basicConfig(level=logging.DEBUG)
+
+class TestResponseCache(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.cache_dir = self.temp_dir.name
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_canonicalize_url(self):
+        self.assertEqual(canonicalize_url("HTTPS://Example.COM:443/a?b=2&a=1#top"), "https://example.com/a?a=1&b=2")
+        self.assertEqual(canonicalize_url("http://example.com"), "http://example.com/")
+        self.assertEqual(canonicalize_url("http://example.com:8080/"), "http://example.com:8080/")
+
+    def test_put_and_get(self):
+        async def run():
+            cache = ResponseCache(self.cache_dir)
+            self.assertIsNone(await cache.get("https://example.com/a"))
+            await cache.put("https://example.com/a", {'body': "content"})
+            data = await cache.get("https://EXAMPLE.com/a#section")
+            return cache, data
+
+        cache, data = asyncio.run(run())
+
+        self.assertEqual(data, {'body': "content"})
+        self.assertEqual(cache.stats(), {'hits': 1, 'misses': 1, 'stores': 1, 'evictions': 0})
+
+    def test_settings_are_part_of_the_key(self):
+        async def run():
+            cache = ResponseCache(self.cache_dir)
+            await cache.put("https://example.com/a", {'body': "full"}, {'resource_profile': 'full'})
+            return await cache.get("https://example.com/a", {'resource_profile': 'text-only'})
+
+        self.assertIsNone(asyncio.run(run()))
+
+    def test_entries_expire(self):
+        async def run():
+            cache = ResponseCache(self.cache_dir, ttl=60)
+            with patch('src.response_cache.time.time', return_value=1000.0):
+                await cache.put("https://example.com/a", {'body': "content"})
+            with patch('src.response_cache.time.time', return_value=1061.0):
+                return cache, await cache.get("https://example.com/a")
+
+        cache, data = asyncio.run(run())
+
+        self.assertIsNone(data)
+        self.assertEqual(cache.misses, 1)
+        self.assertEqual(os.listdir(os.path.join(self.cache_dir, os.listdir(self.cache_dir)[0])), [])
+
+    def test_least_recently_used_entries_are_evicted(self):
+        async def run():
+            cache = ResponseCache(self.cache_dir, max_size=3000)
+            clock = [1000.0]
+            with patch('src.response_cache.time.time', side_effect=lambda: clock[0]):
+                for name in ('a', 'b', 'c'):
+                    clock[0] += 1
+                    await cache.put(f"https://example.com/{name}", {'body': "x" * 700})
+                # Touch 'a' so 'b' becomes the least recently used entry
+                clock[0] += 1
+                await cache.get("https://example.com/a")
+                clock[0] += 1
+                await cache.put("https://example.com/d", {'body': "x" * 700})
+                return cache, [await cache.get(f"https://example.com/{name}") is not None for name in 'abcd']
+
+        cache, present = asyncio.run(run())
+
+        self.assertEqual(present, [True, False, True, True])
+        self.assertEqual(cache.evictions, 1)
+
+    def test_index_is_shared_across_runs(self):
+        asyncio.run(ResponseCache(self.cache_dir).put("https://example.com/a", {'body': "content"}))
+
+        self.assertEqual(asyncio.run(ResponseCache(self.cache_dir).get("https://example.com/a")), {'body': "content"})
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,87 @@
+import os
+import asyncio
+import tempfile
+import unittest
+import logging
+from unittest.mock import patch
+from src.result_writer import ResultWriter
+from src.results_saver import load_manifest
+
+# Setup logging for tests
+logging.basicConfig(level=logging.DEBUG)
+
+class TestResultWriter(unittest.TestCase):
+
+    def test_writes_all_submitted_pages(self):
+        with tempfile.TemporaryDirectory() as output_dir:
+            urls = [f"https://example.com/page{i}" for i in range(50)]
+
+            async def run():
+                async with ResultWriter(output_dir, num_writers=3, queue_size=4, batch_size=8) as writer:
+                    for url in urls:
+                        await writer.submit(url, f"content of {url}")
+                return writer
+
+            writer = asyncio.run(run())
+
+            self.assertEqual(writer.saved_count, 50)
+            self.assertEqual(writer.failed_count, 0)
+            self.assertEqual(sorted(entry['url'] for entry in writer.metadata), sorted(urls))
+
+            manifest = load_manifest(os.path.join(output_dir, 'example.com'))
+            self.assertEqual(set(manifest), set(urls))
+            for entry in writer.metadata:
+                self.assertTrue(os.path.exists(entry['markdown_file']))
+
+    def test_submit_applies_backpressure(self):
+        """submit waits while the queue is full instead of buffering without bound."""
+        async def run():
+            writer = ResultWriter('unused', queue_size=2)  # Not started, so nothing drains the queue
+            await writer.submit("https://example.com/page1", "")
+            await writer.submit("https://example.com/page2", "")
+            with self.assertRaises(asyncio.TimeoutError):
+                await asyncio.wait_for(writer.submit("https://example.com/page3", ""), timeout=0.05)
+
+        asyncio.run(run())
+
+    def test_failed_batches_are_counted(self):
+        async def run():
+            async with ResultWriter('unused', num_writers=1) as writer:
+                await writer.submit("https://example.com/page1", "")
+            return writer
+
+        with patch('src.result_writer.save_markdown_batch', side_effect=OSError("disk full")):
+            writer = asyncio.run(run())
+
+        self.assertEqual(writer.failed_count, 1)
+        self.assertEqual(writer.metadata, [])
+
+    def test_close_returns_after_unexpected_errors(self):
+        async def run():
+            async with ResultWriter('unused', num_writers=1) as writer:
+                await writer.submit("https://example.com/page1", "")
+            return writer
+
+        with patch('src.result_writer.save_markdown_batch', return_value=['/tmp/page1.md']), \
+                patch('src.result_writer.WRITE_SECONDS.observe', side_effect=RuntimeError("metrics broken")):
+            writer = asyncio.run(asyncio.wait_for(run(), timeout=5))
+
+        self.assertEqual(writer._tasks, [])
+
+    def test_pages_are_reported_once_their_write_is_over(self):
+        written = []
+
+        async def run():
+            async with ResultWriter('unused', num_writers=1, on_written=lambda *args: written.append(args)) as writer:
+                await writer.submit("https://example.com/page1", "")
+                await writer.submit("https://example.com/page2", "")
+                # Nothing is reported before the writer gets to the pages
+                self.assertEqual(written, [])
+
+        with patch('src.result_writer.save_markdown_batch', return_value=['/tmp/page1.md', None]):
+            asyncio.run(run())
+
+        self.assertEqual(written, [("https://example.com/page1", True), ("https://example.com/page2", False)])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,10 +1,15 @@
 import os
+import json
 import asyncio
+import tempfile
 import unittest
 import logging
 from unittest.mock import AsyncMock, patch
 import aiofiles
-from src.results_saver import ensure_directory_exists, save_markdown, save_metadata  
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+from src.results_saver import (ensure_directory_exists, save_markdown, save_markdown_batch, save_metadata,
+                               markdown_relative_path, load_manifest)
 
 # Setup logging for tests
 logging.basicConfig(level=logging.DEBUG)
@@ -64,5 +69,77 @@ class TestResultsSaver(unittest.TestCase):
         self.assertIn("crawl_metadata.json", metadata_file_path)  # Check if the path is correct
         mock_open.return_value.__aenter__.return_value.write.assert_called()  # Ensure write was called
 
+    def test_markdown_relative_path_is_collision_free(self):
+        """URLs that flatten to the same name still get distinct files."""
+        path_underscore = markdown_relative_path("https://example.com/a_b")
+        path_slash = markdown_relative_path("https://example.com/a/b")
+
+        self.assertNotEqual(path_underscore, path_slash)
+        self.assertEqual(path_underscore, markdown_relative_path("https://example.com/a_b"))
+
+    def test_markdown_relative_path_is_sharded(self):
+        """Files are fanned out over two levels of hashed subdirectories."""
+        path = markdown_relative_path("https://example.com/docs/intro?page=2")
+        parts = path.split(os.sep)
+
+        self.assertEqual(len(parts), 3)
+        self.assertEqual(len(parts[0]), 2)
+        self.assertEqual(len(parts[1]), 2)
+        self.assertTrue(parts[2].startswith("docs_intro_page_2-"))
+        self.assertTrue(parts[2].endswith(".md"))
+        self.assertTrue(markdown_relative_path("https://example.com/").split(os.sep)[2].startswith("index-"))
+
+    def test_save_markdown_writes_manifest(self):
+        """Every saved file is recorded in the website's manifest."""
+        with tempfile.TemporaryDirectory() as output_dir:
+            urls = ["https://example.com/a_b", "https://example.com/a/b"]
+            file_paths = [asyncio.run(save_markdown(url, f"content of {url}", output_dir)) for url in urls]
+
+            manifest = load_manifest(os.path.join(output_dir, 'example.com'))
+
+            self.assertEqual(manifest, dict(zip(urls, file_paths)))
+            for url, file_path in zip(urls, file_paths):
+                with open(file_path, encoding='utf-8') as f:
+                    self.assertIn(f"content of {url}", f.read())
+
+    def test_removed_directories_are_created_again(self):
+        with tempfile.TemporaryDirectory() as output_dir:
+            url = "https://example.com/docs"
+            save_markdown_batch([(url, "first")], output_dir)
+            shutil.rmtree(os.path.join(output_dir, 'example.com'))
+
+            (file_path,) = save_markdown_batch([(url, "second")], output_dir)
+            async_path = asyncio.run(save_markdown("https://example.com/docs/2", "third", output_dir))
+
+            self.assertIsNotNone(file_path)
+            self.assertTrue(os.path.exists(async_path))
+            self.assertEqual(set(load_manifest(os.path.join(output_dir, 'example.com'))),
+                             {url, "https://example.com/docs/2"})
+
+    def test_manifest_appends_from_writer_threads(self):
+        with tempfile.TemporaryDirectory() as output_dir:
+            batches = [[(f"https://example.com/{n}/{i}", "x" * 1000) for i in range(50)] for n in range(8)]
+            with ThreadPoolExecutor(max_workers=4) as executor:
+                list(executor.map(save_markdown_batch, batches, [output_dir] * len(batches)))
+            # A URL saved again adds a line, and its last line wins
+            save_markdown_batch([("https://example.com/0/0", "again")], output_dir)
+
+            website_dir = os.path.join(output_dir, 'example.com')
+            with open(os.path.join(website_dir, 'manifest.jsonl'), encoding='utf-8') as f:
+                lines = [json.loads(line) for line in f]
+            self.assertEqual(len(lines), 8 * 50 + 1)
+            self.assertEqual(len(load_manifest(website_dir)), 8 * 50)
+
+    def test_manifest_errors_do_not_fail_saved_pages(self):
+        with tempfile.TemporaryDirectory() as output_dir:
+            urls = ["https://example.com/a", "https://example.com/b"]
+            with patch('src.results_saver._append_manifest_lines', side_effect=PermissionError("read-only")):
+                file_paths = save_markdown_batch([(url, "content") for url in urls], output_dir)
+
+            # The files were written, so the pages keep their paths
+            self.assertNotIn(None, file_paths)
+            for file_path in file_paths:
+                self.assertTrue(os.path.exists(file_path))
+
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,77 @@
+import asyncio
+import unittest
+import logging
+from email.utils import format_datetime
+from datetime import datetime, timedelta, timezone
+from unittest.mock import MagicMock, patch
+from src.retry import RetryPolicy, classify_failure, parse_retry_after
+
+# Setup logging for tests
+logging.basicConfig(level=logging.DEBUG)
+
+class TestRetry(unittest.TestCase):
+
+    def test_parse_retry_after(self):
+        self.assertEqual(parse_retry_after("120"), 120.0)
+        self.assertIsNone(parse_retry_after(None))
+        self.assertIsNone(parse_retry_after("soon"))
+
+        retry_at = datetime.now(timezone.utc) + timedelta(seconds=30)
+        self.assertAlmostEqual(parse_retry_after(format_datetime(retry_at, usegmt=True)), 30, delta=2)
+
+    def test_classify_success(self):
+        self.assertIsNone(classify_failure(MagicMock(success=True, status_code=200)))
+
+    def test_classify_status_codes(self):
+        throttled = classify_failure(MagicMock(success=False, status_code=429, response_headers={'Retry-After': '7'}))
+        self.assertTrue(throttled['retryable'])
+        self.assertEqual(throttled['retry_after'], 7.0)
+
+        unavailable = classify_failure(MagicMock(success=False, status_code=503, response_headers={}))
+        self.assertTrue(unavailable['retryable'])
+        self.assertIsNone(unavailable['retry_after'])
+
+        not_found = classify_failure(MagicMock(success=False, status_code=404, response_headers={}))
+        self.assertFalse(not_found['retryable'])
+
+    def test_classify_exceptions(self):
+        self.assertTrue(classify_failure(asyncio.TimeoutError())['retryable'])
+        self.assertTrue(classify_failure(Exception("Page.goto: Timeout 30000ms exceeded"))['retryable'])
+        self.assertTrue(classify_failure(Exception("net::ERR_CONNECTION_RESET at https://example.com"))['retryable'])
+        self.assertFalse(classify_failure(Exception("Invalid CSS selector"))['retryable'])
+
+    def test_classify_failed_result_without_status(self):
+        failure = classify_failure(MagicMock(success=False, status_code=None, error_message="net::ERR_CONNECTION_REFUSED"))
+        self.assertTrue(failure['retryable'])
+
+    def test_backoff_is_jittered_and_capped(self):
+        policy = RetryPolicy(base_delay=1.0, max_delay=10.0)
+        with patch('src.retry.random.uniform', side_effect=lambda low, high: high):
+            self.assertEqual([policy.backoff(attempt) for attempt in range(1, 7)], [1, 2, 4, 8, 10, 10])
+
+    def test_next_delay_caps_attempts_per_url(self):
+        policy = RetryPolicy(max_attempts=3, base_delay=0)
+        failure = {'retryable': True, 'reason': 'HTTP 503', 'retry_after': None}
+
+        self.assertIsNotNone(policy.next_delay("https://example.com/a", failure))
+        self.assertIsNotNone(policy.next_delay("https://example.com/a", failure))
+        self.assertIsNone(policy.next_delay("https://example.com/a", failure))
+
+    def test_next_delay_caps_retries_per_host(self):
+        policy = RetryPolicy(max_retries_per_host=2, base_delay=0)
+        failure = {'retryable': True, 'reason': 'HTTP 503', 'retry_after': None}
+
+        self.assertIsNotNone(policy.next_delay("https://example.com/a", failure))
+        self.assertIsNotNone(policy.next_delay("https://example.com/b", failure))
+        self.assertIsNone(policy.next_delay("https://example.com/c", failure))
+        self.assertIsNotNone(policy.next_delay("https://other.com/a", failure))
+
+    def test_next_delay_honors_retry_after(self):
+        policy = RetryPolicy(base_delay=0)
+
+        self.assertEqual(policy.next_delay("https://example.com/a", {'retryable': True, 'reason': '', 'retry_after': 5.0}), 5.0)
+        self.assertIsNone(policy.next_delay("https://example.com/b", {'retryable': True, 'reason': '', 'retry_after': 3600.0}))
+        self.assertIsNone(policy.next_delay("https://example.com/c", {'retryable': False, 'reason': '', 'retry_after': None}))
+
+if __name__ == "__main__":
+    unittest.main()
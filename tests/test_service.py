@@ -0,0 +1,205 @@
+import os
+import asyncio
+import tempfile
+import unittest
+import logging
+from unittest.mock import AsyncMock, MagicMock, patch
+from aiohttp.test_utils import TestClient, TestServer
+from src.service import CrawlService, JobStore, create_app, parse_job_options
+from src.url_rules import UrlRules
+
+# Setup logging for tests
+logging.basicConfig(level=logging.DEBUG)
+
+
+def mock_crawler(hang=False):
+    crawler = MagicMock()
+    crawler.start = AsyncMock()
+    crawler.close = AsyncMock()
+
+    async def arun(url, **kwargs):
+        if hang:
+            await asyncio.Event().wait()
+        return MagicMock(success=True, status_code=200, markdown=f"# {url}", html="<html></html>",
+                         response_headers={})
+
+    crawler.arun = AsyncMock(side_effect=arun)
+    return crawler
+
+
+async def wait_for_status(client, job_id, statuses):
+    for _ in range(200):
+        job = await (await client.get(f'/jobs/{job_id}')).json()
+        if job['status'] in statuses:
+            return job
+        await asyncio.sleep(0.01)
+    raise AssertionError(f"Job {job_id} is still {job['status']}")
+
+
+class TestJobStore(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.temp_dir.name, 'jobs.db')
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_jobs_survive_reopening(self):
+        store = JobStore(self.db_path)
+        job = store.create("https://example.com", {'max_pages': 5})
+        store.update(job['id'], 'running')
+        store.close()
+
+        store = JobStore(self.db_path)
+        self.assertEqual(store.requeue_interrupted(), 1)
+        job = store.get(job['id'])
+        store.close()
+
+        self.assertEqual(job['status'], 'queued')
+        self.assertEqual(job['options'], {'max_pages': 5})
+
+    def test_parse_job_options(self):
+        self.assertEqual(parse_job_options({'url': "https://example.com", 'max_pages': 5}),
+                         {'crawl_all': False, 'max_pages': 5, 'check_robots': True, 'max_concurrent': 3})
+        for body in ({}, {'url': "https://example.com", 'max_pages': 0},
+                     {'url': "https://example.com", 'max_concurrent': 100},
+                     {'url': "https://example.com", 'max_pages': True}):
+            with self.assertRaises(ValueError):
+                parse_job_options(body)
+
+
+class TestCrawlService(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.output_dir = self.temp_dir.name
+        self.db_path = os.path.join(self.temp_dir.name, 'jobs.db')
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def run_with_client(self, crawler, scenario, **options):
+        async def run():
+            service = CrawlService(self.output_dir, self.db_path, **{'preflight': 'off', **options})
+            with patch('src.service.create_crawler', return_value=crawler):
+                await service.start()
+            client = TestClient(TestServer(create_app(service)))
+            await client.start_server()
+            try:
+                return await scenario(client)
+            finally:
+                await client.close()
+                await service.close()
+
+        return asyncio.run(run())
+
+    def test_submit_job_and_list_results(self):
+        crawler = mock_crawler()
+
+        async def scenario(client):
+            response = await client.post('/jobs', json={'url': "https://example.com/docs"})
+            self.assertEqual(response.status, 201)
+            job = await response.json()
+            self.assertEqual(job['status'], 'queued')
+
+            job = await wait_for_status(client, job['id'], ('succeeded', 'failed'))
+            results = await (await client.get(f"/jobs/{job['id']}/results")).json()
+            jobs = await (await client.get('/jobs?status=succeeded')).json()
+            return job, results, jobs
+
+        job, results, jobs = self.run_with_client(crawler, scenario)
+
+        self.assertEqual(job['status'], 'succeeded')
+        self.assertEqual(job['stats'], {'succeeded': 1, 'failed': 0, 'skipped': 0, 'retried': 0})
+        self.assertEqual([result['url'] for result in results['results']], ["https://example.com/docs"])
+        self.assertEqual([listed['id'] for listed in jobs['jobs']], [job['id']])
+        crawler.close.assert_awaited_once()  # The shared crawler outlives its jobs
+
+    def test_cancel_running_job(self):
+        async def scenario(client):
+            job = await (await client.post('/jobs', json={'url': "https://example.com"})).json()
+            await wait_for_status(client, job['id'], ('running',))
+            response = await client.post(f"/jobs/{job['id']}/cancel")
+            self.assertEqual(response.status, 200)
+            job = await wait_for_status(client, job['id'], ('cancelled',))
+            again = await client.post(f"/jobs/{job['id']}/cancel")
+            return job, again.status
+
+        job, status = self.run_with_client(mock_crawler(hang=True), scenario)
+
+        self.assertEqual(job['status'], 'cancelled')
+        self.assertEqual(status, 409)
+
+    def test_invalid_requests(self):
+        async def scenario(client):
+            bad_job = await client.post('/jobs', json={'max_pages': 5})
+            missing = await client.get('/jobs/unknown')
+            return bad_job.status, missing.status
+
+        self.assertEqual(self.run_with_client(mock_crawler(), scenario), (400, 404))
+
+    def test_metrics_endpoint(self):
+        async def scenario(client):
+            await client.post('/jobs', json={'url': "https://example.com"})
+            text = await client.get('/metrics')
+            summary = await client.get('/metrics', params={'format': 'json'})
+            return text.headers['Content-Type'], await text.text(), await summary.json()
+
+        content_type, text, summary = self.run_with_client(mock_crawler(), scenario)
+
+        self.assertTrue(content_type.startswith('text/plain'))
+        self.assertIn('# TYPE crawler_render_seconds histogram', text)
+        self.assertEqual(sum(summary['crawler_jobs'].values()), 1)
+
+    def test_interrupted_jobs_resume_after_restart(self):
+        # A job left running by a previous process
+        store = JobStore(self.db_path)
+        job = store.create("https://example.com", parse_job_options({'url': "https://example.com"}))
+        store.update(job['id'], 'running')
+        store.close()
+
+        async def scenario(client):
+            return await wait_for_status(client, job['id'], ('succeeded', 'failed'))
+
+        self.assertEqual(self.run_with_client(mock_crawler(), scenario)['status'], 'succeeded')
+
+    @patch('src.discovery.fetch_robots_txt_async', new_callable=AsyncMock)
+    def test_job_without_crawlable_urls_reports_why(self, mock_fetch_robots):
+        mock_fetch_robots.return_value = {'disallow': ['/'], 'allow': [], 'sitemap': []}
+
+        async def scenario(client):
+            job = await (await client.post('/jobs', json={'url': "https://example.com/docs"})).json()
+            return await wait_for_status(client, job['id'], ('succeeded', 'failed'))
+
+        job = self.run_with_client(mock_crawler(), scenario)
+
+        self.assertEqual(job['status'], 'failed')
+        self.assertEqual(job['error'], "No crawlable URLs found for https://example.com/docs")
+
+    @patch('src.service.crawl_parallel', new_callable=AsyncMock)
+    @patch('src.service.discover_site_urls', new_callable=AsyncMock)
+    def test_service_options_reach_every_job(self, mock_discover_site_urls, mock_crawl_parallel):
+        mock_discover_site_urls.return_value = ["https://example.com"]
+        mock_crawl_parallel.return_value = {'succeeded': 1, 'failed': 0, 'skipped': 0, 'retried': 0}
+        url_rules = UrlRules(exclude_globs=['*/drafts/*'])
+
+        async def scenario(client):
+            job = await (await client.post('/jobs', json={'url': "https://example.com"})).json()
+            return await wait_for_status(client, job['id'], ('succeeded', 'failed'))
+
+        job = self.run_with_client(mock_crawler(), scenario, url_rules=url_rules, preflight='extension',
+                                   document_workers=0, cache_dir=os.path.join(self.output_dir, 'cache'))
+
+        self.assertEqual(job['status'], 'succeeded')
+        self.assertIs(mock_discover_site_urls.call_args.kwargs['url_rules'], url_rules)
+        kwargs = mock_crawl_parallel.call_args.kwargs
+        self.assertIsNotNone(kwargs['content_filter'])
+        self.assertIsNotNone(kwargs['cache'])
+        self.assertIs(mock_discover_site_urls.call_args.args[5], kwargs['cache'])
+        # Documents are skipped with no document workers
+        self.assertIsNone(kwargs['content_handlers'])
+
+
+if __name__ == "__main__":
+    unittest.main()
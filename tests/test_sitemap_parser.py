@@ -1,6 +1,7 @@
 import sys
 import os
 import asyncio
+import tempfile
 import unittest
 import logging
 from unittest.mock import patch, AsyncMock
@@ -9,7 +10,8 @@ from aiohttp import ClientSession
 # Add the src directory to the path for imports
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
 
-from sitemap_parser import fetch_sitemap_urls, get_sitemap_urls  
+from sitemap_parser import fetch_sitemap_urls, get_sitemap_urls, fetch_text, fetch_sitemap_entries, iter_sitemap_entries
+from src.response_cache import ResponseCache
 
 # Setup logging for tests (optional)
 logging.basicConfig(level=logging.DEBUG)
@@ -70,6 +72,80 @@ class TestSitemapParser(unittest.TestCase):
         self.assertEqual(urls, expected_urls)
         logging.info("Fetched sitemap URLs using get_sitemap_urls successfully.")
 
+    def test_fetch_text_uses_cache(self):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            async def run():
+                cache = ResponseCache(cache_dir)
+                await cache.put("https://example.com/sitemap.xml", {'body': "<urlset></urlset>"}, {'fetcher': 'aiohttp'})
+                session = AsyncMock()  # Any request through the session would fail
+                return await fetch_text("https://example.com/sitemap.xml", session, cache), session
+
+            content, session = asyncio.run(run())
+
+            self.assertEqual(content, "<urlset></urlset>")
+            session.get.assert_not_called()
+
+    @patch('sitemap_parser.fetch_text', new_callable=AsyncMock)
+    def test_fetch_sitemap_entries(self, mock_fetch_text):
+        mock_fetch_text.return_value = """
+        <urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">
+            <url>
+                <loc>https://example.com/page1</loc>
+                <lastmod>2024-05-01</lastmod>
+                <priority>0.8</priority>
+            </url>
+            <url>
+                <loc>https://example.com/page2</loc>
+                <priority>high</priority>
+            </url>
+        </urlset>
+        """
+
+        entries = asyncio.run(fetch_sitemap_entries("https://example.com/sitemap.xml", session=AsyncMock()))
+
+        self.assertEqual(entries, [
+            {'url': 'https://example.com/page1', 'priority': 0.8, 'lastmod': '2024-05-01'},
+            {'url': 'https://example.com/page2', 'priority': None, 'lastmod': None},
+        ])
+
+    @patch('sitemap_parser.fetch_text', new_callable=AsyncMock)
+    def test_iter_sitemap_entries_yields_each_sitemap(self, mock_fetch_text):
+        sitemaps = {
+            "https://example.com/sitemap.xml": """
+            <sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">
+                <sitemap><loc>https://example.com/sitemap-1.xml</loc></sitemap>
+                <sitemap><loc>https://example.com/sitemap-2.xml</loc></sitemap>
+                <sitemap><loc>https://example.com/sitemap-3.xml</loc></sitemap>
+            </sitemapindex>
+            """,
+            "https://example.com/sitemap-1.xml": """
+            <urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">
+                <url><loc>https://example.com/1a</loc></url>
+                <url><loc>https://example.com/1b</loc></url>
+            </urlset>
+            """,
+            "https://example.com/sitemap-2.xml": """
+            <urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">
+                <url><loc>https://example.com/2a</loc></url>
+                <url><loc>https://example.com/2b</loc></url>
+            </urlset>
+            """,
+        }
+        mock_fetch_text.side_effect = lambda url, session, cache=None: sitemaps[url]
+
+        async def run():
+            batches = []
+            async for entries in iter_sitemap_entries("https://example.com/sitemap.xml", AsyncMock(), max_entries=3):
+                batches.append([entry['url'] for entry in entries])
+            return batches
+
+        batches = asyncio.run(run())
+
+        # Each sitemap arrives as soon as it is parsed; the limit stops the walk before the third sitemap
+        self.assertEqual(batches, [["https://example.com/1a", "https://example.com/1b"], ["https://example.com/2a"]])
+        self.assertEqual(mock_fetch_text.call_count, 3)
+
+
 if __name__ == "__main__":
     unittest.main()
 
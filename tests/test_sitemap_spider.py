@@ -5,6 +5,7 @@ from scrapy.http import HtmlResponse, Request
 from scrapy.utils.project import get_project_settings
 from scrapy.crawler import CrawlerProcess
 from src.sitemap_spider import SitemapSpider  
+from src.url_rules import UrlRules
 
 class SitemapSpiderTest(unittest.TestCase):
 
@@ -112,6 +113,29 @@ class SitemapSpiderTest(unittest.TestCase):
         self.assertEqual(len(results), 2)
         self.assertEqual(spider.crawled_pages, 2)
 
+    def test_parse_applies_url_rules(self):
+        # Test that the spider only follows the links its URL rules allow
+        start_url = 'https://example.com'
+        spider = SitemapSpider(start_url=start_url, url_rules=UrlRules(exclude_globs=['*/tag/*'],
+                                                                       allowed_query_params=['page']))
+
+        fake_html = """
+        <html>
+            <body>
+                <a href="/docs">Docs</a>
+                <a href="/tag/news">Tag</a>
+                <a href="/blog?page=2">Page 2</a>
+                <a href="/blog?sort=new">Sorted</a>
+                <a href="/logo.PNG">Logo</a>
+            </body>
+        </html>
+        """
+        response = HtmlResponse(url=start_url, body=fake_html, encoding='utf-8')
+
+        results = [result['url'] for result in spider.parse(response)]
+
+        self.assertEqual(results, ['https://example.com/docs', 'https://example.com/blog?page=2'])
+
     def tearDown(self):
         # Clean up the output directory after each test
         if os.path.exists(self.output_dir):
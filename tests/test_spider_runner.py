@@ -0,0 +1,17 @@
+import unittest
+from src.spider_runner import SpiderRunner
+
+
+class TestSpiderRunner(unittest.TestCase):
+
+    def test_collected_urls_keep_discovery_order(self):
+        runner = SpiderRunner()
+        for url in ("https://b.com/z", "https://a.com/y", "https://b.com/a"):
+            runner.collect_urls({'url': url}, response=None)
+
+        # Unsorted, as the spider found them
+        self.assertEqual(runner.urls, ["https://b.com/z", "https://a.com/y", "https://b.com/a"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,54 @@
+import os
+import sys
+import json
+import subprocess
+import unittest
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+# Importing src.main must stay well below a second on a developer machine; the budget leaves room for slow CI
+IMPORT_BUDGET_SECONDS = 0.5
+
+# Packages that must only be imported on the code paths that use them
+HEAVY_MODULES = ('crawl4ai', 'playwright', 'scrapy', 'twisted', 'bs4', 'requests', 'aiohttp', 'psutil')
+
+
+def run_python(code: str) -> str:
+    """Runs code in a fresh interpreter and returns its output."""
+    result = subprocess.run([sys.executable, '-c', code], cwd=ROOT_DIR, capture_output=True, text=True,
+                            check=True, timeout=60)
+    return result.stdout
+
+
+class TestStartup(unittest.TestCase):
+
+    def test_importing_main_skips_heavy_dependencies(self):
+        loaded = json.loads(run_python(
+            "import json, sys\n"
+            "import src.main\n"
+            f"print(json.dumps([name for name in {HEAVY_MODULES!r} if name in sys.modules]))\n"))
+
+        self.assertEqual(loaded, [])
+
+    def test_import_time_budget(self):
+        # Best of three, so a busy machine does not fail the test
+        timings = [float(run_python(
+            "import time\n"
+            "start = time.perf_counter()\n"
+            "import src.main\n"
+            "print(time.perf_counter() - start)\n")) for _ in range(3)]
+
+        self.assertLess(min(timings), IMPORT_BUDGET_SECONDS)
+
+    def test_lazy_functions_load_on_first_call(self):
+        output = run_python(
+            "import sys\n"
+            "import src.main\n"
+            "print(src.main.is_url_allowed('https://example.com/private/a', {'disallow': ['/private'], 'allow': []}))\n"
+            "print('requests' in sys.modules)\n")
+
+        self.assertEqual(output.split(), ['False', 'True'])
+
+
+if __name__ == "__main__":
+    unittest.main()
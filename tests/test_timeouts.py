@@ -0,0 +1,80 @@
+import asyncio
+import unittest
+import logging
+from unittest.mock import AsyncMock, MagicMock
+from src.retry import classify_failure
+from src.timeouts import HostCircuitBreaker, PageTimeoutError, arun_with_timeout
+
+# Setup logging for tests
+logging.basicConfig(level=logging.DEBUG)
+
+class TestTimeouts(unittest.TestCase):
+
+    def test_arun_with_timeout_returns_result(self):
+        crawler = MagicMock()
+        crawler.arun = AsyncMock(return_value="result")
+
+        result = asyncio.run(arun_with_timeout(crawler, "https://example.com", 1.0))
+
+        self.assertEqual(result, "result")
+        crawler.arun.assert_called_once_with(url="https://example.com")
+
+    def test_arun_with_timeout_cancels_hung_page(self):
+        async def hang(**kwargs):
+            await asyncio.sleep(60)
+
+        crawler = MagicMock()
+        crawler.arun = hang
+        crawler.crawler_strategy.kill_session = AsyncMock()
+
+        async def run():
+            with self.assertRaises(PageTimeoutError) as context:
+                await arun_with_timeout(crawler, "https://example.com", 0.01, session_id="session_1")
+            return context.exception
+
+        error = asyncio.run(run())
+
+        crawler.crawler_strategy.kill_session.assert_called_once_with("session_1")
+        self.assertTrue(classify_failure(error)['retryable'])
+
+    def test_circuit_breaker_opens_and_recovers(self):
+        now = [0.0]
+        breaker = HostCircuitBreaker(failure_threshold=2, reset_timeout=30.0, clock=lambda: now[0])
+
+        breaker.record_failure("https://slow.com/a")
+        self.assertTrue(breaker.allow("https://slow.com/b"))
+        breaker.record_failure("https://slow.com/b")
+
+        # Open: the host is rejected but others are not
+        self.assertFalse(breaker.allow("https://slow.com/c"))
+        self.assertTrue(breaker.allow("https://fast.com/a"))
+
+        # Half-open: a single trial is let through after the reset timeout
+        now[0] = 31.0
+        self.assertTrue(breaker.allow("https://slow.com/c"))
+        self.assertFalse(breaker.allow("https://slow.com/d"))
+
+        # A failed trial reopens the circuit
+        breaker.record_failure("https://slow.com/c")
+        self.assertFalse(breaker.allow("https://slow.com/d"))
+
+        # A successful trial closes it
+        now[0] = 62.0
+        self.assertTrue(breaker.allow("https://slow.com/d"))
+        breaker.record_success("https://slow.com/d")
+        self.assertTrue(breaker.allow("https://slow.com/e"))
+        self.assertTrue(breaker.allow("https://slow.com/f"))
+
+    def test_circuit_breaker_trial_released_when_not_crawled(self):
+        now = [0.0]
+        breaker = HostCircuitBreaker(failure_threshold=1, reset_timeout=30.0, clock=lambda: now[0])
+        breaker.record_failure("https://slow.com/a")
+
+        now[0] = 31.0
+        self.assertTrue(breaker.allow("https://slow.com/b"))
+        self.assertFalse(breaker.allow("https://slow.com/c"))
+        breaker.release_trial("https://slow.com/b")
+        self.assertTrue(breaker.allow("https://slow.com/c"))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,107 @@
+import os
+import json
+import asyncio
+import tempfile
+import unittest
+from unittest.mock import AsyncMock, MagicMock
+from src.crawl_parallel import crawl_parallel
+from src.tracing import NOOP_TRACE, TRACER, Tracer
+
+
+class TestTracer(unittest.TestCase):
+
+    def test_sampling(self):
+        self.assertIs(Tracer(sample_rate=0.0).start_trace('crawl_url', key="https://a.com/"), NOOP_TRACE)
+        self.assertTrue(Tracer(sample_rate=1.0).start_trace('crawl_url', key="https://a.com/").sampled)
+
+        tracer = Tracer(sample_rate=0.25)
+        keys = [f"https://a.com/{i}" for i in range(2000)]
+        sampled = [key for key in keys if tracer.should_sample(key)]
+        self.assertTrue(350 < len(sampled) < 650)
+        # The decision for a key does not change, so every attempt at a URL is traced alike
+        self.assertEqual(sampled, [key for key in keys if tracer.should_sample(key)])
+
+        with self.assertRaises(ValueError):
+            tracer.configure(1.5)
+
+    def test_spans_nest_and_export(self):
+        tracer = Tracer(sample_rate=1.0)
+        with tracer.start_trace('crawl_url', key="https://a.com/", url="https://a.com/") as trace:
+            queued = trace.start_span('queue_wait')
+            trace.end_span(queued)
+            with trace.span('render') as attributes:
+                attributes['outcome'] = 'succeeded'
+                with trace.span('close_session'):
+                    pass
+
+        self.assertEqual(len(tracer.traces), 1)
+        spans = {span['name']: span for span in tracer.traces[0].spans}
+        self.assertEqual(spans['close_session']['parent_id'], spans['render']['span_id'])
+        self.assertEqual(spans['render']['parent_id'], spans['crawl_url']['span_id'])
+        self.assertTrue(all(span['end'] >= span['start'] for span in spans.values()))
+
+        chrome = tracer.to_chrome_trace()
+        complete = [event for event in chrome['traceEvents'] if event['ph'] == 'X']
+        self.assertEqual(sorted(event['name'] for event in complete),
+                         ['close_session', 'crawl_url', 'queue_wait', 'render'])
+        self.assertEqual({event['tid'] for event in complete}, {1})
+        self.assertEqual(chrome['traceEvents'][0]['args'], {'name': "https://a.com/"})
+
+        otlp_spans = tracer.to_otlp()['resourceSpans'][0]['scopeSpans'][0]['spans']
+        self.assertEqual(len(otlp_spans), 4)
+        self.assertEqual(len({span['traceId'] for span in otlp_spans}), 1)
+        self.assertEqual(sum('parentSpanId' not in span for span in otlp_spans), 1)
+        render = next(span for span in otlp_spans if span['name'] == 'render')
+        self.assertEqual(render['attributes'], [{'key': 'outcome', 'value': {'stringValue': 'succeeded'}}])
+
+    def test_errors_and_buffer_limit(self):
+        tracer = Tracer(sample_rate=1.0, max_traces=1)
+        with self.assertRaises(RuntimeError):
+            with tracer.start_trace('crawl_url') as trace:
+                with trace.span('render'):
+                    raise RuntimeError("browser crashed")
+        tracer.start_trace('crawl_url').finish()
+
+        self.assertEqual(len(tracer.traces), 1)
+        self.assertEqual(tracer.dropped, 1)
+        render = next(span for span in tracer.to_otlp()['resourceSpans'][0]['scopeSpans'][0]['spans']
+                      if span['name'] == 'render')
+        self.assertEqual(render['status']['code'], 2)
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, 'trace.json')
+            tracer.write(path, 'chrome')
+            with open(path) as f:
+                self.assertIn('traceEvents', json.load(f))
+
+
+class TestCrawlTracing(unittest.TestCase):
+
+    def tearDown(self):
+        TRACER.configure(0.0)
+        TRACER.reset()
+
+    def test_crawl_parallel_traces_each_url(self):
+        TRACER.configure(1.0)
+        TRACER.reset()
+        crawler = MagicMock()
+        crawler.close = AsyncMock()
+        crawler.crawler_strategy.kill_session = AsyncMock()
+        crawler.arun = AsyncMock(side_effect=lambda url, **kwargs: MagicMock(
+            success=True, status_code=200, markdown=f"# {url}", html="<html></html>", response_headers={}))
+
+        urls = ["https://example.com/1", "https://example.com/2"]
+        with tempfile.TemporaryDirectory() as output_dir:
+            asyncio.run(crawl_parallel(urls, output_dir=output_dir, crawler=crawler))
+
+        page_traces = [trace for trace in TRACER.traces if trace.root['name'] == 'crawl_url']
+        self.assertEqual(sorted(trace.root['attributes']['url'] for trace in page_traces), urls)
+        for trace in page_traces:
+            self.assertEqual(trace.root['attributes']['outcome'], 'succeeded')
+            self.assertEqual([span['name'] for span in trace.spans],
+                             ['crawl_url', 'queue_wait', 'render', 'close_session', 'write_queue', 'save_markdown'])
+        self.assertEqual([trace.root['name'] for trace in TRACER.traces].count('save_metadata'), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,97 @@
+import time
+import unittest
+from src.metrics import FILTERED_URLS
+from src.url_rules import DEFAULT_URL_RULES, UrlRules, glob_to_regex
+
+
+class TestGlobToRegex(unittest.TestCase):
+
+    def test_translation(self):
+        self.assertEqual(glob_to_regex('*/tag/*'), '/tag/')
+        self.assertEqual(glob_to_regex('*.html'), r'\.html\Z')
+        self.assertEqual(glob_to_regex('https://a.com/blog/*'), r'^https://a\.com/blog/')
+        self.assertEqual(glob_to_regex('https://a.com/p?'), r'^https://a\.com/p.\Z')
+
+
+class TestUrlRules(unittest.TestCase):
+
+    def test_default_rules(self):
+        self.assertTrue(DEFAULT_URL_RULES.allows("https://a.com/docs/intro"))
+        self.assertFalse(DEFAULT_URL_RULES.allows("https://a.com/image.jpg"))
+        self.assertFalse(DEFAULT_URL_RULES.allows("https://a.com/Notes.DOC"))
+        # PDFs and OOXML documents are left to the document extractor
+        self.assertTrue(DEFAULT_URL_RULES.allows("https://a.com/Report.PDF"))
+        self.assertFalse(DEFAULT_URL_RULES.allows("https://a.com/image.png#top"))
+        # Sitemap entries keep their queries; links the spider follows do not
+        self.assertTrue(DEFAULT_URL_RULES.allows("https://a.com/?p=123"))
+        self.assertTrue(DEFAULT_URL_RULES.allows("https://a.com/item?id=7"))
+        self.assertFalse(DEFAULT_URL_RULES.allows("https://a.com/search?q=x", followed_link=True))
+        self.assertTrue(DEFAULT_URL_RULES.allows("https://a.com/pngs/list"))
+        self.assertFalse(DEFAULT_URL_RULES.allows("https://a.com/slides.ppt"))
+
+    def test_extension_is_matched_on_the_path_only(self):
+        # A query or fragment that ends in an excluded extension does not exclude the page
+        self.assertTrue(DEFAULT_URL_RULES.allows("https://x.com/page?img=a.png"))
+        self.assertTrue(DEFAULT_URL_RULES.allows("https://x.com/p#a.jpg"))
+        self.assertFalse(DEFAULT_URL_RULES.allows("https://x.com/a.png?v=2"))
+
+    def test_globs_and_patterns(self):
+        rules = UrlRules(exclude_globs=['*/tag/*', 'https://a.com/blog/*.html'], exclude_patterns=[r'/20\d\d/'])
+
+        self.assertFalse(rules.allows("https://a.com/tag/news"))
+        self.assertFalse(rules.allows("https://a.com/blog/post.html"))
+        self.assertTrue(rules.allows("https://a.com/blog/post.htm"))
+        # Globs without a leading '*' match from the start of the URL
+        self.assertTrue(rules.allows("https://b.com/a.com/blog/post.html"))
+        self.assertFalse(rules.allows("https://a.com/news/2023/05"))
+
+    def test_query_param_allowlist(self):
+        rules = UrlRules(allowed_query_params=['page', 'lang'])
+
+        self.assertTrue(rules.allows("https://a.com/blog?page=2"))
+        self.assertTrue(rules.allows("https://a.com/blog?page=2&lang=en#top"))
+        self.assertFalse(rules.allows("https://a.com/blog?page=2&sort=new"))
+        self.assertFalse(rules.allows("https://a.com/photo.jpg?page=2"))
+        self.assertTrue(UrlRules(allowed_query_params=['*']).allows("https://a.com/blog?sort=new", followed_link=True))
+        # A configured allowlist applies to sitemap entries too
+        self.assertFalse(rules.allows("https://a.com/item?id=7"))
+        self.assertFalse(UrlRules(allowed_query_params=[]).allows("https://a.com/item?id=7"))
+
+    def test_max_depth(self):
+        rules = UrlRules(max_depth=2)
+
+        self.assertTrue(rules.allows("https://a.com/"))
+        self.assertTrue(rules.allows("https://a.com/docs/intro/"))
+        self.assertTrue(rules.allows("https://a.com//docs//intro"))
+        self.assertFalse(rules.allows("https://a.com/docs/intro/setup"))
+        with self.assertRaises(ValueError):
+            UrlRules(max_depth=-1)
+
+    def test_filter_keeps_entry_order_and_counts_dropped(self):
+        entries = [{'url': "https://a.com/a", 'priority': 0.5}, {'url': "https://a.com/b.jpg"},
+                   {'url': "https://a.com/c"}]
+        before = FILTERED_URLS.value()
+
+        self.assertEqual(DEFAULT_URL_RULES.filter(entries), [entries[0], entries[2]])
+        self.assertEqual(FILTERED_URLS.value() - before, 1)
+        self.assertEqual(DEFAULT_URL_RULES.filter(iter(["https://a.com/x.gif", "https://a.com/y"])),
+                         ["https://a.com/y"])
+        self.assertEqual(DEFAULT_URL_RULES.filter([]), [])
+
+    def test_filters_large_batches_quickly(self):
+        urls = [f"https://www.example.com/docs/section-{i % 50}/article-{i}{('.html', '.png', '', '?q=1')[i % 4]}"
+                for i in range(200000)]
+        rules = UrlRules(exclude_globs=['*/tag/*', 'https://www.example.com/blog/*'], exclude_patterns=[r'/private/'],
+                         max_depth=4)
+
+        started = time.perf_counter()
+        kept = rules.filter(urls, followed_links=True)
+        elapsed = time.perf_counter() - started
+
+        self.assertEqual(len(kept), 100000)
+        # About 0.1 s per 200,000 URLs on a laptop; the bound leaves room for slow CI machines
+        self.assertLess(elapsed, 2.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
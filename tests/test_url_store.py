@@ -0,0 +1,66 @@
+import random
+import unittest
+from src import url_store
+from src.url_store import UrlStore, split_origin
+
+
+class TestUrlStore(unittest.TestCase):
+
+    def test_split_origin(self):
+        self.assertEqual(split_origin("https://example.com/docs?page=2"), ("https://example.com", "/docs?page=2"))
+        self.assertEqual(split_origin("https://example.com?q=1"), ("https://example.com", "?q=1"))
+        self.assertEqual(split_origin("https://example.com"), ("https://example.com", ""))
+        self.assertEqual(split_origin("/relative"), ("", "/relative"))
+
+    def test_set_semantics(self):
+        store = UrlStore(["https://b.com/2", "https://a.com/x", "https://b.com/1"])
+
+        self.assertFalse(store.add("https://b.com/1"))
+        self.assertTrue(store.add("https://b.com/0"))
+        self.assertEqual(len(store), 4)
+        self.assertIn("https://b.com/0", store)
+        self.assertIn("https://a.com/x", store)
+        self.assertNotIn("https://a.com/y", store)
+        self.assertNotIn("https://c.com/x", store)
+        self.assertNotIn(None, store)
+        self.assertFalse(UrlStore())
+        # Sorted by origin in the order the origins were added, then by path
+        self.assertEqual(list(store), ["https://b.com/0", "https://b.com/1", "https://b.com/2", "https://a.com/x"])
+
+    def test_many_urls_round_trip(self):
+        rng = random.Random(0)
+        urls = {f"https://www.example.com/docs/section-{rng.randrange(50)}/article-{rng.randrange(10 ** 6)}.html"
+                for _ in range(20000)}
+        urls |= {"https://www.example.com/", "https://www.example.com/é/ünïcode", "http://other.org/a?b=c"}
+        urls = list(urls)
+        rng.shuffle(urls)
+
+        # Half in one merge, the other half one by one through the pending buffer
+        store = UrlStore(urls[:len(urls) // 2])
+        for url in urls[len(urls) // 2:]:
+            self.assertTrue(store.add(url))
+        self.assertEqual(store.update(urls[:100]), 0)
+
+        self.assertEqual(len(store), len(urls))
+        self.assertEqual(sorted(store), sorted(urls))
+        self.assertTrue(all(url in store for url in urls[::7]))
+        self.assertNotIn("https://www.example.com/docs/section-1/article-x.html", store)
+
+    def test_front_coding_is_compact(self):
+        urls = [f"https://www.example.com/docs/section-{i // 1000}/article-{i}.html" for i in range(20000)]
+        store = UrlStore(urls)
+
+        plain = sum(len(url) for url in urls)
+        # Shared prefixes are stored once per block, so the store takes far less than the URL text itself
+        self.assertLess(store.nbytes, plain / 3)
+
+    def test_long_suffixes_use_multibyte_lengths(self):
+        urls = [f"https://example.com/{i}/" + "x" * 300 for i in range(url_store.BLOCK_SIZE * 2)]
+        store = UrlStore(urls)
+
+        self.assertEqual(sorted(store), sorted(urls))
+        self.assertIn(urls[-1], store)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+import os
+import gzip
+import asyncio
+import tempfile
+import unittest
+import logging
+from unittest.mock import MagicMock
+from src.warc import WarcWriter, find_warc_files, iter_warc_records, iter_warc_responses
+
+# Setup logging for tests
+logging.basicConfig(level=logging.DEBUG)
+
+class TestWarc(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.output_dir = self.temp_dir.name
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_write_and_read_response(self):
+        """Records written by WarcWriter can be read back with their HTML intact."""
+        async def write():
+            writer = WarcWriter(self.output_dir)
+            await writer.write_response("https://example.com/page1", "<html><body>Café</body></html>", 200,
+                                        {'Content-Type': 'text/html', 'Content-Encoding': 'gzip'})
+            await writer.close()
+            return writer
+
+        writer = asyncio.run(write())
+
+        self.assertEqual(len(writer.files_written), 1)
+        records = list(iter_warc_records(writer.files_written[0]))
+        self.assertEqual([record['type'] for record in records], ['warcinfo', 'response', 'request'])
+        self.assertEqual(records[2]['headers']['WARC-Concurrent-To'], records[1]['headers']['WARC-Record-ID'])
+
+        responses = list(iter_warc_responses(writer.files_written))
+        self.assertEqual(len(responses), 1)
+        self.assertEqual(responses[0]['url'], "https://example.com/page1")
+        self.assertEqual(responses[0]['status_code'], 200)
+        self.assertEqual(responses[0]['html'], "<html><body>Café</body></html>")
+        self.assertNotIn('Content-Encoding', responses[0]['headers'])
+
+    def test_records_are_separate_gzip_members(self):
+        """Each record is compressed on its own so files can be split at record boundaries."""
+        async def write():
+            writer = WarcWriter(self.output_dir)
+            await writer.write_response("https://example.com/", "<html></html>")
+            await writer.close()
+            return writer.files_written[0]
+
+        path = asyncio.run(write())
+        with open(path, 'rb') as f:
+            data = f.read()
+        self.assertEqual(data.count(b'\x1f\x8b\x08'), 3)
+        self.assertTrue(gzip.decompress(data).startswith(b'WARC/1.1\r\n'))
+
+    def test_rolls_over_files(self):
+        """A new file is started once the current one exceeds max_file_size."""
+        async def write():
+            writer = WarcWriter(self.output_dir, max_file_size=1)
+            for i in range(3):
+                await writer.write_response(f"https://example.com/page{i}", "<html></html>")
+            await writer.close()
+            return writer
+
+        writer = asyncio.run(write())
+
+        self.assertEqual(len(writer.files_written), 3)
+        self.assertEqual(find_warc_files(self.output_dir), sorted(writer.files_written))
+        urls = [response['url'] for response in iter_warc_responses(find_warc_files(self.output_dir))]
+        self.assertEqual(sorted(urls), [f"https://example.com/page{i}" for i in range(3)])
+
+    def test_write_result_skips_empty_html(self):
+        """Results without HTML do not produce records."""
+        async def write():
+            writer = WarcWriter(self.output_dir)
+            await writer.write_result("https://example.com/", MagicMock(html=''))
+            await writer.close()
+            return writer
+
+        writer = asyncio.run(write())
+        self.assertEqual(writer.records_written, 0)
+        self.assertEqual(writer.files_written, [])
+
+if __name__ == "__main__":
+    unittest.main()